@@ -1,4 +1,8 @@
 """API package."""
+import time
+
+# Inizio import del package: base della fase "app_import" del profilo di avvio
+IMPORT_STARTED = time.perf_counter()
 
 
 __all__ = []
@@ -12,9 +12,12 @@ import hashlib
 import logging
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
+from typing import Union
 from pydantic import BaseModel
 from fastapi import APIRouter
 
+from ..utils.quantiles import AnySketch, as_sketch
+
 log = logging.getLogger(__name__)
 
 
@@ -175,7 +178,7 @@ def _get_time_cutoff(filter_option: str) -> datetime | None:
 def aggregate_analytics(
     chat_messages_store: dict,
     feedback_store: dict,
-    ag_latency_samples_ms: list[int],
+    ag_latency_samples_ms: Union[list[int], AnySketch],
 ) -> AnalyticsResponse:
     """
     Aggrega dati analytics da store in-memory.
@@ -183,7 +186,8 @@ def aggregate_analytics(
     Args:
         chat_messages_store: dict[session_id, list[message]]
         feedback_store: dict[key, feedback_record]
-        ag_latency_samples_ms: list[int]
+        ag_latency_samples_ms: Sketch latenze AG (chat_service.ag_latency_sketch)
+            o lista di campioni
         
     Returns:
         AnalyticsResponse con statistiche aggregate
@@ -232,9 +236,11 @@ def aggregate_analytics(
     )
     
     # Performance metrics
-    sample_count = len(ag_latency_samples_ms)
-    latency_p95_ms = int(_percentile(ag_latency_samples_ms, 95.0)) if sample_count > 0 else 0
-    latency_p99_ms = int(_percentile(ag_latency_samples_ms, 99.0)) if sample_count > 0 else 0
+    latency_sketch = as_sketch(ag_latency_samples_ms)
+    sample_count = latency_sketch.count
+    p95, p99 = latency_sketch.quantiles((0.95, 0.99))
+    latency_p95_ms = int(p95) if sample_count > 0 else 0
+    latency_p99_ms = int(p99) if sample_count > 0 else 0
     
     performance_metrics = PerformanceMetrics(
         latency_p95_ms=latency_p95_ms,
@@ -243,7 +249,7 @@ def aggregate_analytics(
     )
     
     # Avg latency
-    avg_latency_ms = int(sum(ag_latency_samples_ms) / sample_count) if sample_count > 0 else 0
+    avg_latency_ms = int(latency_sketch.mean) if sample_count > 0 else 0
     
     overview = OverviewStats(
         total_queries=total_queries,
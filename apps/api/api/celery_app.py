@@ -4,6 +4,7 @@ import os
 from typing import Dict, Any, List
 
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Configurazione Celery (broker/backend da env, default Redis locale)
 BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -21,6 +22,15 @@ celery_app.conf.result_serializer = "json"
 celery_app.conf.accept_content = ["json"]
 
 
+@worker_process_init.connect
+def configure_worker_shared_state(**_kwargs: Any) -> None:
+    """Stato condiviso anche nei worker Celery (es. versione corpus della cache retrieval)."""
+    from .config import get_settings
+    from .shared_state import configure_shared_state
+
+    configure_shared_state(get_settings())
+
+
 @celery_app.task(
     bind=True,
     autoretry_for=(Exception,),
@@ -39,11 +49,14 @@ def kb_indexing_task(self, payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     # Import locale per evitare dipendenze a import-time lato worker
     from .knowledge_base.indexer import index_chunks
+    from .knowledge_base.retrieval_cache import bump_corpus_version
 
     chunks: List[str] = payload.get("chunks") or []
     metadata_list = payload.get("metadata_list")
     document_id = payload.get("document_id")
     inserted = index_chunks(chunks, metadata_list)
+    # Risultati di retrieval in cache (tutti i processi API) non più validi
+    bump_corpus_version("celery_indexing", document_id)
     return {"inserted": inserted, "document_id": document_id}
 
 
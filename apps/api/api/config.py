@@ -6,10 +6,10 @@ Pattern: Singleton con dependency injection.
 """
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
 from dotenv import load_dotenv
-from pydantic import AliasChoices, Field, FieldValidationInfo, field_validator
+from pydantic import AliasChoices, BaseModel, Field, FieldValidationInfo, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 logger = logging.getLogger("api")
@@ -25,6 +25,14 @@ _ENV_FILE = Path(__file__).parent.parent.parent.parent / ".env"
 load_dotenv(_ENV_FILE, override=True)
 
 
+class LLMEndpointSettings(BaseModel):
+    """Endpoint del pool LLM gateway (modello OpenAI-compatibile)."""
+
+    model: str
+    base_url: Optional[str] = None
+    weight: float = Field(default=1.0, gt=0)
+
+
 class Settings(BaseSettings):
     """Application settings con validazione Pydantic."""
 
@@ -103,6 +111,29 @@ class Settings(BaseSettings):
     environment: str = Field(default="development")
     debug: bool = Field(default=False)
     log_level: str = Field(default="INFO")
+    log_async_enabled: bool = Field(
+        default=True,
+        description="Log via coda + writer in background (false = StreamHandler sincrono)",
+    )
+    log_queue_max_size: int = Field(
+        default=10000,
+        ge=100,
+        description="Record in coda oltre i quali i nuovi log sono scartati (mai bloccante)",
+    )
+    log_batch_size: int = Field(
+        default=256,
+        ge=1,
+        le=10000,
+        description="Record massimi per scrittura del writer",
+    )
+    log_event_levels: Dict[str, str] = Field(
+        default_factory=lambda: {"conversation_manager_type": "DEBUG"},
+        description='Livello per evento, JSON (es. {"rerank_pipeline_start": "DEBUG"})',
+    )
+    log_event_sample_rates: Dict[str, float] = Field(
+        default_factory=dict,
+        description='Sampling per evento 0..1, JSON (es. {"context_packed": 0.1})',
+    )
     
     # Testing environment (Story 5.4)
     testing: bool = Field(
@@ -115,7 +146,102 @@ class Settings(BaseSettings):
         default=True,
         description="Global rate limiting toggle"
     )
-    
+    rate_limit_backend: Literal["memory", "redis"] = Field(
+        default="memory",
+        description="Backend rate limiter: memory (per processo) o redis (condiviso tra worker)",
+    )
+    rate_limit_redis_url: Optional[str] = Field(
+        default=None,
+        description="URL Redis per il rate limiter (default: celery_broker_url)",
+    )
+
+    # Stato condiviso tra worker (api/shared_state.py)
+    shared_state_backend: Literal["memory", "redis", "shm"] = Field(
+        default="memory",
+        description=(
+            "Backend di sessioni chat, riassunti, sync job, access code e rate limit: "
+            "memory (per processo), redis (tutti i worker e host), "
+            "shm (SQLite su /dev/shm, worker dello stesso host)"
+        ),
+    )
+    shared_state_redis_url: Optional[str] = Field(
+        default=None,
+        description="URL Redis dello stato condiviso (default: celery_broker_url)",
+    )
+    shared_state_shm_path: Optional[str] = Field(
+        default=None,
+        description="File SQLite del backend shm (default: /dev/shm/fisiorag-state.sqlite3)",
+    )
+    shared_state_cache_ttl_seconds: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=60.0,
+        description="TTL cache locale read-through di riassunti e sync job (0 = sempre dal backend)",
+    )
+
+    # Prometheus (multiprocess via env PROMETHEUS_MULTIPROC_DIR, letta all'import)
+    prometheus_metrics_enabled: bool = Field(
+        default=True,
+        description="Espone GET /metrics in formato Prometheus",
+    )
+    prometheus_pool_sample_interval_seconds: float = Field(
+        default=5.0,
+        ge=0.0,
+        le=300.0,
+        description="Intervallo campionamento gauge pool DB per worker (0 = solo allo scrape)",
+    )
+
+    # Timing per-request (Server-Timing + ring buffer request lente)
+    server_timing_enabled: bool = Field(
+        default=True,
+        description="Aggiunge l'header Server-Timing con la durata degli stadi",
+    )
+    slow_request_threshold_ms: int = Field(
+        default=1000,
+        ge=0,
+        description="Durata minima (ms) per registrare una request nel log delle lente",
+    )
+    slow_request_log_size: int = Field(
+        default=100,
+        ge=1,
+        le=10000,
+        description="Capacità del ring buffer delle request lente (per processo)",
+    )
+    slow_request_sample_rate: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=1.0,
+        description="Frazione di request lente registrate nel ring buffer",
+    )
+
+    # Profiler a campionamento on-demand (POST /api/v1/admin/debug/profile)
+    profiler_enabled: bool = Field(
+        default=True,
+        description="Abilita l'endpoint admin di profiling del worker",
+    )
+    profiler_max_duration_seconds: int = Field(
+        default=30,
+        ge=1,
+        le=300,
+        description="Durata massima di una sessione di profiling",
+    )
+
+    # Warmup di avvio in lifespan (api/startup.py), prima che il worker sia pronto
+    startup_warmup_enabled: bool = Field(
+        default=True,
+        description="Precarica tokenizer, client LLM e reranker prima di accettare request",
+    )
+    startup_warmup_components: List[Literal["tiktoken", "llm_clients", "reranker"]] = Field(
+        default_factory=lambda: ["tiktoken", "llm_clients", "reranker"],
+        description='Componenti del warmup, JSON (es. ["tiktoken", "llm_clients"])',
+    )
+    startup_warmup_timeout_seconds: float = Field(
+        default=60.0,
+        ge=1.0,
+        le=600.0,
+        description="Tempo massimo del warmup: oltre, l'avvio prosegue e i componenti restano lazy",
+    )
+
     # Celery
     celery_enabled: bool = Field(default=False)
     celery_broker_url: str = Field(default="redis://localhost:6379/0")
@@ -226,7 +352,31 @@ class Settings(BaseSettings):
         le=1.0,
         description="Story 7.2 AC1: Threshold for filtering after re-ranking",
     )
-    
+    cross_encoder_skip_margin: float = Field(
+        default=0.15,
+        ge=0.0,
+        le=1.0,
+        description="Skip re-ranking se gap bi-encoder tra k-esimo e (k+1)-esimo candidato >= margin (0 = disabilitato)",
+    )
+    cross_encoder_batch_size: int = Field(
+        default=8,
+        ge=1,
+        le=64,
+        description="Mini-batch size per re-ranking incrementale con early-exit",
+    )
+    cross_encoder_max_chunk_tokens: int = Field(
+        default=256,
+        ge=32,
+        le=512,
+        description="Token budget (approssimato a parole) per chunk prima dello scoring cross-encoder",
+    )
+    cross_encoder_latency_budget_ms: int = Field(
+        default=1500,
+        ge=100,
+        le=10000,
+        description="Latency budget (ms) retrieval+re-ranking misurato dall'inizio della request",
+    )
+
     # Story 7.2: Dynamic retrieval configuration
     dynamic_match_count_min: int = Field(
         default=5,
@@ -260,7 +410,138 @@ class Settings(BaseSettings):
         le=5,
         description="Story 7.2 AC3: Number of top chunks to preserve regardless of diversification",
     )
-    
+
+    # Chunk content cache (RPC ids+scores, contenuto risolto localmente)
+    enable_chunk_content_cache: bool = Field(
+        default=False,
+        description="Usa RPC match_document_chunk_ids (solo id+score) e risolve content da cache locale",
+    )
+    chunk_cache_max_entries: int = Field(
+        default=2000,
+        ge=100,
+        le=50000,
+        description="Numero massimo chunk in cache LRU (chunk pinned inclusi)",
+    )
+    chunk_cache_warmup_count: int = Field(
+        default=200,
+        ge=0,
+        le=5000,
+        description="Chunk più recuperati da precaricare e pinnare all'avvio (0 = nessun warmup)",
+    )
+
+    # ANN su embedding ridotto (halfvec 512) con rescoring esatto su vector(1536)
+    enable_quantized_ann_search: bool = Field(
+        default=False,
+        description="Usa RPC match_document_chunks_quantized (richiede backfill_quantized_embeddings.py)",
+    )
+    quantized_ann_candidate_factor: int = Field(
+        default=4,
+        ge=1,
+        le=10,
+        description="Candidati dall'indice ridotto = match_count x factor, poi rescoring esatto (max 100 = hnsw.ef_search)",
+    )
+
+    # Retrieval result cache (query identiche saltano embedding, RPC e re-ranking)
+    enable_retrieval_result_cache: bool = Field(
+        default=False,
+        description="Cache risultati retrieval per query normalizzata + parametri + flag, invalidata da corpus version",
+    )
+    retrieval_cache_max_entries: int = Field(
+        default=1000,
+        ge=10,
+        le=100000,
+        description="Numero massimo entry nella cache risultati retrieval (LRU)",
+    )
+    retrieval_cache_ttl_seconds: int = Field(
+        default=3600,
+        ge=10,
+        le=86400,
+        description="TTL entry cache risultati (staleness massima se la versione corpus non è condivisa)",
+    )
+    enable_context_packing: bool = Field(
+        default=False,
+        description="Packing dei chunk nel prompt: dedup overlap, merge chunk adiacenti, budget token",
+    )
+    context_max_tokens: int = Field(
+        default=3000,
+        ge=200,
+        le=32000,
+        description="Budget token contesto (chunk + cronologia conversazione) per la generazione",
+    )
+    context_min_chunk_tokens: int = Field(
+        default=800,
+        ge=100,
+        le=16000,
+        description="Budget minimo garantito ai chunk anche con cronologia lunga",
+    )
+    context_min_relative_score: float = Field(
+        default=0.5,
+        ge=0.0,
+        le=1.0,
+        description="Tronca dal primo chunk con rerank score < top * ratio (solo con re-ranking, 0 = disabilitato)",
+    )
+    context_preserve_top_n: int = Field(
+        default=2,
+        ge=1,
+        le=10,
+        description="Chunk top-ranked mai scartati dal taglio per score",
+    )
+    enable_request_coalescing: bool = Field(
+        default=False,
+        description="Coalescing di richieste chat identiche in corso (solo turni senza cronologia)",
+    )
+    enable_native_structured_output: bool = Field(
+        default=False,
+        description="Structured output nativo (response_format json_schema) al posto di PydanticOutputParser",
+    )
+    structured_output_strict: bool = Field(
+        default=True,
+        description="Modalità strict dello schema: decodifica vincolata, niente JSON malformato",
+    )
+    enable_llm_gateway: bool = Field(
+        default=False,
+        description="Chiamate chat tramite LLM gateway (deadline, hedging, pool endpoint)",
+    )
+    llm_endpoints: list[LLMEndpointSettings] = Field(
+        default_factory=list,
+        description=(
+            "Pool endpoint LLM (JSON: [{\"model\": ..., \"base_url\": ..., \"weight\": ...}]); "
+            "vuoto = singolo endpoint openai_model/openai_base_url"
+        ),
+    )
+    llm_request_budget_ms: int = Field(
+        default=20000,
+        ge=1000,
+        le=120000,
+        description="Budget totale request chat: la deadline della chiamata LLM è il tempo residuo",
+    )
+    llm_hedging_enabled: bool = Field(
+        default=False,
+        description="Richiesta duplicata su altro endpoint se la prima supera il p95 osservato",
+    )
+    llm_hedge_min_delay_ms: int = Field(
+        default=1500,
+        ge=50,
+        le=60000,
+        description="Ritardo minimo prima dell'hedge (usato anche finché mancano campioni p95)",
+    )
+    enable_conversation_summary: bool = Field(
+        default=False,
+        description="Riassunto rolling in background dei messaggi precedenti all'ultimo turno",
+    )
+    conversation_summary_min_messages: int = Field(
+        default=4,
+        ge=2,
+        le=40,
+        description="Messaggi non ancora riassunti necessari per avviare un aggiornamento",
+    )
+    conversation_summary_max_words: int = Field(
+        default=150,
+        ge=30,
+        le=1000,
+        description="Lunghezza massima (parole) del riassunto rolling",
+    )
+
     # Validatori custom
     @field_validator('supabase_url')
     @classmethod
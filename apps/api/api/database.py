@@ -1,4 +1,5 @@
 import os
+import time
 import asyncpg
 import asyncio
 from contextlib import asynccontextmanager
@@ -62,26 +63,72 @@ async def close_db_pool():
             pool.terminate()
 
 
+async def _sample_pool_metrics(interval_seconds: float) -> None:
+    """Aggiorna periodicamente le gauge Prometheus del pool (per worker)."""
+    from .utils.prometheus_exporter import sample_db_pool
+
+    while True:
+        sample_db_pool(db_pool)
+        await asyncio.sleep(interval_seconds)
+
+
 @asynccontextmanager
 async def lifespan(app):
     """
     Context manager per lifecycle events di FastAPI.
     
     Gestisce:
-    - Startup: inizializzazione connection pool
-    - Shutdown: chiusura pool e cleanup risorse
+    - Startup: inizializzazione connection pool, warmup (cache chunk,
+      tokenizer, client LLM, reranker: vedi api/startup.py), campionamento
+      metriche pool; ogni fase è misurata nel profilo di avvio
+    - Shutdown: chiusura pool e cleanup risorse (file metriche multiprocess)
     """
     import logging
+    from .startup import run_warmup, startup_phase, startup_profile
+
     logger = logging.getLogger("database")
     logger.critical("🚀 [LIFESPAN] ENTERED - Starting database initialization")
+    lifespan_started = time.perf_counter()
     
     try:
-        await init_db_pool()
+        with startup_phase("db_pool"):
+            await init_db_pool()
         logger.critical("✅ [LIFESPAN] Database pool initialized successfully")
     except Exception as e:
         logger.critical(f"❌ [LIFESPAN] Database initialization FAILED: {e}", exc_info=True)
         raise
-    
+
+    # Warmup cache chunk (non bloccante in caso di errore)
+    try:
+        from .config import get_settings
+        settings = get_settings()
+        if settings.enable_chunk_content_cache and settings.chunk_cache_warmup_count > 0:
+            from .knowledge_base.chunk_cache import warm_chunk_cache
+            with startup_phase("chunk_cache_warmup"):
+                await warm_chunk_cache(db_pool, settings.chunk_cache_warmup_count)
+    except Exception as e:
+        logger.warning(f"⚠️ [LIFESPAN] Chunk cache warmup skipped: {e}")
+
+    # Warmup dipendenze della prima chat (prima del yield: worker non ancora pronto)
+    try:
+        from .config import get_settings
+        await run_warmup(get_settings())
+    except Exception as e:
+        logger.warning(f"⚠️ [LIFESPAN] Startup warmup skipped: {e}")
+
+    pool_sampler: asyncio.Task | None = None
+    try:
+        from .config import get_settings
+        interval = get_settings().prometheus_pool_sample_interval_seconds
+        if interval > 0:
+            pool_sampler = asyncio.create_task(_sample_pool_metrics(interval))
+    except Exception as e:
+        logger.warning(f"⚠️ [LIFESPAN] Pool metrics sampler disabled: {e}")
+
+    startup_profile.record("lifespan", (time.perf_counter() - lifespan_started) * 1000.0)
+    startup_profile.mark_ready()
+    logging.getLogger("api").info({"event": "startup_profile", **startup_profile.as_dict()})
+
     logger.critical("🟢 [LIFESPAN] Yielding control to application")
     yield
     
@@ -95,10 +142,17 @@ async def lifespan(app):
     except Exception as e:
         logger.error(f"⚠️ [LIFESPAN] Error flushing pending writes: {e}", exc_info=True)
     
+    if pool_sampler is not None:
+        pool_sampler.cancel()
+
     logger.critical("🔴 [LIFESPAN] Closing database pool")
     await close_db_pool()
     logger.critical("✅ [LIFESPAN] Database pool closed")
 
+    from .utils.prometheus_exporter import mark_worker_dead, sample_db_pool
+    sample_db_pool(None)
+    mark_worker_dead()
+
 
 async def get_db_connection() -> AsyncGenerator[asyncpg.Connection, None]:
     """
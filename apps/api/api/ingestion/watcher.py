@@ -17,7 +17,9 @@ from api.knowledge_base.classification_cache import (
     ClassificationCache,
     get_classification_cache,
 )
+from api.knowledge_base.chunk_cache import invalidate_document_chunks
 from api.knowledge_base.extractors import DocumentExtractor
+from api.knowledge_base.retrieval_cache import bump_corpus_version
 
 from .chunk_router import ChunkRouter, CONFIDENZA_SOGLIA_FALLBACK
 from .config import IngestionConfig
@@ -62,7 +64,8 @@ def _classify_with_timeout(
     cache: ClassificationCache,
 ) -> tuple[EnhancedClassificationOutput, Dict[str, Any]]:
     """Execute classification respecting timeout and returning source metadata."""
-    cache_stats_before = cache.get_stats() if cache else {}
+    # Solo i contatori prima; le statistiche complete una volta, dopo
+    counters_before = cache.counters() if cache else None
 
     future = _CLASSIFICATION_EXECUTOR.submit(
         classify_content_enhanced,
@@ -77,10 +80,9 @@ def _classify_with_timeout(
 
     cache_stats_after = cache.get_stats() if cache else {}
     source = "unknown"
-    if cache_stats_before and cache_stats_after:
-        hits_before = cache_stats_before.get("hits") or 0
+    if counters_before is not None and cache_stats_after:
+        hits_before, misses_before = counters_before
         hits_after = cache_stats_after.get("hits") or 0
-        misses_before = cache_stats_before.get("misses") or 0
         misses_after = cache_stats_after.get("misses") or 0
         if hits_after > hits_before:
             source = "cache"
@@ -509,6 +511,8 @@ async def scan_once(
                         db_storage_duration_ms = (time.perf_counter() - db_storage_start) * 1000.0
                         doc.status = "completed"
                         doc.metadata["document_id"] = str(document_id)
+                        # Re-ingestion: document_id invariato per stesso file_hash
+                        invalidate_document_chunks(document_id)
                         
                         # Story 6.4 AC2+AC2.5: UPDATE embeddings su chunk esistenti con advisory lock
                         # CRITICAL: Advisory lock BLOCKING per coordinamento con batch script
@@ -564,6 +568,9 @@ async def scan_once(
                                     "document_id": str(document_id)
                                 })
                         
+                        # Chunk + embeddings committati: risultati retrieval in cache obsoleti
+                        bump_corpus_version("watcher_ingestion", document_id)
+
                         logger.info(
                             {
                                 "event": "watcher_db_storage_complete",
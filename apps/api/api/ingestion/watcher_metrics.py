@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from collections import Counter, deque
+from collections import Counter
 from threading import Lock
 from typing import Any, Dict, List, Optional
 
@@ -9,31 +9,32 @@ from api.knowledge_base.classification_cache import (
     ClassificationCache,
     get_classification_cache,
 )
+from api.utils.prometheus_exporter import (
+    record_watcher_classification,
+    record_watcher_document,
+    record_watcher_strategy,
+)
+from api.utils.quantiles import WindowedQuantileSketch, sketch_from_values
+
+# Finestra scorrevole delle latenze di classificazione (secondi)
+LATENCY_WINDOW_SECONDS = 3600
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
 
 
 def _percentile(values: List[float], percentile: float) -> Optional[float]:
     """Return percentile using linear interpolation (1-100 scale)."""
-    if not values:
-        return None
-    ordered = sorted(values)
-    if len(ordered) == 1:
-        return round(ordered[0], 3)
-    rank = (len(ordered) - 1) * (percentile / 100.0)
-    low = int(rank)
-    high = low + 1
-    if high >= len(ordered):
-        return round(ordered[-1], 3)
-    weight_high = rank - low
-    interpolated = ordered[low] * (1 - weight_high) + ordered[high] * weight_high
-    return round(interpolated, 3)
+    return _round(sketch_from_values(values).quantile(percentile / 100.0, interpolate=True))
 
 
 class WatcherMetrics:
     """In-memory metrics aggregator for watcher observability (AC7)."""
 
-    def __init__(self, max_samples: int = 2000) -> None:
+    def __init__(self, latency_window_seconds: float = LATENCY_WINDOW_SECONDS) -> None:
         self._lock = Lock()
-        self._latencies: deque[float] = deque(maxlen=max_samples)
+        self._latencies = WindowedQuantileSketch(window_seconds=latency_window_seconds)
         self._classification_success = 0
         self._classification_failure = 0
         self._classification_skipped = 0
@@ -54,6 +55,7 @@ class WatcherMetrics:
     def record_document(self) -> None:
         with self._lock:
             self._documents_processed += 1
+        record_watcher_document()
 
     def record_classification(self, outcome: str, latency_ms: Optional[float]) -> None:
         with self._lock:
@@ -65,20 +67,21 @@ class WatcherMetrics:
                 self._classification_skipped += 1
 
             if latency_ms is not None:
-                self._latencies.append(latency_ms)
+                self._latencies.record(latency_ms)
+        record_watcher_classification(outcome, latency_ms)
 
     def record_strategy(self, strategy_name: str, is_fallback: bool) -> None:
         with self._lock:
             self._strategy_counts[strategy_name] += 1
             if is_fallback:
                 self._fallback_count += 1
+        record_watcher_strategy(strategy_name, is_fallback)
 
     def snapshot(
         self,
         cache_stats: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         with self._lock:
-            latencies = list(self._latencies)
             success = self._classification_success
             failure = self._classification_failure
             skipped = self._classification_skipped
@@ -104,11 +107,12 @@ class WatcherMetrics:
             },
         }
 
+        p50, p95, p99 = self._latencies.quantiles((0.50, 0.95, 0.99), interpolate=True)
         latency_metrics = {
-            "count": len(latencies),
-            "p50": _percentile(latencies, 50),
-            "p95": _percentile(latencies, 95),
-            "p99": _percentile(latencies, 99),
+            "count": self._latencies.count,
+            "p50": _round(p50),
+            "p95": _round(p95),
+            "p99": _round(p99),
         }
 
         return {
@@ -0,0 +1,306 @@
+"""Cache locale bounded per il contenuto dei chunk della knowledge base.
+
+Con ``enable_chunk_content_cache`` la ricerca semantica usa l'RPC
+``match_document_chunk_ids`` (solo id, document_id, similarity) e risolve
+il ``content`` dei chunk da questa cache; solo i miss vengono letti da
+``document_chunks`` in un'unica query ``IN``. I chunk più recuperati
+(``source_chunk_ids`` persistiti + ``aggregate_top_chunks`` in memoria)
+vengono precaricati all'avvio e pinnati, così non escono per LRU.
+
+Invalidazione per ``document_id`` alla re-ingestion di un documento.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.prometheus_exporter import record_cache_lookup
+
+logger = logging.getLogger("api")
+
+
+class ChunkContentCache:
+    """LRU thread-safe di chunk ``id -> {document_id, content, metadata}``.
+
+    I chunk pinned non vengono espulsi per LRU; se i pinned superano la
+    capacità l'ultimo inserito resta comunque fuori (cache sempre bounded).
+    """
+
+    def __init__(self, max_entries: int = 2000) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pinned: set[str] = set()
+        self._by_document: Dict[str, set[str]] = {}
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(
+        self, chunk_ids: Iterable[str]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Restituisce (entry trovate, id mancanti) preservando l'ordine dei miss."""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for chunk_id in chunk_ids:
+                entry = self._entries.get(chunk_id)
+                if entry is None:
+                    self._misses += 1
+                    missing.append(chunk_id)
+                    continue
+                self._hits += 1
+                self._entries.move_to_end(chunk_id)
+                found[chunk_id] = entry
+        record_cache_lookup("chunk", hits=len(found), misses=len(missing))
+        return found, missing
+
+    def put(
+        self,
+        chunk_id: str,
+        document_id: Optional[str],
+        content: Optional[str],
+        metadata: Optional[Dict[str, Any]] = None,
+        pinned: bool = False,
+    ) -> bool:
+        """Inserisce/aggiorna un chunk. Ritorna False se la cache è piena di pinned."""
+        if not chunk_id or content is None:
+            return False
+        entry = {
+            "document_id": document_id,
+            "content": content,
+            "metadata": dict(metadata or {}),
+        }
+        with self._lock:
+            previous = self._entries.get(chunk_id)
+            if previous is not None:
+                self._unindex(chunk_id, previous.get("document_id"))
+            elif len(self._entries) >= self.max_entries and not self._evict_one():
+                return False
+            self._entries[chunk_id] = entry
+            self._entries.move_to_end(chunk_id)
+            if document_id:
+                self._by_document.setdefault(document_id, set()).add(chunk_id)
+            if pinned:
+                self._pinned.add(chunk_id)
+        return True
+
+    def invalidate_document(self, document_id: Any) -> int:
+        """Rimuove tutti i chunk di un documento (pinned inclusi)."""
+        key = str(document_id) if document_id else None
+        if not key:
+            return 0
+        with self._lock:
+            chunk_ids = self._by_document.pop(key, set())
+            for chunk_id in chunk_ids:
+                self._entries.pop(chunk_id, None)
+                self._pinned.discard(chunk_id)
+            self._invalidations += len(chunk_ids)
+        if chunk_ids:
+            logger.info(
+                {
+                    "event": "chunk_cache_document_invalidated",
+                    "document_id": key,
+                    "chunks_removed": len(chunk_ids),
+                }
+            )
+        return len(chunk_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+            self._by_document.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "pinned": len(self._pinned),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+    def _evict_one(self) -> bool:
+        # Chiamato con lock acquisito: espelle il chunk non pinned meno recente
+        for chunk_id in self._entries:
+            if chunk_id in self._pinned:
+                continue
+            entry = self._entries.pop(chunk_id)
+            self._unindex(chunk_id, entry.get("document_id"))
+            self._evictions += 1
+            return True
+        return False
+
+    def _unindex(self, chunk_id: str, document_id: Optional[str]) -> None:
+        if not document_id:
+            return
+        chunk_ids = self._by_document.get(document_id)
+        if chunk_ids is None:
+            return
+        chunk_ids.discard(chunk_id)
+        if not chunk_ids:
+            self._by_document.pop(document_id, None)
+
+
+_chunk_cache: Optional[ChunkContentCache] = None
+
+
+def get_chunk_cache() -> ChunkContentCache:
+    """Singleton cache chunk dimensionata da settings."""
+    global _chunk_cache
+    if _chunk_cache is None:
+        from ..config import get_settings
+
+        _chunk_cache = ChunkContentCache(get_settings().chunk_cache_max_entries)
+    return _chunk_cache
+
+
+def invalidate_document_chunks(document_id: Any) -> int:
+    """Invalida i chunk di un documento se la cache è stata inizializzata."""
+    if _chunk_cache is None:
+        return 0
+    return _chunk_cache.invalidate_document(document_id)
+
+
+def fetch_chunk_contents(supabase: Any, chunk_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Legge da Supabase i chunk mancanti in cache (una query ``IN``)."""
+    if not chunk_ids:
+        return {}
+    response = (
+        supabase.table("document_chunks")
+        .select("id, document_id, content, metadata")
+        .in_("id", chunk_ids)
+        .execute()
+    )
+    rows: Dict[str, Dict[str, Any]] = {}
+    for row in response.data or []:
+        chunk_id = row.get("id")
+        if not chunk_id:
+            continue
+        document_id = row.get("document_id")
+        rows[str(chunk_id)] = {
+            "document_id": str(document_id) if document_id else None,
+            "content": row.get("content"),
+            "metadata": row.get("metadata") or {},
+        }
+    return rows
+
+
+def resolve_chunk_contents(
+    supabase: Any, chunk_ids: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Risolve content per gli id richiesti: cache prima, Supabase per i miss."""
+    cache = get_chunk_cache()
+    found, missing = cache.get_many(chunk_ids)
+    if missing:
+        fetched = fetch_chunk_contents(supabase, missing)
+        for chunk_id, entry in fetched.items():
+            cache.put(chunk_id, entry["document_id"], entry["content"], entry["metadata"])
+        found.update(fetched)
+    return found
+
+
+async def _hot_chunk_ids_from_db(conn: Any, limit: int) -> List[str]:
+    rows = await conn.fetch(
+        """
+        SELECT chunk_id, COUNT(*) AS retrieval_count
+        FROM chat_messages, unnest(source_chunk_ids) AS chunk_id
+        WHERE role = 'assistant'
+        GROUP BY chunk_id
+        ORDER BY retrieval_count DESC
+        LIMIT $1
+        """,
+        limit,
+    )
+    return [str(row["chunk_id"]) for row in rows]
+
+
+def _hot_chunk_ids_from_memory(limit: int) -> List[str]:
+    from ..analytics.analytics import aggregate_top_chunks
+    from ..stores import chat_messages_store
+
+    response = aggregate_top_chunks(chat_messages_store, limit=limit)
+    return [str(stat.chunk_id) for stat in response.top_chunks]
+
+
+async def warm_chunk_cache(pool: Any, limit: int) -> int:
+    """
+    Precarica e pinna i chunk più recuperati.
+
+    Args:
+        pool: asyncpg pool (può essere None: solo statistiche in memoria)
+        limit: Numero massimo chunk da precaricare
+
+    Returns:
+        Numero chunk caricati in cache
+    """
+    if limit <= 0:
+        return 0
+
+    chunk_ids: List[str] = []
+    if pool is not None:
+        try:
+            async with pool.acquire() as conn:
+                chunk_ids = await _hot_chunk_ids_from_db(conn, limit)
+        except Exception as exc:
+            logger.warning({"event": "chunk_cache_warmup_query_failed", "error": str(exc)})
+
+    for chunk_id in _hot_chunk_ids_from_memory(limit):
+        if len(chunk_ids) >= limit:
+            break
+        if chunk_id not in chunk_ids:
+            chunk_ids.append(chunk_id)
+
+    if not chunk_ids or pool is None:
+        return 0
+
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            """
+            SELECT id, document_id, content, metadata
+            FROM document_chunks
+            WHERE id = ANY($1::uuid[])
+            """,
+            chunk_ids,
+        )
+
+    cache = get_chunk_cache()
+    loaded = 0
+    for row in rows:
+        metadata = row["metadata"]
+        if isinstance(metadata, str):
+            # asyncpg restituisce JSONB come stringa senza codec registrato
+            metadata = json.loads(metadata)
+        if not isinstance(metadata, dict):
+            metadata = {}
+        document_id = row["document_id"]
+        if cache.put(
+            str(row["id"]),
+            str(document_id) if document_id else None,
+            row["content"],
+            metadata,
+            pinned=True,
+        ):
+            loaded += 1
+
+    logger.info(
+        {
+            "event": "chunk_cache_warmed",
+            "requested": len(chunk_ids),
+            "loaded": loaded,
+        }
+    )
+    return loaded
@@ -10,8 +10,6 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
-import math
-from collections import deque
 from threading import Lock, RLock
 from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse
@@ -27,9 +25,14 @@ except Exception:  # pragma: no cover - library missing in some environments
 
 from ..config import Settings, get_settings
 from ..ingestion.models import EnhancedClassificationOutput
+from ..utils.prometheus_exporter import record_cache_lookup
+from ..utils.quantiles import WindowedQuantileSketch
 
 logger = logging.getLogger("api")
 
+# Finestra scorrevole delle latenze cache (secondi)
+LATENCY_WINDOW_SECONDS = 900
+
 
 def _stringify_metadata(value: Any) -> Any:
     """Convert metadata values to JSON-serialisable primitives."""
@@ -55,21 +58,13 @@ def _serialise_metadata(metadata: Optional[Dict[str, Any]]) -> str:
         return json.dumps(normalised, sort_keys=True, separators=(",", ":"))
 
 
-def _percentile(values: deque[float], percentile: float) -> Optional[float]:
-    """Compute percentile using linear interpolation (1-100 scale)."""
-    if not values:
-        return None
-    data = sorted(values)
-    if len(data) == 1:
-        return round(data[0], 3)
-    rank = (len(data) - 1) * (percentile / 100.0)
-    low = math.floor(rank)
-    high = math.ceil(rank)
-    if low == high:
-        return round(data[int(rank)], 3)
-    weight_high = rank - low
-    interpolated = data[low] * (1 - weight_high) + data[high] * weight_high
-    return round(interpolated, 3)
+def _latency_summary(sketch: WindowedQuantileSketch) -> Dict[str, Any]:
+    p50, p95 = sketch.quantiles((0.50, 0.95), interpolate=True)
+    return {
+        "count": sketch.count,
+        "p50": round(p50, 3) if p50 is not None else None,
+        "p95": round(p95, 3) if p95 is not None else None,
+    }
 
 
 def resolve_cache_url(settings: Settings) -> str:
@@ -110,8 +105,8 @@ class ClassificationCache:
         self._hits = 0
         self._misses = 0
         self._errors = 0
-        self._latency_hits: deque[float] = deque(maxlen=1000)
-        self._latency_misses: deque[float] = deque(maxlen=1000)
+        self._latency_hits = WindowedQuantileSketch(window_seconds=LATENCY_WINDOW_SECONDS)
+        self._latency_misses = WindowedQuantileSketch(window_seconds=LATENCY_WINDOW_SECONDS)
         self._lock = Lock()
 
     def _generate_key(
@@ -126,10 +121,12 @@ class ClassificationCache:
     def _record_hit(self) -> None:
         with self._lock:
             self._hits += 1
+        record_cache_lookup("classification", hits=1)
 
     def _record_miss(self) -> None:
         with self._lock:
             self._misses += 1
+        record_cache_lookup("classification", misses=1)
 
     def _record_error(self) -> None:
         with self._lock:
@@ -139,11 +136,10 @@ class ClassificationCache:
         """Track latency samples for observability."""
         if duration_ms < 0:
             return
-        with self._lock:
-            if cached:
-                self._latency_hits.append(duration_ms)
-            else:
-                self._latency_misses.append(duration_ms)
+        if cached:
+            self._latency_hits.record(duration_ms)
+        else:
+            self._latency_misses.record(duration_ms)
 
     def get(
         self,
@@ -277,6 +273,11 @@ class ClassificationCache:
             )
             return 0
 
+    def counters(self) -> Tuple[int, int]:
+        """(hits, misses) senza calcolo delle latenze."""
+        with self._lock:
+            return self._hits, self._misses
+
     def get_stats(self) -> Dict[str, Any]:
         """Return aggregated cache metrics for dashboard export."""
         with self._lock:
@@ -287,8 +288,6 @@ class ClassificationCache:
             total = hits + misses
             if total:
                 hit_rate = round(hits / total, 4)
-            latency_hit = list(self._latency_hits)
-            latency_miss = list(self._latency_misses)
 
         stats = {
             "enabled": self.enabled,
@@ -297,20 +296,8 @@ class ClassificationCache:
             "errors": errors,
             "hit_rate": hit_rate,
             "latency_ms": {
-                "hit": {
-                    "count": len(latency_hit),
-                    "p50": _percentile(deque(latency_hit, maxlen=len(latency_hit)), 50),
-                    "p95": _percentile(deque(latency_hit, maxlen=len(latency_hit)), 95),
-                },
-                "miss": {
-                    "count": len(latency_miss),
-                    "p50": _percentile(
-                        deque(latency_miss, maxlen=len(latency_miss)), 50
-                    ),
-                    "p95": _percentile(
-                        deque(latency_miss, maxlen=len(latency_miss)), 95
-                    ),
-                },
+                "hit": _latency_summary(self._latency_hits),
+                "miss": _latency_summary(self._latency_misses),
             },
         }
         return stats
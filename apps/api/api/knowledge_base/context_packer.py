@@ -0,0 +1,244 @@
+"""Packing dei chunk recuperati nel contesto del prompt entro un budget token.
+
+Il chunker ricorsivo produce chunk da ~800 caratteri con 160 di overlap:
+chunk consecutivi dello stesso documento ripetono lo stesso testo e la
+concatenazione ingenua paga quei token due volte. Il packer:
+
+1. se il re-ranking è stato eseguito, tronca la lista al primo chunk con
+   rerank score troppo basso rispetto al migliore (i primi ``min_chunks``
+   restano sempre);
+2. raggruppa i chunk adiacenti dello stesso documento (riconosciuti
+   dall'overlap suffisso/prefisso) e rimuove il testo duplicato;
+3. riempie il budget token in ordine di rank, gruppo per gruppo.
+
+Ogni chunk mantiene la sua riga ``[chunk_id=...]`` così le citazioni
+restano risolvibili; il chunk top-ranked è sempre incluso.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("api")
+
+# Overlap minimo per considerare due chunk adiacenti (evita match casuali
+# su poche parole) e massimo cercato: chunk_overlap 160 + margine separatori
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 240
+
+
+@lru_cache(maxsize=8)
+def _get_encoder(model: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as exc:
+            logger.warning({
+                "event": "context_packer_tokenizer_unavailable",
+                "model": model,
+                "error": str(exc),
+                "fallback": "approximate_counting",
+            })
+            return None
+
+
+def make_token_counter(model: str) -> Callable[[str], int]:
+    """Token counter per il modello di generazione (fallback ~4 char/token)."""
+    encoder = _get_encoder(model)
+    if encoder is None:
+        return lambda text: len(text) // 4
+    return lambda text: len(encoder.encode(text))
+
+
+@dataclass
+class _Entry:
+    rank: int
+    chunk: Any
+    chunk_id: str
+    document_id: Optional[str]
+    content: str
+    text: str  # content senza l'overlap col chunk precedente nel gruppo
+    tokens: int = 0
+
+
+@dataclass
+class PackedContext:
+    """Risultato del packing: testo per il prompt + statistiche."""
+
+    text: str
+    chunk_ids: List[str] = field(default_factory=list)
+    dropped_chunk_ids: List[str] = field(default_factory=list)
+    original_tokens: int = 0
+    packed_tokens: int = 0
+    token_budget: int = 0
+    merged_chunks: int = 0
+    overlap_chars_removed: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.original_tokens - self.packed_tokens)
+
+
+def _chunk_line(chunk_id: str, text: str) -> str:
+    return f"[chunk_id={chunk_id}] {text}"
+
+
+def find_overlap(previous: str, following: str) -> int:
+    """Lunghezza del suffisso di ``previous`` che coincide col prefisso di ``following``."""
+    upper = min(MAX_OVERLAP_CHARS, len(previous), len(following))
+    for size in range(upper, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(following[:size]):
+            return size
+    return 0
+
+
+def _group_adjacent(entries: List[_Entry]) -> tuple[List[List[_Entry]], int, int]:
+    """Raggruppa chunk adiacenti dello stesso documento e toglie l'overlap.
+
+    Returns:
+        (gruppi in ordine di rank migliore, chunk fusi, caratteri rimossi)
+    """
+    groups: List[List[_Entry]] = []
+    by_document: Dict[str, List[List[_Entry]]] = {}
+    merged = 0
+    removed = 0
+
+    for entry in entries:
+        attached = False
+        for group in by_document.get(entry.document_id or "", []):
+            if any(member.content == entry.content for member in group):
+                # Chunk duplicato (stesso testo): nessun token aggiuntivo
+                entry.text = ""
+                group.append(entry)
+                removed += len(entry.content)
+                attached = True
+                break
+            tail, head = group[-1], group[0]
+            overlap = find_overlap(tail.content, entry.content)
+            if overlap:
+                entry.text = entry.content[overlap:].lstrip()
+                group.append(entry)
+            else:
+                overlap = find_overlap(entry.content, head.content)
+                if not overlap:
+                    continue
+                head.text = head.content[overlap:].lstrip()
+                group.insert(0, entry)
+            removed += overlap
+            merged += 1
+            attached = True
+            break
+
+        if not attached:
+            group = [entry]
+            groups.append(group)
+            if entry.document_id:
+                by_document.setdefault(entry.document_id, []).append(group)
+
+    return groups, merged, removed
+
+
+def pack_context(
+    chunks: Sequence[Any],
+    token_budget: int,
+    count_tokens: Callable[[str], int],
+    min_relative_score: float = 0.0,
+    min_chunks: int = 1,
+    rerank_scores: Optional[Sequence[Optional[float]]] = None,
+) -> PackedContext:
+    """
+    Impacchetta chunk ordinati per rank nel contesto del prompt.
+
+    Args:
+        chunks: Chunk in ordine di rank (attributi id, document_id, content)
+        token_budget: Token massimi per il contesto
+        count_tokens: Funzione di conteggio token del modello
+        min_relative_score: Tronca dal primo chunk con rerank score < top * ratio
+            (0 = disabilitato)
+        min_chunks: Chunk top-ranked mai scartati per score
+        rerank_scores: Score cross-encoder allineati a ``chunks`` (l'ordine di
+            rank); senza, nessun taglio per score
+
+    Returns:
+        PackedContext con testo e statistiche (tokens_saved incluso)
+    """
+    entries: List[_Entry] = []
+    for rank, chunk in enumerate(chunks):
+        if not chunk:
+            continue
+        content = (getattr(chunk, "content", None) or "").strip()
+        if not content:
+            continue
+        chunk_id = getattr(chunk, "id", None) or getattr(chunk, "document_id", None) or "unknown"
+        document_id = getattr(chunk, "document_id", None)
+        entries.append(_Entry(
+            rank=rank,
+            chunk=chunk,
+            chunk_id=str(chunk_id),
+            document_id=str(document_id) if document_id else None,
+            content=content,
+            text=content,
+        ))
+
+    original_text = "\n".join(_chunk_line(e.chunk_id, e.content) for e in entries)
+    result = PackedContext(
+        text="",
+        original_tokens=count_tokens(original_text) if original_text else 0,
+        token_budget=token_budget,
+    )
+    if not entries:
+        return result
+
+    # 1. Coda a basso score: sullo score cross-encoder che ha prodotto l'ordine
+    # (la similarity coseno del bi-encoder non è calibrata per un rapporto col top)
+    kept: List[_Entry] = entries
+    scores = [
+        rerank_scores[e.rank] if rerank_scores is not None and e.rank < len(rerank_scores) else None
+        for e in entries
+    ]
+    top_score = max((s for s in scores if s is not None), default=None)
+    if min_relative_score > 0 and top_score is not None and top_score > 0:
+        cutoff = top_score * min_relative_score
+        for index in range(min_chunks, len(entries)):
+            if scores[index] is not None and scores[index] < cutoff:
+                kept = entries[:index]
+                result.dropped_chunk_ids.extend(e.chunk_id for e in entries[index:])
+                break
+
+    # 2. Adiacenza + dedup overlap
+    groups, result.merged_chunks, result.overlap_chars_removed = _group_adjacent(kept)
+
+    # 3. Budget in ordine di rank (il chunk top-ranked entra sempre)
+    top_entry = kept[0]
+    lines: List[str] = []
+    used = 0
+    for group in groups:
+        gap = False
+        for entry in group:
+            if not entry.text:
+                result.chunk_ids.append(entry.chunk_id)
+                continue
+            # Se il chunk precedente del gruppo è stato escluso l'overlap
+            # rimosso non è più nel prompt: si usa il content completo
+            line = _chunk_line(entry.chunk_id, entry.content if gap else entry.text)
+            entry.tokens = count_tokens(line)
+            if entry is not top_entry and used + entry.tokens > token_budget:
+                result.dropped_chunk_ids.append(entry.chunk_id)
+                gap = True
+                continue
+            gap = False
+            lines.append(line)
+            used += entry.tokens
+            result.chunk_ids.append(entry.chunk_id)
+
+    result.text = "\n".join(lines).strip()
+    result.packed_tokens = count_tokens(result.text) if result.text else 0
+    return result
@@ -5,13 +5,16 @@ Story 7.2 AC1, AC4: Hybrid retrieval pipeline con over-retrieve, re-rank, divers
 
 Pattern:
 1. Over-retrieve: 3x target count, lower threshold (0.4)
-2. Re-rank: cross-encoder batch prediction (20+ pairs)
+2. Re-rank: cross-encoder in mini-batch ordinati per score bi-encoder
 3. Diversify: max 2 chunks per document, preserve top-3
 4. Filter: threshold finale (0.6) e return top-k
 
 Performance:
 - Cross-encoder model lazy loaded (~200MB RAM)
-- Batch prediction per latency optimization
+- Skip re-ranking se bi-encoder mostra margine netto sul top-k
+- Mini-batch con early-exit quando il top-k è stabile
+- Chunk troncati a token budget prima dello scoring
+- Latency budget per-request (misurato dall'inizio della request)
 - Circuit breaker: skip re-ranking se initial retrieval > 1s
 - Fallback: graceful degradation a bi-encoder se error
 """
@@ -19,9 +22,13 @@ from __future__ import annotations
 
 import logging
 import time
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from ..config import Settings, get_settings
+from ..utils.request_timing import span
+
+if TYPE_CHECKING:
+    from .search import RetrievalResult
 
 logger = logging.getLogger("api")
 
@@ -125,13 +132,136 @@ class EnhancedChunkRetriever:
             from .search import perform_semantic_search
             self._baseline_search = perform_semantic_search
         return self._baseline_search
-    
+
+    def _has_clear_margin(self, candidates: List[Dict[str, Any]], match_count: int) -> bool:
+        """
+        Verifica se il bi-encoder separa gia nettamente il top-k dal resto.
+
+        Confronta lo score del k-esimo candidato con il (k+1)-esimo: se il gap
+        supera cross_encoder_skip_margin il re-ranking non cambierebbe il set top-k.
+
+        Args:
+            candidates: Chunk ordinati per similarity_score (desc)
+            match_count: Target top-k
+
+        Returns:
+            True se re-ranking può essere saltato
+        """
+        margin = self.settings.cross_encoder_skip_margin
+        if margin <= 0 or match_count <= 0 or len(candidates) <= match_count:
+            return False
+
+        kth_score = candidates[match_count - 1].get("similarity_score")
+        next_score = candidates[match_count].get("similarity_score")
+        if not isinstance(kth_score, (int, float)) or not isinstance(next_score, (int, float)):
+            return False
+        return (kth_score - next_score) >= margin
+
+    def _truncate_for_rerank(self, text: str) -> str:
+        """
+        Tronca contenuto chunk al token budget cross-encoder.
+
+        Approssimazione a parole (whitespace) per evitare tokenizzazione extra:
+        il tokenizer del modello applica comunque max_length=512.
+
+        Args:
+            text: Contenuto chunk
+
+        Returns:
+            Testo troncato a cross_encoder_max_chunk_tokens parole
+        """
+        max_tokens = self.settings.cross_encoder_max_chunk_tokens
+        words = text.split()
+        if len(words) <= max_tokens:
+            return text
+        return " ".join(words[:max_tokens])
+
+    def _rerank_adaptive(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        match_count: int,
+        budget_started_at: float,
+    ) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Re-ranking incrementale in mini-batch ordinati per score bi-encoder.
+
+        Stop conditions:
+        - top_k_stable: set top-k invariato dopo un nuovo batch
+        - budget_exhausted: batch successivo sforerebbe il latency budget
+          (stima = durata ultimo batch, misurata da budget_started_at)
+
+        Args:
+            query: User query
+            candidates: Chunk da valutare
+            match_count: Target top-k
+            budget_started_at: Riferimento time.time() per latency budget
+
+        Returns:
+            Tuple (chunk valutati, chunk non valutati, stats)
+        """
+        ordered = sorted(
+            (chunk for chunk in candidates if chunk.get("content")),
+            key=lambda x: x.get("similarity_score") or 0.0,
+            reverse=True,
+        )
+        batch_size = self.settings.cross_encoder_batch_size
+        budget_s = self.settings.cross_encoder_latency_budget_ms / 1000.0
+
+        scored: List[Dict[str, Any]] = []
+        previous_top_ids: Optional[set] = None
+        last_batch_s = 0.0
+        batches = 0
+        stop_reason = "exhausted_candidates"
+
+        for offset in range(0, len(ordered), batch_size):
+            elapsed_s = time.time() - budget_started_at
+            if elapsed_s + last_batch_s > budget_s:
+                stop_reason = "budget_exhausted"
+                break
+
+            batch = ordered[offset:offset + batch_size]
+            pairs = [[query, self._truncate_for_rerank(chunk["content"])] for chunk in batch]
+
+            batch_start = time.time()
+            batch_scores = self.reranker.predict(pairs, batch_size=len(pairs))
+            last_batch_s = time.time() - batch_start
+            batches += 1
+
+            for chunk, score in zip(batch, batch_scores):
+                chunk["rerank_score"] = float(score)
+                chunk["bi_encoder_score"] = chunk.get("similarity_score", 0.0)
+                chunk["relevance_score"] = float(score)  # Final score = rerank
+                scored.append(chunk)
+
+            if len(scored) >= match_count:
+                top_ids = {
+                    id(chunk) for chunk in sorted(
+                        scored, key=lambda x: x["rerank_score"], reverse=True
+                    )[:match_count]
+                }
+                if top_ids == previous_top_ids:
+                    stop_reason = "top_k_stable"
+                    break
+                previous_top_ids = top_ids
+
+        unscored = ordered[len(scored):]
+        stats = {
+            "candidates": len(ordered),
+            "pairs_scored": len(scored),
+            "batches": batches,
+            "stop_reason": stop_reason if unscored else "exhausted_candidates",
+        }
+        return scored, unscored, stats
+
     def retrieve_and_rerank(
         self,
         query: str,
         match_count: int = 8,
         match_threshold: float = 0.6,
         diversify: bool = True,
+        request_started_at: Optional[float] = None,
+        result: Optional[RetrievalResult] = None,
     ) -> List[Dict[str, Any]]:
         """
         Execute hybrid retrieval pipeline: over-retrieve → re-rank → diversify → filter.
@@ -140,7 +270,8 @@ class EnhancedChunkRetriever:
         
         Pipeline stages:
         1. Over-retrieve: match_count × over_retrieve_factor (default 3x), threshold 0.4
-        2. Re-rank: cross-encoder batch prediction (query-chunk pairs)
+        2. Re-rank: cross-encoder in mini-batch ordinati per score bi-encoder,
+           skip se margine netto, early-exit su top-k stabile, latency budget
         3. Diversify: max_per_document enforcement (optional, flag)
         4. Filter: threshold finale (0.6) e limit top-k
         
@@ -149,6 +280,10 @@ class EnhancedChunkRetriever:
             match_count: Target number of chunks (default: 8)
             match_threshold: Final threshold post-rerank (default: 0.6)
             diversify: Apply chunk diversification (default: True)
+            request_started_at: time.time() di inizio request per latency budget
+                (default: inizio pipeline)
+            result: RetrievalResult da popolare (embedding, candidati, timing)
+                per riuso nei tier di fallback del chiamante
             
         Returns:
             List of chunks con rerank_score, bi_encoder_score, relevance_score
@@ -173,10 +308,14 @@ class EnhancedChunkRetriever:
         retrieval_start = time.time()
         try:
             baseline_search = self._get_baseline_search_fn()
+            search_kwargs: Dict[str, Any] = {}
+            if result is not None:
+                search_kwargs["result"] = result
             initial_results = baseline_search(
                 query=query,
                 match_count=over_retrieve_count,
                 match_threshold=over_retrieve_threshold,
+                **search_kwargs,
             )
         except Exception as exc:
             logger.error({
@@ -202,49 +341,71 @@ class EnhancedChunkRetriever:
                 "threshold_ms": 1000,
                 "action": "skip_reranking_return_baseline",
             })
+            if result is not None:
+                result.degraded = True
+            return initial_results[:match_count]
+        
+        # Skip re-ranking se bi-encoder mostra gia un margine netto sul top-k
+        if self._has_clear_margin(initial_results, match_count):
+            logger.info({
+                "event": "rerank_skipped_clear_margin",
+                "margin_threshold": self.settings.cross_encoder_skip_margin,
+                "initial_count": len(initial_results),
+                "action": "return_baseline",
+            })
             return initial_results[:match_count]
         
-        # Stage 2: Re-rank con cross-encoder
+        # Stage 2: Re-rank adattivo con cross-encoder (mini-batch + early-exit)
         rerank_start = time.time()
         try:
-            query_chunk_pairs = [
-                [query, chunk.get("content", "")] 
-                for chunk in initial_results 
-                if chunk.get("content")
-            ]
+            with span("rerank"):
+                scored, unscored, stats = self._rerank_adaptive(
+                    query=query,
+                    candidates=initial_results,
+                    match_count=match_count,
+                    budget_started_at=request_started_at or pipeline_start,
+                )
+            rerank_time_ms = int((time.time() - rerank_start) * 1000)
+            if result is not None:
+                result.timings_ms["rerank_ms"] = rerank_time_ms
+                result.degraded = stats["stop_reason"] == "budget_exhausted"
             
-            if not query_chunk_pairs:
+            if not scored and not unscored:
                 logger.warning({
                     "event": "rerank_no_valid_pairs",
                     "initial_results_count": len(initial_results),
                 })
                 return []
             
-            # Batch prediction (20+ pairs per call, latency optimization)
-            rerank_scores = self.reranker.predict(query_chunk_pairs, batch_size=32)
-            rerank_time_ms = int((time.time() - rerank_start) * 1000)
-            
-            # Arricchisci chunk con rerank scores
-            for idx, chunk in enumerate(initial_results):
-                if idx < len(rerank_scores):
-                    chunk["rerank_score"] = float(rerank_scores[idx])
-                    chunk["bi_encoder_score"] = chunk.get("similarity_score", 0.0)
-                    chunk["relevance_score"] = float(rerank_scores[idx])  # Final score = rerank
+            if not scored:
+                # Budget esaurito prima del primo batch: come skip re-ranking, ordine bi-encoder
+                logger.warning({
+                    "event": "rerank_budget_exhausted_fallback_baseline",
+                    "candidates_count": stats["candidates"],
+                    "action": "return_baseline_results",
+                })
+                return initial_results[:match_count]
             
-            # Sort per rerank score (descending)
+            # Candidati non valutati (budget esaurito / early-exit) esclusi: sono la
+            # coda bi-encoder, non possono sostituire chunk scartati dal threshold
             reranked_results = sorted(
-                initial_results,
-                key=lambda x: x.get("rerank_score", -1.0),
+                scored,
+                key=lambda x: x["rerank_score"],
                 reverse=True,
             )
             
+            scores = [chunk["rerank_score"] for chunk in scored]
             logger.info({
                 "event": "rerank_completed",
-                "pairs_count": len(query_chunk_pairs),
+                "pairs_count": stats["pairs_scored"],
+                "candidates_count": stats["candidates"],
+                "batches": stats["batches"],
+                "stop_reason": stats["stop_reason"],
+                "unscored_dropped": len(unscored),
                 "rerank_time_ms": rerank_time_ms,
-                "scores_min": float(min(rerank_scores)) if rerank_scores.size > 0 else None,
-                "scores_max": float(max(rerank_scores)) if rerank_scores.size > 0 else None,
-                "scores_avg": float(rerank_scores.mean()) if rerank_scores.size > 0 else None,
+                "scores_min": min(scores) if scores else None,
+                "scores_max": max(scores) if scores else None,
+                "scores_avg": sum(scores) / len(scores) if scores else None,
             })
             
         except Exception as exc:
@@ -253,6 +414,8 @@ class EnhancedChunkRetriever:
                 "error": str(exc),
                 "action": "return_baseline_results",
             })
+            if result is not None:
+                result.degraded = True
             # Fallback: return bi-encoder results
             return initial_results[:match_count]
         
@@ -262,11 +425,12 @@ class EnhancedChunkRetriever:
             from .diversification import diversify_chunks, calculate_diversity_score
             
             diversity_before = calculate_diversity_score(reranked_results[:match_count])
-            diversified_results = diversify_chunks(
-                chunks=reranked_results,
-                max_per_doc=self.settings.diversification_max_per_document,
-                preserve_top_n=self.settings.diversification_preserve_top_n,
-            )
+            with span("diversification"):
+                diversified_results = diversify_chunks(
+                    chunks=reranked_results,
+                    max_per_doc=self.settings.diversification_max_per_document,
+                    preserve_top_n=self.settings.diversification_preserve_top_n,
+                )
             diversity_after = calculate_diversity_score(diversified_results[:match_count])
             
             logger.info({
@@ -280,7 +444,7 @@ class EnhancedChunkRetriever:
         final_threshold = match_threshold or self.settings.cross_encoder_threshold_post_rerank
         filtered_results = [
             chunk for chunk in diversified_results
-            if chunk.get("rerank_score", 0.0) >= final_threshold
+            if chunk["rerank_score"] >= final_threshold
         ][:match_count]
         
         pipeline_time_ms = int((time.time() - pipeline_start) * 1000)
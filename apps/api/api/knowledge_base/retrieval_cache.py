@@ -0,0 +1,201 @@
+"""Cache dei risultati di retrieval (baseline / enhanced) per query identiche.
+
+L'output di ``perform_semantic_search`` / ``retrieve_and_rerank`` è
+deterministico per query, parametri e stato del corpus: una query ripetuta
+salta embedding, RPC ANN e re-ranking.
+
+Chiave: versione corpus + query normalizzata + match_count + threshold +
+feature flag che influenzano il ranking. La versione corpus è un contatore
+monotono in ``corpus_state_store`` incrementato da watcher, sync job e task
+Celery quando salvano chunk. Con stato condiviso (``SHARED_STATE_BACKEND``)
+il contatore è unico per tutti i processi e letto con la cache locale breve
+dello store: ogni lookup costruisce la chiave con la versione corrente, quindi
+un bump fatto da un altro processo rende irraggiungibili le entry vecchie
+(svuotate alla prima versione nuova osservata) entro
+``shared_state_cache_ttl_seconds``, non al TTL della cache.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from ..shared_state import StateBackendError
+from ..stores import corpus_state_store
+from ..utils.prometheus_exporter import record_cache_lookup
+
+logger = logging.getLogger("api")
+
+# Settings che cambiano candidati o ordinamento dei risultati
+_RANKING_FLAGS: Tuple[str, ...] = (
+    "enable_cross_encoder_reranking",
+    "enable_chunk_diversification",
+    "enable_dynamic_match_count",
+    "enable_quantized_ann_search",
+    "cross_encoder_model_name",
+    "cross_encoder_over_retrieve_factor",
+    "cross_encoder_threshold_post_rerank",
+    "diversification_max_per_document",
+    "diversification_preserve_top_n",
+)
+
+CORPUS_VERSION_KEY = "version"
+
+# Ultima versione osservata da questo processo (cambio = svuota la cache locale)
+_seen_version = 0
+_version_lock = Lock()
+
+
+def _observe_version(version: int) -> None:
+    global _seen_version
+    with _version_lock:
+        if version == _seen_version:
+            return
+        _seen_version = version
+    if _retrieval_cache is not None:
+        _retrieval_cache.clear()
+
+
+def get_corpus_version() -> int:
+    """Versione corpus corrente (condivisa tra processi se configurato)."""
+    record = corpus_state_store.get(CORPUS_VERSION_KEY)
+    version = int(record["version"]) if record else 0
+    _observe_version(version)
+    return version
+
+
+def _next_version(current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"version": (current or {}).get("version", 0) + 1}
+
+
+def bump_corpus_version(reason: str, document_id: Any = None) -> int:
+    """Incrementa la versione corpus e invalida la cache risultati."""
+    try:
+        _, record = corpus_state_store.update_item(CORPUS_VERSION_KEY, _next_version)
+        version = record["version"]
+    except StateBackendError as exc:
+        # Versione invariata: gli altri processi restano coperti dal TTL
+        logger.warning(
+            {
+                "event": "corpus_version_bump_failed",
+                "reason": reason,
+                "error": str(exc),
+            }
+        )
+        version = get_corpus_version()
+    _observe_version(version)
+    if _retrieval_cache is not None:
+        _retrieval_cache.clear()
+    logger.info(
+        {
+            "event": "corpus_version_bumped",
+            "corpus_version": version,
+            "reason": reason,
+            "document_id": str(document_id) if document_id else None,
+        }
+    )
+    return version
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase + whitespace collassato: varianti banali condividono la entry."""
+    return " ".join((query or "").lower().split())
+
+
+def make_cache_key(
+    query: str,
+    match_count: int,
+    match_threshold: Optional[float],
+    settings: Any,
+) -> Tuple[Hashable, ...]:
+    flags = tuple(getattr(settings, name, None) for name in _RANKING_FLAGS)
+    return (
+        get_corpus_version(),
+        normalize_query(query),
+        int(match_count),
+        None if match_threshold is None else round(float(match_threshold), 4),
+        flags,
+    )
+
+
+class RetrievalResultCache:
+    """LRU thread-safe con TTL; conserva e restituisce copie dei risultati."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 3600) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Restituisce (tier originale, risultati) oppure None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                record_cache_lookup("retrieval", misses=1)
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            _, tier, results = entry
+        record_cache_lookup("retrieval", hits=1)
+        return tier, _copy_results(results)
+
+    def put(self, key: Tuple[Hashable, ...], tier: str, results: List[Dict[str, Any]]) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (expires_at, tier, _copy_results(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "corpus_version": get_corpus_version(),
+            }
+
+
+def _copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Il chiamante può mutare i dict (es. metadata): copia a due livelli
+    copied: List[Dict[str, Any]] = []
+    for item in results or []:
+        item_copy = dict(item)
+        if isinstance(item_copy.get("metadata"), dict):
+            item_copy["metadata"] = dict(item_copy["metadata"])
+        copied.append(item_copy)
+    return copied
+
+
+_retrieval_cache: Optional[RetrievalResultCache] = None
+
+
+def get_retrieval_cache() -> RetrievalResultCache:
+    """Singleton cache risultati dimensionata da settings."""
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        from ..config import get_settings
+
+        settings = get_settings()
+        _retrieval_cache = RetrievalResultCache(
+            max_entries=settings.retrieval_cache_max_entries,
+            ttl_seconds=settings.retrieval_cache_ttl_seconds,
+        )
+    return _retrieval_cache
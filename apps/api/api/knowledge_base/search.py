@@ -1,63 +1,210 @@
 from __future__ import annotations
 import os
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-from langchain_openai import OpenAIEmbeddings
-from supabase import Client, create_client
+from ..config import get_settings
+from ..utils.request_timing import span
+from .chunk_cache import resolve_chunk_contents
+
+if TYPE_CHECKING:
+    from langchain_openai import OpenAIEmbeddings
+    from supabase import Client
 
 logger = logging.getLogger("api")
 
+# Soglia predefinita meno rigida per recuperare risultati pertinenti
+DEFAULT_MATCH_THRESHOLD = 0.6
+
+# Limite candidati RPC quantizzata (= hnsw.ef_search nella funzione SQL)
+QUANTIZED_MAX_CANDIDATES = 100
+
+
+@dataclass
+class RetrievalResult:
+    """
+    Risultati intermedi della pipeline di retrieval.
+
+    Popolato da perform_semantic_search / retrieve_and_rerank quando passato
+    come ``result``: i tier di fallback riusano embedding e candidati già
+    calcolati invece di ripetere embed + RPC.
+    """
+
+    query: str
+    query_embedding: Optional[List[float]] = None
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+    candidates_match_count: int = 0
+    tier: Optional[str] = None
+    timings_ms: Dict[str, int] = field(default_factory=dict)
+    # True se la pipeline ha degradato (circuit breaker, budget, rerank fallito):
+    # risultato valido ma non deterministico, da non mettere in cache
+    degraded: bool = False
+
+    def record_timing(self, stage: str, started_at: float) -> None:
+        """Accumula durata stage (ms) da time.time() di inizio."""
+        elapsed_ms = int((time.time() - started_at) * 1000)
+        self.timings_ms[stage] = self.timings_ms.get(stage, 0) + elapsed_ms
+
 
 def _get_supabase_client() -> Client:
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         raise RuntimeError("SUPABASE_URL o SUPABASE_SERVICE_ROLE_KEY non impostati")
+    # Import locali: supabase e langchain_openai fuori dall'avvio dell'app
+    from supabase import create_client
+
     return create_client(url, key)
 
 
 def _get_embeddings_model() -> OpenAIEmbeddings:
+    from langchain_openai import OpenAIEmbeddings
+
     # richiede OPENAI_API_KEY nell'ambiente
     return OpenAIEmbeddings(model="text-embedding-3-small")
 
 
+def _above_threshold(
+    hits: List[Dict[str, Any]],
+    threshold: float,
+) -> List[Dict[str, Any]]:
+    """
+    Filtra hit (ordinati per similarity) con similarity > threshold.
+
+    Il top-N sopra threshold è un sottoinsieme ordinato del top-N sopra 0.0:
+    una RPC a 0.0 + questo filtro equivale all'RPC con match_threshold.
+    """
+    return [
+        hit for hit in hits
+        if isinstance(hit.get("similarity_score"), (int, float))
+        and hit["similarity_score"] > threshold
+    ]
+
+
+def results_from_candidates(
+    result: RetrievalResult,
+    match_count: int,
+    match_threshold: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ricava risultati baseline dai candidati già recuperati (nessuna RPC).
+
+    I candidati over-retrieved dal tier enhanced contengono il top-N baseline
+    per qualsiasi match_count <= candidates_match_count.
+
+    Args:
+        result: RetrievalResult con candidati
+        match_count: Numero risultati richiesti
+        match_threshold: Soglia similarity (default 0.6)
+
+    Returns:
+        Lista risultati (copie, senza score di re-ranking)
+    """
+    threshold = match_threshold if match_threshold is not None else DEFAULT_MATCH_THRESHOLD
+    hits = [dict(candidate) for candidate in result.candidates]
+    if threshold <= 0.0:
+        return hits[:match_count]
+    return (_above_threshold(hits, threshold) or hits)[:match_count]
+
+
 def perform_semantic_search(
     query: str,
     match_count: int = 8,
     match_threshold: Optional[float] = None,
+    query_embedding: Optional[List[float]] = None,
+    result: Optional[RetrievalResult] = None,
 ) -> List[Dict[str, Any]]:
     """
     Esegue ricerca semantica su Supabase (pgvector) e restituisce lista di risultati.
+
+    Una sola RPC a soglia 0.0 con filtro threshold lato client: stesso risultato
+    del retry a 0.0 quando nessun hit supera la soglia, senza seconda RPC.
+    Con enable_chunk_content_cache l'RPC restituisce solo id + score e il
+    content viene risolto dalla cache chunk locale (vedi chunk_cache).
+
+    Args:
+        query: Testo query
+        match_count: Numero massimo risultati
+        match_threshold: Soglia similarity (default 0.6)
+        query_embedding: Embedding già calcolato (skip embed_query)
+        result: RetrievalResult da popolare con embedding, candidati e timing
     """
     if not query or not query.strip():
         return []
 
     supabase = _get_supabase_client()
-    embeddings = _get_embeddings_model()
 
-    try:
-        query_embedding = embeddings.embed_query(query)
-    except Exception as exc:  # pragma: no cover - errore embedding propagato
-        logger.error(
-            {"event": "embedding_query_failed", "error": str(exc)}
-        )
-        raise
+    if query_embedding is None:
+        embedding_start = time.time()
+        embeddings = _get_embeddings_model()
+        try:
+            with span("embedding"):
+                query_embedding = embeddings.embed_query(query)
+        except Exception as exc:  # pragma: no cover - errore embedding propagato
+            logger.error(
+                {"event": "embedding_query_failed", "error": str(exc)}
+            )
+            raise
+        if result is not None:
+            result.record_timing("embedding_ms", embedding_start)
+
+    if result is not None:
+        result.query_embedding = query_embedding
 
-    # Soglia predefinita meno rigida per recuperare risultati pertinenti
-    threshold = match_threshold if match_threshold is not None else 0.6
+    threshold = match_threshold if match_threshold is not None else DEFAULT_MATCH_THRESHOLD
+
+    settings = get_settings()
+    use_chunk_cache = settings.enable_chunk_content_cache
+
+    def _fetch_rows(threshold_value: float) -> List[Dict[str, Any]]:
+        params: Dict[str, Any] = {
+            "query_embedding": query_embedding,
+            "match_threshold": float(threshold_value),
+            "match_count": match_count,
+        }
+        if settings.enable_quantized_ann_search:
+            # Candidati da indice halfvec(512), top-k ricalcolato su vector(1536)
+            rpc_name = "match_document_chunks_quantized"
+            params["candidate_count"] = min(
+                match_count * settings.quantized_ann_candidate_factor,
+                QUANTIZED_MAX_CANDIDATES,
+            )
+            params["include_content"] = not use_chunk_cache
+        elif use_chunk_cache:
+            # RPC leggera (id + score), content risolto da cache locale
+            rpc_name = "match_document_chunk_ids"
+        else:
+            rpc_name = "match_document_chunks"
+
+        with span("ann_rpc"):
+            rows = supabase.rpc(rpc_name, params).execute().data or []
+        if not use_chunk_cache:
+            return rows
+
+        with span("chunk_resolve"):
+            contents = resolve_chunk_contents(
+                supabase, [str(row["id"]) for row in rows if row.get("id")]
+            )
+        resolved: List[Dict[str, Any]] = []
+        for row in rows:
+            entry = contents.get(str(row.get("id")))
+            if entry is None:
+                # chunk rimosso tra RPC e lookup: scartato
+                continue
+            resolved.append(
+                {
+                    **row,
+                    "document_id": row.get("document_id") or entry["document_id"],
+                    "content": entry["content"],
+                    "metadata": entry["metadata"],
+                }
+            )
+        return resolved
 
     def _execute(threshold_value: float) -> List[Dict[str, Any]]:
-        response = supabase.rpc(
-            "match_document_chunks",
-            {
-                "query_embedding": query_embedding,
-                "match_threshold": float(threshold_value),
-                "match_count": match_count,
-            },
-        ).execute()
-
-        rows = response.data or []
+        rows = _fetch_rows(threshold_value)
         results: List[Dict[str, Any]] = []
         for row in rows:
             metadata: Dict[str, Any] = dict(row.get("metadata") or {})
@@ -82,8 +229,16 @@ def perform_semantic_search(
         return results
 
     try:
-        hits = _execute(threshold)
-        if not hits and threshold > 0.0:
+        rpc_start = time.time()
+        hits = _execute(min(threshold, 0.0))
+        if result is not None:
+            result.record_timing("rpc_ms", rpc_start)
+            result.candidates = [dict(hit) for hit in hits]
+            result.candidates_match_count = match_count
+        if threshold <= 0.0:
+            return hits
+        above = _above_threshold(hits, threshold)
+        if hits and not above:
             logger.info(
                 {
                     "event": "semantic_search_threshold_fallback",
@@ -92,8 +247,8 @@ def perform_semantic_search(
                     "previous_threshold": threshold,
                 }
             )
-            hits = _execute(0.0)
-        return hits
+            return hits
+        return above
     except Exception as exc:
         logger.warning(
             {"event": "semantic_search_rpc_error", "error": str(exc)}
@@ -11,6 +11,7 @@ Architecture:
 """
 import asyncio
 import logging
+import time
 from dotenv import load_dotenv
 
 from fastapi import FastAPI
@@ -20,9 +21,15 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
 from .database import lifespan
-from .middleware import log_requests, add_request_id
+from .middleware import RequestContextMiddleware
 from .utils.logging import setup_logging
 from .config import get_settings
+from .services.rate_limit_service import configure_rate_limit_backend
+from .shared_state import configure_shared_state
+from .utils.request_timing import slow_request_log
+from .utils.responses import FastJSONResponse
+from .startup import startup_profile
+from . import IMPORT_STARTED
 
 # Import routers
 from .routers import (
@@ -40,15 +47,17 @@ from .routers import (
 # Environment & Logging Setup
 # -------------------------------
 load_dotenv()
-setup_logging()
-logger = logging.getLogger("api")
 settings = get_settings()  # Story 5.4 Task 1.2
+setup_logging(settings)
+logger = logging.getLogger("api")
 
 # -------------------------------
 # FastAPI Application
 # -------------------------------
 app = FastAPI(
     lifespan=lifespan,
+    # Encoder orjson/pydantic-core al posto di json.dumps (api/utils/responses.py)
+    default_response_class=FastJSONResponse,
     title="FisioRAG API",
     version="2.0.0",
     description="Retrieval-Augmented Generation system for physiotherapy knowledge base"
@@ -64,8 +73,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.middleware("http")(log_requests)
-app.middleware("http")(add_request_id)
+# Request id + timing + access log in un solo layer ASGI (più esterno)
+app.add_middleware(RequestContextMiddleware, server_timing=settings.server_timing_enabled)
+slow_request_log.configure(
+    capacity=settings.slow_request_log_size,
+    threshold_ms=settings.slow_request_threshold_ms,
+    sample_rate=settings.slow_request_sample_rate,
+)
+
+# -------------------------------
+# Stato condiviso tra worker (prima del rate limiter, che lo segue)
+# -------------------------------
+configure_shared_state(settings)
 
 # -------------------------------
 # Rate Limiting (SlowAPI) - Story 5.4 Task 1.2
@@ -75,6 +94,7 @@ if settings.should_enable_rate_limiting:
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
     logger.info("Rate limiting ENABLED")
+    configure_rate_limit_backend(settings)
 else:
     logger.warning("Rate limiting DISABLED (test environment)")
 
@@ -95,6 +115,7 @@ app.include_router(monitoring.router)
 # -------------------------------
 # Startup Log
 # -------------------------------
+startup_profile.record("app_import", (time.perf_counter() - IMPORT_STARTED) * 1000.0)
 logger.info({
     "event": "app_started",
     "version": "2.0.0",
@@ -1,56 +1,81 @@
 """
 Custom middleware per FastAPI application.
 
-Fornisce:
-- Request logging strutturato
-- Request ID tracking
-- Performance metrics
+Fornisce (un solo layer ASGI puro, ``RequestContextMiddleware``):
+- Request ID tracking (``request.state.request_id`` + header X-Request-ID)
+- Timing per stadio (contesto ``RequestTiming``, header Server-Timing,
+  request lente nel ring buffer)
+- Request logging strutturato (evento ``http_request``)
+
+ASGI puro invece di ``@app.middleware("http")``: nessun task e nessuno
+stream intermedio per request (BaseHTTPMiddleware), le StreamingResponse
+passano senza buffering e il contesto di timing è nello stesso task
+dell'endpoint.
 """
-import time
 import logging
 from uuid import uuid4
-from fastapi import Request
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .utils.request_timing import begin_request, end_request, slow_request_log
 
 logger = logging.getLogger("api")
 
 
-async def log_requests(request: Request, call_next):
-    """
-    Middleware per logging HTTP requests.
-    
-    Logga:
-    - Method, path, status code
-    - Duration in milliseconds
-    - Client IP
+class RequestContextMiddleware:
     """
-    start = time.time()
-    response = await call_next(request)
-    duration_ms = int((time.time() - start) * 1000)
-    
-    client_ip = request.client.host if request.client else None
-    
-    logger.info({
-        "event": "http_request",
-        "method": request.method,
-        "path": request.url.path,
-        "status": response.status_code,
-        "duration_ms": duration_ms,
-        "client_ip": client_ip,
-    })
-    
-    return response
-
-
-async def add_request_id(request: Request, call_next):
-    """
-    Middleware per aggiungere request_id unico.
-    
-    Usato per troubleshooting e correlation logs.
+    Middleware ASGI per request id, timing e access log.
+
+    Args:
+        app: Applicazione ASGI interna
+        server_timing: Aggiunge l'header Server-Timing (stadi fino all'invio
+            degli header; per le risposte streaming "total" è il time-to-first-byte)
     """
-    request_id = str(uuid4())
-    request.state.request_id = request_id
-    
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
-    
-    return response
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = str(uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        timing, token = begin_request(scope["method"], scope["path"])
+        status_code = 500
+
+        async def send_with_context(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                if self.server_timing:
+                    headers.append((
+                        b"server-timing",
+                        timing.server_timing(timing.elapsed_ms()).encode("latin-1"),
+                    ))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_context)
+        finally:
+            end_request(token)
+            total_ms = timing.elapsed_ms()
+            client = scope.get("client")
+
+            logger.info({
+                "event": "http_request",
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": int(total_ms),
+                "client_ip": client[0] if client else None,
+                "request_id": request_id,
+            })
+
+            if total_ms >= slow_request_log.threshold_ms:
+                slow_request_log.offer(timing.summary(total_ms, status_code, request_id))
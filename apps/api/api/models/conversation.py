@@ -39,7 +39,11 @@ class ConversationMessage(BaseModel):
         default=None,
         description="IDs chunk citati nella risposta (se assistant message)",
     )
-    
+    id: Optional[str] = Field(
+        default=None,
+        description="ID stabile del messaggio (chat_messages.id) se caricato da DB",
+    )
+
     def to_compact_format(self, max_length: int = 150) -> str:
         """
         Compatta messaggio per inclusion in context window (messaggi più vecchi).
@@ -81,6 +85,10 @@ class ChatContextWindow(BaseModel):
         description="Token count totale per tutti i messaggi nel window",
         ge=0,
     )
+    summary: Optional[str] = Field(
+        default=None,
+        description="Riassunto rolling dei messaggi precedenti al window (se disponibile)",
+    )
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc),
         description="Timestamp creazione context window",
@@ -73,6 +73,22 @@ CITAZIONI:
 """
 
 
+# Riassunto rolling della conversazione (generato in background)
+CONVERSATION_SUMMARY_PROMPT = """Sei l'assistente di un tutor di fisioterapia. Aggiorna il riassunto
+della conversazione tra STUDENTE e TUTOR integrando i nuovi messaggi.
+
+Mantieni: argomenti trattati, domande dello studente, concetti chiave spiegati,
+eventuali riferimenti a materiali o chunk citati. Ometti saluti e ripetizioni.
+Rispondi solo con il riassunto aggiornato, in italiano, massimo {max_words} parole.
+
+RIASSUNTO PRECEDENTE:
+{previous_summary}
+
+NUOVI MESSAGGI:
+{transcript}
+"""
+
+
 # Story 7.1 AC3: Conversation History Section (quando conversational memory attiva)
 CONVERSATION_HISTORY_SECTION = """
 === CRONOLOGIA CONVERSAZIONE ===
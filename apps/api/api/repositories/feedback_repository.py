@@ -11,10 +11,11 @@ Risk Mitigation:
 
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from uuid import UUID
 
-from supabase import Client
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger("api.repositories")
 
@@ -30,7 +31,7 @@ class FeedbackRepository:
         client: Supabase client instance (service_role for RLS bypass on INSERT)
     """
     
-    def __init__(self, client: Client):
+    def __init__(self, client: "Client"):
         """
         Initialize repository with Supabase client.
         
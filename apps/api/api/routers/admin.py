@@ -3,15 +3,17 @@ Admin router - Debug query, analytics dashboard, admin utilities.
 
 Story: 4.1, 4.2, 5.4
 """
+import asyncio
 import logging
 import time
 import jwt
 import os
 from datetime import datetime, timedelta  # Story 4.2.4
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 from unittest.mock import MagicMock
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -36,13 +38,16 @@ from ..analytics.analytics import (
 from ..knowledge_base.search import perform_semantic_search
 from ..dependencies import verify_jwt_token, _is_admin, get_supabase_client  # Story 4.2.4
 from ..config import Settings, get_settings
-from ..services.chat_service import ag_latency_samples_ms
+from ..services.chat_service import ag_latency_sketch
 from ..stores import chat_messages_store  # feedback_store deprecato Story 4.2.4
 from ..repositories.feedback_repository import FeedbackRepository  # Story 4.2.4
 from ..knowledge_base.classification_cache import get_classification_cache
+from ..utils.request_timing import slow_request_log
+from ..utils.responses import FastJSONResponse
+from ..startup import startup_profile
+from ..utils import sampling_profiler
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
 
 router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
 logger = logging.getLogger("api")
@@ -166,6 +171,8 @@ def admin_debug_query(
             model_kwargs["temperature"] = 1.0  # Explicit for nano
         else:
             model_kwargs["temperature"] = 0  # Deterministic for admin debug
+        from langchain_openai import ChatOpenAI
+
         llm = ChatOpenAI(**model_kwargs)
         chain = prompt | llm | StrOutputParser()
         answer_value = chain.invoke({"question": q, "context": context})
@@ -217,7 +224,7 @@ async def get_admin_analytics(  # Story 4.2.4: Changed to async for DB access
     Aggrega dati da database persistente e in-memory:
     - chat_messages_store: query utenti (in-memory, future migration)
     - feedback DB (Supabase): thumbs up/down (Story 4.2.4)
-    - ag_latency_samples_ms: performance metrics (in-memory)
+    - ag_latency_sketch: performance metrics (in-memory, finestra scorrevole)
     
     Query params:
     - time_filter: Periodo dati ("day", "week", "month", "all") - default "week"
@@ -277,7 +284,7 @@ async def get_admin_analytics(  # Story 4.2.4: Changed to async for DB access
     base_analytics = aggregate_analytics(
         chat_messages_store=chat_messages_store,
         feedback_store=feedback_store_compat,  # Story 4.2.4: DB data
-        ag_latency_samples_ms=ag_latency_samples_ms,
+        ag_latency_samples_ms=ag_latency_sketch,
     )
     
     # AC9: Backward compatibility - return base analytics if advanced not requested
@@ -291,7 +298,7 @@ async def get_admin_analytics(  # Story 4.2.4: Changed to async for DB access
             "include_advanced": False,
             "feedback_source": "database"  # Story 4.2.4
         })
-        return base_analytics
+        return FastJSONResponse(base_analytics)
     
     # Story 4.2.2: Metriche avanzate
     temporal_dist = aggregate_temporal_distribution(chat_messages_store, time_filter)
@@ -316,7 +323,7 @@ async def get_admin_analytics(  # Story 4.2.4: Changed to async for DB access
         "feedback_count": len(feedback_list)
     })
     
-    return AdvancedAnalyticsResponse(
+    return FastJSONResponse(AdvancedAnalyticsResponse(
         # Base metrics
         overview=base_analytics.overview,
         top_queries=base_analytics.top_queries,
@@ -329,7 +336,7 @@ async def get_admin_analytics(  # Story 4.2.4: Changed to async for DB access
         problematic_queries=problematic,
         engagement_stats=engagement,
         top_chunks=top_chunks
-    )
+    ))
 
 
 @router.get("/knowledge-base/classification-cache/metrics")
@@ -353,6 +360,104 @@ def get_classification_cache_metrics(
     return {"cache": stats}
 
 
+@router.get("/debug/slow-requests")
+def get_slow_requests(
+    payload: Annotated[dict, Depends(verify_jwt_token)],
+    limit: int = Query(20, ge=1, le=500),
+    path_prefix: Optional[str] = Query(None, max_length=200),
+):
+    """Request più lente del processo con breakdown per stadio (Server-Timing)."""
+    if not _is_admin(payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden: admin only",
+        )
+
+    return {
+        "log": slow_request_log.stats(),
+        "requests": slow_request_log.entries(limit=limit, path_prefix=path_prefix),
+    }
+
+
+@router.get("/debug/startup")
+def get_startup_profile(
+    payload: Annotated[dict, Depends(verify_jwt_token)],
+):
+    """Profilo di avvio del worker: durata fasi (import, pool DB, warmup) ed esito warmup."""
+    if not _is_admin(payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden: admin only",
+        )
+
+    return startup_profile.as_dict()
+
+
+@router.post("/debug/profile")
+@limiter.limit("6/hour")
+async def profile_worker(
+    request: Request,
+    payload: Annotated[dict, Depends(verify_jwt_token)],
+    settings: Annotated[Settings, Depends(get_settings)],
+    duration_seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1.0, le=100.0),
+    format: Literal["speedscope", "collapsed"] = Query("speedscope"),
+    include_idle: bool = False,
+):
+    """
+    Profiling a campionamento del worker che serve la request.
+
+    Campiona tutti i thread (event loop incluso) per ``duration_seconds``
+    e ritorna un profilo speedscope (JSON) o collapsed stacks (testo).
+    Un profiling alla volta per worker; rate limiting 6/hour.
+    """
+    if not _is_admin(payload):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden: admin only",
+        )
+    if not settings.profiler_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="profiler_disabled",
+        )
+    if duration_seconds > settings.profiler_max_duration_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"duration_seconds max {settings.profiler_max_duration_seconds}",
+        )
+
+    logger.info({
+        "event": "admin_profile_started",
+        "admin_sub": payload.get("sub"),
+        "duration_seconds": duration_seconds,
+        "interval_ms": interval_ms,
+    })
+    try:
+        # Campionatore fuori dall'event loop: il loop resta libero e campionabile
+        result = await asyncio.to_thread(
+            sampling_profiler.profile,
+            duration_seconds,
+            interval_ms / 1000.0,
+            include_idle,
+        )
+    except sampling_profiler.ProfilerBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="profiling_in_progress",
+        )
+
+    logger.info({
+        "event": "admin_profile_completed",
+        "pid": result.pid,
+        "samples": result.sample_count,
+        "distinct_stacks": len(result.stacks),
+    })
+    headers = {"X-Profile-Pid": str(result.pid), "X-Profile-Samples": str(result.sample_count)}
+    if format == "collapsed":
+        return PlainTextResponse(result.to_collapsed(), headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="profile-{result.pid}.speedscope.json"'
+    return JSONResponse(result.to_speedscope(), headers=headers)
 
 
 @router.delete("/knowledge-base/classification-cache")
@@ -21,13 +21,14 @@ from ..services.auth_service import generate_temp_jwt, generate_refresh_token
 from ..services.rate_limit_service import rate_limit_service
 from ..dependencies import verify_jwt_token, _is_admin, _get_supabase_client
 from ..config import Settings, get_settings
+from ..stores import access_codes_store
 from ..utils.security import generate_access_code
 
 router = APIRouter(prefix="/api/v1/auth", tags=["Authentication"])
 logger = logging.getLogger("api")
 
-# Store in-memory per access codes (Story 1.3 - legacy, mono-uso)
-access_codes_store: Dict[str, Dict[str, Any]] = {}
+# Access code scaduti conservati ancora un giorno: rispondono 410, non 401
+EXPIRED_CODE_RETENTION = timedelta(days=1)
 
 
 @router.post("/admin/access-codes/generate", response_model=GeneratedCodeResponse)
@@ -52,7 +53,7 @@ def generate_access_code_admin(
     if body.expires_in_minutes and body.expires_in_minutes > 0:
         expires_at_dt = now + timedelta(minutes=body.expires_in_minutes)
 
-    access_codes_store[code_value] = {
+    access_codes_store.put(code_value, {
         "id": code_id,
         "code": code_value,
         "is_active": True,
@@ -62,7 +63,7 @@ def generate_access_code_admin(
         "created_by_id": payload.get("sub"),
         "created_at": now,
         "updated_at": now,
-    }
+    }, ttl=(expires_at_dt - now + EXPIRED_CODE_RETENTION).total_seconds() if expires_at_dt else None)
 
     return GeneratedCodeResponse(
         id=code_id,
@@ -114,7 +115,7 @@ def exchange_code(
         })
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_request")
 
-    # 1. Cerca in access_codes_store (in-memory, Story 1.3)
+    # 1. Cerca in access_codes_store (Story 1.3, condiviso tra worker se configurato)
     record = access_codes_store.get(code)
     if record:
         # Comportamento esistente per access code (15 min, mono-uso, NO refresh token)
@@ -140,8 +141,7 @@ def exchange_code(
         now = datetime.now(timezone.utc)
         expires_at_dt: Optional[datetime] = record.get("expires_at")
         if expires_at_dt and now >= expires_at_dt:
-            record["is_active"] = False
-            record["updated_at"] = now
+            access_codes_store.patch(code, is_active=False, updated_at=now)
             logger.info({
                 "event": "exchange_code_result",
                 "result": "expired_code",
@@ -150,11 +150,28 @@ def exchange_code(
             })
             raise HTTPException(status_code=status.HTTP_410_GONE, detail="expired_code")
 
-        # Mark as used
-        record["usage_count"] = record.get("usage_count", 0) + 1
-        record["last_used_at"] = now
-        record["is_active"] = False
-        record["updated_at"] = now
+        # Mark as used: atomico, due exchange concorrenti (anche su worker
+        # diversi) non possono riscattare lo stesso codice
+        def _redeem(current: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            if current is None or current.get("usage_count", 0) > 0 or not current.get("is_active", False):
+                return current
+            return {
+                **current,
+                "usage_count": current.get("usage_count", 0) + 1,
+                "last_used_at": now,
+                "is_active": False,
+                "updated_at": now,
+            }
+
+        previous, _ = access_codes_store.update_item(code, _redeem)
+        if previous is None or previous.get("usage_count", 0) > 0 or not previous.get("is_active", False):
+            logger.info({
+                "event": "exchange_code_result",
+                "result": "code_already_used",
+                "client_ip": client_ip,
+                "code_id": record.get("id"),
+            })
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="code_already_used")
 
         session_id = str(uuid4())
         subject = f"student:{record['id']}"
@@ -8,10 +8,13 @@ Endpoints:
 
 Stories: 3.1, 3.2, 3.4
 """
+import asyncio
 import time
 import logging
 import hashlib
-from typing import Annotated, Optional, Dict
+import threading
+from dataclasses import dataclass
+from typing import Annotated, Dict, Literal, Optional
 from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Query, Response
@@ -37,11 +40,27 @@ from ..config import Settings, get_settings
 from ..services.chat_service import record_ag_latency_ms, get_llm
 from ..services.rate_limit_service import rate_limit_service
 from ..services.conversation_service import get_conversation_manager  # Story 7.1
-from ..services.persistence_service import ConversationPersistenceService  # Story 9.2
+from ..services.persistence_service import (  # Story 9.2
+    ConversationPersistenceService,
+    InvalidHistoryCursor,
+    SessionHistoryStats,
+)
+from ..services.single_flight import SingleFlight
+from ..services.llm_gateway import get_llm_gateway, llm_call_deadline, request_deadline
+from ..services.structured_output import build_response_format, generate_structured
 from ..dependencies import _auth_bridge, TokenPayload, get_supabase_client  # Story 4.2.4
 from .. import database  # Story 9.2
-from ..knowledge_base.search import perform_semantic_search
+from ..knowledge_base.search import (
+    RetrievalResult,
+    perform_semantic_search,
+    results_from_candidates,
+)
+from ..knowledge_base.retrieval_cache import (
+    get_retrieval_cache,
+    make_cache_key as make_retrieval_cache_key,
+)
 from ..knowledge_base.enhanced_retrieval import get_enhanced_retriever  # Story 7.2
+from ..knowledge_base.context_packer import make_token_counter, pack_context
 from ..knowledge_base.dynamic_retrieval import get_dynamic_strategy  # Story 7.2
 from ..models.answer_with_citations import AnswerWithCitations
 from ..models.enhanced_response import EnhancedAcademicResponse  # Story 7.1
@@ -49,6 +68,9 @@ from ..prompts.academic_medical import (  # Story 7.1
     BASELINE_PROMPT,
     ACADEMIC_MEDICAL_SYSTEM_PROMPT,
 )
+from ..utils.prometheus_exporter import observe_chat_stage
+from ..utils.request_timing import record_stage, span
+from ..utils.responses import FastJSONResponse
 from ..stores import chat_messages_store  # feedback_store deprecato Story 4.2.4
 from ..repositories.feedback_repository import FeedbackRepository  # Story 4.2.4
 
@@ -56,6 +78,143 @@ router = APIRouter(prefix="/api/v1/chat", tags=["Chat"])
 logger = logging.getLogger("api")
 
 
+# Chain prompt | llm | parser precompilate e riusate tra request: template,
+# format instructions (JSON schema del modello risposta) e client LLM costruiti
+# una volta per combinazione di flag/modello; per request si passano solo le variabili.
+_chat_chain_registry: Dict[tuple, Runnable] = {}
+_chat_chain_lock = threading.Lock()
+
+
+def _chat_chain_key(settings: Settings) -> tuple:
+    return (
+        bool(settings.enable_academic_prompt),
+        bool(settings.enable_enhanced_response_model),
+        bool(settings.llm_config_refactor_enabled),
+        settings.openai_model,
+        settings.openai_temperature_chat,
+        bool(settings.enable_native_structured_output),
+        bool(settings.structured_output_strict),
+        bool(settings.enable_llm_gateway),
+    )
+
+
+def _chat_response_model(settings: Settings) -> type:
+    # Story 7.1: modello risposta in base al feature flag
+    if settings.enable_enhanced_response_model:
+        return EnhancedAcademicResponse
+    return AnswerWithCitations
+
+
+def _chat_llm(settings: Settings, **params):
+    """LLM della chain: gateway (deadline/hedging/pool) o ChatOpenAI singolo."""
+    if settings.enable_llm_gateway:
+        if settings.openai_temperature_chat is not None:
+            params.setdefault("temperature", settings.openai_temperature_chat)
+        return get_llm_gateway(settings).as_runnable(**params)
+    llm = get_llm(settings)
+    return llm.bind(**params) if params else llm
+
+
+def _build_chat_chain(settings: Settings) -> Runnable:
+    """Compone prompt | llm | parser per la combinazione di flag corrente."""
+    response_model = _chat_response_model(settings)
+    if settings.enable_native_structured_output:
+        # Schema imposto dal provider: niente format instructions nel prompt,
+        # la chain restituisce il JSON (parsato in streaming da generate_structured)
+        format_instructions = ""
+        output_stage = _chat_llm(
+            settings,
+            response_format=build_response_format(
+                response_model, strict=settings.structured_output_strict
+            ),
+        )
+    else:
+        parser = PydanticOutputParser(pydantic_object=response_model)
+        format_instructions = parser.get_format_instructions()
+        output_stage = None
+
+    if settings.enable_academic_prompt:
+        # Story 7.1 AC1: Academic medical prompt
+        # context / conversation_history legati per request in invoke()
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", ACADEMIC_MEDICAL_SYSTEM_PROMPT),
+            ("user", "{question}"),
+        ]).partial(format_instructions=format_instructions)
+    else:
+        # Baseline prompt (backward compatibility)
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", BASELINE_PROMPT),
+            ("user", "CONTEXT:\n{context}\n\nDOMANDA:\n{question}"),
+        ]).partial(format_instructions=format_instructions)
+
+    if output_stage is not None:
+        return prompt | output_stage
+    return prompt | _chat_llm(settings) | parser
+
+
+def _get_chat_chain(settings: Settings) -> Runnable:
+    """Restituisce la chain dal registry, compilandola al primo utilizzo."""
+    key = _chat_chain_key(settings)
+    chain = _chat_chain_registry.get(key)
+    if chain is not None:
+        return chain
+    with _chat_chain_lock:
+        chain = _chat_chain_registry.get(key)
+        if chain is None:
+            chain = _build_chat_chain(settings)
+            _chat_chain_registry[key] = chain
+            logger.info({
+                "event": "chat_chain_compiled",
+                "academic_prompt": key[0],
+                "enhanced_response_model": key[1],
+                "model": key[3],
+                "registry_size": len(_chat_chain_registry),
+            })
+    return chain
+
+
+def reset_chat_chain_registry() -> None:
+    """Svuota il registry (test / reload configurazione)."""
+    with _chat_chain_lock:
+        _chat_chain_registry.clear()
+
+
+def _pack_chat_context(
+    chunks: list[ChatQueryChunk],
+    context_window,
+    settings: Settings,
+    session_id: str,
+    rerank_scores: Optional[list[Optional[float]]] = None,
+) -> str:
+    """Contesto chunk entro il budget token residuo dopo la cronologia."""
+    history_tokens = context_window.total_tokens if context_window is not None else 0
+    token_budget = max(
+        settings.context_min_chunk_tokens,
+        settings.context_max_tokens - history_tokens,
+    )
+    packed = pack_context(
+        chunks,
+        token_budget=token_budget,
+        count_tokens=make_token_counter(settings.openai_model),
+        min_relative_score=settings.context_min_relative_score,
+        min_chunks=settings.context_preserve_top_n,
+        rerank_scores=rerank_scores,
+    )
+    logger.info({
+        "event": "context_packed",
+        "session_id": session_id,
+        "token_budget": token_budget,
+        "history_tokens": history_tokens,
+        "original_tokens": packed.original_tokens,
+        "packed_tokens": packed.packed_tokens,
+        "tokens_saved": packed.tokens_saved,
+        "chunks_kept": len(packed.chunk_ids),
+        "chunks_dropped": len(packed.dropped_chunk_ids),
+        "chunks_merged": packed.merged_chunks,
+    })
+    return packed.text
+
+
 def _resolve_chat_rate_limit_key(request: Request, payload: TokenPayload) -> str:
     """
     Determina la chiave per il rate limiting della chat.
@@ -106,6 +265,64 @@ def _build_fallback_answer(chunks: list[ChatQueryChunk]) -> str:
     return "\n".join([header, *snippets])
 
 
+def _retrieve_fallback_tier(
+    retrieval_result: RetrievalResult,
+    match_count: int,
+    match_threshold: Optional[float],
+    session_id: str,
+) -> list[dict]:
+    """
+    Fallback retrieval riusando il lavoro del tier fallito.
+
+    Tier (in ordine):
+    - candidates: candidati over-retrieved già disponibili → filtro locale, nessuna RPC
+    - embedding: embedding già calcolato → sola RPC baseline
+    - baseline: nessun lavoro riusabile dal tier enhanced → ricerca completa
+
+    Un tier baseline fallito non viene ripetuto (stesso lavoro, stesso esito).
+
+    Args:
+        retrieval_result: Risultati intermedi del tier fallito (aggiornato con tier/timing)
+        match_count: Numero chunk richiesti
+        match_threshold: Soglia similarity richiesta dal client
+        session_id: Session identifier (logging)
+
+    Returns:
+        Lista risultati baseline (vuota se anche il fallback fallisce)
+    """
+    failed_tier = retrieval_result.tier
+    tier_started_at = time.time()
+    try:
+        if retrieval_result.candidates and retrieval_result.candidates_match_count >= match_count:
+            retrieval_result.tier = "fallback_candidates"
+            return results_from_candidates(retrieval_result, match_count, match_threshold)
+        if failed_tier == "baseline" and retrieval_result.query_embedding is None:
+            retrieval_result.tier = "fallback_none"
+            return []
+
+        search_kwargs: dict = {}
+        if retrieval_result.query_embedding is not None:
+            retrieval_result.tier = "fallback_embedding"
+            search_kwargs["query_embedding"] = retrieval_result.query_embedding
+        else:
+            retrieval_result.tier = "fallback_baseline"
+        return perform_semantic_search(
+            query=retrieval_result.query,
+            match_count=match_count,
+            match_threshold=match_threshold,
+            **search_kwargs,
+        )
+    except Exception as fallback_exc:  # noqa: BLE001
+        logger.error({
+            "event": "semantic_search_error",
+            "error": str(fallback_exc),
+            "session_id": session_id,
+        })
+        return []
+    finally:
+        retrieval_result.record_timing(f"tier_{retrieval_result.tier}_ms", tier_started_at)
+
+
 @router.post("/query", response_model=ChatQueryResponse)
 def chat_query_endpoint(
     body: ChatQueryRequest,
@@ -136,7 +353,9 @@ def chat_query_endpoint(
         body.match_threshold,
     )
 
-    chunks: list[dict] = []
+    # Valori già normalizzati qui sotto: model_construct evita la validazione
+    # per chunk, la response serializza il modello in un solo passaggio
+    chunks: list[ChatQueryChunk] = []
     for r in results:
         payload = r or {}
         metadata = payload.get("metadata") or {}
@@ -150,14 +369,39 @@ def chat_query_endpoint(
             or payload.get("id")
         )
         document_id = metadata.get("document_id") or payload.get("document_id")
-        chunks.append({
-            "id": str(chunk_id) if chunk_id else None,
-            "document_id": str(document_id) if document_id else None,
-            "content": payload.get("content"),
-            "similarity": float(score) if isinstance(score, (int, float)) else None,
-        })
+        chunks.append(ChatQueryChunk.model_construct(
+            id=str(chunk_id) if chunk_id else None,
+            document_id=str(document_id) if document_id else None,
+            content=payload.get("content"),
+            similarity=float(score) if isinstance(score, (int, float)) else None,
+        ))
     
-    return ChatQueryResponse(chunks=[ChatQueryChunk(**c) for c in chunks])
+    return FastJSONResponse(ChatQueryResponse.model_construct(chunks=chunks))
+
+
+_HISTORY_CACHE_CONTROL = "private, no-cache"
+
+
+def _history_etag(
+    stats: SessionHistoryStats,
+    order: str,
+    limit: int,
+    cursor: Optional[str],
+    offset: int,
+) -> str:
+    """ETag debole: ultimo messaggio + conteggio sessione + parametri pagina."""
+    fingerprint = (
+        f"{stats.last_message_id}:{stats.message_count}:{order}:{limit}:{cursor or offset}"
+    )
+    return 'W/"' + hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Confronto debole (RFC 9110 §13.1.2): il prefisso W/ è ignorato
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
 
 
 @router.get("/sessions/{sessionId}/history/full", response_model=SessionHistoryResponse)
@@ -169,6 +413,8 @@ async def get_session_history(
     settings: Annotated[Settings, Depends(get_settings)],
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, max_length=512),
+    order: Literal["asc", "desc"] = Query("asc"),
 ):
     """
     Session history retrieval endpoint (Story 9.2).
@@ -176,7 +422,12 @@ async def get_session_history(
     Recupera full conversational history per session da database con pagination.
     
     Features:
-    - Pagination con limit/offset parameters
+    - Keyset pagination su (created_at, id): ``next_cursor`` della risposta
+      va passato come ``cursor`` per la pagina successiva, costo costante
+      per pagina anche su history lunghe
+    - ``offset`` mantenuto per compatibilità (costo lineare nell'offset)
+    - ``total_count`` esatto dal contatore per sessione (chat_session_stats)
+    - ETag sull'ultimo messaggio + 304 Not Modified con If-None-Match
     - Rate limiting: 60 req/min per session
     - Feature flag: ENABLE_PERSISTENT_MEMORY
     - Graceful degradation: 404 per session nuova
@@ -186,20 +437,23 @@ async def get_session_history(
         request: FastAPI Request
         response: FastAPI Response (per headers)
         limit: Max messaggi per page (default 100, max 500)
-        offset: Pagination offset (default 0)
+        offset: Pagination offset legacy (ignorato se cursor presente)
+        cursor: Cursor opaco della pagina precedente
+        order: "asc" (cronologico) o "desc" (newest first, scroll indietro)
         payload: JWT payload verificato
         settings: Application settings
         
     Returns:
-        SessionHistoryResponse con messages, total_count, has_more
+        SessionHistoryResponse con messages, total_count, has_more, next_cursor
         
     Security:
         - JWT authentication required
         - Rate limiting: 60/minute
-        - Cache-Control: private, max-age=0, no-store (per-user data)
+        - Cache-Control: private, no-cache (per-user data, sempre rivalidato)
     """
-    # QA Must-Fix: Cache-Control headers per evitare caching proxy indesiderato
-    response.headers["Cache-Control"] = "private, max-age=0, no-store"
+    # QA Must-Fix: niente caching su proxy condivisi; il browser conserva la
+    # risposta ma la rivalida sempre via ETag
+    response.headers["Cache-Control"] = _HISTORY_CACHE_CONTROL
     response.headers["Pragma"] = "no-cache"
     
     # AC6: Feature flag check
@@ -240,23 +494,54 @@ async def get_session_history(
         )
     
     try:
-        # AC2: Use ConversationPersistenceService.load_session_history()
+        # AC2: Use ConversationPersistenceService
         persistence_service = ConversationPersistenceService(database.db_pool)
         
-        # Load messages con pagination
-        conversation_messages = await persistence_service.load_session_history(
-            session_id=sessionId,
-            limit=limit + 1,  # Fetch +1 per determinare has_more
-            offset=offset,
-        )
+        # Lookup per PK: conteggio esatto + ETag prima della query pagina
+        stats = await persistence_service.get_session_stats(sessionId)
+        if stats is not None:
+            etag = _history_etag(stats, order, limit, cursor, offset)
+            response.headers["ETag"] = etag
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                logger.info({
+                    "event": "session_history_not_modified",
+                    "session_id": sessionId,
+                })
+                return Response(
+                    status_code=304,
+                    headers={
+                        "ETag": etag,
+                        "Cache-Control": _HISTORY_CACHE_CONTROL,
+                        "Pragma": "no-cache",
+                    },
+                )
         
-        # AC1: Determine has_more based su limit+1 fetch
-        has_more = len(conversation_messages) > limit
-        if has_more:
-            conversation_messages = conversation_messages[:limit]
+        order_desc = order == "desc"
+        next_cursor: Optional[str] = None
+        if cursor is None and offset > 0:
+            # Client legacy con offset
+            conversation_messages = await persistence_service.load_session_history(
+                session_id=sessionId,
+                limit=limit + 1,  # Fetch +1 per determinare has_more
+                offset=offset,
+                order_desc=order_desc,
+            )
+            has_more = len(conversation_messages) > limit
+            if has_more:
+                conversation_messages = conversation_messages[:limit]
+        else:
+            conversation_messages, next_cursor = (
+                await persistence_service.load_session_history_page(
+                    session_id=sessionId,
+                    limit=limit,
+                    cursor=cursor,
+                    order_desc=order_desc,
+                )
+            )
+            has_more = next_cursor is not None
         
         # AC7: Return empty array per sessione nuova/vuota (NOT 404)
-        if not conversation_messages and offset == 0:
+        if not conversation_messages and offset == 0 and cursor is None:
             logger.info({
                 "event": "session_history_empty",
                 "session_id": sessionId,
@@ -270,11 +555,6 @@ async def get_session_history(
         # AC5: Convert to response schema preservando formato identico
         response_messages: list[ConversationMessageSchema] = []
         for msg in conversation_messages:
-            # Generate unique message ID from timestamp + content hash
-            msg_id = hashlib.sha256(
-                f"{sessionId}_{msg.timestamp.isoformat()}_{msg.content[:50]}".encode()
-            ).hexdigest()[:16]
-            
             # CRITICAL FIX: Popola metadata con citations per frontend
             # Frontend cerca msg.metadata.citations per rendering popover
             metadata_dict = {}
@@ -283,6 +563,11 @@ async def get_session_history(
                     {"chunk_id": cid} for cid in msg.chunk_ids
                 ]
             
+            # ID stabile da chat_messages.id; hash solo per messaggi senza id
+            msg_id = msg.id or hashlib.sha256(
+                f"{sessionId}_{msg.timestamp.isoformat()}_{msg.content[:50]}".encode()
+            ).hexdigest()[:16]
+            
             response_messages.append(
                 ConversationMessageSchema(
                     id=msg_id,
@@ -294,11 +579,11 @@ async def get_session_history(
                 )
             )
         
-        # AC1: Calcola total_count (approximation basata su has_more)
-        # In produzione, considerare COUNT(*) separata per total_count esatto
-        total_count = offset + len(response_messages)
-        if has_more:
-            total_count += 1  # At least 1 more
+        if stats is not None:
+            total_count = stats.message_count
+        else:
+            # Fallback senza chat_session_stats: approssimazione da has_more
+            total_count = offset + len(response_messages) + (1 if has_more else 0)
         
         logger.info({
             "event": "session_history_retrieved",
@@ -307,14 +592,24 @@ async def get_session_history(
             "has_more": has_more,
             "limit": limit,
             "offset": offset,
+            "has_cursor": cursor is not None,
+            "order": order,
         })
         
-        return SessionHistoryResponse(
-            messages=response_messages,
-            total_count=total_count,
-            has_more=has_more,
+        # Fino a 500 messaggi: serializzazione diretta del modello già validato;
+        # gli header impostati su ``response`` (ETag, Cache-Control) vanno copiati
+        return FastJSONResponse(
+            SessionHistoryResponse(
+                messages=response_messages,
+                total_count=total_count,
+                has_more=has_more,
+                next_cursor=next_cursor,
+            ),
+            headers=response.headers,
         )
     
+    except InvalidHistoryCursor:
+        raise HTTPException(status_code=400, detail="cursor non valido")
     except HTTPException:
         raise
     except Exception as exc:
@@ -384,64 +679,61 @@ async def delete_chat_session(
         raise HTTPException(status_code=500, detail="Failed to delete session")
 
 
-@router.post("/sessions/{sessionId}/messages", response_model=ChatMessageCreateResponse)
-async def create_chat_message(
-    sessionId: str,
-    body: ChatMessageCreateRequest,
-    request: Request,
-    settings: Annotated[Settings, Depends(get_settings)],
-    payload: Annotated[TokenPayload, Depends(_auth_bridge)],
-):
-    """
-    Augmented generation endpoint (Story 3.2 / 2.11).
-    
-    Genera risposta usando LLM con contesto fornito dai chunk.
-    Implementa:
-    - Context-aware generation con vincolo uso esclusivo contesto
-    - Citation tracking con chunk IDs
-    - Performance metrics (latency, p95)
-    - Fallback sicuro per ambienti senza LLM
-    
-    Args:
-        sessionId: Session identifier
-        body: Request con messaggio utente, configurazione retrieval e chunk opzionali
-        request: FastAPI Request
-        payload: JWT payload verificato
-        
-    Returns:
-        ChatMessageCreateResponse con risposta, citazioni, message_id
-        
-    Security:
-        - JWT authentication required
-        - Rate limiting: 60/minute (gestito da SlowAPI su main.app)
-    """
-    _ag_start_time = time.time()
+@dataclass(frozen=True)
+class _GenerationOutcome:
+    """Risultato retrieval + generazione, condivisibile tra richieste coalesced."""
 
-    rate_limit_service.enforce_rate_limit(
-        key=_resolve_chat_rate_limit_key(request, payload),
-        scope="chat_message",
-        window_seconds=settings.chat_rate_limit_window_sec,
-        max_requests=settings.chat_rate_limit_max_requests,
+    resolved_chunks: list[ChatQueryChunk]
+    answer: Optional[str]
+    citations: list[str]
+    retrieval_time_ms: int
+    generation_time_ms: int
+
+
+_chat_single_flight = SingleFlight()
+
+# Flag che cambiano prompt, parser o formato risposta
+_COALESCING_PROMPT_FLAGS = (
+    "openai_model",
+    "enable_academic_prompt",
+    "enable_enhanced_response_model",
+    "enable_conversational_memory",
+    "enable_context_packing",
+    "context_max_tokens",
+    "context_min_relative_score",
+)
+
+
+def _chat_coalescing_key(
+    user_message: str, body: ChatMessageCreateRequest, settings: Settings
+) -> tuple:
+    """Chiave coalescing: query normalizzata + retrieval + flag prompt/ranking."""
+    return (
+        make_retrieval_cache_key(user_message, body.match_count, body.match_threshold, settings),
+        tuple(getattr(settings, name, None) for name in _COALESCING_PROMPT_FLAGS),
     )
 
-    if not sessionId or not sessionId.strip():
-        raise HTTPException(status_code=400, detail="sessionId mancante")
-    user_message = (body.message or "").strip()
-    if not user_message:
-        raise HTTPException(status_code=400, detail="message mancante")
 
-    logger.info({
-        "event": "ag_message_request",
-        "path": f"/api/v1/chat/sessions/{sessionId}/messages",
-        "session_id": sessionId,
-        "has_chunks": bool(body.chunks),
-        "match_count": body.match_count,
-        "match_threshold": body.match_threshold,
-    })
+def _run_generation_pipeline(
+    user_message: str,
+    body: ChatMessageCreateRequest,
+    settings: Settings,
+    session_id: str,
+    conversation_history: str,
+    context_window,
+    started_at: float,
+) -> _GenerationOutcome:
+    """
+    Retrieval chunk + costruzione contesto + generazione LLM.
 
+    Non dipende da message_id né scrive nello store conversazioni: l'esito
+    può essere condiviso tra richieste identiche (vedi ``_chat_single_flight``).
+    """
     # Recupera chunk: usa payload client oppure esegue semantic search server-side
     retrieval_time_ms = 0
     resolved_chunks: list[ChatQueryChunk] = []
+    # Score cross-encoder allineati a resolved_chunks (solo retrieval server-side)
+    rerank_scores: list[Optional[float]] = []
     if body.chunks:
         resolved_chunks = [chunk for chunk in body.chunks if chunk]
     else:
@@ -473,52 +765,90 @@ async def create_chat_message(
                 effective_match_count = body.match_count
         
         # Story 7.2 AC1: Enhanced retrieval con re-ranking (se enabled)
+        # RetrievalResult raccoglie embedding/candidati per riuso nei tier di fallback
+        retrieval_result = RetrievalResult(query=user_message)
+        retrieval_cache_key = None
+        cached_retrieval = None
+        if settings.enable_retrieval_result_cache:
+            retrieval_cache_key = make_retrieval_cache_key(
+                user_message, effective_match_count, body.match_threshold, settings
+            )
+            cached_retrieval = get_retrieval_cache().get(retrieval_cache_key)
+        tier_started_at = time.time()
         try:
-            if settings.enable_cross_encoder_reranking:
+            if cached_retrieval is not None:
+                # Query identica, stesso corpus: skip embedding, RPC e re-ranking
+                retrieval_result.tier = "cache"
+                cached_tier, search_results = cached_retrieval
+                logger.info({
+                    "event": "retrieval_cache_hit",
+                    "session_id": session_id,
+                    "cached_tier": cached_tier,
+                    "chunks_count": len(search_results),
+                })
+            elif settings.enable_cross_encoder_reranking:
                 # Use enhanced retrieval pipeline
+                retrieval_result.tier = "enhanced"
                 retriever = get_enhanced_retriever(settings)
                 search_results = retriever.retrieve_and_rerank(
                     query=user_message,
                     match_count=effective_match_count,
                     match_threshold=body.match_threshold,
                     diversify=settings.enable_chunk_diversification,  # AC3: Diversification
+                    request_started_at=started_at,  # Latency budget sull'intera request
+                    result=retrieval_result,
                 )
                 logger.info({
                     "event": "enhanced_retrieval_used",
-                    "session_id": sessionId,
+                    "session_id": session_id,
                     "match_count": effective_match_count,
                     "diversify": settings.enable_chunk_diversification,
                 })
             else:
                 # Use baseline semantic search
+                retrieval_result.tier = "baseline"
                 search_results = perform_semantic_search(
                     query=user_message,
                     match_count=effective_match_count,
                     match_threshold=body.match_threshold,
                 )
+            retrieval_result.record_timing(f"tier_{retrieval_result.tier}_ms", tier_started_at)
+            # Solo risultati completi e non vuoti (RPC in errore restituisce [])
+            if (
+                retrieval_cache_key is not None
+                and cached_retrieval is None
+                and search_results
+                and not retrieval_result.degraded
+            ):
+                get_retrieval_cache().put(
+                    retrieval_cache_key, retrieval_result.tier, search_results
+                )
         except Exception as exc:  # noqa: BLE001 - fallback a baseline
+            retrieval_result.record_timing(f"tier_{retrieval_result.tier}_ms", tier_started_at)
             logger.warning({
                 "event": "enhanced_retrieval_fallback",
                 "error": str(exc),
-                "action": "use_baseline_search",
-                "session_id": sessionId,
+                "failed_tier": retrieval_result.tier,
+                "session_id": session_id,
             })
-            # Graceful degradation: fallback a baseline search
-            try:
-                search_results = perform_semantic_search(
-                    query=user_message,
-                    match_count=effective_match_count,
-                    match_threshold=body.match_threshold,
-                )
-            except Exception as fallback_exc:  # noqa: BLE001
-                logger.error({
-                    "event": "semantic_search_error",
-                    "error": str(fallback_exc),
-                    "session_id": sessionId,
-                })
-                search_results = []
+            search_results = _retrieve_fallback_tier(
+                retrieval_result,
+                match_count=effective_match_count,
+                match_threshold=body.match_threshold,
+                session_id=session_id,
+            )
+        
+        logger.info({
+            "event": "retrieval_tiers_completed",
+            "session_id": session_id,
+            "tier": retrieval_result.tier,
+            "timings_ms": retrieval_result.timings_ms,
+        })
         
         retrieval_time_ms = int((time.time() - retrieval_started_at) * 1000)
+        observe_chat_stage("retrieval", retrieval_time_ms)
+        for timing_name, timing_ms in retrieval_result.timings_ms.items():
+            observe_chat_stage(f"retrieval_{timing_name.removesuffix('_ms')}", timing_ms)
 
         for item in search_results or []:
             metadata = (item or {}).get("metadata") or {}
@@ -537,6 +867,7 @@ async def create_chat_message(
             }
             try:
                 resolved_chunks.append(ChatQueryChunk(**chunk_payload))
+                rerank_scores.append(item.get("rerank_score"))
             except Exception:
                 logger.debug({
                     "event": "chunk_parse_skip",
@@ -545,72 +876,28 @@ async def create_chat_message(
 
     logger.info({
         "event": "ag_chunks_resolved",
-        "session_id": sessionId,
+        "session_id": session_id,
         "chunks_count": len(resolved_chunks),
         "retrieval_time_ms": retrieval_time_ms,
     })
 
-    # Story 7.1: Load conversational context if enabled
-    conversation_history = ""
-    context_window = None
-    if settings.enable_conversational_memory:
-        conv_manager = get_conversation_manager(
-            max_turns=settings.conversation_max_turns,
-            max_tokens=settings.conversation_max_tokens,
-            compact_length=settings.conversation_message_compact_length,
-            enable_persistence=settings.enable_persistent_memory,  # Story 9.1 AC3
-        )
-        context_window = conv_manager.get_context_window(sessionId)
-        conversation_history = conv_manager.format_for_prompt(context_window)
-        
-        logger.info({
-            "event": "context_window_loaded",
-            "session_id": sessionId,
-            "messages_count": len(context_window.messages),
-            "total_tokens": context_window.total_tokens,
-        })
-    else:
-        conversation_history = "\n=== PRIMA INTERAZIONE (nessuna cronologia) ===\n"
-    
     # Costruzione del contesto a partire dai chunk
-    context_lines: list[str] = []
-    for chunk in resolved_chunks:
-        if not chunk:
-            continue
-        chunk_identifier = chunk.id or chunk.document_id or "unknown"
-        chunk_content = (chunk.content or "").strip()
-        if chunk_content:
-            context_lines.append(f"[chunk_id={chunk_identifier}] {chunk_content}")
-    context: str = "\n".join(context_lines).strip()
-    
-    # Story 7.1: Choose prompt and parser based on feature flags
-    if settings.enable_enhanced_response_model:
-        parser = PydanticOutputParser(pydantic_object=EnhancedAcademicResponse)
+    if settings.enable_context_packing:
+        with span("context_assembly"):
+            context = _pack_chat_context(
+                resolved_chunks, context_window, settings, session_id, rerank_scores=rerank_scores
+            )
     else:
-        parser = PydanticOutputParser(pydantic_object=AnswerWithCitations)
+        context_lines: list[str] = []
+        for chunk in resolved_chunks:
+            if not chunk:
+                continue
+            chunk_identifier = chunk.id or chunk.document_id or "unknown"
+            chunk_content = (chunk.content or "").strip()
+            if chunk_content:
+                context_lines.append(f"[chunk_id={chunk_identifier}] {chunk_content}")
+        context: str = "\n".join(context_lines).strip()
     
-    format_instructions = parser.get_format_instructions()
-    
-    if settings.enable_academic_prompt:
-        # Story 7.1 AC1: Academic medical prompt
-        system_prompt = ACADEMIC_MEDICAL_SYSTEM_PROMPT
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("user", "{question}"),
-        ]).partial(
-            format_instructions=format_instructions,
-            context=context,
-            conversation_history=conversation_history,
-        )
-    else:
-        # Baseline prompt (backward compatibility)
-        system_prompt = BASELINE_PROMPT
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("user", "CONTEXT:\n{context}\n\nDOMANDA:\n{question}"),
-        ]).partial(format_instructions=format_instructions)
-
-    message_id = str(uuid4())
     answer_value: Optional[str] = None
     citations_value: Optional[list[str]] = None
     generation_time_ms = 0
@@ -620,27 +907,47 @@ async def create_chat_message(
         citations_value = []
         logger.warning({
             "event": "ag_no_context",
-            "session_id": sessionId,
+            "session_id": session_id,
             "reason": "no_chunks_available",
         })
     else:
         try:
-            llm = get_llm(settings)
-            chain: Runnable = prompt | llm | parser
+            chain = _get_chat_chain(settings)
             gen_started_at = time.time()
             
             # Story 7.1: Invoke with appropriate parameters
+            chain_inputs = {
+                "question": user_message,
+                "context": context,
+            }
             if settings.enable_academic_prompt:
-                result = chain.invoke({
-                    "question": user_message,
-                })
-            else:
-                result = chain.invoke({
-                    "question": user_message,
-                    "context": context,
-                })
+                chain_inputs["conversation_history"] = conversation_history
+
+            # Deadline chiamata LLM = budget residuo della request (gateway)
+            deadline = request_deadline(started_at, settings.llm_request_budget_ms)
+            with llm_call_deadline(deadline):
+                if settings.enable_native_structured_output:
+                    first_field_ms: list[int] = []
+
+                    def _on_field(_name, _value) -> None:
+                        if not first_field_ms:
+                            first_field_ms.append(int((time.time() - gen_started_at) * 1000))
+
+                    result = generate_structured(
+                        chain, chain_inputs, _chat_response_model(settings), on_field=_on_field
+                    )
+                    logger.info({
+                        "event": "structured_output_generated",
+                        "session_id": session_id,
+                        "time_to_first_field_ms": first_field_ms[0] if first_field_ms else None,
+                    })
+                else:
+                    result = chain.invoke(chain_inputs)
             
             generation_time_ms = int((time.time() - gen_started_at) * 1000)
+            observe_chat_stage("generation", generation_time_ms)
+            record_stage("generation", generation_time_ms)
+            parse_started_at = time.perf_counter()
             
             # Story 7.1: Extract answer and citations based on model type
             if settings.enable_enhanced_response_model:
@@ -666,7 +973,7 @@ async def create_chat_message(
                 # Log enhanced response metadata
                 logger.info({
                     "event": "enhanced_response_generated",
-                    "session_id": sessionId,
+                    "session_id": session_id,
                     "has_clinical_notes": hasattr(result, "note_cliniche") and bool(result.note_cliniche),
                     "has_limitations": hasattr(result, "limitazioni_contesto") and bool(result.limitazioni_contesto),
                     "concepts_count": len(result.concetti_chiave) if hasattr(result, "concetti_chiave") else 0,
@@ -677,6 +984,7 @@ async def create_chat_message(
                 # Baseline AnswerWithCitations model
                 answer_value = getattr(result, "risposta", None)
                 citations_value = getattr(result, "citazioni", None)
+            record_stage("parsing", (time.perf_counter() - parse_started_at) * 1000)
                 
         except Exception as exc:  # noqa: BLE001 - fallback per ambienti senza LLM
             citations_value = []
@@ -695,8 +1003,153 @@ async def create_chat_message(
                 "citations_count": len(citations_value),
             })
 
-    answer_value = (answer_value or "").strip() or "Non trovato nel contesto"
-    citations_value = citations_value or []
+    return _GenerationOutcome(
+        resolved_chunks=resolved_chunks,
+        answer=answer_value,
+        citations=list(citations_value or []),
+        retrieval_time_ms=retrieval_time_ms,
+        generation_time_ms=generation_time_ms,
+    )
+
+
+@router.post("/sessions/{sessionId}/messages", response_model=ChatMessageCreateResponse)
+async def create_chat_message(
+    sessionId: str,
+    body: ChatMessageCreateRequest,
+    request: Request,
+    settings: Annotated[Settings, Depends(get_settings)],
+    payload: Annotated[TokenPayload, Depends(_auth_bridge)],
+):
+    """
+    Augmented generation endpoint (Story 3.2 / 2.11).
+    
+    Genera risposta usando LLM con contesto fornito dai chunk.
+    Implementa:
+    - Context-aware generation con vincolo uso esclusivo contesto
+    - Citation tracking con chunk IDs
+    - Performance metrics (latency, p95)
+    - Fallback sicuro per ambienti senza LLM
+    
+    Args:
+        sessionId: Session identifier
+        body: Request con messaggio utente, configurazione retrieval e chunk opzionali
+        request: FastAPI Request
+        payload: JWT payload verificato
+        
+    Returns:
+        ChatMessageCreateResponse con risposta, citazioni, message_id
+        
+    Security:
+        - JWT authentication required
+        - Rate limiting: 60/minute (gestito da SlowAPI su main.app)
+    """
+    _ag_start_time = time.time()
+
+    rate_limit_service.enforce_rate_limit(
+        key=_resolve_chat_rate_limit_key(request, payload),
+        scope="chat_message",
+        window_seconds=settings.chat_rate_limit_window_sec,
+        max_requests=settings.chat_rate_limit_max_requests,
+    )
+
+    if not sessionId or not sessionId.strip():
+        raise HTTPException(status_code=400, detail="sessionId mancante")
+    user_message = (body.message or "").strip()
+    if not user_message:
+        raise HTTPException(status_code=400, detail="message mancante")
+
+    logger.info({
+        "event": "ag_message_request",
+        "path": f"/api/v1/chat/sessions/{sessionId}/messages",
+        "session_id": sessionId,
+        "has_chunks": bool(body.chunks),
+        "match_count": body.match_count,
+        "match_threshold": body.match_threshold,
+    })
+
+    # Story 7.1: Load conversational context if enabled
+    conversation_history = ""
+    context_window = None
+    if settings.enable_conversational_memory:
+        conv_manager = get_conversation_manager(
+            max_turns=settings.conversation_max_turns,
+            max_tokens=settings.conversation_max_tokens,
+            compact_length=settings.conversation_message_compact_length,
+            enable_persistence=settings.enable_persistent_memory,  # Story 9.1 AC3
+            enable_summarization=settings.enable_conversation_summary,
+        )
+        with span("conversation_context"):
+            if conv_manager.summarizer is not None:
+                # Riassunto rolling perso (riavvio/altro worker): ricaricato dal DB
+                await conv_manager.summarizer.restore_summary(sessionId)
+            context_window = conv_manager.get_context_window(sessionId)
+            conversation_history = conv_manager.format_for_prompt(context_window)
+        
+        logger.info({
+            "event": "context_window_loaded",
+            "session_id": sessionId,
+            "messages_count": len(context_window.messages),
+            "total_tokens": context_window.total_tokens,
+        })
+    else:
+        conversation_history = "\n=== PRIMA INTERAZIONE (nessuna cronologia) ===\n"
+    
+    message_id = str(uuid4())
+
+    # Coalescing: turni senza cronologia e con retrieval server-side sono
+    # identici per query + parametri; richieste concorrenti condividono
+    # un'unica esecuzione (message_id e persistenza restano per-request).
+    # Un riassunto rolling (anche senza messaggi in L1) è cronologia della
+    # sessione: il turno non è condivisibile tra utenti
+    coalescing_key = None
+    if (
+        settings.enable_request_coalescing
+        and not body.chunks
+        and (
+            context_window is None
+            or (not context_window.messages and not context_window.summary)
+        )
+    ):
+        coalescing_key = _chat_coalescing_key(user_message, body, settings)
+
+    if coalescing_key is not None:
+        outcome, shared = await _chat_single_flight.do(
+            coalescing_key,
+            lambda: asyncio.to_thread(
+                _run_generation_pipeline,
+                user_message,
+                body,
+                settings,
+                sessionId,
+                conversation_history,
+                context_window,
+                _ag_start_time,
+            ),
+        )
+        if shared:
+            logger.info({
+                "event": "chat_generation_coalesced",
+                "session_id": sessionId,
+                "message_id": message_id,
+            })
+    else:
+        # Retrieval, rerank e LLM sono bloccanti: fuori dall'event loop come nel ramo coalescing
+        outcome = await asyncio.to_thread(
+            _run_generation_pipeline,
+            user_message,
+            body,
+            settings,
+            sessionId,
+            conversation_history,
+            context_window,
+            _ag_start_time,
+        )
+
+    resolved_chunks = outcome.resolved_chunks
+    retrieval_time_ms = outcome.retrieval_time_ms
+    generation_time_ms = outcome.generation_time_ms
+    answer_value = (outcome.answer or "").strip() or "Non trovato nel contesto"
+    citations_value = list(outcome.citations or [])
 
     # Arricchisci citazioni con metadati minimi per popover (prima di add_turn)
     enriched_citations: list[dict] = []
@@ -730,6 +1183,7 @@ async def create_chat_message(
             max_tokens=settings.conversation_max_tokens,
             compact_length=settings.conversation_message_compact_length,
             enable_persistence=settings.enable_persistent_memory,  # Story 9.1 AC3
+            enable_summarization=settings.enable_conversation_summary,
         )
         
         # DIAGNOSTIC: Log manager type per verify HybridConversationManager initialization
@@ -743,12 +1197,13 @@ async def create_chat_message(
         
         # add_turn() salva ENTRAMBI i messaggi (user + assistant) in L1 cache
         # e avvia async persist in DB se HybridConversationManager
-        conv_manager.add_turn(
-            sessionId,
-            user_message,
-            answer_value,
-            citations_value,  # Passa citations come chunk IDs
-        )
+        with span("persistence"):
+            conv_manager.add_turn(
+                sessionId,
+                user_message,
+                answer_value,
+                citations_value,  # Passa citations come chunk IDs
+            )
         
         logger.info({
             "event": "conversation_turn_saved",
@@ -21,6 +21,7 @@ from ..schemas.knowledge_base import (
 )
 from ..dependencies import _auth_bridge, TokenPayload, _is_admin
 from ..database import get_db_connection
+from ..utils.responses import FastJSONResponse
 
 router = APIRouter(prefix="/api/v1/admin/documents", tags=["Admin - Documents"])
 logger = logging.getLogger("api")
@@ -255,10 +256,12 @@ async def get_document_chunks(
         "total_chunks": total_count,
     })
     
-    return DocumentChunksResponse(
+    # Fino a 100 chunk con contenuto completo: modello serializzato direttamente
+    # (niente ri-validazione response_model + to_python di FastAPI)
+    return FastJSONResponse(DocumentChunksResponse(
         document_id=document_id,  # Story 5.4 Task 2.1
         document_name=document_name,  # Story 5.4 Task 2.1 FIX
         chunks=chunks,
         total_chunks=total_count  # Story 5.4.1 Phase 2: renamed to total_chunks
-    )
+    ))
 
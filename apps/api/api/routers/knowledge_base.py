@@ -33,15 +33,20 @@ from ..schemas.knowledge_base import (
 from ..dependencies import _auth_bridge, TokenPayload, _is_admin
 from ..database import get_db_connection
 from ..knowledge_base.search import perform_semantic_search
-from ..knowledge_base.indexer import index_chunks
+from ..knowledge_base.chunk_cache import invalidate_document_chunks
+from ..knowledge_base.retrieval_cache import bump_corpus_version
 from ..ingestion.models import ClassificazioneOutput, DocumentStructureCategory
 from ..ingestion.chunk_router import ChunkRouter
 from ..ingestion.db_storage import save_document_to_db, update_document_status
 from ..stores import sync_jobs_store
+from ..utils.lazy_import import lazy_import
+from ..utils.responses import FastJSONResponse
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import Runnable
-from langchain_openai import ChatOpenAI
+
+# Indexer (OpenAI embeddings + vector store LangChain) solo al primo sync job
+index_chunks = lazy_import("..knowledge_base.indexer", "index_chunks", __package__)
 
 # Celery setup
 CELERY_ENABLED = os.getenv("CELERY_ENABLED", "false").lower() in {"1", "true", "yes"}
@@ -106,6 +111,8 @@ def _get_llm():
         `temperature=0` genera un errore \"Unsupported value: temperature\". Lasciamo quindi
         il valore di default per garantire compatibilita con il modello approvato.
     """
+    from langchain_openai import ChatOpenAI
+
     return ChatOpenAI(model="gpt-5-nano")
 
 
@@ -176,7 +183,8 @@ def semantic_search_endpoint(body: SearchRequest, request: Request):
         body.match_count,
         body.match_threshold,
     )
-    return SearchResponse(results=results)
+    # results sono già dict JSON-compatibili: niente copia/validazione per risultato
+    return FastJSONResponse(SearchResponse.model_construct(results=results))
 
 
 @router.post("/admin/knowledge-base/sync-jobs", response_model=StartSyncJobResponse)
@@ -377,8 +385,10 @@ async def start_sync_job(
         
         try:
             inserted = index_chunks(chunks_result.chunks, metadata_list)
-            sync_jobs_store[job_id_str]["inserted"] = inserted
-            sync_jobs_store[job_id_str]["status"] = "completed"
+            sync_jobs_store.patch(job_id_str, inserted=inserted)
+            invalidate_document_chunks(document_id)
+            bump_corpus_version("sync_job", document_id)
+            sync_jobs_store.patch(job_id_str, status="completed")
             
             # Step 7: Update document status
             await update_document_status(conn, document_id, status="completed")
@@ -394,8 +404,7 @@ async def start_sync_job(
             })
             
         except Exception as exc:
-            sync_jobs_store[job_id_str]["status"] = "failed"
-            sync_jobs_store[job_id_str]["error"] = str(exc)
+            sync_jobs_store.patch(job_id_str, status="failed", error=str(exc))
             
             await update_document_status(conn, document_id, status="error", error=str(exc))
             
@@ -410,7 +419,7 @@ async def start_sync_job(
         
         return StartSyncJobResponse(
             job_id=job_id_str,
-            inserted=sync_jobs_store[job_id_str]["inserted"],
+            inserted=inserted,
             document_id=str(document_id),
             timing=timing_metrics
         )
@@ -1,17 +1,38 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.responses import PlainTextResponse
 
+from .. import database
 from ..config import Settings, get_settings
 from ..ingestion.watcher_metrics import (
     format_metrics_for_prometheus,
     get_watcher_metrics_snapshot,
 )
 
+from ..utils.prometheus_exporter import PROMETHEUS_AVAILABLE, render_metrics, sample_db_pool
+
 router = APIRouter(prefix="/metrics", tags=["monitoring"])
 
 
+@router.get(
+    "",
+    summary="Prometheus metrics",
+    description=(
+        "Registry unico (chat, cache, pool DB, outbox, circuit breaker, watcher) "
+        "aggregato tra i worker se PROMETHEUS_MULTIPROC_DIR è impostata."
+    ),
+    response_class=Response,
+)
+def prometheus_metrics(settings: Settings = Depends(get_settings)):
+    if not settings.prometheus_metrics_enabled or not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="metrics_disabled")
+    # Valore fresco per il worker che risponde; gli altri campionano in background
+    sample_db_pool(database.db_pool)
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 @router.get(
     "/watcher",
     summary="Watcher ingestion metrics",
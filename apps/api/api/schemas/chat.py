@@ -127,4 +127,5 @@ class SessionHistoryResponse(BaseModel):
     """Response per GET session history con pagination."""
     messages: list[ConversationMessage]
     total_count: int
-    has_more: bool
\ No newline at end of file
+    has_more: bool
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -4,28 +4,28 @@ Chat service - Business logic per chat RAG orchestration.
 Story: 3.1, 3.2, 3.4
 """
 import logging
-from typing import Optional
-
-from langchain_openai import ChatOpenAI
-from langchain_core.language_models import BaseLanguageModel
+from typing import TYPE_CHECKING, Optional
 
 from ..config import Settings, get_settings
+from ..utils.lazy_import import lazy_import
+from ..utils.prometheus_exporter import observe_chat_stage
+from ..utils.quantiles import WindowedQuantileSketch
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseLanguageModel
 
-# Metriche performance per AG
-AG_LATENCY_MAX_SAMPLES = 10000  # Increased for production use
-ag_latency_samples_ms: list[int] = []
-logger = logging.getLogger("api")
 
+# Metriche performance per AG: sketch a memoria fissa su finestra scorrevole
+AG_LATENCY_WINDOW_SECONDS = 3600
+ag_latency_sketch = WindowedQuantileSketch(
+    window_seconds=AG_LATENCY_WINDOW_SECONDS,
+    slices=12,
+)
+logger = logging.getLogger("api")
 
-def _percentile(values: list[float], p: float) -> float:
-    """Calcola percentile (nearest-rank)."""
-    if not values:
-        return 0.0
-    ordered = sorted(values)
-    idx = round((p / 100.0) * (len(ordered) - 1))
-    idx = max(0, min(len(ordered) - 1, int(idx)))
-    return float(ordered[idx])
+# langchain_openai (+ openai, langsmith) caricato alla prima istanza LLM
+# o dal warmup di avvio, non all'import del modulo
+ChatOpenAI = lazy_import("langchain_openai", "ChatOpenAI")
 
 
 def track_ag_latency(duration_ms: int) -> None:
@@ -35,14 +35,12 @@ def track_ag_latency(duration_ms: int) -> None:
     Args:
         duration_ms: Durata AG in millisecondi
     """
-    global ag_latency_samples_ms
-    
-    ag_latency_samples_ms.append(int(duration_ms))
-    
-    # Mantieni finestra scorrevole
-    excess = len(ag_latency_samples_ms) - AG_LATENCY_MAX_SAMPLES
-    if excess > 0:
-        del ag_latency_samples_ms[:excess]
+    ag_latency_sketch.record(int(duration_ms))
+
+
+def _latency_quantile_ms(q: float) -> int:
+    value = ag_latency_sketch.quantile(q)
+    return int(value) if value is not None else 0
 
 
 def get_latency_p95() -> int:
@@ -52,9 +50,7 @@ def get_latency_p95() -> int:
     Returns:
         p95 in millisecondi
     """
-    if not ag_latency_samples_ms:
-        return 0
-    return int(_percentile(ag_latency_samples_ms, 95.0))
+    return _latency_quantile_ms(0.95)
 
 
 def get_latency_p50() -> int:
@@ -64,9 +60,7 @@ def get_latency_p50() -> int:
     Returns:
         p50 in millisecondi
     """
-    if not ag_latency_samples_ms:
-        return 0
-    return int(_percentile(ag_latency_samples_ms, 50.0))
+    return _latency_quantile_ms(0.50)
 
 
 def get_latency_p99() -> int:
@@ -76,9 +70,7 @@ def get_latency_p99() -> int:
     Returns:
         p99 in millisecondi
     """
-    if not ag_latency_samples_ms:
-        return 0
-    return int(_percentile(ag_latency_samples_ms, 99.0))
+    return _latency_quantile_ms(0.99)
 
 
 def record_ag_latency_ms(duration_ms: int) -> dict:
@@ -89,18 +81,20 @@ def record_ag_latency_ms(duration_ms: int) -> dict:
         duration_ms: Durata AG in millisecondi
         
     Returns:
-        dict con p50_ms, p95_ms e count samples
+        dict con p50_ms, p95_ms e count samples (finestra corrente)
     """
     track_ag_latency(duration_ms)
+    observe_chat_stage("total", duration_ms)
+    p50, p95 = ag_latency_sketch.quantiles((0.50, 0.95))
     
     return {
-        "p50_ms": get_latency_p50(),
-        "p95_ms": get_latency_p95(),
-        "count": len(ag_latency_samples_ms)
+        "p50_ms": int(p50 or 0),
+        "p95_ms": int(p95 or 0),
+        "count": ag_latency_sketch.count,
     }
 
 
-def get_llm(settings: Optional[Settings] = None) -> BaseLanguageModel:
+def get_llm(settings: Optional[Settings] = None) -> "BaseLanguageModel":
     """
     Istanzia language model per chat orchestration.
 
@@ -5,10 +5,12 @@ Gestisce conversational memory con sliding window (ultimi 3 turni).
 
 Features:
 - Load/save conversation context da chat_messages_store
-- Token counting (tiktoken con fallback)
+- Token counting (tiktoken con fallback), memoizzato per messaggio nello store
+- Context window incrementale per sessione (running token total, O(1) per turno)
 - Token budget enforcement (max 2000 token)
 - Message compacting per messaggi più vecchi
 - Sliding window (keep last 6 messages)
+- Riassunto rolling opzionale (background) al posto dei messaggi già riassunti
 - Story 9.1: Hybrid Memory Architecture con L1 cache + L2 DB persistence
 
 Reference: docs/architecture/addendum-conversational-memory-patterns.md
@@ -16,12 +18,16 @@ Reference: docs/architecture/addendum-conversational-memory-patterns.md
 import asyncio
 import logging
 import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Deque, List, Optional, Tuple
 
 from ..models.conversation import ConversationMessage, ChatContextWindow
-from ..stores import chat_messages_store
+from ..stores import chat_messages_store, conversation_summaries_store
 from ..utils.metrics import metrics
+from ..utils.prometheus_exporter import record_cache_lookup
+from .conversation_summarizer import ConversationSummarizer, store_offset
 from .outbox_queue import OutboxPersistenceQueue
 from .persistence_service import ConversationPersistenceService
 
@@ -50,6 +56,7 @@ class ConversationManager:
     MAX_TURNS = 3  # 3 turni = 6 messaggi totali
     MAX_CONTEXT_TOKENS = 2000  # Token budget per context window
     COMPACT_MESSAGE_LENGTH = 150  # Lunghezza compattata per messaggi vecchi
+    MAX_CACHED_WINDOWS = 1000  # Sessioni con window incrementale in memoria
     
     def __init__(
         self,
@@ -69,6 +76,12 @@ class ConversationManager:
         self.max_tokens = max_tokens
         self.compact_length = compact_length
         
+        # Sliding window incrementale per sessione (LRU)
+        self._windows: "OrderedDict[str, _SessionWindow]" = OrderedDict()
+        
+        # Riassunto rolling in background (opzionale, vedi get_conversation_manager)
+        self.summarizer: Optional[ConversationSummarizer] = None
+        
         # Lazy init tiktoken encoder
         self.tokenizer = None
         if TIKTOKEN_AVAILABLE:
@@ -88,6 +101,10 @@ class ConversationManager:
         Story 7.1 AC3: Load ultimi 3 turni (6 messaggi) da chat_messages_store,
         calcola token count, applica truncation se necessario.
         
+        Il window è mantenuto incrementalmente per sessione: ad ogni turno
+        vengono parsati solo i messaggi nuovi, con token count memoizzato per
+        messaggio e totale aggiornato a running sum (costo costante per turno).
+        
         Args:
             session_id: Session identifier
         
@@ -97,68 +114,52 @@ class ConversationManager:
         # Load messages from store
         stored_messages = chat_messages_store.get(session_id, [])
         if not stored_messages:
+            self._windows.pop(session_id, None)
             metrics.increment("cache_misses")
+            record_cache_lookup("conversation", misses=1)
+            # Riassunto ripristinato dal DB: unico contesto dei turni precedenti
+            summary, summary_tokens = self._summary_for_window(session_id, stored_messages)
             return ChatContextWindow(
                 session_id=session_id,
                 messages=[],
-                total_tokens=0,
+                total_tokens=summary_tokens,
+                summary=summary,
             )
         
         metrics.increment("cache_hits")
-        
-        # Convert stored dict to ConversationMessage
-        conversation_messages: List[ConversationMessage] = []
-        for msg_dict in stored_messages:
-            try:
-                # Extract fields from stored dict
-                role = msg_dict.get("role", "assistant")
-                content = msg_dict.get("content", "")
-                
-                # Parse timestamp
-                timestamp_str = msg_dict.get("created_at")
-                if timestamp_str:
-                    try:
-                        timestamp = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
-                    except Exception:
-                        timestamp = datetime.now(timezone.utc)
-                else:
-                    timestamp = datetime.now(timezone.utc)
-                
-                # Extract chunk_ids if assistant message
-                chunk_ids = None
-                if role == "assistant":
-                    citations = msg_dict.get("citations", [])
-                    if citations:
-                        chunk_ids = [c.get("chunk_id") for c in citations if c.get("chunk_id")]
-                
-                conversation_messages.append(
-                    ConversationMessage(
-                        role=role,
-                        content=content,
-                        timestamp=timestamp,
-                        chunk_ids=chunk_ids,
-                    )
-                )
-            except Exception as exc:
-                logger.debug({
-                    "event": "message_parse_skip",
-                    "session_id": session_id,
-                    "error": str(exc),
+        record_cache_lookup("conversation", hits=1)
+        
+        window = self._sync_window(session_id, stored_messages)
+        entries = list(window.entries)
+        total_tokens = window.total_tokens
+        
+        # Riassunto rolling: sostituisce i messaggi che copre (ultimo turno sempre integrale)
+        summary, summary_tokens = self._summary_for_window(session_id, stored_messages)
+        if summary is not None:
+            entry = conversation_summaries_store[session_id]
+            first_store_index = store_offset(entry) + len(stored_messages) - len(entries)
+            covered = entry["covered_messages"]
+            skip = min(max(0, covered - first_store_index), max(0, len(entries) - 2))
+            total_tokens -= sum(tokens for _, tokens in entries[:skip])
+            entries = entries[skip:]
+        
+        # Truncate if exceeds budget (single pass su token count memoizzati)
+        if total_tokens + summary_tokens > self.max_tokens:
+            start = self._budget_start_index(
+                [tokens for _, tokens in entries],
+                budget=self.max_tokens - summary_tokens,
+            )
+            if start:
+                logger.info({
+                    "event": "context_window_truncated",
+                    "original_count": len(entries),
+                    "truncated_count": len(entries) - start,
+                    "removed_count": start,
                 })
-                continue
-        
-        # Keep only last MAX_TURNS * 2 messages (sliding window)
-        max_messages = self.max_turns * 2  # 2 messages per turn (user + assistant)
-        if len(conversation_messages) > max_messages:
-            conversation_messages = conversation_messages[-max_messages:]
-        
-        # Calculate token count
-        total_tokens = self._count_tokens(conversation_messages)
+            total_tokens -= sum(tokens for _, tokens in entries[:start])
+            entries = entries[start:]
         
-        # Truncate if exceeds budget
-        if total_tokens > self.max_tokens:
-            conversation_messages = self._truncate_to_budget(conversation_messages)
-            total_tokens = self._count_tokens(conversation_messages)
+        conversation_messages = [message for message, _ in entries]
         
         logger.debug({
             "event": "context_window_loaded",
@@ -171,10 +172,128 @@ class ConversationManager:
         return ChatContextWindow(
             session_id=session_id,
             messages=conversation_messages,
-            total_tokens=total_tokens,
+            total_tokens=total_tokens + summary_tokens,
+            summary=summary,
             updated_at=datetime.now(timezone.utc),
         )
     
+    def _summary_for_window(
+        self,
+        session_id: str,
+        stored_messages: List[dict],
+    ) -> Tuple[Optional[str], int]:
+        """Riassunto rolling valido per lo store corrente e relativo token count."""
+        if self.summarizer is None:
+            return None, 0
+        entry = conversation_summaries_store.get(session_id)
+        if not entry or entry.get("covered_messages", 0) > store_offset(entry) + len(stored_messages):
+            return None, 0
+        summary_tokens = entry.get("token_count")
+        if not isinstance(summary_tokens, int):
+            # Entry scritta senza count_tokens: i valori dello store sono copie, niente memo
+            summary_tokens = self._count_text_tokens(entry["summary"])
+        return entry["summary"], summary_tokens
+    
+    def _sync_window(self, session_id: str, stored_messages: List[dict]) -> "_SessionWindow":
+        """
+        Allinea il sliding window cached ai messaggi in store.
+        
+        Incrementale se lo store è la stessa lista già consumata (solo append);
+        altrimenti ricostruisce scorrendo a ritroso gli ultimi messaggi validi.
+        """
+        max_messages = self.max_turns * 2  # 2 messages per turn (user + assistant)
+        window = self._windows.get(session_id)
+        
+        if (
+            window is None
+            or window.source is not stored_messages
+            or window.consumed > len(stored_messages)
+            or (window.consumed and stored_messages[window.consumed - 1] is not window.last_dict)
+        ):
+            window = _SessionWindow(source=stored_messages)
+            rebuilt: List[Tuple[ConversationMessage, int]] = []
+            for msg_dict in reversed(stored_messages):
+                entry = self._parse_stored_message(session_id, msg_dict)
+                if entry is not None:
+                    rebuilt.append(entry)
+                    if len(rebuilt) >= max_messages:
+                        break
+            rebuilt.reverse()
+            window.entries.extend(rebuilt)
+            window.total_tokens = sum(tokens for _, tokens in rebuilt)
+        else:
+            for msg_dict in stored_messages[window.consumed:]:
+                entry = self._parse_stored_message(session_id, msg_dict)
+                if entry is None:
+                    continue
+                window.entries.append(entry)
+                window.total_tokens += entry[1]
+                # Sliding window: evict oldest mantenendo running total
+                while len(window.entries) > max_messages:
+                    _, evicted_tokens = window.entries.popleft()
+                    window.total_tokens -= evicted_tokens
+        
+        window.consumed = len(stored_messages)
+        window.last_dict = stored_messages[-1]
+        
+        self._windows[session_id] = window
+        self._windows.move_to_end(session_id)
+        while len(self._windows) > self.MAX_CACHED_WINDOWS:
+            self._windows.popitem(last=False)
+        return window
+    
+    def _parse_stored_message(
+        self,
+        session_id: str,
+        msg_dict: dict,
+    ) -> Optional[Tuple[ConversationMessage, int]]:
+        """Converte dict dello store in (ConversationMessage, token count)."""
+        try:
+            # Extract fields from stored dict
+            role = msg_dict.get("role", "assistant")
+            content = msg_dict.get("content", "")
+            
+            # Parse timestamp
+            timestamp_str = msg_dict.get("created_at")
+            if timestamp_str:
+                try:
+                    timestamp = datetime.fromisoformat(timestamp_str.replace("Z", "+00:00"))
+                except Exception:
+                    timestamp = datetime.now(timezone.utc)
+            else:
+                timestamp = datetime.now(timezone.utc)
+            
+            # Extract chunk_ids if assistant message
+            chunk_ids = None
+            if role == "assistant":
+                citations = msg_dict.get("citations", [])
+                if citations:
+                    chunk_ids = [c.get("chunk_id") for c in citations if c.get("chunk_id")]
+            
+            message = ConversationMessage(
+                role=role,
+                content=content,
+                timestamp=timestamp,
+                chunk_ids=chunk_ids,
+            )
+        except Exception as exc:
+            logger.debug({
+                "event": "message_parse_skip",
+                "session_id": session_id,
+                "error": str(exc),
+            })
+            return None
+        
+        return message, self._stored_token_count(msg_dict)
+    
+    def _stored_token_count(self, msg_dict: dict) -> int:
+        """Token count memoizzato nel dict dello store (calcolato una sola volta)."""
+        token_count = msg_dict.get("token_count")
+        if not isinstance(token_count, int):
+            token_count = self._count_text_tokens(msg_dict.get("content", ""))
+            msg_dict["token_count"] = token_count
+        return token_count
+    
     def add_turn(
         self,
         session_id: str,
@@ -202,6 +321,7 @@ class ConversationManager:
             "role": "user",
             "content": user_message,
             "created_at": timestamp_now,
+            "token_count": self._count_text_tokens(user_message),
         }
         
         # Assistant message
@@ -212,12 +332,11 @@ class ConversationManager:
             "content": assistant_message,
             "citations": [{"chunk_id": cid} for cid in (chunk_ids or [])],
             "created_at": timestamp_now,
+            "token_count": self._count_text_tokens(assistant_message),
         }
         
-        # Append to store
-        stored_messages = chat_messages_store.get(session_id, [])
-        stored_messages.extend([user_msg_dict, assistant_msg_dict])
-        chat_messages_store[session_id] = stored_messages
+        # Append to store (condiviso tra worker se configurato)
+        stored_count = chat_messages_store.append(session_id, [user_msg_dict, assistant_msg_dict])
         
         # Story 9.1 AC7: Track active sessions count
         metrics.gauge("active_sessions_count", len(chat_messages_store))
@@ -225,11 +344,15 @@ class ConversationManager:
         logger.info({
             "event": "conversation_turn_added",
             "session_id": session_id,
-            "turn_number": len(stored_messages) // 2,
+            "turn_number": stored_count // 2,
             "user_msg_length": len(user_message),
             "assistant_msg_length": len(assistant_message),
             "chunks_cited": len(chunk_ids) if chunk_ids else 0,
         })
+        
+        # Aggiornamento riassunto rolling fuori dal request path
+        if self.summarizer is not None:
+            self.summarizer.maybe_schedule(session_id)
     
     def format_for_prompt(self, context_window: ChatContextWindow) -> str:
         """
@@ -244,7 +367,7 @@ class ConversationManager:
         Returns:
             Stringa formattata pronta per inclusion in prompt
         """
-        if not context_window.messages:
+        if not context_window.messages and not context_window.summary:
             return "\n=== PRIMA INTERAZIONE (nessuna cronologia) ===\n"
         
         formatted_lines = []
@@ -261,6 +384,11 @@ class ConversationManager:
                 # Use compact format for older messages
                 formatted_lines.append(msg.to_compact_format(self.compact_length))
         
+        if context_window.summary:
+            formatted_lines.insert(
+                0, f"RIASSUNTO CONVERSAZIONE PRECEDENTE:\n{context_window.summary}"
+            )
+        
         formatted_history = "\n\n".join(formatted_lines)
         
         return f"""
@@ -280,6 +408,7 @@ ISTRUZIONI CONTESTUALI:
         Conta token per lista messaggi.
         
         Story 7.1: Usa tiktoken se disponibile, altrimenti fallback approximation.
+        Somma dei conteggi per messaggio (stessa unità memoizzata nello store).
         
         Args:
             messages: Lista ConversationMessage
@@ -287,17 +416,17 @@ ISTRUZIONI CONTESTUALI:
         Returns:
             Token count totale
         """
-        if not messages:
+        return sum(self._count_text_tokens(msg.content) for msg in messages)
+    
+    def _count_text_tokens(self, text: str) -> int:
+        """Token count per singolo testo (tiktoken o ≈ 4 caratteri per token)."""
+        if not text:
             return 0
         
-        # Concatenate all message contents
-        text = " ".join([msg.content for msg in messages])
-        
         # Try tiktoken
         if self.tokenizer:
             try:
-                tokens = self.tokenizer.encode(text)
-                return len(tokens)
+                return len(self.tokenizer.encode(text))
             except Exception as exc:
                 logger.debug({
                     "event": "tiktoken_counting_failed",
@@ -308,6 +437,27 @@ ISTRUZIONI CONTESTUALI:
         # Fallback: approximate 1 token ≈ 4 characters
         return len(text) // 4
     
+    def _budget_start_index(
+        self,
+        token_counts: List[int],
+        budget: Optional[int] = None,
+    ) -> int:
+        """
+        Indice del primo messaggio da mantenere per rientrare nel budget.
+        
+        Single pass sui conteggi: rimuove i più vecchi finché il totale
+        supera il budget (default max_tokens), mantenendo sempre almeno
+        l'ultimo turno (2 messaggi).
+        """
+        if budget is None:
+            budget = self.max_tokens
+        total = sum(token_counts)
+        start = 0
+        while len(token_counts) - start > 2 and total > budget:
+            total -= token_counts[start]
+            start += 1
+        return start
+    
     def _truncate_to_budget(
         self,
         messages: List[ConversationMessage],
@@ -328,14 +478,10 @@ ISTRUZIONI CONTESTUALI:
             # Keep at least last turn
             return messages
         
-        # Remove oldest messages until budget satisfied
-        truncated = messages[:]
-        while len(truncated) > 2:
-            token_count = self._count_tokens(truncated)
-            if token_count <= self.max_tokens:
-                break
-            # Remove oldest message
-            truncated = truncated[1:]
+        start = self._budget_start_index(
+            [self._count_text_tokens(msg.content) for msg in messages]
+        )
+        truncated = messages[start:]
         
         if len(truncated) < len(messages):
             logger.info({
@@ -348,6 +494,17 @@ ISTRUZIONI CONTESTUALI:
         return truncated
 
 
+@dataclass
+class _SessionWindow:
+    """Sliding window cached per sessione con running token total."""
+    
+    source: List[dict]
+    consumed: int = 0
+    last_dict: Optional[dict] = None
+    entries: Deque[Tuple[ConversationMessage, int]] = field(default_factory=deque)
+    total_tokens: int = 0
+
+
 # Singleton instance
 _conversation_manager: Optional[ConversationManager] = None
 
@@ -357,6 +514,7 @@ def get_conversation_manager(
     max_tokens: int = ConversationManager.MAX_CONTEXT_TOKENS,
     compact_length: int = ConversationManager.COMPACT_MESSAGE_LENGTH,
     enable_persistence: bool = False,
+    enable_summarization: bool = False,
 ) -> ConversationManager:
     """
     Dependency per ottenere ConversationManager (singleton pattern).
@@ -369,6 +527,7 @@ def get_conversation_manager(
         max_tokens: Token budget per context window
         compact_length: Max length for compacted messages
         enable_persistence: Feature flag per L2 persistence (Story 9.1)
+        enable_summarization: Riassunto rolling in background dopo add_turn
     
     Returns:
         ConversationManager or HybridConversationManager instance
@@ -423,6 +582,16 @@ def get_conversation_manager(
                 max_tokens=max_tokens,
                 compact_length=compact_length,
             )
+    if enable_summarization and _conversation_manager.summarizer is None:
+        from ..config import get_settings
+        
+        settings = get_settings()
+        _conversation_manager.summarizer = ConversationSummarizer(
+            min_new_messages=settings.conversation_summary_min_messages,
+            max_words=settings.conversation_summary_max_words,
+            persistence=getattr(_conversation_manager, "persistence", None),
+            count_tokens=_conversation_manager._count_text_tokens,
+        )
     return _conversation_manager
 
 
@@ -0,0 +1,249 @@
+"""
+Riassunto rolling delle conversazioni lunghe, calcolato in background.
+
+Dopo ``add_turn`` il summarizer verifica quanti messaggi precedenti
+all'ultimo turno non sono ancora coperti dal riassunto; oltre la soglia
+avvia un task asyncio (fuori dal request path) che integra i nuovi
+messaggi nel riassunto precedente con una chiamata LLM. Il costo per
+aggiornamento resta costante: riassunto precedente + soli messaggi nuovi.
+
+Il riassunto è salvato in ``conversation_summaries_store`` e, con
+persistenza attiva, nel metadata dell'ultimo messaggio in
+``chat_messages``. ``ConversationManager.get_context_window`` lo usa al
+posto dei messaggi che copre.
+
+``covered_messages`` conta i messaggi dall'inizio della sessione (come nel
+DB). Se lo store è vuoto (riavvio, altro worker) ``restore_summary``
+ricarica l'ultimo riassunto dal metadata; ``store_offset`` registra quanti
+messaggi della sessione precedono il primo messaggio in
+``chat_messages_store``.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from ..stores import chat_messages_store, conversation_summaries_store
+
+logger = logging.getLogger("api")
+
+# Messaggi finali mai riassunti: l'ultimo turno resta sempre integrale
+KEEP_RECENT_MESSAGES = 2
+
+# Sessioni per cui il restore dal DB è già stato tentato (bound memoria)
+MAX_RESTORE_CHECKED = 4096
+
+SummarizeFn = Callable[[Optional[str], List[Dict[str, Any]], int], str]
+
+
+def store_offset(entry: Dict[str, Any]) -> int:
+    """Messaggi della sessione che precedono chat_messages_store[session_id][0]."""
+    return int(entry.get("store_offset", 0))
+
+
+def format_transcript(messages: List[Dict[str, Any]]) -> str:
+    lines = []
+    for msg in messages:
+        role_label = "STUDENTE" if msg.get("role") == "user" else "TUTOR"
+        lines.append(f"{role_label}: {(msg.get('content') or '').strip()}")
+    return "\n".join(lines)
+
+
+def llm_summarize(
+    previous_summary: Optional[str],
+    messages: List[Dict[str, Any]],
+    max_words: int,
+) -> str:
+    """Aggiorna il riassunto con il LLM di chat configurato."""
+    from ..config import get_settings
+    from ..prompts.academic_medical import CONVERSATION_SUMMARY_PROMPT
+    from .chat_service import get_llm
+
+    prompt = CONVERSATION_SUMMARY_PROMPT.format(
+        previous_summary=previous_summary or "(nessuno)",
+        transcript=format_transcript(messages),
+        max_words=max_words,
+    )
+    response = get_llm(get_settings()).invoke(prompt)
+    return str(getattr(response, "content", response) or "")
+
+
+class ConversationSummarizer:
+    """Scheduler per-sessione dei riassunti rolling (un task alla volta)."""
+
+    def __init__(
+        self,
+        summarize_fn: Optional[SummarizeFn] = None,
+        min_new_messages: int = 4,
+        max_words: int = 150,
+        persistence: Any = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        self.summarize_fn = summarize_fn or llm_summarize
+        self.min_new_messages = max(1, min_new_messages)
+        self.max_words = max_words
+        self.persistence = persistence
+        # Token count calcolato in scrittura: i valori letti dallo store
+        # condiviso sono copie, un memo scritto in lettura andrebbe perso
+        self.count_tokens = count_tokens
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._dirty: set[str] = set()
+        self._restore_checked: "OrderedDict[str, None]" = OrderedDict()
+
+    def uncovered_count(self, session_id: str) -> int:
+        """Messaggi precedenti all'ultimo turno non ancora nel riassunto."""
+        stored = chat_messages_store.get(session_id) or []
+        entry = conversation_summaries_store.get(session_id) or {}
+        covered = int(entry.get("covered_messages", 0))
+        return store_offset(entry) + len(stored) - KEEP_RECENT_MESSAGES - covered
+
+    async def restore_summary(self, session_id: str) -> bool:
+        """
+        Ricarica il riassunto dal metadata persistito se manca nello store.
+        
+        Tentato una sola volta per sessione; il riassunto viene scartato se
+        copre più messaggi di quelli presenti nel DB.
+        """
+        if self.persistence is None or session_id in conversation_summaries_store:
+            return False
+        if session_id in self._restore_checked:
+            return False
+        self._restore_checked[session_id] = None
+        while len(self._restore_checked) > MAX_RESTORE_CHECKED:
+            self._restore_checked.popitem(last=False)
+
+        record = await self.persistence.load_session_summary(session_id)
+        if record is None:
+            return False
+        message_count = await self._db_message_count(session_id)
+        if message_count is None or record.covered_messages > message_count:
+            logger.info({
+                "event": "conversation_summary_restore_skipped",
+                "session_id": session_id,
+                "covered_messages": record.covered_messages,
+                "db_message_count": message_count,
+            })
+            return False
+
+        stored = chat_messages_store.get(session_id) or []
+        offset = max(0, message_count - len(stored))
+        conversation_summaries_store[session_id] = self._entry(
+            record.summary, record.covered_messages, offset
+        )
+        logger.info({
+            "event": "conversation_summary_restored",
+            "session_id": session_id,
+            "covered_messages": record.covered_messages,
+            "store_offset": offset,
+        })
+        return True
+
+    def _entry(self, summary: str, covered_messages: int, offset: int) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {
+            "summary": summary,
+            "covered_messages": covered_messages,
+            "store_offset": offset,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if self.count_tokens is not None:
+            entry["token_count"] = self.count_tokens(summary)
+        return entry
+
+    async def _db_message_count(self, session_id: str) -> Optional[int]:
+        """Messaggi della sessione nel DB, None se non disponibile."""
+        if self.persistence is None:
+            return None
+        stats = await self.persistence.get_session_stats(session_id)
+        message_count = getattr(stats, "message_count", None)
+        return message_count if isinstance(message_count, int) else None
+
+    async def _load_gap(self, session_id: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """Messaggi [start, end) presenti solo nel DB (precedono lo store)."""
+        if self.persistence is None or end <= start:
+            return []
+        messages = await self.persistence.load_session_history(
+            session_id, limit=end - start, offset=start, order_desc=False
+        )
+        return [{"role": msg.role, "content": msg.content} for msg in messages]
+
+    def maybe_schedule(self, session_id: str) -> bool:
+        """Avvia (o accoda) l'aggiornamento se supera la soglia. Non bloccante."""
+        if self.uncovered_count(session_id) < self.min_new_messages:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nessun event loop (es. chiamata sync da script): si salta
+            return False
+        if session_id in self._inflight:
+            self._dirty.add(session_id)
+            return True
+        self._inflight[session_id] = loop.create_task(self._run(session_id))
+        return True
+
+    async def _run(self, session_id: str) -> None:
+        try:
+            while True:
+                self._dirty.discard(session_id)
+                await self.summarize_session(session_id)
+                if session_id not in self._dirty:
+                    break
+        finally:
+            self._inflight.pop(session_id, None)
+
+    async def summarize_session(self, session_id: str) -> Optional[str]:
+        """Integra nel riassunto i messaggi non coperti (escluso l'ultimo turno)."""
+        stored = list(chat_messages_store.get(session_id) or [])
+        entry = conversation_summaries_store.get(session_id) or {}
+        covered = int(entry.get("covered_messages", 0))
+        offset = store_offset(entry)
+        total = offset + len(stored)
+        # Il DB può essere indietro rispetto allo store (scritture async)
+        db_count = await self._db_message_count(session_id)
+        if covered > max(total, db_count or 0):
+            # Sessione cancellata/ricreata: si riparte da zero
+            entry, covered, offset, total = {}, 0, 0, len(stored)
+        target = total - KEEP_RECENT_MESSAGES
+        if target <= covered:
+            return entry.get("summary")
+
+        new_messages = stored[max(0, covered - offset):target - offset]
+        if covered < offset:
+            new_messages = await self._load_gap(session_id, covered, offset) + new_messages
+
+        try:
+            summary = await asyncio.to_thread(
+                self.summarize_fn, entry.get("summary"), new_messages, self.max_words
+            )
+        except Exception as exc:  # noqa: BLE001 - il window resta quello senza riassunto
+            logger.warning({
+                "event": "conversation_summary_failed",
+                "session_id": session_id,
+                "error": str(exc),
+                "error_type": type(exc).__name__,
+            })
+            return None
+
+        summary = (summary or "").strip()
+        if not summary:
+            return None
+        conversation_summaries_store[session_id] = self._entry(summary, target, offset)
+        logger.info({
+            "event": "conversation_summary_updated",
+            "session_id": session_id,
+            "covered_messages": target,
+            "new_messages": target - covered,
+            "summary_length": len(summary),
+        })
+
+        if self.persistence is not None:
+            await self.persistence.save_session_summary(session_id, summary, target)
+        return summary
+
+    async def drain(self) -> None:
+        """Attende i task in corso (shutdown / test)."""
+        while self._inflight:
+            await asyncio.gather(*list(self._inflight.values()), return_exceptions=True)
@@ -0,0 +1,360 @@
+"""
+LLM gateway: chiamate chat con deadline, hedging e pool di endpoint.
+
+- Deadline per chiamata derivata dal budget residuo della request
+  (``request_deadline`` / ``llm_call_deadline``): nessuna chiamata supera
+  il tempo rimasto, niente timeout di default da decine di secondi.
+- Pool pesato di endpoint OpenAI-compatibili (modello + base_url); la
+  selezione è random pesata.
+- Hedging opzionale: se l'endpoint primario non risponde entro il p95
+  osservato (min ``hedge_min_delay_ms``) parte una richiesta duplicata su
+  un altro endpoint; vince la prima risposta valida. Un errore del primario
+  prima del ritardo fa partire subito l'hedge.
+- Latenze ed errori tracciati per endpoint.
+
+Il trasporto è iniettabile: ``openai_transport`` usa l'SDK ``openai`` con
+``max_retries=0`` e timeout per chiamata, quindi il gateway è testabile
+contro un server OpenAI fake locale.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from ..utils.quantiles import WindowedQuantileSketch
+
+logger = logging.getLogger("api")
+
+LATENCY_WINDOW_SECONDS = 300
+# Campioni minimi prima di usare il p95 come ritardo di hedge
+MIN_SAMPLES_FOR_HEDGE = 20
+
+_ROLE_BY_MESSAGE_TYPE = {
+    "system": "system",
+    "human": "user",
+    "ai": "assistant",
+}
+
+_call_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "llm_call_deadline", default=None
+)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Budget della request esaurito prima di una risposta LLM."""
+
+
+def request_deadline(started_at: float, budget_ms: int) -> float:
+    """Deadline monotonic da inizio request (``time.time()``) + budget."""
+    remaining_s = started_at + budget_ms / 1000.0 - time.time()
+    return time.monotonic() + remaining_s
+
+
+@contextmanager
+def llm_call_deadline(deadline: float) -> Iterator[None]:
+    """Imposta la deadline per le chiamate gateway nel contesto corrente."""
+    token = _call_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+
+class LatencyTracker:
+    """Finestra temporale scorrevole di latenze (ms) con percentili."""
+
+    def __init__(self, window_seconds: float = LATENCY_WINDOW_SECONDS) -> None:
+        self._sketch = WindowedQuantileSketch(window_seconds=window_seconds)
+
+    def __len__(self) -> int:
+        return self._sketch.count
+
+    def record(self, duration_ms: float) -> None:
+        self._sketch.record(duration_ms)
+
+    def percentile(self, p: float) -> float:
+        return self._sketch.quantile(p / 100.0) or 0.0
+
+
+@dataclass
+class LLMEndpoint:
+    """Endpoint del pool: modello + base_url opzionale + peso."""
+
+    model: str
+    base_url: Optional[str] = None
+    weight: float = 1.0
+    latency: LatencyTracker = field(default_factory=LatencyTracker)
+    errors: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.base_url or 'default'}"
+
+
+Transport = Callable[[LLMEndpoint, List[Dict[str, str]], float, Dict[str, Any]], str]
+
+
+def openai_transport(api_key: Optional[str]) -> Transport:
+    """Trasporto SDK ``openai``: un client per base_url, nessun retry interno."""
+    from openai import OpenAI
+
+    clients: Dict[Optional[str], Any] = {}
+    lock = threading.Lock()
+
+    def _client(base_url: Optional[str]) -> Any:
+        with lock:
+            client = clients.get(base_url)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+                clients[base_url] = client
+            return client
+
+    def _send(
+        endpoint: LLMEndpoint,
+        messages: List[Dict[str, str]],
+        timeout_s: float,
+        params: Dict[str, Any],
+    ) -> str:
+        request = dict(params)
+        # gpt-5-nano accetta solo la temperatura di default (Story 6.5)
+        if "nano" in endpoint.model.lower():
+            request["temperature"] = 1.0
+        response = _client(endpoint.base_url).chat.completions.create(
+            model=endpoint.model,
+            messages=messages,
+            timeout=timeout_s,
+            **request,
+        )
+        return response.choices[0].message.content or ""
+
+    return _send
+
+
+class LLMGateway:
+    """Pool pesato di endpoint con deadline e hedging."""
+
+    def __init__(
+        self,
+        endpoints: Sequence[LLMEndpoint],
+        transport: Transport,
+        hedging: bool = False,
+        hedge_min_delay_ms: int = 1500,
+        hedge_percentile: float = 95.0,
+        default_timeout_ms: int = 20000,
+        max_workers: int = 16,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("LLMGateway richiede almeno un endpoint")
+        self.endpoints = list(endpoints)
+        self.transport = transport
+        self.hedging = hedging
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_percentile = hedge_percentile
+        self.default_timeout_ms = default_timeout_ms
+        self._rng = rng or random.Random()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm-gateway"
+        )
+        self._hedges_sent = 0
+        self._hedges_won = 0
+        self._deadline_exceeded = 0
+
+    def _pick(self, exclude: Optional[LLMEndpoint] = None) -> LLMEndpoint:
+        candidates = [e for e in self.endpoints if e is not exclude] or self.endpoints
+        return self._rng.choices(candidates, weights=[e.weight for e in candidates], k=1)[0]
+
+    def hedge_delay_s(self, endpoint: LLMEndpoint) -> float:
+        delay_ms = float(self.hedge_min_delay_ms)
+        if len(endpoint.latency) >= MIN_SAMPLES_FOR_HEDGE:
+            delay_ms = max(delay_ms, endpoint.latency.percentile(self.hedge_percentile))
+        return delay_ms / 1000.0
+
+    def _call(
+        self,
+        endpoint: LLMEndpoint,
+        messages: List[Dict[str, str]],
+        deadline: float,
+        params: Dict[str, Any],
+    ) -> str:
+        timeout_s = deadline - time.monotonic()
+        if timeout_s <= 0:
+            raise LLMDeadlineExceeded(endpoint.name)
+        started = time.monotonic()
+        try:
+            text = self.transport(endpoint, messages, timeout_s, params)
+        except Exception:
+            endpoint.errors += 1
+            raise
+        endpoint.latency.record((time.monotonic() - started) * 1000)
+        return text
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        deadline: Optional[float] = None,
+        **params: Any,
+    ) -> str:
+        """
+        Chat completion entro la deadline (monotonic).
+
+        Args:
+            messages: Messaggi formato OpenAI (role/content)
+            deadline: Deadline ``time.monotonic()``; default quella del
+                contesto (``llm_call_deadline``) o ``default_timeout_ms``
+            params: Parametri extra della richiesta (es. response_format)
+
+        Raises:
+            LLMDeadlineExceeded: Nessuna risposta entro la deadline
+        """
+        if deadline is None:
+            deadline = _call_deadline.get()
+        if deadline is None:
+            deadline = time.monotonic() + self.default_timeout_ms / 1000.0
+
+        primary = self._pick()
+        futures: Dict[Future, LLMEndpoint] = {
+            self._executor.submit(self._call, primary, messages, deadline, params): primary
+        }
+        pending = set(futures)
+        hedge_at = time.monotonic() + self.hedge_delay_s(primary) if self.hedging else None
+        last_error: Optional[BaseException] = None
+
+        while True:
+            now = time.monotonic()
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            timeout = remaining
+            if hedge_at is not None:
+                timeout = max(0.0, min(remaining, hedge_at - now))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as exc:  # noqa: BLE001 - si attende l'altra richiesta
+                    last_error = exc
+                    logger.warning({
+                        "event": "llm_gateway_call_failed",
+                        "endpoint": futures[future].name,
+                        "error": str(exc),
+                        "error_type": type(exc).__name__,
+                    })
+                    continue
+                if futures[future] is not primary:
+                    self._hedges_won += 1
+                # Le richieste perse terminano da sole entro la stessa deadline
+                for other in pending:
+                    other.cancel()
+                return text
+
+            if hedge_at is not None and (time.monotonic() >= hedge_at or not pending):
+                hedge = self._pick(exclude=primary)
+                futures_hedge = self._executor.submit(self._call, hedge, messages, deadline, params)
+                futures[futures_hedge] = hedge
+                pending.add(futures_hedge)
+                hedge_at = None
+                self._hedges_sent += 1
+                logger.info({
+                    "event": "llm_gateway_hedge_sent",
+                    "primary": primary.name,
+                    "hedge": hedge.name,
+                    "primary_failed": last_error is not None,
+                })
+                continue
+
+            if not pending:
+                break
+
+        if last_error is not None and not pending:
+            raise last_error
+        self._deadline_exceeded += 1
+        raise LLMDeadlineExceeded(
+            f"nessuna risposta LLM entro la deadline ({primary.name})"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedges_sent": self._hedges_sent,
+            "hedges_won": self._hedges_won,
+            "deadline_exceeded": self._deadline_exceeded,
+            "endpoints": [
+                {
+                    "name": endpoint.name,
+                    "weight": endpoint.weight,
+                    "samples": len(endpoint.latency),
+                    "p50_ms": round(endpoint.latency.percentile(50.0), 1),
+                    "p95_ms": round(endpoint.latency.percentile(95.0), 1),
+                    "errors": endpoint.errors,
+                }
+                for endpoint in self.endpoints
+            ],
+        }
+
+    def as_runnable(self, **params: Any) -> Any:
+        """Adapter LangChain: PromptValue -> AIMessage tramite ``complete``."""
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+
+        def _invoke(prompt_value: Any) -> Any:
+            messages = [
+                {
+                    "role": _ROLE_BY_MESSAGE_TYPE.get(message.type, "user"),
+                    "content": message.content,
+                }
+                for message in prompt_value.to_messages()
+            ]
+            return AIMessage(content=self.complete(messages, **params))
+
+        return RunnableLambda(_invoke)
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_key: Optional[tuple] = None
+_gateway_lock = threading.Lock()
+
+
+def _gateway_settings_key(settings: Any) -> tuple:
+    endpoints = tuple(
+        (e.model, e.base_url, e.weight) for e in (settings.llm_endpoints or [])
+    ) or ((settings.openai_model, settings.openai_base_url, 1.0),)
+    return (
+        endpoints,
+        settings.llm_hedging_enabled,
+        settings.llm_hedge_min_delay_ms,
+        settings.llm_request_budget_ms,
+    )
+
+
+def get_llm_gateway(settings: Any) -> LLMGateway:
+    """Gateway singleton, ricostruito se cambia la configurazione del pool."""
+    global _gateway, _gateway_key
+    key = _gateway_settings_key(settings)
+    with _gateway_lock:
+        if _gateway is None or _gateway_key != key:
+            endpoints = [
+                LLMEndpoint(model=model, base_url=base_url, weight=weight)
+                for model, base_url, weight in key[0]
+            ]
+            _gateway = LLMGateway(
+                endpoints,
+                transport=openai_transport(settings.openai_api_key),
+                hedging=settings.llm_hedging_enabled,
+                hedge_min_delay_ms=settings.llm_hedge_min_delay_ms,
+                default_timeout_ms=settings.llm_request_budget_ms,
+            )
+            _gateway_key = key
+            logger.info({
+                "event": "llm_gateway_initialized",
+                "endpoints": [e.name for e in endpoints],
+                "hedging": settings.llm_hedging_enabled,
+            })
+        return _gateway
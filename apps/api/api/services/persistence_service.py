@@ -6,16 +6,19 @@ Database persistence layer per conversational memory con asyncpg.
 Features:
 - Bulk insert messaggi con UNNEST SQL pattern
 - Idempotency keys per prevenire duplicati
-- Pagination per load historical messages
+- Pagination per load historical messages (keyset su created_at, id)
+- Conteggio esatto per sessione da chat_session_stats (trigger DB)
 - Graceful error handling con logging strutturato
 
 Reference: docs/architecture/addendum-persistent-conversational-memory.md
 """
+import base64
 import logging
 import hashlib
 import json
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 from uuid import UUID
 
 import asyncpg
@@ -24,6 +27,62 @@ from ..models.conversation import ConversationMessage
 
 logger = logging.getLogger("api")
 
+# Stesso predicato dell'indice parziale idx_chat_messages_session_keyset
+_NOT_ARCHIVED = "(metadata->>'archived') IS DISTINCT FROM 'true'"
+
+
+class InvalidHistoryCursor(ValueError):
+    """Cursor di paginazione history malformato."""
+
+
+@dataclass(frozen=True)
+class SessionHistoryStats:
+    """Contatore per sessione mantenuto dal trigger su chat_messages."""
+    message_count: int
+    last_message_id: Optional[str]
+
+
+@dataclass(frozen=True)
+class SessionSummaryRecord:
+    """Riassunto rolling salvato nel metadata di un messaggio (save_session_summary)."""
+    summary: str
+    covered_messages: int
+
+
+def encode_history_cursor(created_at: datetime, message_id: str) -> str:
+    """Cursor opaco (base64url) sulla posizione (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), str(message_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decodifica un cursor prodotto da ``encode_history_cursor``.
+    
+    Raises:
+        InvalidHistoryCursor: Cursor non decodificabile
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), UUID(message_id)
+    except Exception as exc:  # noqa: BLE001 - qualsiasi input malformato
+        raise InvalidHistoryCursor("cursor non valido") from exc
+
+
+def _row_to_message(row) -> ConversationMessage:
+    # Convert UUID[] to string list per chunk_ids
+    chunk_ids = None
+    if row["source_chunk_ids"]:
+        chunk_ids = [str(uuid) for uuid in row["source_chunk_ids"]]
+    return ConversationMessage(
+        id=str(row["id"]),
+        role=row["role"],
+        content=row["content"],
+        timestamp=row["created_at"],
+        chunk_ids=chunk_ids,
+    )
+
 
 class ConversationPersistenceService:
     """
@@ -199,9 +258,11 @@ class ConversationPersistenceService:
             Lista ConversationMessage objects
         
         Notes:
-            - Usa INDEX idx_chat_messages_session_created
+            - Usa INDEX parziale idx_chat_messages_session_keyset
             - Esclude archived: metadata->>'archived' != 'true'
             - Limit max 500 per protezione
+            - Costo lineare nell'offset: per history lunghe preferire
+              load_session_history_page (keyset)
         """
         # Enforce limit max 500
         limit = min(limit, 500)
@@ -212,8 +273,8 @@ class ConversationPersistenceService:
                 SELECT id, session_id, role, content, source_chunk_ids, metadata, created_at
                 FROM chat_messages
                 WHERE session_id = $1
-                  AND (metadata->>'archived' IS NULL OR metadata->>'archived' != 'true')
-                ORDER BY created_at {order_clause}
+                  AND {_NOT_ARCHIVED}
+                ORDER BY created_at {order_clause}, id {order_clause}
                 LIMIT $2 OFFSET $3;
             """
             
@@ -221,21 +282,7 @@ class ConversationPersistenceService:
                 rows = await conn.fetch(query, session_id, limit, offset)
             
             # Convert rows to ConversationMessage
-            messages: List[ConversationMessage] = []
-            for row in rows:
-                # Convert UUID[] to string list per chunk_ids
-                chunk_ids = None
-                if row["source_chunk_ids"]:
-                    chunk_ids = [str(uuid) for uuid in row["source_chunk_ids"]]
-                
-                messages.append(
-                    ConversationMessage(
-                        role=row["role"],
-                        content=row["content"],
-                        timestamp=row["created_at"],
-                        chunk_ids=chunk_ids,
-                    )
-                )
+            messages: List[ConversationMessage] = [_row_to_message(row) for row in rows]
             
             logger.info({
                 "event": "load_session_history_success",
@@ -256,6 +303,204 @@ class ConversationPersistenceService:
             }, exc_info=True)
             return []
 
+    async def load_session_history_page(
+        self,
+        session_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        order_desc: bool = False,
+    ) -> Tuple[List[ConversationMessage], Optional[str]]:
+        """
+        Load una pagina di history con keyset pagination su (created_at, id).
+        
+        A differenza di LIMIT/OFFSET il costo per pagina è costante: la
+        query parte dalla posizione del cursor sull'indice parziale
+        idx_chat_messages_session_keyset (solo messaggi non archived).
+        
+        Args:
+            session_id: Session identifier
+            limit: Max messaggi per page (max 500)
+            cursor: Cursor della pagina precedente (None = prima pagina)
+            order_desc: Se True, newest first (scroll indietro nel frontend)
+        
+        Returns:
+            (messaggi, next_cursor); next_cursor None se non ci sono altre pagine
+        
+        Raises:
+            InvalidHistoryCursor: Cursor malformato (errore client, non DB)
+        """
+        limit = min(limit, 500)
+        position = decode_history_cursor(cursor) if cursor else None
+        
+        order_clause = "DESC" if order_desc else "ASC"
+        comparison = "<" if order_desc else ">"
+        params: list = [session_id]
+        keyset_clause = ""
+        if position is not None:
+            params.extend(position)
+            keyset_clause = f"AND (created_at, id) {comparison} ($2, $3)"
+        params.append(limit + 1)  # +1 per determinare has_more
+        
+        query = f"""
+            SELECT id, session_id, role, content, source_chunk_ids, metadata, created_at
+            FROM chat_messages
+            WHERE session_id = $1
+              AND {_NOT_ARCHIVED}
+              {keyset_clause}
+            ORDER BY created_at {order_clause}, id {order_clause}
+            LIMIT ${len(params)};
+        """
+        
+        try:
+            async with self.db_pool.acquire() as conn:
+                rows = await conn.fetch(query, *params)
+        except Exception as exc:
+            logger.error({
+                "event": "load_session_history_page_error",
+                "session_id": session_id,
+                "error": str(exc),
+                "error_type": type(exc).__name__,
+            }, exc_info=True)
+            return [], None
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_history_cursor(last["created_at"], last["id"])
+        
+        logger.info({
+            "event": "load_session_history_page_success",
+            "session_id": session_id,
+            "messages_loaded": len(rows),
+            "limit": limit,
+            "has_cursor": position is not None,
+            "has_more": next_cursor is not None,
+        })
+        return [_row_to_message(row) for row in rows], next_cursor
+
+    async def get_session_stats(self, session_id: str) -> Optional[SessionHistoryStats]:
+        """
+        Conteggio esatto e ultimo messaggio della sessione (lookup per PK).
+        
+        Returns:
+            SessionHistoryStats, zero messaggi se la sessione non ha righe,
+            None se la tabella non è disponibile (migration non applicata)
+        """
+        try:
+            async with self.db_pool.acquire() as conn:
+                row = await conn.fetchrow(
+                    """
+                    SELECT message_count, last_message_id
+                    FROM chat_session_stats
+                    WHERE session_id = $1;
+                    """,
+                    session_id,
+                )
+        except Exception as exc:
+            logger.warning({
+                "event": "session_stats_unavailable",
+                "session_id": session_id,
+                "error": str(exc),
+                "error_type": type(exc).__name__,
+            })
+            return None
+        
+        if row is None:
+            return SessionHistoryStats(message_count=0, last_message_id=None)
+        last_message_id = row["last_message_id"]
+        return SessionHistoryStats(
+            message_count=int(row["message_count"]),
+            last_message_id=str(last_message_id) if last_message_id else None,
+        )
+
+    async def save_session_summary(
+        self,
+        session_id: str,
+        summary: str,
+        covered_messages: int,
+    ) -> bool:
+        """
+        Salva il riassunto rolling nel metadata dell'ultimo messaggio della sessione.
+        
+        Args:
+            session_id: Session identifier
+            summary: Riassunto aggiornato
+            covered_messages: Numero messaggi coperti dal riassunto
+        
+        Returns:
+            bool: True se un messaggio è stato aggiornato
+        """
+        query = """
+            UPDATE chat_messages
+            SET metadata = COALESCE(metadata, '{}'::jsonb) || jsonb_build_object(
+                'rolling_summary', $2::text,
+                'summary_covered_messages', $3::int
+            )
+            WHERE id = (
+                SELECT id FROM chat_messages
+                WHERE session_id = $1
+                ORDER BY created_at DESC
+                LIMIT 1
+            );
+        """
+        try:
+            async with self.db_pool.acquire() as conn:
+                result = await conn.execute(query, session_id, summary, covered_messages)
+            updated = bool(result) and result.split()[-1] != "0"
+            logger.debug({
+                "event": "save_session_summary",
+                "session_id": session_id,
+                "updated": updated,
+                "covered_messages": covered_messages,
+            })
+            return updated
+        except Exception as exc:
+            logger.error({
+                "event": "save_session_summary_error",
+                "session_id": session_id,
+                "error": str(exc),
+                "error_type": type(exc).__name__,
+            })
+            return False
+
+    async def load_session_summary(self, session_id: str) -> Optional[SessionSummaryRecord]:
+        """
+        Ultimo riassunto rolling salvato per la sessione (vedi save_session_summary).
+        
+        Args:
+            session_id: Session identifier
+        
+        Returns:
+            SessionSummaryRecord, None se assente o DB non disponibile
+        """
+        query = """
+            SELECT metadata->>'rolling_summary' AS summary,
+                   (metadata->>'summary_covered_messages')::int AS covered_messages
+            FROM chat_messages
+            WHERE session_id = $1 AND metadata ? 'rolling_summary'
+            ORDER BY created_at DESC
+            LIMIT 1;
+        """
+        try:
+            async with self.db_pool.acquire() as conn:
+                row = await conn.fetchrow(query, session_id)
+        except Exception as exc:
+            logger.warning({
+                "event": "load_session_summary_error",
+                "session_id": session_id,
+                "error": str(exc),
+                "error_type": type(exc).__name__,
+            })
+            return None
+        
+        if row is None or not row["summary"]:
+            return None
+        return SessionSummaryRecord(
+            summary=row["summary"],
+            covered_messages=int(row["covered_messages"] or 0),
+        )
+
     async def delete_session(self, session_id: str) -> bool:
         """
         Hard delete session and all its messages.
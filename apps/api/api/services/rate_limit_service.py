@@ -2,27 +2,150 @@
 Rate Limiting service - Business logic per rate limiting enforcement.
 
 Story: 1.3, 1.3.1, 4.1, 5.4
+
+Algoritmo GCRA (Generic Cell Rate Algorithm, equivalente a un token bucket
+con capacità ``max_requests`` e ricarica ``max_requests / window_seconds``):
+per ogni key si conserva un solo float, il TAT (theoretical arrival time).
+Costo O(1) in tempo e memoria per richiesta, indipendente dal limite.
+
+Una key con TAT nel passato equivale a una key mai vista, quindi può essere
+rimossa: le key inattive vengono espulse in modo incrementale (LRU) a ogni
+chiamata, senza sweep completi dello store.
+
+Backend opzionale Redis (``RATE_LIMIT_BACKEND=redis``): lo stesso GCRA
+eseguito atomicamente da uno script Lua, con TTL sulla key pari al tempo
+di inattività necessario; il limite vale per tutti i worker invece che
+per processo. Se Redis non risponde si ricade sul limiter locale.
+
+Con uno stato condiviso configurato (``SHARED_STATE_BACKEND``, vedi
+``api/shared_state.py``) il limiter lo segue: redis usa lo script Lua sul
+client dello stato, shm esegue lo stesso passo GCRA come update atomico
+sul backend condiviso dai worker dell'host.
 """
-import time
+import logging
+import math
 import os
-from typing import Dict
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import HTTPException, status
+
+from ..shared_state import RedisStateBackend, StateBackend, StateBackendError, get_state_backend
 from ..stores import _rate_limit_store
 
+try:
+    import redis
+    from redis.exceptions import RedisError
+except Exception:  # pragma: no cover - library missing in some environments
+    redis = None
+
+    class RedisError(Exception):  # type: ignore
+        """Fallback exception when redis package is unavailable."""
+
+logger = logging.getLogger("api")
+
+# Tolleranza float: N richieste simultanee con limite N non devono fallire
+# per arrotondamento di window / N * N
+_EPSILON = 1e-9
+
+# Key inattive rimosse per chiamata (ammortizzato O(1))
+_EVICTIONS_PER_CALL = 2
+
+REDIS_KEY_PREFIX = "ratelimit:v1:"
+
+# Namespace nello stato condiviso: <prefisso><scope> -> {key: TAT}
+STATE_NAMESPACE_PREFIX = "ratelimit:"
+
+# KEYS[1] = key; ARGV[1] = intervallo emissione (s); ARGV[2] = finestra (s)
+# Ritorna {allowed, retry_after_ms}. Usa il clock Redis: nessuno skew tra host.
+GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then
+  tat = now
+end
+local new_tat = tat + interval
+local excess = new_tat - now - window
+if excess > 1e-9 then
+  return {0, math.ceil(excess * 1000)}
+end
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {1, 0}
+"""
+
+
+def gcra_update(
+    tat: Optional[float],
+    now: float,
+    interval: float,
+    window: float,
+) -> Tuple[bool, float, float]:
+    """
+    Singolo passo GCRA.
+
+    Args:
+        tat: TAT corrente della key (None se assente)
+        now: Timestamp corrente (secondi)
+        interval: Intervallo di emissione (window / max_requests)
+        window: Finestra (burst massimo = window / interval richieste)
+
+    Returns:
+        (allowed, tat aggiornato, retry_after secondi)
+    """
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + interval
+    excess = new_tat - now - window
+    if excess > _EPSILON:
+        return False, tat, excess
+    return True, new_tat, 0.0
+
 
 class RateLimitService:
     """
-    Rate limiter in-memory per endpoint.
-    
+    Rate limiter GCRA per endpoint.
+
     Configuration:
     - Scope isolato per tipo endpoint
-    - Reset automatico dopo window
+    - Stato per key: un float (TAT), key inattive espulse automaticamente
+    - Backend Redis opzionale condiviso tra worker
     """
-    
-    def __init__(self, store: Dict[str, Dict[str, list[float]]] = None):
+
+    def __init__(
+        self,
+        store: Dict[str, Dict[str, Any]] = None,
+        redis_client: Any = None,
+    ):
         # Use shared store or create isolated one
         self._store = store if store is not None else _rate_limit_store
-    
+        self._lock = threading.Lock()
+        self._redis_script = None
+        self._state_backend: Optional[StateBackend] = None
+        if redis_client is not None:
+            self.use_redis(redis_client)
+
+    def use_redis(self, redis_client: Any) -> None:
+        """Attiva il backend Redis (None per tornare al solo limiter locale)."""
+        self._redis_script = (
+            redis_client.register_script(GCRA_LUA) if redis_client is not None else None
+        )
+
+    def use_state_backend(self, backend: Optional[StateBackend]) -> None:
+        """Attiva il GCRA sullo stato condiviso (None per il solo limiter locale)."""
+        self._state_backend = backend
+
+    @property
+    def backend(self) -> str:
+        if self._redis_script is not None:
+            return "redis"
+        if self._state_backend is not None:
+            return self._state_backend.name
+        return "memory"
+
     def enforce_rate_limit(
         self,
         key: str,
@@ -32,50 +155,162 @@ class RateLimitService:
     ) -> None:
         """
         Enforce rate limit per key in scope.
-        
+
         Args:
             key: Identifier (IP, admin_id, etc.)
             scope: Scope rate limit (e.g., "exchange_code", "admin_debug")
             window_seconds: Durata finestra in secondi
-            max_requests: Max richieste nella finestra
-            
+            max_requests: Max richieste nella finestra (burst)
+
         Raises:
-            HTTPException: 429 se limit superato
-            
+            HTTPException: 429 se limit superato (header Retry-After)
+
         Story 5.4 Task 1.4: Bypass rate limiting in test environment
         """
         # Story 5.4: Bypass se test environment
         if os.getenv("TESTING") == "true" or os.getenv("RATE_LIMITING_ENABLED") == "false":
             return
-        
+
         if not key:
             return
-        
-        now_ts = time.time()
-        window_start = now_ts - window_seconds
-        
-        # Init scope se non esiste
-        if scope not in self._store:
-            self._store[scope] = {}
-        
-        # Get timestamps per key
-        timestamps = self._store[scope].get(key, [])
-        
-        # Cleanup timestamps fuori finestra
-        timestamps = [t for t in timestamps if t > window_start]
-        
-        # Check limit
-        if len(timestamps) >= max_requests:
-            self._store[scope][key] = timestamps
+
+        interval = window_seconds / max(max_requests, 1)
+        retry_after = None
+        if self._redis_script is not None:
+            retry_after = self._acquire_redis(key, scope, interval, window_seconds)
+        elif self._state_backend is not None:
+            retry_after = self._acquire_shared(key, scope, interval, window_seconds)
+        else:
+            retry_after = self._acquire_local(key, scope, interval, window_seconds)
+
+        if retry_after is not None:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="rate_limited"
+                detail="rate_limited",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    def _acquire_local(
+        self,
+        key: str,
+        scope: str,
+        interval: float,
+        window: float,
+    ) -> Optional[float]:
+        now = time.time()
+        with self._lock:
+            bucket = self._store.get(scope)
+            if bucket is None:
+                bucket = self._store[scope] = {}
+
+            allowed, tat, retry_after = gcra_update(bucket.get(key), now, interval, window)
+            if allowed:
+                # Reinserimento: l'ordine del dict resta LRU
+                bucket.pop(key, None)
+                bucket[key] = tat
+
+            # Le key più vecchie in testa: espulse se il TAT è già passato
+            for _ in range(_EVICTIONS_PER_CALL):
+                oldest = next(iter(bucket), None)
+                if oldest is None or bucket[oldest] > now:
+                    break
+                del bucket[oldest]
+
+        return None if allowed else retry_after
+
+    def _acquire_redis(
+        self,
+        key: str,
+        scope: str,
+        interval: float,
+        window: float,
+    ) -> Optional[float]:
+        try:
+            allowed, retry_after_ms = self._redis_script(
+                keys=[f"{REDIS_KEY_PREFIX}{scope}:{key}"],
+                args=[repr(interval), repr(float(window))],
             )
-        
-        # Add current request
-        timestamps.append(now_ts)
-        self._store[scope][key] = timestamps
+        except RedisError as exc:
+            # Degradazione: limite per processo finché Redis non torna
+            logger.warning({
+                "event": "rate_limit_redis_error",
+                "scope": scope,
+                "error": str(exc),
+            })
+            return self._acquire_local(key, scope, interval, window)
+
+        if int(allowed):
+            return None
+        return int(retry_after_ms) / 1000.0
+
+    def _acquire_shared(
+        self,
+        key: str,
+        scope: str,
+        interval: float,
+        window: float,
+    ) -> Optional[float]:
+        now = time.time()
+        outcome: Dict[str, Optional[float]] = {}
+
+        def _step(tat: Optional[float]) -> float:
+            allowed, new_tat, retry_after = gcra_update(tat, now, interval, window)
+            outcome["retry_after"] = None if allowed else retry_after
+            return new_tat
+
+        try:
+            # TTL = finestra: oltre, il TAT è nel passato e la key equivale a una mai vista
+            self._state_backend.update(f"{STATE_NAMESPACE_PREFIX}{scope}", key, _step, ttl=window)
+        except StateBackendError as exc:
+            logger.warning({
+                "event": "rate_limit_shared_state_error",
+                "scope": scope,
+                "error": str(exc),
+            })
+            return self._acquire_local(key, scope, interval, window)
+        return outcome["retry_after"]
 
 
 # Global rate limiter instance
 rate_limit_service = RateLimitService()
+
+
+def configure_rate_limit_backend(settings: Any) -> str:
+    """
+    Collega ``rate_limit_service`` al backend configurato.
+
+    Senza ``rate_limit_backend=redis`` segue lo stato condiviso configurato
+    (``configure_shared_state`` va chiamata prima).
+
+    Returns:
+        Backend attivo ("memory", "redis" o "shm")
+    """
+    if settings.rate_limit_backend != "redis":
+        state_backend = get_state_backend()
+        if isinstance(state_backend, RedisStateBackend):
+            rate_limit_service.use_state_backend(None)
+            rate_limit_service.use_redis(state_backend.client)
+        else:
+            rate_limit_service.use_redis(None)
+            rate_limit_service.use_state_backend(state_backend)
+        return rate_limit_service.backend
+
+    if redis is None:
+        logger.warning({
+            "event": "rate_limit_redis_unavailable",
+            "reason": "redis package not installed",
+        })
+        return rate_limit_service.backend
+
+    redis_url = settings.rate_limit_redis_url or settings.celery_broker_url
+    client = redis.from_url(  # type: ignore[attr-defined]
+        redis_url,
+        socket_timeout=0.25,
+        socket_connect_timeout=0.25,
+    )
+    rate_limit_service.use_redis(client)
+    logger.info({
+        "event": "rate_limit_backend_configured",
+        "backend": "redis",
+    })
+    return rate_limit_service.backend
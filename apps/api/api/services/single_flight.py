@@ -0,0 +1,84 @@
+"""
+Single-flight: coalescing di computazioni identiche in corso.
+
+La prima richiesta per una chiave (leader) avvia la computazione in un
+task proprio; leader e richieste concorrenti con la stessa chiave
+attendono lo stesso future e ricevono lo stesso risultato (o la stessa
+eccezione). La cancellazione di una richiesta, leader compreso (client
+disconnesso, timeout), non interrompe la computazione per le altre. La
+entry viene rimossa al completamento: nessun caching oltre la durata
+della computazione.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+logger = logging.getLogger("api")
+
+
+class SingleFlight:
+    """Coalescing per-event-loop di coroutine con la stessa chiave."""
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Riferimenti forti ai task in corso (il loop tiene solo weakref)
+        self._tasks: Set[asyncio.Future] = set()
+        self._leaders = 0
+        self._coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Esegue ``fn`` una sola volta per chiave tra chiamate concorrenti.
+
+        Returns:
+            (risultato, shared) dove shared=True se il risultato proviene
+            dalla computazione di un'altra richiesta
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self._coalesced += 1
+            # shield: la cancellazione di un follower non cancella il future condiviso
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            task = asyncio.ensure_future(fn())
+        except BaseException:
+            self._inflight.pop(key, None)
+            raise
+        self._leaders += 1
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._resolve(key, future, done))
+        # Il leader attende come i follower: se viene cancellato il task prosegue
+        return await asyncio.shield(future), False
+
+    def _resolve(self, key: Hashable, future: asyncio.Future, task: asyncio.Future) -> None:
+        """Done-callback del task: rimuove la entry e propaga l'esito al future condiviso."""
+        self._tasks.discard(task)
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if task.cancelled():
+            future.cancel()
+            return
+        exc = task.exception()
+        if exc is not None:
+            future.set_exception(exc)
+            # Evita "Future exception was never retrieved" senza richieste in attesa
+            future.exception()
+        else:
+            future.set_result(task.result())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self._leaders,
+            "coalesced": self._coalesced,
+        }
@@ -0,0 +1,160 @@
+"""
+Structured output nativo del provider per la generazione chat.
+
+Invece di chiedere al modello di rispettare format instructions testuali e
+parsare il testo libero con ``PydanticOutputParser``, il JSON schema del
+modello risposta viene passato come ``response_format`` (OpenAI structured
+outputs): il provider vincola la decodifica allo schema e le format
+instructions escono dal prompt.
+
+La risposta viene consumata in streaming da ``IncrementalJSONParser``, che
+emette i campi top-level man mano che sono completi (es. per log di
+time-to-first-field o per uno streaming verso il client).
+"""
+from __future__ import annotations
+
+import copy
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+# Keyword JSON schema non supportate dalla modalità strict: i vincoli
+# restano nella validazione Pydantic locale
+_STRICT_UNSUPPORTED_KEYWORDS = ("minLength", "maxLength", "default")
+
+
+class StructuredOutputError(ValueError):
+    """Risposta structured output incompleta o non valida."""
+
+
+def _to_strict_schema(node: Any, is_mapping: bool = False) -> Any:
+    if isinstance(node, dict):
+        # properties / $defs: le chiavi sono nomi, non keyword dello schema
+        node = {
+            key: _to_strict_schema(value, is_mapping=key in ("properties", "$defs") and not is_mapping)
+            for key, value in node.items()
+            if is_mapping or key not in _STRICT_UNSUPPORTED_KEYWORDS
+        }
+        if node.get("type") == "object" and "properties" in node:
+            # strict: tutti i campi required (gli opzionali sono già nullable)
+            node["required"] = list(node["properties"].keys())
+            node["additionalProperties"] = False
+        return node
+    if isinstance(node, list):
+        return [_to_strict_schema(item) for item in node]
+    return node
+
+
+def build_response_format(model: Type[BaseModel], strict: bool = True) -> Dict[str, Any]:
+    """``response_format`` OpenAI (json_schema) per un modello Pydantic."""
+    schema = copy.deepcopy(model.model_json_schema())
+    if strict:
+        schema = _to_strict_schema(schema)
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": schema,
+            "strict": strict,
+        },
+    }
+
+
+class IncrementalJSONParser:
+    """
+    Parser incrementale di un oggetto JSON top-level ricevuto a frammenti.
+
+    ``feed`` restituisce i campi (chiave, valore) completati dal frammento;
+    ogni carattere viene scansionato una sola volta. Eventuale testo prima
+    della ``{`` iniziale (es. code fence) viene ignorato.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start: Optional[int] = None
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        completed: List[Tuple[str, Any]] = []
+        if self.complete or not text:
+            return completed
+        self._buffer += text
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._field_start = self._pos + 1
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(self._pos, completed)
+                    self.complete = True
+                    self._pos += 1
+                    break
+            elif char == "," and self._depth == 1:
+                self._emit(self._pos, completed)
+                self._field_start = self._pos + 1
+            self._pos += 1
+        return completed
+
+    def _emit(self, end: int, completed: List[Tuple[str, Any]]) -> None:
+        segment = self._buffer[self._field_start:end].strip()
+        if not segment:
+            return
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except json.JSONDecodeError as exc:
+            raise StructuredOutputError(f"campo JSON non valido: {exc}") from exc
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
+
+
+def generate_structured(
+    chain: Any,
+    inputs: Dict[str, Any],
+    response_model: Type[BaseModel],
+    on_field: Optional[Callable[[str, Any], None]] = None,
+) -> BaseModel:
+    """
+    Esegue la chain in streaming e valida la risposta nel modello Pydantic.
+
+    Args:
+        chain: Runnable prompt | llm con response_format json_schema
+        inputs: Variabili del prompt
+        response_model: AnswerWithCitations / EnhancedAcademicResponse
+        on_field: Callback invocata per ogni campo top-level completato
+
+    Raises:
+        StructuredOutputError: JSON incompleto (es. refusal o troncamento)
+    """
+    parser = IncrementalJSONParser()
+    for chunk in chain.stream(inputs):
+        text = getattr(chunk, "content", chunk)
+        if not isinstance(text, str) or not text:
+            continue
+        for name, value in parser.feed(text):
+            if on_field is not None:
+                on_field(name, value)
+    if not parser.complete:
+        raise StructuredOutputError("risposta structured output incompleta")
+    return response_model.model_validate(parser.fields)
@@ -0,0 +1,1056 @@
+"""
+Stato condiviso tra worker (deploy multi-worker senza sticky session).
+
+Gli store di ``api/stores.py`` (sessioni chat, riassunti, sync job, access
+code) sono per processo finché non si configura un backend condiviso:
+
+- ``memory``: dict del processo (default, nessun backend)
+- ``redis``: chiavi sotto ``REDIS_KEY_PREFIX``; liste Redis per le history
+  di sessione, WATCH/MULTI per gli update atomici
+- ``shm``: SQLite su tmpfs (``/dev/shm``) condiviso dai worker dello stesso
+  host; update atomici con ``BEGIN IMMEDIATE``
+
+Due forme di dato:
+
+- record (``SharedMap``): chiave → valore JSON (datetime inclusi), TTL
+  opzionale, ``update_item``/``patch`` atomici read-modify-write
+- log (``SharedSessionLog``): chiave → lista append-only con generazione
+  (incrementata a ogni sostituzione/cancellazione). Read-through
+  incrementale: la lista locale è estesa in place con i soli elementi
+  nuovi, quindi il window incrementale di ``ConversationManager`` resta
+  valido tra un turno e l'altro anche se il turno precedente è stato
+  servito da un altro worker.
+
+Errori del backend: letture e scritture semplici degradano sulla copia
+locale con un warning; gli update atomici propagano ``StateBackendError``
+(un access code non deve poter essere riscattato due volte).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import redis
+    from redis.exceptions import RedisError, WatchError
+except Exception:  # pragma: no cover - library missing in some environments
+    redis = None
+
+    class RedisError(Exception):  # type: ignore
+        """Fallback exception when redis package is unavailable."""
+
+    class WatchError(RedisError):  # type: ignore
+        """Fallback exception when redis package is unavailable."""
+
+logger = logging.getLogger("api")
+
+REDIS_KEY_PREFIX = "fisiorag:state:v1:"
+
+DEFAULT_SHM_FILENAME = "fisiorag-state.sqlite3"
+
+UpdateFn = Callable[[Optional[Any]], Any]
+
+_MISSING = object()
+
+
+class StateBackendError(Exception):
+    """Backend condiviso non raggiungibile o in errore."""
+
+
+# -------------------------------
+# Codec (JSON con datetime)
+# -------------------------------
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Valore non serializzabile nello stato condiviso: {type(value).__name__}")
+
+
+def _json_object_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def encode_value(value: Any) -> str:
+    return json.dumps(value, default=_json_default, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode_value(raw: Any) -> Any:
+    if raw is None:
+        return None
+    return json.loads(raw, object_hook=_json_object_hook)
+
+
+# -------------------------------
+# Backend
+# -------------------------------
+
+
+class StateBackend(ABC):
+    """Operazioni per namespace su record e log condivisi tra processi."""
+
+    name: str = "abstract"
+
+    # Record
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]: ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool: ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]: ...
+
+    @abstractmethod
+    def update(
+        self, namespace: str, key: str, fn: UpdateFn, ttl: Optional[float] = None
+    ) -> Tuple[Optional[Any], Optional[Any]]:
+        """
+        Read-modify-write atomico rispetto agli altri processi.
+
+        ``fn`` riceve il valore corrente (None se assente) e ritorna il nuovo
+        valore (None = cancella); può essere rieseguita in caso di conflitto.
+        Senza ``ttl`` la scadenza del record esistente resta invariata.
+
+        Returns:
+            (valore precedente, valore nuovo)
+        """
+
+    @abstractmethod
+    def clear(self, namespace: str) -> None: ...
+
+    # Log append-only
+    @abstractmethod
+    def log_append(self, namespace: str, key: str, items: Sequence[Any]) -> Tuple[int, int]:
+        """Aggiunge in coda; ritorna (generazione, lunghezza dopo l'append)."""
+
+    @abstractmethod
+    def log_read(
+        self, namespace: str, key: str, start: int, generation: Optional[int]
+    ) -> Tuple[int, int, List[Any]]:
+        """
+        Elementi da ``start`` se la generazione coincide, altrimenti da 0.
+
+        Returns:
+            (generazione, offset effettivo, elementi)
+        """
+
+    @abstractmethod
+    def log_replace(self, namespace: str, key: str, items: Sequence[Any]) -> int:
+        """Sostituisce l'intera lista; ritorna la nuova generazione."""
+
+    @abstractmethod
+    def log_delete(self, namespace: str, key: str) -> None: ...
+
+    @abstractmethod
+    def log_keys(self, namespace: str) -> List[str]: ...
+
+    @abstractmethod
+    def log_count(self, namespace: str) -> int: ...
+
+    @abstractmethod
+    def log_clear(self, namespace: str) -> None: ...
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        return None
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Stato su Redis, condiviso da tutti i worker e host.
+
+    Layout (prefisso ``REDIS_KEY_PREFIX``): ``r:<ns>:<key>`` record JSON,
+    ``ri:<ns>`` set delle chiavi record, ``l:<ns>:<key>`` lista JSON,
+    ``lg:<ns>`` hash generazioni, ``li:<ns>`` set delle chiavi log.
+    """
+
+    name = "redis"
+
+    def __init__(self, client: Any, prefix: str = REDIS_KEY_PREFIX, max_retries: int = 20):
+        self.client = client
+        self.prefix = prefix
+        self.max_retries = max_retries
+
+    def _record(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}r:{namespace}:{key}"
+
+    def _record_index(self, namespace: str) -> str:
+        return f"{self.prefix}ri:{namespace}"
+
+    def _log(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}l:{namespace}:{key}"
+
+    def _log_generations(self, namespace: str) -> str:
+        return f"{self.prefix}lg:{namespace}"
+
+    def _log_index(self, namespace: str) -> str:
+        return f"{self.prefix}li:{namespace}"
+
+    @staticmethod
+    def _text(value: Any) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl else None
+
+    def get(self, namespace, key):
+        try:
+            return decode_value(self.client.get(self._record(namespace, key)))
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def set(self, namespace, key, value, ttl=None):
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(self._record(namespace, key), encode_value(value), px=self._px(ttl))
+            pipe.sadd(self._record_index(namespace), key)
+            pipe.execute()
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def delete(self, namespace, key):
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(self._record(namespace, key))
+            pipe.srem(self._record_index(namespace), key)
+            removed, _ = pipe.execute()
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+        return bool(removed)
+
+    def keys(self, namespace):
+        try:
+            members = self.client.smembers(self._record_index(namespace))
+            names = sorted(self._text(member) for member in members)
+            if not names:
+                return []
+            # Il set indice può contenere record scaduti per TTL
+            exists = self.client.mget([self._record(namespace, name) for name in names])
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+        return [name for name, raw in zip(names, exists) if raw is not None]
+
+    def update(self, namespace, key, fn, ttl=None):
+        record_key = self._record(namespace, key)
+        try:
+            with self.client.pipeline() as pipe:
+                for _ in range(self.max_retries):
+                    try:
+                        pipe.watch(record_key)
+                        previous = decode_value(pipe.get(record_key))
+                        current = fn(previous)
+                        pipe.multi()
+                        if current is None:
+                            pipe.delete(record_key)
+                            pipe.srem(self._record_index(namespace), key)
+                        elif ttl:
+                            pipe.set(record_key, encode_value(current), px=self._px(ttl))
+                            pipe.sadd(self._record_index(namespace), key)
+                        else:
+                            pipe.set(record_key, encode_value(current), keepttl=True)
+                            pipe.sadd(self._record_index(namespace), key)
+                        pipe.execute()
+                        return previous, current
+                    except WatchError:
+                        continue
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+        raise StateBackendError(f"update conteso oltre {self.max_retries} tentativi: {namespace}:{key}")
+
+    def clear(self, namespace):
+        try:
+            names = [self._text(member) for member in self.client.smembers(self._record_index(namespace))]
+            self.client.delete(
+                self._record_index(namespace), *(self._record(namespace, name) for name in names)
+            )
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def log_append(self, namespace, key, items):
+        try:
+            pipe = self.client.pipeline()
+            pipe.hget(self._log_generations(namespace), key)
+            pipe.rpush(self._log(namespace, key), *(encode_value(item) for item in items))
+            pipe.sadd(self._log_index(namespace), key)
+            generation, length, _ = pipe.execute()
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+        return int(generation or 0), int(length)
+
+    def log_read(self, namespace, key, start, generation):
+        log_key = self._log(namespace, key)
+        try:
+            pipe = self.client.pipeline()
+            pipe.hget(self._log_generations(namespace), key)
+            pipe.lrange(log_key, start, -1)
+            current, raw_items = pipe.execute()
+            current = int(current or 0)
+            if start and current != generation:
+                start = 0
+                raw_items = self.client.lrange(log_key, 0, -1)
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+        return current, start, [decode_value(raw) for raw in raw_items]
+
+    def log_replace(self, namespace, key, items):
+        log_key = self._log(namespace, key)
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(log_key)
+            if items:
+                pipe.rpush(log_key, *(encode_value(item) for item in items))
+                pipe.sadd(self._log_index(namespace), key)
+            else:
+                pipe.srem(self._log_index(namespace), key)
+            pipe.hincrby(self._log_generations(namespace), key, 1)
+            generation = pipe.execute()[-1]
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+        return int(generation)
+
+    def log_delete(self, namespace, key):
+        self.log_replace(namespace, key, [])
+
+    def log_keys(self, namespace):
+        try:
+            return sorted(self._text(member) for member in self.client.smembers(self._log_index(namespace)))
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def log_count(self, namespace):
+        try:
+            return int(self.client.scard(self._log_index(namespace)))
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def log_clear(self, namespace):
+        try:
+            names = [self._text(member) for member in self.client.smembers(self._log_index(namespace))]
+            pipe = self.client.pipeline()
+            for name in names:
+                pipe.delete(self._log(namespace, name))
+                pipe.hincrby(self._log_generations(namespace), name, 1)
+            pipe.delete(self._log_index(namespace))
+            pipe.execute()
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def ping(self):
+        try:
+            return bool(self.client.ping())
+        except RedisError as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS logs (
+    ns TEXT NOT NULL, key TEXT NOT NULL, seq INTEGER NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (ns, key, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS log_meta (
+    ns TEXT NOT NULL, key TEXT NOT NULL, generation INTEGER NOT NULL, length INTEGER NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+"""
+
+
+def default_shm_path() -> Path:
+    """``/dev/shm`` (tmpfs, Linux) se disponibile, altrimenti la temp dir."""
+    base = Path("/dev/shm")
+    if not (base.is_dir() and os.access(base, os.W_OK)):
+        base = Path(tempfile.gettempdir())
+    return base / DEFAULT_SHM_FILENAME
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Stato su un file SQLite condiviso dai processi di un host.
+
+    Su tmpfs (``/dev/shm``) non c'è I/O su disco: i worker condividono le
+    pagine in memoria e SQLite fornisce locking e transazioni tra processi
+    (WAL: letture concorrenti, una scrittura alla volta). Non adatto a più
+    host: per quello serve ``RedisStateBackend``.
+    """
+
+    name = "shm"
+
+    # Scritture tra due pulizie dei record scaduti (per processo)
+    PURGE_EVERY = 512
+
+    def __init__(self, path: Path, busy_timeout: float = 5.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as conn:
+            conn.executescript(_SQLITE_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: transazioni esplicite solo dove serve atomicità
+            conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            raise StateBackendError(str(exc)) from exc
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge_expired()
+        return result
+
+    def _read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self._connection()
+        try:
+            # Transazione di lettura: snapshot coerente tra più SELECT
+            conn.execute("BEGIN")
+            try:
+                return fn(conn)
+            finally:
+                conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            raise StateBackendError(str(exc)) from exc
+
+    def _purge_expired(self) -> None:
+        try:
+            self._connection().execute(
+                "DELETE FROM records WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+        except sqlite3.Error as exc:
+            logger.warning({"event": "shared_state_purge_failed", "error": str(exc)})
+
+    @staticmethod
+    def _expires(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    @staticmethod
+    def _select_record(conn: sqlite3.Connection, namespace: str, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        row = conn.execute(
+            "SELECT value, expires_at FROM records WHERE ns = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None, None
+        return decode_value(row[0]), row[1]
+
+    def get(self, namespace, key):
+        return self._read(lambda conn: self._select_record(conn, namespace, key)[0])
+
+    def set(self, namespace, key, value, ttl=None):
+        payload = encode_value(value)
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO records (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, payload, self._expires(ttl)),
+        ))
+
+    def delete(self, namespace, key):
+        cursor = self._write(lambda conn: conn.execute(
+            "DELETE FROM records WHERE ns = ? AND key = ?", (namespace, key)
+        ))
+        return cursor.rowcount > 0
+
+    def keys(self, namespace):
+        rows = self._read(lambda conn: conn.execute(
+            "SELECT key FROM records WHERE ns = ? AND (expires_at IS NULL OR expires_at > ?) ORDER BY key",
+            (namespace, time.time()),
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    def update(self, namespace, key, fn, ttl=None):
+        def _apply(conn: sqlite3.Connection):
+            previous, expires_at = self._select_record(conn, namespace, key)
+            current = fn(previous)
+            if current is None:
+                conn.execute("DELETE FROM records WHERE ns = ? AND key = ?", (namespace, key))
+            else:
+                # Senza TTL esplicito la scadenza esistente resta (come KEEPTTL su Redis)
+                conn.execute(
+                    "INSERT OR REPLACE INTO records (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, encode_value(current), self._expires(ttl) if ttl else expires_at),
+                )
+            return previous, current
+
+        return self._write(_apply)
+
+    def clear(self, namespace):
+        self._write(lambda conn: conn.execute("DELETE FROM records WHERE ns = ?", (namespace,)))
+
+    @staticmethod
+    def _log_meta(conn: sqlite3.Connection, namespace: str, key: str) -> Tuple[int, int]:
+        row = conn.execute(
+            "SELECT generation, length FROM log_meta WHERE ns = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+
+    def log_append(self, namespace, key, items):
+        payloads = [encode_value(item) for item in items]
+
+        def _apply(conn: sqlite3.Connection):
+            generation, length = self._log_meta(conn, namespace, key)
+            conn.executemany(
+                "INSERT INTO logs (ns, key, seq, value) VALUES (?, ?, ?, ?)",
+                [(namespace, key, length + offset, payload) for offset, payload in enumerate(payloads)],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO log_meta (ns, key, generation, length) VALUES (?, ?, ?, ?)",
+                (namespace, key, generation, length + len(payloads)),
+            )
+            return generation, length + len(payloads)
+
+        return self._write(_apply)
+
+    def log_read(self, namespace, key, start, generation):
+        def _select(conn: sqlite3.Connection):
+            current, _ = self._log_meta(conn, namespace, key)
+            offset = start if current == generation else 0
+            rows = conn.execute(
+                "SELECT value FROM logs WHERE ns = ? AND key = ? AND seq >= ? ORDER BY seq",
+                (namespace, key, offset),
+            ).fetchall()
+            return current, offset, [decode_value(row[0]) for row in rows]
+
+        return self._read(_select)
+
+    def log_replace(self, namespace, key, items):
+        payloads = [encode_value(item) for item in items]
+
+        def _apply(conn: sqlite3.Connection):
+            generation, _ = self._log_meta(conn, namespace, key)
+            conn.execute("DELETE FROM logs WHERE ns = ? AND key = ?", (namespace, key))
+            conn.executemany(
+                "INSERT INTO logs (ns, key, seq, value) VALUES (?, ?, ?, ?)",
+                [(namespace, key, seq, payload) for seq, payload in enumerate(payloads)],
+            )
+            # La riga meta resta anche a lista vuota: la generazione non riparte da 0
+            conn.execute(
+                "INSERT OR REPLACE INTO log_meta (ns, key, generation, length) VALUES (?, ?, ?, ?)",
+                (namespace, key, generation + 1, len(payloads)),
+            )
+            return generation + 1
+
+        return self._write(_apply)
+
+    def log_delete(self, namespace, key):
+        self.log_replace(namespace, key, [])
+
+    def log_keys(self, namespace):
+        rows = self._read(lambda conn: conn.execute(
+            "SELECT key FROM log_meta WHERE ns = ? AND length > 0 ORDER BY key", (namespace,)
+        ).fetchall())
+        return [row[0] for row in rows]
+
+    def log_count(self, namespace):
+        return self._read(lambda conn: conn.execute(
+            "SELECT COUNT(*) FROM log_meta WHERE ns = ? AND length > 0", (namespace,)
+        ).fetchone()[0])
+
+    def log_clear(self, namespace):
+        def _apply(conn: sqlite3.Connection):
+            conn.execute("DELETE FROM logs WHERE ns = ?", (namespace,))
+            conn.execute(
+                "UPDATE log_meta SET generation = generation + 1, length = 0 WHERE ns = ?", (namespace,)
+            )
+
+        self._write(_apply)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# -------------------------------
+# Store (interfaccia dict)
+# -------------------------------
+
+
+def _backend_warning(event: str, namespace: str, exc: Exception) -> None:
+    logger.warning({
+        "event": event,
+        "namespace": namespace,
+        "error": str(exc),
+        "fallback": "local_copy",
+    })
+
+
+class SharedMap(MutableMapping):
+    """
+    Mapping chiave → record, per processo o su ``StateBackend``.
+
+    Senza backend i valori sono tenuti per riferimento (comportamento
+    storico dei dict in ``api/stores.py``). Con backend i valori letti sono
+    copie: le modifiche vanno scritte con assegnazione, ``patch`` o
+    ``update_item``, mai mutando il dict ritornato.
+
+    Args:
+        namespace: Namespace nel backend
+        default_ttl: TTL (secondi) dei record scritti senza TTL esplicito
+        cacheable: Letture servite da cache locale per ``cache_ttl`` secondi
+            (falso per dati che devono essere sempre autorevoli, es. access code)
+    """
+
+    def __init__(self, namespace: str, default_ttl: Optional[float] = None, cacheable: bool = True):
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.cacheable = cacheable
+        self.cache_ttl = 0.0
+        self._backend: Optional[StateBackend] = None
+        self._local: Dict[str, Any] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def backend(self) -> Optional[StateBackend]:
+        return self._backend
+
+    def use_backend(self, backend: Optional[StateBackend], cache_ttl: float = 0.0) -> None:
+        with self._lock:
+            self._backend = backend
+            self.cache_ttl = cache_ttl if self.cacheable else 0.0
+            self._local.clear()
+            self._cache.clear()
+
+    def _cached(self, key: str) -> Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] < time.monotonic():
+            self._cache.pop(key, None)
+            return _MISSING
+        return entry[1]
+
+    def _remember(self, key: str, value: Any) -> None:
+        if self.cache_ttl > 0 and value is not None:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        else:
+            self._cache.pop(key, None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self._backend is None:
+            return self._local.get(key, default)
+        cached = self._cached(key)
+        if cached is not _MISSING:
+            return cached
+        try:
+            value = self._backend.get(self.namespace, key)
+        except StateBackendError as exc:
+            _backend_warning("shared_state_read_failed", self.namespace, exc)
+            value = self._local.get(key)
+        if value is None:
+            return default
+        self._remember(key, value)
+        return value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING  # type: ignore[arg-type]
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Scrive il record (TTL esplicito o ``default_ttl``)."""
+        if self._backend is None:
+            self._local[key] = value
+            return
+        try:
+            self._backend.set(self.namespace, key, value, ttl=ttl or self.default_ttl)
+        except StateBackendError as exc:
+            _backend_warning("shared_state_write_failed", self.namespace, exc)
+            self._local[key] = value
+        self._remember(key, value)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.put(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if self._backend is None:
+            del self._local[key]
+            return
+        self._cache.pop(key, None)
+        self._local.pop(key, None)
+        try:
+            removed = self._backend.delete(self.namespace, key)
+        except StateBackendError as exc:
+            _backend_warning("shared_state_write_failed", self.namespace, exc)
+            return
+        if not removed:
+            raise KeyError(key)
+
+    def update_item(self, key: str, fn: UpdateFn, ttl: Optional[float] = None) -> Tuple[Any, Any]:
+        """
+        Read-modify-write atomico (anche tra worker con backend condiviso).
+
+        ``fn(valore corrente o None)`` ritorna il nuovo valore (None =
+        cancella) e non deve mutare l'argomento: può essere rieseguita.
+
+        Returns:
+            (valore precedente, valore nuovo)
+
+        Raises:
+            StateBackendError: backend non disponibile
+        """
+        if self._backend is None:
+            with self._lock:
+                previous = self._local.get(key)
+                current = fn(previous)
+                if current is None:
+                    self._local.pop(key, None)
+                else:
+                    self._local[key] = current
+                return previous, current
+        previous, current = self._backend.update(
+            self.namespace, key, fn, ttl=ttl or self.default_ttl
+        )
+        self._remember(key, current)
+        return previous, current
+
+    def patch(self, key: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """Aggiorna atomicamente alcuni campi di un record esistente (None se assente)."""
+        _, current = self.update_item(
+            key, lambda record: None if record is None else {**record, **fields}
+        )
+        return current
+
+    def __iter__(self) -> Iterator[str]:
+        if self._backend is None:
+            return iter(list(self._local))
+        try:
+            return iter(self._backend.keys(self.namespace))
+        except StateBackendError as exc:
+            _backend_warning("shared_state_read_failed", self.namespace, exc)
+            return iter(list(self._local))
+
+    def __len__(self) -> int:
+        if self._backend is None:
+            return len(self._local)
+        return sum(1 for _ in self)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+            self._cache.clear()
+            if self._backend is not None:
+                self._backend.clear(self.namespace)
+
+    def __repr__(self) -> str:
+        backend = self._backend.name if self._backend else "memory"
+        return f"SharedMap({self.namespace!r}, backend={backend!r})"
+
+
+@dataclass
+class _CachedLog:
+    items: List[Any]
+    generation: int
+
+
+class SharedSessionLog(MutableMapping):
+    """
+    Mapping sessione → lista messaggi append-only (``chat_messages_store``).
+
+    Senza backend è un dict di liste del processo. Con backend ogni lettura
+    allinea la copia locale chiedendo solo gli elementi oltre quelli già in
+    cache (una round trip se la sessione non è cambiata): la lista ritornata
+    è la stessa tra una lettura e l'altra, estesa in place. Una
+    sostituzione o cancellazione (nuova generazione) produce una lista nuova.
+
+    Le liste ritornate sono in sola lettura per i chiamanti: i nuovi
+    messaggi vanno aggiunti con ``append``.
+    """
+
+    MAX_CACHED_SESSIONS = 4096
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._backend: Optional[StateBackend] = None
+        self._local: Dict[str, List[Any]] = {}
+        self._cache: "OrderedDict[str, _CachedLog]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def backend(self) -> Optional[StateBackend]:
+        return self._backend
+
+    def use_backend(self, backend: Optional[StateBackend]) -> None:
+        with self._lock:
+            self._backend = backend
+            self._local.clear()
+            self._cache.clear()
+
+    def _cache_put(self, key: str, entry: _CachedLog) -> None:
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.MAX_CACHED_SESSIONS:
+            self._cache.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self._backend is None:
+            return self._local.get(key, default)
+        with self._lock:
+            cached = self._cache.get(key)
+            start = len(cached.items) if cached else 0
+            try:
+                generation, offset, items = self._backend.log_read(
+                    self.namespace, key, start, cached.generation if cached else None
+                )
+            except StateBackendError as exc:
+                _backend_warning("shared_state_read_failed", self.namespace, exc)
+                return cached.items if cached else default
+            if cached is not None and generation == cached.generation and offset == start:
+                cached.items.extend(items)
+                self._cache.move_to_end(key)
+            else:
+                cached = _CachedLog(items=items, generation=generation)
+                self._cache_put(key, cached)
+            if not cached.items:
+                self._cache.pop(key, None)
+                return default
+            return cached.items
+
+    def __getitem__(self, key: str) -> List[Any]:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return self.get(key, _MISSING) is not _MISSING  # type: ignore[arg-type]
+
+    def append(self, key: str, items: Sequence[Any]) -> int:
+        """
+        Aggiunge messaggi in coda alla sessione (atomico rispetto agli altri worker).
+
+        Returns:
+            Messaggi della sessione dopo l'append
+        """
+        if self._backend is None:
+            stored = self._local.setdefault(key, [])
+            stored.extend(items)
+            return len(stored)
+        if not items:
+            return len(self.get(key, []))
+        with self._lock:
+            cached = self._cache.get(key)
+            try:
+                generation, length = self._backend.log_append(self.namespace, key, items)
+            except StateBackendError as exc:
+                _backend_warning("shared_state_write_failed", self.namespace, exc)
+                if cached is None:
+                    return len(items)
+                cached.items.extend(items)
+                return len(cached.items)
+            if cached is not None and cached.generation == generation and (
+                len(cached.items) + len(items) == length
+            ):
+                cached.items.extend(items)
+                self._cache.move_to_end(key)
+            elif cached is not None:
+                # Altri worker hanno scritto nel frattempo: riallineamento alla prossima lettura
+                self._cache.pop(key, None)
+            return length
+
+    def __setitem__(self, key: str, items: List[Any]) -> None:
+        if self._backend is None:
+            self._local[key] = items
+            return
+        with self._lock:
+            try:
+                generation = self._backend.log_replace(self.namespace, key, items)
+            except StateBackendError as exc:
+                _backend_warning("shared_state_write_failed", self.namespace, exc)
+                return
+            self._cache_put(key, _CachedLog(items=items, generation=generation))
+
+    def __delitem__(self, key: str) -> None:
+        if self._backend is None:
+            del self._local[key]
+            return
+        with self._lock:
+            self._cache.pop(key, None)
+            try:
+                self._backend.log_delete(self.namespace, key)
+            except StateBackendError as exc:
+                _backend_warning("shared_state_write_failed", self.namespace, exc)
+
+    def __iter__(self) -> Iterator[str]:
+        if self._backend is None:
+            return iter(list(self._local))
+        try:
+            return iter(self._backend.log_keys(self.namespace))
+        except StateBackendError as exc:
+            _backend_warning("shared_state_read_failed", self.namespace, exc)
+            return iter(list(self._cache))
+
+    def __len__(self) -> int:
+        if self._backend is None:
+            return len(self._local)
+        try:
+            return self._backend.log_count(self.namespace)
+        except StateBackendError as exc:
+            _backend_warning("shared_state_read_failed", self.namespace, exc)
+            return len(self._cache)
+
+    def keys(self):
+        return self._local.keys() if self._backend is None else super().keys()
+
+    def values(self):
+        return self._local.values() if self._backend is None else super().values()
+
+    def items(self):
+        return self._local.items() if self._backend is None else super().items()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+            self._cache.clear()
+            if self._backend is not None:
+                self._backend.log_clear(self.namespace)
+
+    def __repr__(self) -> str:
+        backend = self._backend.name if self._backend else "memory"
+        return f"SharedSessionLog({self.namespace!r}, backend={backend!r})"
+
+
+# -------------------------------
+# Configurazione
+# -------------------------------
+
+_state_backend: Optional[StateBackend] = None
+
+
+def get_state_backend() -> Optional[StateBackend]:
+    """Backend condiviso attivo (None = stato per processo)."""
+    return _state_backend
+
+
+def create_state_backend(settings: Any) -> Optional[StateBackend]:
+    """
+    Backend da ``settings.shared_state_backend``.
+
+    Returns:
+        Backend pronto, o None per ``memory`` e se il backend non è
+        raggiungibile (warning: si resta sullo stato per processo)
+    """
+    kind = settings.shared_state_backend
+    if kind == "memory":
+        return None
+
+    try:
+        if kind == "redis":
+            if redis is None:
+                raise StateBackendError("redis package not installed")
+            redis_url = settings.shared_state_redis_url or settings.celery_broker_url
+            backend: StateBackend = RedisStateBackend(redis.from_url(  # type: ignore[attr-defined]
+                redis_url,
+                decode_responses=True,
+                socket_timeout=0.5,
+                socket_connect_timeout=0.5,
+            ))
+        else:
+            path = Path(settings.shared_state_shm_path) if settings.shared_state_shm_path else default_shm_path()
+            backend = SQLiteStateBackend(path)
+        backend.ping()
+    except (StateBackendError, OSError) as exc:
+        logger.warning({
+            "event": "shared_state_unavailable",
+            "backend": kind,
+            "error": str(exc),
+            "fallback": "memory",
+        })
+        return None
+    return backend
+
+
+def configure_shared_state(settings: Any, backend: Any = _MISSING) -> str:
+    """
+    Collega gli store di ``api/stores.py`` al backend configurato.
+
+    Args:
+        settings: Settings applicazione
+        backend: Backend esplicito (test); default da ``create_state_backend``
+
+    Returns:
+        Backend attivo ("memory", "redis" o "shm")
+    """
+    global _state_backend
+    from . import stores
+
+    if backend is _MISSING:
+        backend = create_state_backend(settings)
+    previous, _state_backend = _state_backend, backend
+    stores.use_state_backend(backend, cache_ttl=settings.shared_state_cache_ttl_seconds)
+    if previous is not None and previous is not backend:
+        previous.close()
+
+    name = backend.name if backend is not None else "memory"
+    if backend is not None:
+        logger.info({
+            "event": "shared_state_configured",
+            "backend": name,
+            "cache_ttl_seconds": settings.shared_state_cache_ttl_seconds,
+        })
+    return name
+
+
+__all__ = [
+    "REDIS_KEY_PREFIX",
+    "RedisStateBackend",
+    "SQLiteStateBackend",
+    "SharedMap",
+    "SharedSessionLog",
+    "StateBackend",
+    "StateBackendError",
+    "configure_shared_state",
+    "create_state_backend",
+    "decode_value",
+    "default_shm_path",
+    "encode_value",
+    "get_state_backend",
+]
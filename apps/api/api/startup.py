@@ -0,0 +1,193 @@
+"""
+Profilo di avvio e warmup del worker.
+
+``import api.main`` carica solo il necessario per servire le route: le
+dipendenze pesanti sono differite (``utils/lazy_import.py``). Quello che
+serve comunque alla prima chat viene precaricato qui, in ``lifespan``
+prima del ``yield``: finché il warmup non termina il worker non accetta
+request (``/health`` incluso), quindi il primo utente non paga lo stallo
+di caricamento.
+
+Componenti (``STARTUP_WARMUP_COMPONENTS``):
+- ``tiktoken``: encoder del ConversationManager e del context packer
+  (la prima ``encoding_for_model`` scarica/legge il BPE)
+- ``llm_clients``: chain chat compilata (ChatOpenAI o gateway),
+  embeddings OpenAI e modulo supabase
+- ``reranker``: cross-encoder caricato + una predict di prova (solo con
+  ``ENABLE_CROSS_ENCODER_RERANKING``)
+
+I componenti girano in parallelo nel threadpool; un errore o il timeout
+complessivo non bloccano l'avvio (il componente resta lazy, come prima).
+
+``startup_profile`` raccoglie le durate delle fasi (import app, pool DB,
+warmup per componente), loggate come evento ``startup_profile`` e lette da
+``GET /api/v1/admin/debug/startup``.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger("api")
+
+
+class StartupProfile:
+    """Durate (ms) delle fasi di avvio del processo."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+        self.warmup: Dict[str, Dict[str, Any]] = {}
+        self.ready_at: Optional[float] = None
+
+    def record(self, phase: str, duration_ms: float) -> None:
+        with self._lock:
+            self.phases[phase] = round(duration_ms, 1)
+
+    def record_component(
+        self, name: str, status: str, duration_ms: float, error: Optional[str] = None
+    ) -> None:
+        entry: Dict[str, Any] = {"status": status, "duration_ms": round(duration_ms, 1)}
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self.warmup[name] = entry
+
+    def mark_ready(self) -> None:
+        self.ready_at = time.time()
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "ready": self.ready_at is not None,
+                "ready_at": self.ready_at,
+                "phases_ms": dict(self.phases),
+                "warmup": {name: dict(entry) for name, entry in self.warmup.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.phases.clear()
+            self.warmup.clear()
+            self.ready_at = None
+
+
+# Istanza di processo
+startup_profile = StartupProfile()
+
+
+@contextmanager
+def startup_phase(phase: str) -> Iterator[None]:
+    """Misura il blocco come fase di avvio (registrata anche se solleva)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_profile.record(phase, (time.perf_counter() - started) * 1000.0)
+
+
+def _warm_tiktoken(settings: Any) -> None:
+    from .knowledge_base.context_packer import make_token_counter
+    from .services.conversation_service import TIKTOKEN_AVAILABLE
+
+    if not TIKTOKEN_AVAILABLE:
+        raise RuntimeError("tiktoken non installato")
+    import tiktoken
+
+    # Cache encoding di tiktoken: il ConversationManager la riusa all'init
+    tiktoken.encoding_for_model("gpt-3.5-turbo")
+    make_token_counter(settings.openai_model)("warmup")
+
+
+def _warm_llm_clients(settings: Any) -> None:
+    from .knowledge_base.search import _get_embeddings_model
+    from .routers.chat import _get_chat_chain
+
+    _get_chat_chain(settings)
+    _get_embeddings_model()
+    import supabase  # noqa: F401  (client creato per request)
+
+
+def _warm_reranker(settings: Any) -> Optional[str]:
+    if not settings.enable_cross_encoder_reranking:
+        return "skipped"
+    from .knowledge_base.enhanced_retrieval import _get_cross_encoder_model
+
+    model = _get_cross_encoder_model(settings.cross_encoder_model_name)
+    # Prima predict: inizializzazione kernel/threadpool torch fuori dalla request
+    model.predict([("warmup", "warmup")])
+    return None
+
+
+# nome -> funzione sync (eseguita nel threadpool); ritorna None ("ok") o "skipped"
+WARMUP_COMPONENTS: Dict[str, Callable[[Any], Optional[str]]] = {
+    "tiktoken": _warm_tiktoken,
+    "llm_clients": _warm_llm_clients,
+    "reranker": _warm_reranker,
+}
+
+
+async def _run_component(name: str, settings: Any) -> None:
+    started = time.perf_counter()
+    try:
+        outcome = await asyncio.to_thread(WARMUP_COMPONENTS[name], settings)
+    except Exception as exc:
+        startup_profile.record_component(
+            name, "error", (time.perf_counter() - started) * 1000.0, f"{type(exc).__name__}: {exc}"
+        )
+        logger.warning({
+            "event": "startup_warmup_component_failed",
+            "component": name,
+            "error": str(exc),
+        })
+    else:
+        startup_profile.record_component(
+            name, outcome or "ok", (time.perf_counter() - started) * 1000.0
+        )
+
+
+async def run_warmup(settings: Any) -> Dict[str, Dict[str, Any]]:
+    """
+    Esegue i componenti di warmup configurati (paralleli, entro il timeout).
+
+    Returns:
+        Esito per componente (status ok/error/timeout, duration_ms)
+    """
+    if not settings.startup_warmup_enabled:
+        return {}
+
+    components = [name for name in settings.startup_warmup_components if name in WARMUP_COMPONENTS]
+    tasks = {name: asyncio.create_task(_run_component(name, settings)) for name in components}
+    with startup_phase("warmup"):
+        if tasks:
+            _, pending = await asyncio.wait(
+                tasks.values(), timeout=settings.startup_warmup_timeout_seconds
+            )
+            for name, task in tasks.items():
+                if task in pending:
+                    # Il thread continua in background: il componente sarà pronto più tardi
+                    task.cancel()
+                    startup_profile.record_component(
+                        name, "timeout", settings.startup_warmup_timeout_seconds * 1000.0
+                    )
+
+    warmup = startup_profile.as_dict()["warmup"]
+    logger.info({
+        "event": "startup_warmup_completed",
+        "duration_ms": startup_profile.phases.get("warmup"),
+        "components": warmup,
+    })
+    return warmup
+
+
+__all__ = [
+    "StartupProfile",
+    "WARMUP_COMPONENTS",
+    "run_warmup",
+    "startup_phase",
+    "startup_profile",
+]
@@ -1,18 +1,32 @@
 """
-In-memory stores per MVP (Tech Debt).
+Store di stato applicativo (Tech Debt: in produzione persistenza DB).
 
-Note: In produzione questi store dovrebbero essere sostituiti con persistenza DB.
+Di default per processo (dict in memoria). Con ``SHARED_STATE_BACKEND``
+redis o shm gli store sono condivisi tra i worker (``api/shared_state.py``):
+nessuna sticky session necessaria. Gli oggetti restano gli stessi per tutta
+la vita del processo, quindi gli import ``from ..stores import ...`` valgono
+anche dopo ``configure_shared_state``.
 
 Stores:
-- chat_messages_store: Messaggi chat per sessione (Story 3.2)
+- chat_messages_store: Messaggi chat per sessione (Story 3.2), append-only
+- conversation_summaries_store: Riassunto rolling per sessione
 - feedback_store: Feedback utente per messaggi (Story 3.4)
 - sync_jobs_store: Status sync jobs KB (Story 2.4)
-- _rate_limit_store: Rate limiting tracking (Story 1.3.1)
+- access_codes_store: Access code mono-uso (Story 1.3)
+- corpus_state_store: Versione corpus per la cache risultati di retrieval
+- _rate_limit_store: Rate limiting tracking (Story 1.3.1), sempre per
+  processo: con backend condiviso è il fallback del limiter
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-# Store in-memory per messaggi chat per sessione (Story 3.2)
-chat_messages_store: Dict[str, list[Dict[str, Any]]] = {}
+from .shared_state import SharedMap, SharedSessionLog, StateBackend
+
+# Messaggi chat per sessione (Story 3.2): aggiungere con ``append``
+chat_messages_store = SharedSessionLog("chat_messages")
+
+# Riassunto rolling per sessione: {summary, covered_messages, updated_at}
+# covered_messages = numero messaggi iniziali di chat_messages_store coperti
+conversation_summaries_store = SharedMap("conversation_summaries")
 
 # DEPRECATED: feedback_store in-memory rimosso in Story 4.2.4
 # Feedback ora persistito su Supabase tabella public.feedback
@@ -22,9 +36,21 @@ chat_messages_store: Dict[str, list[Dict[str, Any]]] = {}
 #   - GET /api/v1/admin/analytics (apps/api/api/routers/admin.py)
 # feedback_store: Dict[str, Dict[str, Any]] = {}  # NO LONGER USED
 
-# Store in-memory per job di indicizzazione (Story 2.4)
-sync_jobs_store: Dict[str, Dict[str, Any]] = {}
+# Job di indicizzazione (Story 2.4), conservati 7 giorni con backend condiviso
+sync_jobs_store = SharedMap("sync_jobs", default_ttl=7 * 24 * 3600)
+
+# Access code mono-uso (Story 1.3): mai da cache, il riscatto è atomico
+access_codes_store = SharedMap("access_codes", cacheable=False)
 
-# Store in-memory per rate limiting (Story 1.3.1)
+# Versione corpus (api/knowledge_base/retrieval_cache.py): {"version": int}
+corpus_state_store = SharedMap("corpus_state")
+
+# Store in-memory per rate limiting (Story 1.3.1): scope -> {key: TAT GCRA}
 _rate_limit_store: Dict[str, Dict[str, Any]] = {}
 
+
+def use_state_backend(backend: Optional[StateBackend], cache_ttl: float = 0.0) -> None:
+    """Collega gli store condivisibili a ``backend`` (None = per processo)."""
+    chat_messages_store.use_backend(backend)
+    for store in (conversation_summaries_store, sync_jobs_store, access_codes_store, corpus_state_store):
+        store.use_backend(backend, cache_ttl=cache_ttl)
@@ -0,0 +1,55 @@
+"""
+Import differito di dipendenze pesanti fuori dal percorso di avvio.
+
+``import api.main`` non deve caricare ``langchain_openai`` (+ openai,
+langsmith), ``supabase``, il vector store LangChain o celery: il worker
+costa secondi in più a partire e le classi servono solo alla prima
+request (o al warmup in ``lifespan``, vedi ``api/startup.py``).
+
+Dove basta, l'import è locale alla funzione (stile già usato in
+``dependencies._get_supabase_client``). ``lazy_import`` serve quando il nome
+deve restare un attributo del modulo (``patch("modulo.ChatOpenAI")`` nei
+test, callable passati ad altri componenti): il proxy importa il modulo
+alla prima chiamata e risolve l'attributo a ogni uso (un lookup in
+``sys.modules``), quindi anche un patch del modulo sorgente è visto.
+"""
+import importlib
+from typing import Any, Optional
+
+
+class LazyAttribute:
+    """Proxy callable di ``module.name`` importato al primo utilizzo."""
+
+    __slots__ = ("_module", "_name", "_package")
+
+    def __init__(self, module: str, name: str, package: Optional[str] = None) -> None:
+        self._module = module
+        self._name = name
+        self._package = package
+
+    def resolve(self) -> Any:
+        return getattr(importlib.import_module(self._module, self._package), self._name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.resolve(), item)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self._module}.{self._name}>"
+
+
+def lazy_import(module: str, name: str, package: Optional[str] = None) -> Any:
+    """
+    Attributo ``name`` di ``module`` importato al primo utilizzo.
+
+    Args:
+        module: Modulo (assoluto, o relativo con ``package``)
+        name: Attributo del modulo (classe o funzione)
+        package: Package di riferimento per import relativi (``__package__``)
+    """
+    return LazyAttribute(module, name, package)
+
+
+__all__ = ["LazyAttribute", "lazy_import"]
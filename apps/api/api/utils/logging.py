@@ -1,45 +1,289 @@
 """
 Logging utilities per structured logging.
 
-Fornisce JSONFormatter per log strutturati.
+Fornisce JSONFormatter per log strutturati e una pipeline non bloccante:
+
+- ``AsyncQueueHandler`` sul logger "api": il thread della request crea solo
+  il LogRecord e lo accoda (``put_nowait``, coda limitata; se piena il
+  record è scartato e contato, mai bloccante)
+- ``BatchingLogWriter``: thread daemon che svuota la coda a batch,
+  serializza in JSON (orjson se disponibile) e scrive ogni batch con una
+  sola ``write`` + ``flush``
+- ``EventLogFilter``: livello e sampling per evento (chiave ``event`` dei
+  log dict), applicati prima dell'accodamento
+
+Con ``LOG_ASYNC_ENABLED=false`` si torna al ``StreamHandler`` sincrono.
 """
+import atexit
 import logging
 import json
+import queue
+import random
+import sys
+import threading
 from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from typing import IO, Any, Dict, List, Mapping, Optional
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - library missing in some environments
+    orjson = None
+
+
+def _dumps_stdlib(data: Dict[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_log(data: Dict[str, Any]) -> str:
+        """Serializza un record di log (orjson, fallback json stdlib)."""
+        try:
+            return orjson.dumps(data, default=str, option=_ORJSON_OPTIONS).decode("utf-8")
+        except TypeError:
+            # es. interi oltre 64 bit: il modulo json li gestisce
+            return _dumps_stdlib(data)
+else:  # pragma: no cover - library missing in some environments
+    dumps_log = _dumps_stdlib
 
 
 class JSONFormatter(logging.Formatter):
     """
     Formatter per logging strutturato in JSON.
-    
+
     Features:
-    - Timestamp ISO 8601
+    - Timestamp ISO 8601 (creazione del record, non della scrittura)
     - Structured data
     - Extra fields support
     """
-    
+
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         base: dict = {}
-        
+
         # Se il messaggio è già un dict, usalo direttamente
         if isinstance(record.msg, dict):
             base.update(record.msg)
         else:
             base["message"] = record.getMessage()
-        
+
         base.setdefault("level", record.levelname)
         base.setdefault("logger", record.name)
-        base.setdefault("time", datetime.now(timezone.utc).isoformat())
-        
-        return json.dumps(base, ensure_ascii=False)
+        base.setdefault("time", datetime.fromtimestamp(record.created, timezone.utc).isoformat())
+        if record.exc_info:
+            base.setdefault("exc_info", self.formatException(record.exc_info))
+
+        return dumps_log(base)
+
 
+def _to_level(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    return logging.getLevelNamesMapping()[str(value).upper()]
 
-def setup_logging():
-    """Setup application logging con JSONFormatter."""
+
+class EventLogFilter(logging.Filter):
+    """
+    Livello e sampling per evento (log dict con chiave ``event``).
+
+    Args:
+        event_levels: event -> livello (es. {"conversation_manager_type": "DEBUG"});
+            il record assume quel livello ed è scartato se sotto ``min_level``
+        sample_rates: event -> frazione di record tenuti (0..1); i record
+            campionati riportano ``sample_rate`` per la ripesatura a valle
+        min_level: Livello minimo del logger
+    """
+
+    def __init__(
+        self,
+        event_levels: Optional[Mapping[str, Any]] = None,
+        sample_rates: Optional[Mapping[str, float]] = None,
+        min_level: int = logging.INFO,
+    ) -> None:
+        super().__init__()
+        self.event_levels = {
+            event: _to_level(level)
+            for event, level in (event_levels or {}).items()
+        }
+        self.sample_rates = {
+            event: min(max(float(rate), 0.0), 1.0)
+            for event, rate in (sample_rates or {}).items()
+        }
+        self.min_level = min_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        msg = record.msg
+        if not isinstance(msg, dict):
+            return True
+        event = msg.get("event")
+        if event is None:
+            return True
+
+        level = self.event_levels.get(event)
+        if level is not None:
+            if level < self.min_level:
+                return False
+            record.levelno = level
+            record.levelname = logging.getLevelName(level)
+
+        rate = self.sample_rates.get(event)
+        if rate is not None and rate < 1.0:
+            if random.random() >= rate:
+                return False
+            record.msg = {**msg, "sample_rate": rate}
+        return True
+
+
+class AsyncQueueHandler(QueueHandler):
+    """QueueHandler non bloccante: niente formattazione sul thread chiamante."""
+
+    def __init__(self, log_queue: "queue.Queue[Any]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Copia superficiale del dict: il chiamante può riusarlo dopo il log
+        if isinstance(record.msg, dict):
+            record.msg = dict(record.msg)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_STOP = object()
+
+
+class BatchingLogWriter:
+    """Thread daemon che formatta e scrive i record accodati a batch."""
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[Any]",
+        stream: IO[str],
+        formatter: logging.Formatter,
+        batch_size: int = 256,
+    ) -> None:
+        self.queue = log_queue
+        self.stream = stream
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.batches_written = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Scrive i record ancora in coda e ferma il thread."""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _format(self, record: logging.LogRecord) -> str:
+        try:
+            return self.formatter.format(record)
+        except Exception as exc:
+            return dumps_log({
+                "event": "log_format_error",
+                "logger": record.name,
+                "level": record.levelname,
+                "error": str(exc),
+            })
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch: List[logging.LogRecord] = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            payload = "".join(self._format(record) + "\n" for record in batch)
+            try:
+                self.stream.write(payload)
+                self.stream.flush()
+            except Exception:  # stream chiuso/rotto: i log non devono fermare il writer
+                pass
+            self.batches_written += 1
+
+
+_pipeline: Optional[Dict[str, Any]] = None
+
+
+def shutdown_logging() -> None:
+    """Svuota la coda dei log e ferma il writer (idempotente)."""
+    global _pipeline
+    if _pipeline is None:
+        return
+    writer: Optional[BatchingLogWriter] = _pipeline.get("writer")
+    if writer is not None:
+        writer.stop()
+    _pipeline = None
+
+
+def setup_logging(settings: Any = None) -> None:
+    """
+    Setup application logging con JSONFormatter.
+
+    Args:
+        settings: Settings applicative (None = default: pipeline asincrona,
+            nessun override per evento)
+    """
+    global _pipeline
     logger = logging.getLogger("api")
-    handler = logging.StreamHandler()
-    handler.setFormatter(JSONFormatter())
+    level = _to_level(getattr(settings, "log_level", "INFO"))
+
+    # Idempotente: rimuove l'handler installato da una chiamata precedente
+    if _pipeline is not None:
+        logger.removeHandler(_pipeline["handler"])
+        shutdown_logging()
+
+    event_filter = EventLogFilter(
+        event_levels=getattr(settings, "log_event_levels", None),
+        sample_rates=getattr(settings, "log_event_sample_rates", None),
+        min_level=level,
+    )
+
+    writer: Optional[BatchingLogWriter] = None
+    if getattr(settings, "log_async_enabled", True):
+        log_queue: "queue.Queue[Any]" = queue.Queue(
+            maxsize=getattr(settings, "log_queue_max_size", 10000)
+        )
+        handler: logging.Handler = AsyncQueueHandler(log_queue)
+        writer = BatchingLogWriter(
+            log_queue,
+            sys.stderr,
+            JSONFormatter(),
+            batch_size=getattr(settings, "log_batch_size", 256),
+        )
+        writer.start()
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JSONFormatter())
+
+    handler.addFilter(event_filter)
     logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level)
     logger.propagate = False
+    _pipeline = {"handler": handler, "writer": writer}
+
+
+atexit.register(shutdown_logging)
@@ -1,8 +1,9 @@
 """
 Metrics collection utilities (Story 9.1).
 
-Stub implementation per metrics collection. In produzione sostituire con
-Prometheus client, StatsD, o DataDog StatsD client.
+Collector in-memory per le statistiche interne (admin/debug); ogni valore
+è inoltrato anche all'exporter Prometheus (api/utils/prometheus_exporter.py)
+come ``rag_<name>``, aggregato tra worker ed esposto su GET /metrics.
 
 Story 9.1 AC7: Metrics per DB writes, cache performance, session tracking,
 backpressure, circuit breaker, outbox queue.
@@ -15,31 +16,37 @@ Usage:
     metrics.gauge("active_sessions_count", 12)
 """
 import logging
-from typing import Dict, List
+from typing import Dict
+
+from .prometheus_exporter import bridge_counter, bridge_gauge, bridge_histogram
+from .quantiles import WindowedQuantileSketch
 
 logger = logging.getLogger("metrics")
 
+# Finestra scorrevole degli histogram (secondi)
+HISTOGRAM_WINDOW_SECONDS = 600
+
 
 class MetricsCollector:
     """
-    In-memory metrics collector (stub implementation).
+    In-memory metrics collector con bridge verso Prometheus.
     
     Story 9.1 AC7: Collects counters, histograms, gauges per monitoring.
     
     Features:
     - Counters: Incremento monotono (es. db_writes_succeeded)
-    - Histograms: Distribuzioni valori (es. db_write_latency_ms)
+    - Histograms: Distribuzioni valori (es. db_write_latency_ms), sketch
+      a memoria fissa su finestra di HISTOGRAM_WINDOW_SECONDS
     - Gauges: Valori point-in-time (es. active_sessions_count)
     
     Production:
-        Replace with Prometheus client:
-        from prometheus_client import Counter, Histogram, Gauge
+        I valori sono esportati da prometheus_exporter (scrape GET /metrics)
     """
     
     def __init__(self):
         """Initialize metrics storage."""
         self._counters: Dict[str, int] = {}
-        self._histograms: Dict[str, List[float]] = {}
+        self._histograms: Dict[str, WindowedQuantileSketch] = {}
         self._gauges: Dict[str, float] = {}
     
     def increment(self, name: str, value: int = 1) -> None:
@@ -52,6 +59,7 @@ class MetricsCollector:
         """
         current = self._counters.get(name, 0)
         self._counters[name] = current + value
+        bridge_counter(name, value)
         
         logger.debug({
             "event": "metric_counter_increment",
@@ -68,14 +76,13 @@ class MetricsCollector:
             name: Metric name (es. 'db_write_latency_ms')
             value: Observed value
         """
-        if name not in self._histograms:
-            self._histograms[name] = []
-        
-        self._histograms[name].append(value)
-        
-        # Keep only last 1000 samples per metric (memory bound)
-        if len(self._histograms[name]) > 1000:
-            self._histograms[name] = self._histograms[name][-1000:]
+        sketch = self._histograms.get(name)
+        if sketch is None:
+            sketch = self._histograms.setdefault(
+                name, WindowedQuantileSketch(window_seconds=HISTOGRAM_WINDOW_SECONDS)
+            )
+        sketch.record(value)
+        bridge_histogram(name, value)
         
         logger.debug({
             "event": "metric_histogram_record",
@@ -92,6 +99,7 @@ class MetricsCollector:
             value: Current value
         """
         self._gauges[name] = value
+        bridge_gauge(name, value)
         
         logger.debug({
             "event": "metric_gauge_set",
@@ -121,9 +129,10 @@ class MetricsCollector:
         Returns:
             Dict con min, max, p50, p95, p99, count
         """
-        samples = self._histograms.get(name, [])
+        sketch = self._histograms.get(name)
+        minimum, maximum = sketch.bounds() if sketch is not None else (None, None)
         
-        if not samples:
+        if minimum is None:
             return {
                 "count": 0,
                 "min": 0.0,
@@ -133,27 +142,14 @@ class MetricsCollector:
                 "p99": 0.0,
             }
         
-        sorted_samples = sorted(samples)
-        count = len(sorted_samples)
-        
-        def percentile(p: float) -> float:
-            """Calculate percentile."""
-            k = (count - 1) * p
-            f = int(k)
-            c = f + 1
-            if c >= count:
-                return sorted_samples[-1]
-            d0 = sorted_samples[f] * (c - k)
-            d1 = sorted_samples[c] * (k - f)
-            return d0 + d1
-        
+        p50, p95, p99 = sketch.quantiles((0.50, 0.95, 0.99), interpolate=True)
         return {
-            "count": count,
-            "min": sorted_samples[0],
-            "max": sorted_samples[-1],
-            "p50": percentile(0.50),
-            "p95": percentile(0.95),
-            "p99": percentile(0.99),
+            "count": sketch.count,
+            "min": minimum,
+            "max": maximum,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
         }
     
     def get_gauge(self, name: str) -> float:
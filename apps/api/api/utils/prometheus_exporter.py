@@ -0,0 +1,287 @@
+"""
+Exporter Prometheus unificato: un solo registry per tutti i sottosistemi.
+
+Metriche esposte su ``GET /metrics``:
+- ``rag_chat_stage_duration_seconds{stage}``: stadi pipeline chat
+  (retrieval, tier di retrieval, generation, total)
+- ``rag_cache_requests_total{cache,result}``: hit/miss per cache
+  (classification, retrieval, chunk, conversation)
+- ``rag_db_pool_connections{state}``: pool asyncpg (size, idle, in_use, max)
+- ``rag_watcher_*``: documenti, classificazioni, latenza e strategie watcher
+- ``rag_<name>``: bridge dal ``MetricsCollector`` (outbox depth, circuit
+  breaker, db writes, ...), così ogni ``metrics.increment/histogram/gauge``
+  esistente è esportato senza toccare i chiamanti
+
+Multiprocess: con ``PROMETHEUS_MULTIPROC_DIR`` impostata *prima* dell'avvio
+dei worker, prometheus_client scrive i valori di ogni worker su file mmap in
+quella directory e ``render_metrics`` li aggrega con ``MultiProcessCollector``:
+lo scrape su qualunque worker restituisce il totale. La directory va svuotata
+dal processo master prima di avviare i worker; allo shutdown ogni worker
+chiama ``mark_worker_dead`` per le gauge ``live*``. Senza la variabile si usa
+il ``REGISTRY`` di processo (sviluppo, worker singolo).
+
+Se prometheus_client non è installato tutte le funzioni sono no-op.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        REGISTRY,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except Exception:  # pragma: no cover - library missing in some environments
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    REGISTRY = None
+    CollectorRegistry = Counter = Gauge = Histogram = None  # type: ignore
+    generate_latest = multiprocess = None  # type: ignore
+
+logger = logging.getLogger("metrics")
+
+PROMETHEUS_AVAILABLE = Counter is not None
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+METRIC_PREFIX = "rag_"
+
+# Bucket latenze (secondi): da cache hit (~1ms) a generazione LLM lenta
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+# Aggregazione cross-worker delle gauge del bridge: default "livemax"
+# (es. circuit breaker aperto in almeno un worker, outbox su file condiviso);
+# le gauge per-processo che vanno sommate sono elencate qui
+BRIDGE_GAUGE_MODES: Dict[str, str] = {
+    "active_sessions_count": "livesum",
+}
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _multiproc_dir() -> Optional[str]:
+    return os.environ.get(MULTIPROC_DIR_ENV) or os.environ.get(MULTIPROC_DIR_ENV.lower())
+
+
+if PROMETHEUS_AVAILABLE:
+    CHAT_STAGE_SECONDS = Histogram(
+        "rag_chat_stage_duration_seconds",
+        "Durata degli stadi della pipeline chat",
+        ["stage"],
+        buckets=LATENCY_BUCKETS,
+    )
+    CACHE_REQUESTS = Counter(
+        "rag_cache_requests_total",
+        "Lookup in cache per esito",
+        ["cache", "result"],
+    )
+    DB_POOL_CONNECTIONS = Gauge(
+        "rag_db_pool_connections",
+        "Connessioni del pool asyncpg per stato (somma sui worker vivi)",
+        ["state"],
+        multiprocess_mode="livesum",
+    )
+    WATCHER_DOCUMENTS = Counter(
+        "rag_watcher_documents",
+        "Documenti processati dal watcher",
+    )
+    WATCHER_CLASSIFICATIONS = Counter(
+        "rag_watcher_classifications",
+        "Classificazioni watcher per esito",
+        ["outcome"],
+    )
+    WATCHER_CLASSIFICATION_SECONDS = Histogram(
+        "rag_watcher_classification_duration_seconds",
+        "Latenza classificazione watcher",
+        buckets=LATENCY_BUCKETS,
+    )
+    WATCHER_STRATEGIES = Counter(
+        "rag_watcher_strategy_selections",
+        "Strategie di chunking selezionate dal watcher",
+        ["strategy", "fallback"],
+    )
+else:  # pragma: no cover - library missing in some environments
+    CHAT_STAGE_SECONDS = CACHE_REQUESTS = DB_POOL_CONNECTIONS = None
+    WATCHER_DOCUMENTS = WATCHER_CLASSIFICATIONS = None
+    WATCHER_CLASSIFICATION_SECONDS = WATCHER_STRATEGIES = None
+
+_bridge_lock = threading.Lock()
+_bridge_metrics: Dict[Tuple[str, str], Any] = {}
+
+
+def observe_chat_stage(stage: str, duration_ms: float) -> None:
+    """Registra la durata (ms) di uno stadio della pipeline chat."""
+    if CHAT_STAGE_SECONDS is None or duration_ms is None or duration_ms < 0:
+        return
+    CHAT_STAGE_SECONDS.labels(stage).observe(duration_ms / 1000.0)
+
+
+def record_cache_lookup(cache: str, hits: int = 0, misses: int = 0) -> None:
+    """Conta hit e miss di una cache (una chiamata per lookup, anche batch)."""
+    if CACHE_REQUESTS is None:
+        return
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+def record_watcher_document() -> None:
+    if WATCHER_DOCUMENTS is not None:
+        WATCHER_DOCUMENTS.inc()
+
+
+def record_watcher_classification(outcome: str, latency_ms: Optional[float]) -> None:
+    if WATCHER_CLASSIFICATIONS is None:
+        return
+    WATCHER_CLASSIFICATIONS.labels(outcome).inc()
+    if latency_ms is not None and latency_ms >= 0:
+        WATCHER_CLASSIFICATION_SECONDS.observe(latency_ms / 1000.0)
+
+
+def record_watcher_strategy(strategy_name: str, is_fallback: bool) -> None:
+    if WATCHER_STRATEGIES is not None:
+        WATCHER_STRATEGIES.labels(strategy_name, "true" if is_fallback else "false").inc()
+
+
+def sample_db_pool(pool: Any) -> None:
+    """Aggiorna le gauge del pool asyncpg (None = pool chiuso)."""
+    if DB_POOL_CONNECTIONS is None:
+        return
+    if pool is None:
+        size = idle = max_size = 0
+    else:
+        try:
+            size = pool.get_size()
+            idle = pool.get_idle_size()
+            max_size = pool.get_max_size()
+        except Exception as exc:  # pool in chiusura
+            logger.debug({"event": "db_pool_sample_failed", "error": str(exc)})
+            return
+    DB_POOL_CONNECTIONS.labels("size").set(size)
+    DB_POOL_CONNECTIONS.labels("idle").set(idle)
+    DB_POOL_CONNECTIONS.labels("in_use").set(max(size - idle, 0))
+    DB_POOL_CONNECTIONS.labels("max").set(max_size)
+
+
+def _bridge_metric(kind: str, name: str) -> Any:
+    key = (kind, name)
+    metric = _bridge_metrics.get(key)
+    if metric is not None:
+        return metric
+    with _bridge_lock:
+        metric = _bridge_metrics.get(key)
+        if metric is not None:
+            return metric
+        metric_name = METRIC_PREFIX + _INVALID_NAME_CHARS.sub("_", name)
+        documentation = f"MetricsCollector {kind} '{name}'"
+        try:
+            if kind == "counter":
+                metric = Counter(metric_name, documentation)
+            elif kind == "gauge":
+                metric = Gauge(
+                    metric_name,
+                    documentation,
+                    multiprocess_mode=BRIDGE_GAUGE_MODES.get(name, "livemax"),
+                )
+            else:
+                metric = Histogram(metric_name, documentation, buckets=LATENCY_BUCKETS)
+        except ValueError as exc:
+            # Nome già registrato da un altro tipo: la metrica resta solo in-memory
+            logger.warning({
+                "event": "prometheus_bridge_conflict",
+                "metric": metric_name,
+                "kind": kind,
+                "error": str(exc),
+            })
+            metric = False
+        _bridge_metrics[key] = metric
+    return metric
+
+
+def bridge_counter(name: str, value: float) -> None:
+    if not PROMETHEUS_AVAILABLE or value <= 0:
+        return
+    metric = _bridge_metric("counter", name)
+    if metric:
+        metric.inc(value)
+
+
+def bridge_gauge(name: str, value: float) -> None:
+    if not PROMETHEUS_AVAILABLE:
+        return
+    metric = _bridge_metric("gauge", name)
+    if metric:
+        metric.set(value)
+
+
+def bridge_histogram(name: str, value: float) -> None:
+    """Histogram del bridge; i nomi ``*_ms`` sono esportati in secondi."""
+    if not PROMETHEUS_AVAILABLE:
+        return
+    if name.endswith("_ms"):
+        name, value = name[:-3] + "_seconds", value / 1000.0
+    metric = _bridge_metric("histogram", name)
+    if metric:
+        metric.observe(value)
+
+
+def render_metrics(multiproc_dir: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    Serializza tutte le metriche in formato testo Prometheus.
+
+    Args:
+        multiproc_dir: Directory multiprocess (default da PROMETHEUS_MULTIPROC_DIR)
+
+    Returns:
+        (payload, content type)
+
+    Raises:
+        RuntimeError: Se prometheus_client non è installato
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus_client non installato")
+    path = multiproc_dir or _multiproc_dir()
+    if path:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=path)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: Optional[int] = None) -> None:
+    """Rimuove i file live* del worker (da chiamare allo shutdown)."""
+    path = _multiproc_dir()
+    if not PROMETHEUS_AVAILABLE or not path:
+        return
+    try:
+        multiprocess.mark_process_dead(pid or os.getpid(), path)
+    except Exception as exc:
+        logger.warning({"event": "prometheus_mark_dead_failed", "error": str(exc)})
+
+
+__all__ = [
+    "PROMETHEUS_AVAILABLE",
+    "bridge_counter",
+    "bridge_gauge",
+    "bridge_histogram",
+    "mark_worker_dead",
+    "observe_chat_stage",
+    "record_cache_lookup",
+    "record_watcher_classification",
+    "record_watcher_document",
+    "record_watcher_strategy",
+    "render_metrics",
+    "sample_db_pool",
+]
@@ -0,0 +1,322 @@
+"""
+Sketch di quantili in streaming a memoria fissa (core metriche condiviso).
+
+``QuantileSketch`` è un istogramma a bucket logaritmici in stile DDSketch:
+il bucket ``i`` copre ``(gamma^(i-1), gamma^i]`` con
+``gamma = (1 + a) / (1 - a)``. ``record`` è O(1) (un log e due somme) e il
+numero di bucket è limitato dal range tracciabile, quindi la memoria non
+cresce con i campioni. Ogni bucket conserva anche la somma dei valori: il
+quantile restituito è la media del bucket (esatta se il bucket contiene un
+solo valore distinto, altrimenti entro la larghezza del bucket, ~2a
+relativo). Min e max sono esatti.
+
+``WindowedQuantileSketch`` aggiunge una finestra temporale scorrevole:
+``slices`` sotto-sketch ruotano ogni ``window_seconds / slices`` secondi e
+l'aggregato è mantenuto incrementalmente (somma su record, sottrazione
+all'uscita di una slice), quindi una lettura non richiede merge.
+
+Una lettura ordina solo le chiavi dei bucket non vuoti (ordinamento in
+cache, invalidato quando compare o scompare un bucket) e le scansiona una
+volta per tutti i quantili richiesti.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+DEFAULT_RELATIVE_ACCURACY = 0.005
+
+# Range tracciabile (unità del chiamante, tipicamente ms): i valori sotto
+# MIN_TRACKABLE_VALUE finiscono nel bucket zero, quelli sopra
+# MAX_TRACKABLE_VALUE nell'ultimo bucket
+MIN_TRACKABLE_VALUE = 1e-3
+MAX_TRACKABLE_VALUE = 1e9
+
+
+class QuantileSketch:
+    """Istogramma logaritmico con record O(1) e quantili a errore relativo limitato."""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy deve essere in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(gamma)
+        self._max_key = math.ceil(math.log(MAX_TRACKABLE_VALUE) / self._log_gamma)
+        self._zero_key = math.ceil(math.log(MIN_TRACKABLE_VALUE) / self._log_gamma) - 1
+        self._counts: Dict[int, int] = {}
+        self._sums: Dict[int, float] = {}
+        self._sorted_keys: Optional[List[int]] = None
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def _key(self, value: float) -> int:
+        if value <= MIN_TRACKABLE_VALUE:
+            return self._zero_key
+        return min(math.ceil(math.log(value) / self._log_gamma), self._max_key)
+
+    def record(self, value: float) -> None:
+        value = float(value)
+        key = self._key(value)
+        current = self._counts.get(key)
+        if current is None:
+            self._counts[key] = 1
+            self._sums[key] = value
+            self._sorted_keys = None
+        else:
+            self._counts[key] = current + 1
+            self._sums[key] += value
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _check_compatible(self, other: "QuantileSketch") -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("sketch con relative_accuracy diverse")
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Somma ``other`` in questo sketch."""
+        self._check_compatible(other)
+        for key, count in other._counts.items():
+            if key not in self._counts:
+                self._counts[key] = 0
+                self._sums[key] = 0.0
+                self._sorted_keys = None
+            self._counts[key] += count
+            self._sums[key] += other._sums[key]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def subtract(self, other: "QuantileSketch") -> None:
+        """
+        Rimuove i campioni di ``other`` (già sommati in precedenza).
+
+        Min e max non sono ricostruibili: li ricalcola il chiamante.
+        """
+        self._check_compatible(other)
+        for key, count in other._counts.items():
+            remaining = self._counts.get(key, 0) - count
+            if remaining <= 0:
+                self._counts.pop(key, None)
+                self._sums.pop(key, None)
+                self._sorted_keys = None
+            else:
+                self._counts[key] = remaining
+                self._sums[key] -= other._sums[key]
+        self.count = max(0, self.count - other.count)
+        self.sum = self.sum - other.sum if self.count else 0.0
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._sums.clear()
+        self._sorted_keys = None
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _values_at_ranks(self, ranks: Sequence[int]) -> Dict[int, float]:
+        """Valori ai rank (0-based) richiesti, con una sola scansione."""
+        keys = self._sorted_keys
+        if keys is None:
+            keys = self._sorted_keys = sorted(self._counts)
+        values: Dict[int, float] = {}
+        last_rank = self.count - 1
+        position = 0
+        cumulative = 0
+        key = keys[0]
+        for rank in sorted(set(ranks)):
+            if rank <= 0:
+                values[rank] = self.min
+                continue
+            if rank >= last_rank:
+                values[rank] = self.max
+                continue
+            while cumulative <= rank:
+                key = keys[position]
+                cumulative += self._counts[key]
+                position += 1
+            mean = self._sums[key] / self._counts[key]
+            values[rank] = min(max(mean, self.min), self.max)
+        return values
+
+    def quantiles(
+        self,
+        qs: Sequence[float],
+        interpolate: bool = False,
+    ) -> List[Optional[float]]:
+        """
+        Quantili (``q`` in [0, 1]) in una sola scansione.
+
+        Args:
+            qs: Quantili richiesti
+            interpolate: Interpolazione lineare tra rank adiacenti; altrimenti
+                nearest-rank (``round(q * (count - 1))``)
+
+        Returns:
+            Valori nello stesso ordine di ``qs`` (None se sketch vuoto)
+        """
+        if not self.count:
+            return [None for _ in qs]
+        last_rank = self.count - 1
+        plan: List[Tuple[int, int, float]] = []
+        for q in qs:
+            rank = min(max(float(q), 0.0), 1.0) * last_rank
+            if interpolate:
+                low = int(math.floor(rank))
+                plan.append((low, min(low + 1, last_rank), rank - low))
+            else:
+                nearest = int(round(rank))
+                plan.append((nearest, nearest, 0.0))
+        values = self._values_at_ranks([rank for low, high, _ in plan for rank in (low, high)])
+        results: List[Optional[float]] = []
+        for low, high, weight in plan:
+            value = values[low]
+            if weight:
+                value += (values[high] - value) * weight
+            results.append(value)
+        return results
+
+    def quantile(self, q: float, interpolate: bool = False) -> Optional[float]:
+        return self.quantiles((q,), interpolate=interpolate)[0]
+
+
+def sketch_from_values(
+    values: Iterable[float],
+    relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+) -> QuantileSketch:
+    """Sketch costruito da una sequenza di campioni."""
+    sketch = QuantileSketch(relative_accuracy)
+    for value in values:
+        sketch.record(value)
+    return sketch
+
+
+class WindowedQuantileSketch:
+    """Sketch su finestra temporale scorrevole, thread-safe."""
+
+    def __init__(
+        self,
+        window_seconds: float = 300.0,
+        slices: int = 6,
+        relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if window_seconds <= 0 or slices < 1:
+            raise ValueError("window_seconds > 0 e slices >= 1 richiesti")
+        self.window_seconds = float(window_seconds)
+        self.relative_accuracy = relative_accuracy
+        self._slice_seconds = self.window_seconds / slices
+        self._max_slices = slices
+        self._clock = clock
+        self._slices: Deque[Tuple[int, QuantileSketch]] = deque()
+        self._total = QuantileSketch(relative_accuracy)
+        self._lock = threading.Lock()
+
+    def _expire(self, epoch: int) -> None:
+        expired = False
+        while self._slices and self._slices[0][0] <= epoch - self._max_slices:
+            _, old = self._slices.popleft()
+            self._total.subtract(old)
+            expired = True
+        if expired:
+            # Min/max della finestra dalle slice rimaste (al più ``slices``)
+            self._total.min = min((s.min for _, s in self._slices), default=math.inf)
+            self._total.max = max((s.max for _, s in self._slices), default=-math.inf)
+
+    def _epoch(self) -> int:
+        return int(self._clock() // self._slice_seconds)
+
+    def record(self, value: float) -> None:
+        with self._lock:
+            epoch = self._epoch()
+            self._expire(epoch)
+            if not self._slices or self._slices[-1][0] != epoch:
+                self._slices.append((epoch, QuantileSketch(self.relative_accuracy)))
+            self._slices[-1][1].record(value)
+            self._total.record(value)
+
+    def quantiles(
+        self,
+        qs: Sequence[float],
+        interpolate: bool = False,
+    ) -> List[Optional[float]]:
+        with self._lock:
+            self._expire(self._epoch())
+            return self._total.quantiles(qs, interpolate=interpolate)
+
+    def quantile(self, q: float, interpolate: bool = False) -> Optional[float]:
+        return self.quantiles((q,), interpolate=interpolate)[0]
+
+    def snapshot(self) -> QuantileSketch:
+        """Copia dell'aggregato della finestra corrente."""
+        with self._lock:
+            self._expire(self._epoch())
+            copy = QuantileSketch(self.relative_accuracy)
+            copy.merge(self._total)
+            return copy
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            self._expire(self._epoch())
+            return self._total.count
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> Optional[float]:
+        with self._lock:
+            self._expire(self._epoch())
+            return self._total.mean
+
+    def bounds(self) -> Tuple[Optional[float], Optional[float]]:
+        """(min, max) esatti della finestra, None se vuota."""
+        with self._lock:
+            self._expire(self._epoch())
+            if not self._total.count:
+                return None, None
+            return self._total.min, self._total.max
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slices.clear()
+            self._total.clear()
+
+
+AnySketch = Union[QuantileSketch, WindowedQuantileSketch]
+
+
+def as_sketch(source: Union[AnySketch, Iterable[float]]) -> QuantileSketch:
+    """Sketch (non windowed) da uno sketch esistente o da una lista di campioni."""
+    if isinstance(source, WindowedQuantileSketch):
+        return source.snapshot()
+    if isinstance(source, QuantileSketch):
+        return source
+    return sketch_from_values(source)
+
+
+__all__ = [
+    "QuantileSketch",
+    "WindowedQuantileSketch",
+    "as_sketch",
+    "sketch_from_values",
+]
@@ -0,0 +1,216 @@
+"""
+Timing per-request a stadi (Server-Timing + log delle richieste lente).
+
+Il middleware ``RequestContextMiddleware`` apre un ``RequestTiming`` nel
+contesto della request (ContextVar: propagata anche a ``asyncio.to_thread``
+e al threadpool delle route sync); le funzioni hot lo alimentano con
+``span("stage")``, no-op fuori da una request. A fine request:
+
+- header ``Server-Timing`` con la durata di ogni stadio e il totale
+- se il totale supera la soglia, la request (campionata) entra nel ring
+  buffer ``slow_request_log`` con il breakdown completo, letto
+  dall'endpoint admin ``GET /api/v1/admin/debug/slow-requests``
+
+Costo per span: due ``perf_counter`` e una somma sotto lock.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+_current_timing: ContextVar[Optional["RequestTiming"]] = ContextVar(
+    "request_timing", default=None
+)
+
+
+class RequestTiming:
+    """Durate accumulate per stadio (ms) di una singola request."""
+
+    __slots__ = ("method", "path", "started_at", "_started_perf", "stages", "counts", "_lock")
+
+    def __init__(self, method: str, path: str) -> None:
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._started_perf = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, duration_ms: float) -> None:
+        """Accumula la durata di uno stadio (stadi ripetuti vengono sommati)."""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + duration_ms
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started_perf) * 1000.0
+
+    def server_timing(self, total_ms: float) -> str:
+        """Valore header Server-Timing (``stage;dur=ms`` + ``total``)."""
+        with self._lock:
+            parts = [f"{stage};dur={duration:.1f}" for stage, duration in self.stages.items()]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+    def summary(
+        self,
+        total_ms: float,
+        status_code: int,
+        request_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                stage: {"duration_ms": round(duration, 2), "count": self.counts[stage]}
+                for stage, duration in sorted(
+                    self.stages.items(), key=lambda item: item[1], reverse=True
+                )
+            }
+            accounted = sum(self.stages.values())
+        return {
+            "request_id": request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "duration_ms": round(total_ms, 2),
+            # Tempo non coperto da span (framework, serializzazione, stadi non strumentati)
+            "unaccounted_ms": round(max(total_ms - accounted, 0.0), 2),
+            "stages": stages,
+        }
+
+
+def begin_request(method: str, path: str) -> Tuple[RequestTiming, Token]:
+    timing = RequestTiming(method, path)
+    return timing, _current_timing.set(timing)
+
+
+def end_request(token: Token) -> None:
+    _current_timing.reset(token)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current_timing.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Misura il blocco come stadio della request corrente (no-op senza request)."""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(stage, (time.perf_counter() - started) * 1000.0)
+
+
+def record_stage(stage: str, duration_ms: float) -> None:
+    """Registra uno stadio misurato altrove (es. timing già calcolati)."""
+    timing = _current_timing.get()
+    if timing is not None and duration_ms >= 0:
+        timing.add(stage, duration_ms)
+
+
+class SlowRequestLog:
+    """
+    Ring buffer delle request lente.
+
+    Entrano solo request con durata >= ``threshold_ms``, campionate con
+    probabilità ``sample_rate``; a capacità piena esce la più vecchia.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100,
+        threshold_ms: float = 1000.0,
+        sample_rate: float = 1.0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self._offered = 0
+        self._recorded = 0
+
+    def configure(
+        self,
+        capacity: Optional[int] = None,
+        threshold_ms: Optional[float] = None,
+        sample_rate: Optional[float] = None,
+    ) -> None:
+        with self._lock:
+            if capacity is not None and capacity != self._entries.maxlen:
+                self._entries = deque(self._entries, maxlen=capacity)
+            if threshold_ms is not None:
+                self.threshold_ms = threshold_ms
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+
+    def offer(self, entry: Dict[str, Any]) -> bool:
+        """Registra ``entry`` se lenta (e campionata); True se registrata."""
+        if entry["duration_ms"] < self.threshold_ms:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._lock:
+                self._offered += 1
+            return False
+        with self._lock:
+            self._offered += 1
+            self._recorded += 1
+            self._entries.append(entry)
+        return True
+
+    def entries(
+        self,
+        limit: Optional[int] = None,
+        path_prefix: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Request registrate, dalla più lenta."""
+        with self._lock:
+            items = list(self._entries)
+        if path_prefix:
+            items = [item for item in items if item["path"].startswith(path_prefix)]
+        items.sort(key=lambda item: item["duration_ms"], reverse=True)
+        return items[:limit] if limit else items
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "capacity": self._entries.maxlen,
+                "size": len(self._entries),
+                "threshold_ms": self.threshold_ms,
+                "sample_rate": self.sample_rate,
+                "slow_requests_seen": self._offered,
+                "slow_requests_recorded": self._recorded,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._offered = 0
+            self._recorded = 0
+
+
+# Istanza di processo (configurata da main.py)
+slow_request_log = SlowRequestLog()
+
+
+__all__ = [
+    "RequestTiming",
+    "SlowRequestLog",
+    "begin_request",
+    "current_timing",
+    "end_request",
+    "record_stage",
+    "slow_request_log",
+    "span",
+]
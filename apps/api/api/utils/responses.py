@@ -0,0 +1,67 @@
+"""
+Response JSON veloce (``default_response_class`` dell'app).
+
+``FastJSONResponse`` sostituisce ``JSONResponse`` (``json.dumps`` stdlib):
+
+- contenuto già JSON-compatibile (il caso di FastAPI dopo
+  ``serialize_response``): ``orjson.dumps``, senza passaggio per ``str``
+- modello pydantic restituito direttamente dall'endpoint
+  (``return FastJSONResponse(model)``): un solo ``model_dump(mode="json")``
+  + orjson, saltando la ri-validazione del ``response_model`` di FastAPI.
+  Da usare per i payload grandi (chunk documento, history completa,
+  analytics, search). Misurato più veloce di ``model_dump_json`` sui
+  payload con testi lunghi non-ASCII (escaping stringhe di orjson)
+- tipi non nativi per orjson (modelli annidati in dict, Decimal, set, ...):
+  ``pydantic_core.to_jsonable_python`` come ``default``
+
+Senza orjson la serializzazione passa a ``pydantic_core.to_json``.
+
+Nota: una Response restituita dall'endpoint non eredita gli header impostati
+sul parametro ``response: Response`` iniettato; vanno passati in ``headers``.
+"""
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json, to_jsonable_python
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - library missing in some environments
+    orjson = None
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_json(content: Any) -> bytes:
+        """Serializza ``content`` in JSON UTF-8 (orjson, fallback pydantic_core)."""
+        try:
+            return orjson.dumps(content, default=to_jsonable_python, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # es. interi oltre 64 bit: pydantic_core li gestisce
+            return to_json(content)
+
+    def dumps_model(model: BaseModel) -> bytes:
+        """Serializza un modello (stessa forma di FastAPI: alias, mode json)."""
+        return dumps_json(model.model_dump(mode="json", by_alias=True))
+else:  # pragma: no cover - library missing in some environments
+    def dumps_json(content: Any) -> bytes:
+        """Serializza ``content`` in JSON UTF-8 (pydantic_core)."""
+        return to_json(content)
+
+    def dumps_model(model: BaseModel) -> bytes:
+        """Serializza un modello (stessa forma di FastAPI: alias, mode json)."""
+        return model.model_dump_json(by_alias=True).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse con encoder orjson / pydantic-core (vedi docstring modulo)."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return dumps_model(content)
+        return dumps_json(content)
+
+
+__all__ = ["FastJSONResponse", "dumps_json", "dumps_model"]
@@ -0,0 +1,180 @@
+"""
+Profiler a campionamento in-process, attivabile on-demand.
+
+Il thread chiamante (``asyncio.to_thread`` dall'endpoint admin) legge
+``sys._current_frames()`` ogni ``interval_seconds`` per ``duration_seconds``
+e conta gli stack identici per thread. Nessun hook (``sys.setprofile`` /
+``settrace``) e nessun thread quando il profiler non è attivo: overhead zero
+fuori dalla finestra di profiling, e durante la finestra il costo è sul solo
+thread campionatore.
+
+Output:
+- ``to_collapsed()``: formato "collapsed stacks" (``thread;f1;f2 N``),
+  input di flamegraph.pl / speedscope / inferno
+- ``to_speedscope()``: profilo ``sampled`` nel file format di speedscope
+  (https://www.speedscope.app/file-format-schema.json), un profilo per thread
+
+Un solo profiling alla volta per processo (``ProfilerBusyError``).
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+# Profondità massima stack campionato (frame più esterni troncati)
+MAX_STACK_DEPTH = 128
+
+# Stack con questi frame in cima sono thread in attesa (idle), esclusi di default
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+_IDLE_FUNCTIONS = frozenset({"select", "poll", "sleep", "wait", "_worker"})
+
+FrameKey = Tuple[str, str, int]
+
+
+class ProfilerBusyError(RuntimeError):
+    """Profiling già in corso sul processo."""
+
+
+@dataclass
+class ProfileResult:
+    """Stack campionati aggregati per thread."""
+
+    duration_seconds: float
+    interval_seconds: float
+    sample_count: int = 0
+    # (nome thread, stack root→leaf) → numero campioni
+    stacks: Counter = field(default_factory=Counter)
+    pid: int = field(default_factory=os.getpid)
+
+    def to_collapsed(self) -> str:
+        lines = []
+        for (thread_name, stack), count in self.stacks.most_common():
+            frames = ";".join(_frame_label(frame) for frame in stack)
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        frame_index: Dict[FrameKey, int] = {}
+        frames: List[Dict[str, Any]] = []
+        by_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+
+        for (thread_name, stack), count in self.stacks.most_common():
+            indices = []
+            for frame in stack:
+                index = frame_index.get(frame)
+                if index is None:
+                    index = frame_index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": filename, "line": line})
+                indices.append(index)
+            samples, weights = by_thread.setdefault(thread_name, ([], []))
+            samples.append(indices)
+            weights.append(round(count * self.interval_seconds, 6))
+
+        profiles = [
+            {
+                "type": "sampled",
+                "name": f"pid {self.pid} · {thread_name}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread_name, (samples, weights) in sorted(by_thread.items())
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"pid {self.pid} ({self.duration_seconds:.1f}s)",
+            "exporter": "fisiorag-sampling-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+def _frame_label(frame: FrameKey) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _is_idle(leaf: FrameKey) -> bool:
+    name, filename, _ = leaf
+    return name in _IDLE_FUNCTIONS or filename.endswith(_IDLE_FILES)
+
+
+def _stack_of(frame: Any) -> Tuple[FrameKey, ...]:
+    stack: List[FrameKey] = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+_run_lock = threading.Lock()
+
+
+def is_profiling() -> bool:
+    return _run_lock.locked()
+
+
+def profile(
+    duration_seconds: float,
+    interval_seconds: float = 0.005,
+    include_idle: bool = False,
+) -> ProfileResult:
+    """
+    Campiona tutti i thread del processo (bloccante per ``duration_seconds``).
+
+    Da chiamare fuori dall'event loop (``asyncio.to_thread``): il thread
+    chiamante è escluso dai campioni.
+
+    Raises:
+        ProfilerBusyError: Se un altro profiling è in corso
+    """
+    if not _run_lock.acquire(blocking=False):
+        raise ProfilerBusyError("profiling already running")
+    try:
+        result = ProfileResult(duration_seconds=duration_seconds, interval_seconds=interval_seconds)
+        own_id = threading.get_ident()
+        deadline = time.perf_counter() + duration_seconds
+        next_tick = time.perf_counter()
+
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _stack_of(frame)
+                if not stack or (not include_idle and _is_idle(stack[-1])):
+                    continue
+                result.stacks[(names.get(thread_id, str(thread_id)), stack)] += 1
+            result.sample_count += 1
+
+            next_tick += interval_seconds
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if next_tick > now:
+                time.sleep(next_tick - now)
+            else:
+                # In ritardo (GIL conteso): riallinea senza burst di campioni
+                next_tick = now
+        return result
+    finally:
+        _run_lock.release()
+
+
+__all__ = [
+    "ProfileResult",
+    "ProfilerBusyError",
+    "is_profiling",
+    "profile",
+]
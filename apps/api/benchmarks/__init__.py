@@ -0,0 +1,14 @@
+"""
+Suite di benchmark offline dell'API.
+
+- ``benchmarks.e2e``: scenari end-to-end (chat, search, history, ingestion)
+  contro l'app FastAPI reale, con OpenAI e Supabase sostituiti da un server
+  locale deterministico e il pool asyncpg da uno stand-in in memoria.
+- ``benchmarks.micro``: microbenchmark dei percorsi CPU pure-Python (chunking,
+  memoria conversazionale, analytics, rate limit, logging) su fixture deterministiche.
+- ``benchmarks.report``: statistiche (throughput, p50/p95/p99), report JSON
+  con metadati git e confronto con una baseline salvata.
+
+Nessuna chiamata di rete verso servizi esterni: gira in CI e in locale.
+Vedi ``benchmarks/README.md``.
+"""
@@ -0,0 +1,15 @@
+"""
+Benchmark end-to-end offline (chat, search, history, ingestion).
+
+Componenti:
+- ``corpus``: corpus sintetico deterministico (documenti, chunk, query,
+  sessioni) ed embedding hashing bag-of-words a 1536 dimensioni
+- ``fake_services``: server locale (TLS, self-signed) con API OpenAI
+  (``/v1/embeddings``, ``/v1/chat/completions``, latenze configurabili) e
+  PostgREST Supabase (RPC ``match_document_chunks`` su indice numpy in
+  memoria, upsert ``document_chunks``)
+- ``fake_db``: pool asyncpg in memoria per chat_messages / documents
+- ``scenarios``: driver a concorrenza configurabile contro ``api.main.app``
+
+Esecuzione: ``python -m benchmarks.e2e --help``.
+"""
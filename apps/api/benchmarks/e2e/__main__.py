@@ -0,0 +1,160 @@
+"""
+Benchmark end-to-end offline: throughput e p50/p95/p99 per scenario.
+
+Nessun servizio esterno: OpenAI e Supabase sono sostituiti dal server fake
+locale, il DB dal pool in memoria (vedi ``benchmarks/e2e/__init__.py``).
+
+Usage:
+    cd apps/api
+    python -m benchmarks.e2e
+    python -m benchmarks.e2e --scenarios chat,search --concurrency 1,8,32 --requests 300
+    python -m benchmarks.e2e --chat-latency lognormal:800:0.6 --env ENABLE_REQUEST_COALESCING=true
+
+    # baseline: salva, poi confronta un altro commit con la stessa config
+    python -m benchmarks.e2e --baseline benchmarks/baselines/e2e.json --save-baseline
+    python -m benchmarks.e2e --baseline benchmarks/baselines/e2e.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from ..report import (
+    DEFAULT_TOLERANCE,
+    build_report,
+    compare_reports,
+    config_differences,
+    format_comparison_table,
+    format_summary_table,
+    load_report,
+    save_report,
+)
+from .scenarios import SCENARIOS, BenchmarkHarness, HarnessConfig
+
+RESULTS_DIR = Path(__file__).resolve().parent.parent / "results"
+
+SUMMARY_METRICS = ("requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _env_overrides(values: List[str]) -> Dict[str, str]:
+    overrides: Dict[str, str] = {}
+    for item in values:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise SystemExit(f"--env atteso KEY=VALUE, ricevuto {item!r}")
+        overrides[key.strip()] = value
+    return overrides
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    defaults = HarnessConfig()
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end offline FisioRAG API")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Scenari separati da virgola ({', '.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", default="8",
+                        help="Livelli di concorrenza separati da virgola (es. 1,8,32)")
+    parser.add_argument("--requests", type=int, default=defaults.requests,
+                        help="Request misurate per scenario e livello")
+    parser.add_argument("--ingestion-requests", type=int, default=defaults.ingestion_requests,
+                        help="Request misurate per lo scenario ingestion")
+    parser.add_argument("--warmup", type=int, default=defaults.warmup_requests,
+                        help="Request di warmup (non misurate) prima di ogni scenario")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--documents", type=int, default=defaults.documents)
+    parser.add_argument("--chunks-per-document", type=int, default=defaults.chunks_per_document)
+    parser.add_argument("--sessions", type=int, default=defaults.sessions)
+    parser.add_argument("--messages-per-session", type=int, default=defaults.messages_per_session)
+    parser.add_argument("--chat-latency", default=defaults.chat_latency,
+                        help="Latenza chat completions: none | fixed:<ms> | lognormal:<ms>:<sigma>")
+    parser.add_argument("--embeddings-latency", default=defaults.embeddings_latency)
+    parser.add_argument("--rpc-latency", default=defaults.rpc_latency,
+                        help="Latenza PostgREST (RPC match e upsert chunk)")
+    parser.add_argument("--db-latency", default=defaults.db_latency,
+                        help="Latenza per query del pool DB in memoria")
+    parser.add_argument("--db-pool-size", type=int, default=defaults.db_pool_size)
+    parser.add_argument("--tokenizer", choices=("auto", "tiktoken", "offline"), default=defaults.tokenizer,
+                        help="auto: BPE tiktoken se in cache, altrimenti encoding byte-level offline")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override variabili d'ambiente dell'app (feature flag), ripetibile")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Report JSON (default: benchmarks/results/e2e-<commit>.json)")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="Report baseline da confrontare (o da scrivere con --save-baseline)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Scrive il report corrente in --baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Variazione relativa tollerata nel confronto (0.15 = 15%%)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit code 1 se il confronto con la baseline trova regressioni")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if args.save_baseline and args.baseline is None:
+        raise SystemExit("--save-baseline richiede --baseline PATH")
+
+    config = HarnessConfig(
+        scenarios=_csv(args.scenarios),
+        concurrency=[int(level) for level in _csv(args.concurrency)],
+        requests=args.requests,
+        ingestion_requests=args.ingestion_requests,
+        warmup_requests=args.warmup,
+        seed=args.seed,
+        documents=args.documents,
+        chunks_per_document=args.chunks_per_document,
+        sessions=args.sessions,
+        messages_per_session=args.messages_per_session,
+        chat_latency=args.chat_latency,
+        embeddings_latency=args.embeddings_latency,
+        rpc_latency=args.rpc_latency,
+        db_latency=args.db_latency,
+        db_pool_size=args.db_pool_size,
+        tokenizer=args.tokenizer,
+        env=_env_overrides(args.env),
+    )
+
+    harness = BenchmarkHarness(config).start()
+    # Log applicativi oltre WARNING soltanto: il logging non deve dominare la misura
+    logging.getLogger("api").setLevel(logging.WARNING)
+    try:
+        results = asyncio.run(harness.run())
+        report = build_report("e2e", results, harness.report_context())
+    finally:
+        harness.stop()
+
+    print(format_summary_table(results, SUMMARY_METRICS))
+    if harness.tokenizer == "byte_fallback":
+        print("\nNota: BPE tiktoken non in cache, usato encoding byte-level offline.")
+
+    commit = (report["git"].get("commit") or "nogit")[:10]
+    output = args.output or RESULTS_DIR / f"e2e-{commit}.json"
+    print(f"\nReport: {save_report(report, output)}")
+
+    exit_code = 0
+    if args.baseline is not None and args.save_baseline:
+        print(f"Baseline aggiornata: {save_report(report, args.baseline)}")
+    elif args.baseline is not None:
+        baseline = load_report(args.baseline)
+        differences = config_differences(baseline, report)
+        if differences:
+            print("\nAttenzione: config diversa dalla baseline, confronto non omogeneo:")
+            for key, values in differences.items():
+                print(f"  {key}: {values['baseline']!r} -> {values['current']!r}")
+        comparisons = compare_reports(baseline, report, tolerance=args.tolerance)
+        print(f"\nConfronto con {args.baseline} (commit {str(baseline['git'].get('commit'))[:10]}):")
+        print(format_comparison_table(comparisons))
+        regressions = [item for item in comparisons if item.regression]
+        if regressions and args.fail_on_regression:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
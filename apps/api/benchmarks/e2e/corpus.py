@@ -0,0 +1,283 @@
+"""
+Corpus sintetico deterministico per i benchmark end-to-end.
+
+Stesso seed → stessi documenti, chunk, id, query e sessioni, quindi gli
+stessi top-k dalla ricerca vettoriale: i run su commit diversi misurano lo
+stesso lavoro.
+
+Gli embedding sono bag-of-words con feature hashing (blake2b, non
+``hash()`` che è randomizzato per processo) normalizzati L2: query
+costruite da parole di un chunk hanno similarity alta con quel chunk, come
+con un modello reale. Le stesse funzioni sono usate dal fake OpenAI
+(``/v1/embeddings``) e per indicizzare il corpus, quindi query e chunk
+stanno nello stesso spazio.
+"""
+import hashlib
+import random
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+EMBEDDING_DIM = 1536
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+TOPICS: Dict[str, Sequence[str]] = {
+    "lombare": (
+        "lombalgia", "disco", "ernia", "vertebra", "sciatica", "radicolopatia", "lordosi",
+        "paravertebrali", "stenosi", "faccette", "sacroiliaca", "flessione", "estensione",
+    ),
+    "cervicale": (
+        "cervicalgia", "colpo", "frusta", "trapezio", "atlante", "epistrofeo", "cefalea",
+        "scaleni", "rachide", "rotazione", "inclinazione", "brachialgia", "postura",
+    ),
+    "spalla": (
+        "cuffia", "rotatori", "sovraspinato", "impingement", "acromion", "glenoomerale",
+        "capsulite", "abduzione", "scapola", "deltoide", "tendinopatia", "lussazione",
+    ),
+    "ginocchio": (
+        "legamento", "crociato", "menisco", "rotula", "quadricipite", "femore", "tibia",
+        "artrosi", "valgismo", "propriocezione", "ricostruzione", "versamento",
+    ),
+    "caviglia": (
+        "distorsione", "peroneo", "achille", "tallone", "astragalo", "instabilità",
+        "fascite", "plantare", "dorsiflessione", "equilibrio", "carico", "tutore",
+    ),
+    "neurologico": (
+        "ictus", "emiparesi", "spasticità", "parkinson", "atassia", "neuroplasticità",
+        "deambulazione", "sclerosi", "mielina", "riflessi", "tono", "coordinazione",
+    ),
+}
+
+_COMMON = (
+    "il", "la", "paziente", "trattamento", "dolore", "esercizio", "valutazione", "terapia",
+    "muscolo", "articolazione", "movimento", "riabilitazione", "forza", "mobilità",
+    "clinico", "protocollo", "settimane", "progressione", "test", "funzione", "evidenza",
+    "studio", "risultati", "fase", "acuta", "cronica", "recupero", "intervento", "manuale",
+)
+
+_QUESTION_PREFIXES = (
+    "come si tratta", "quali esercizi per", "cosa indica", "qual è la valutazione di",
+    "spiegami", "quali sono le evidenze su", "protocollo per",
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embedding deterministico (feature hashing con segno, norma L2 = 1)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokenize(text):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dim] += 1.0 if (value >> 63) & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def embed_texts(texts: Sequence[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    return np.vstack([embed_text(text, dim) for text in texts])
+
+
+@dataclass
+class SyntheticChunk:
+    id: str
+    document_id: str
+    content: str
+    topic: str
+    chunk_index: int
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "document_id": self.document_id,
+            "chunk_index": self.chunk_index,
+            "topic": self.topic,
+        }
+
+
+@dataclass
+class SyntheticDocument:
+    id: str
+    name: str
+    topic: str
+    chunks: List[SyntheticChunk] = field(default_factory=list)
+
+
+@dataclass
+class SyntheticQuery:
+    text: str
+    topic: str
+    source_chunk_id: str
+
+
+@dataclass
+class SyntheticMessage:
+    id: str
+    session_id: str
+    role: str
+    content: str
+    source_chunk_ids: List[str]
+    created_at: datetime
+
+
+@dataclass
+class SyntheticCorpus:
+    seed: int
+    documents: List[SyntheticDocument]
+    chunks: List[SyntheticChunk]
+    queries: List[SyntheticQuery]
+    sessions: Dict[str, List[SyntheticMessage]]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "seed": self.seed,
+            "documents": len(self.documents),
+            "chunks": len(self.chunks),
+            "queries": len(self.queries),
+            "sessions": len(self.sessions),
+            "messages": sum(len(messages) for messages in self.sessions.values()),
+        }
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _sentence(rng: random.Random, topic_words: Sequence[str]) -> str:
+    words = [
+        rng.choice(topic_words) if rng.random() < 0.45 else rng.choice(_COMMON)
+        for _ in range(rng.randint(8, 16))
+    ]
+    return " ".join(words).capitalize() + "."
+
+
+def generate_text(rng: random.Random, topic: str, words: int) -> str:
+    """Paragrafi di circa ``words`` parole sul topic."""
+    topic_words = TOPICS[topic]
+    sentences: List[str] = []
+    count = 0
+    while count < words:
+        sentence = _sentence(rng, topic_words)
+        sentences.append(sentence)
+        count += len(sentence.split())
+        if len(sentences) % 5 == 0:
+            sentences.append("\n\n")
+    return " ".join(sentences).replace(" \n\n ", "\n\n").strip()
+
+
+def generate_corpus(
+    seed: int = 42,
+    documents: int = 40,
+    chunks_per_document: int = 12,
+    chunk_words: int = 110,
+    queries: int = 200,
+    sessions: int = 20,
+    messages_per_session: int = 60,
+) -> SyntheticCorpus:
+    """
+    Genera corpus, query e history di sessione deterministici.
+
+    Args:
+        seed: Seed del generatore
+        documents: Documenti nel corpus indicizzato
+        chunks_per_document: Chunk per documento
+        chunk_words: Parole per chunk (circa)
+        queries: Query per chat/search (da parole di un chunk + prefisso domanda)
+        sessions: Sessioni con history precaricata (scenario history)
+        messages_per_session: Messaggi per sessione (user/assistant alternati)
+    """
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+
+    docs: List[SyntheticDocument] = []
+    chunks: List[SyntheticChunk] = []
+    for doc_index in range(documents):
+        topic = topics[doc_index % len(topics)]
+        document = SyntheticDocument(
+            id=_uuid(rng), name=f"{topic}_{doc_index:03d}.pdf", topic=topic
+        )
+        for chunk_index in range(chunks_per_document):
+            chunk = SyntheticChunk(
+                id=_uuid(rng),
+                document_id=document.id,
+                content=generate_text(rng, topic, chunk_words),
+                topic=topic,
+                chunk_index=chunk_index,
+            )
+            document.chunks.append(chunk)
+            chunks.append(chunk)
+        docs.append(document)
+
+    query_list: List[SyntheticQuery] = []
+    for _ in range(queries if chunks else 0):
+        source = rng.choice(chunks)
+        words = tokenize(source.content)
+        picked = rng.sample(words, k=min(len(words), rng.randint(5, 9)))
+        query_list.append(SyntheticQuery(
+            text=f"{rng.choice(_QUESTION_PREFIXES)} {' '.join(picked)}?",
+            topic=source.topic,
+            source_chunk_id=source.id,
+        ))
+
+    session_map: Dict[str, List[SyntheticMessage]] = {}
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for session_index in range(sessions):
+        session_id = f"bench-session-{session_index:04d}"
+        messages: List[SyntheticMessage] = []
+        for message_index in range(messages_per_session):
+            role = "user" if message_index % 2 == 0 else "assistant"
+            cited = [rng.choice(chunks).id for _ in range(rng.randint(1, 3))] if (
+                role == "assistant" and chunks
+            ) else []
+            messages.append(SyntheticMessage(
+                id=_uuid(rng),
+                session_id=session_id,
+                role=role,
+                content=generate_text(rng, rng.choice(topics), 25 if role == "user" else 90),
+                source_chunk_ids=cited,
+                created_at=started + timedelta(minutes=session_index, seconds=message_index * 7),
+            ))
+        session_map[session_id] = messages
+
+    return SyntheticCorpus(
+        seed=seed, documents=docs, chunks=chunks, queries=query_list, sessions=session_map
+    )
+
+
+def generate_ingestion_documents(seed: int, count: int, words: int = 1500) -> List[str]:
+    """Testi distinti per lo scenario ingestion (hash diversi: nessun upsert su documento esistente)."""
+    rng = random.Random(seed * 7919 + 1)
+    topics = sorted(TOPICS)
+    return [
+        f"Documento benchmark {index}\n\n" + generate_text(rng, topics[index % len(topics)], words)
+        for index in range(count)
+    ]
+
+
+__all__ = [
+    "EMBEDDING_DIM",
+    "SyntheticChunk",
+    "SyntheticCorpus",
+    "SyntheticDocument",
+    "SyntheticMessage",
+    "SyntheticQuery",
+    "embed_text",
+    "embed_texts",
+    "generate_corpus",
+    "generate_ingestion_documents",
+    "generate_text",
+    "tokenize",
+]
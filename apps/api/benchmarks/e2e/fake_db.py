@@ -0,0 +1,284 @@
+"""
+Pool asyncpg in memoria per i benchmark end-to-end.
+
+Implementa solo le query che l'app esegue sui percorsi misurati, riconosciute
+dal testo SQL (nessun parser):
+
+- ``ConversationPersistenceService``: INSERT chat_messages (idempotency
+  key), SELECT pagina history (offset e keyset su (created_at, id)),
+  ``chat_session_stats``, UPDATE riassunto, DELETE sessione
+- ``db_storage``: INSERT documents ... RETURNING id (upsert su file_hash),
+  UPDATE status, SELECT per hash
+
+Una query non riconosciuta solleva ``NotImplementedError`` con il testo:
+meglio fallire che misurare un percorso diverso da quello reale.
+
+``acquire`` rispetta la dimensione del pool (semaforo) e ogni query attende
+la latenza ``LatencyModel`` configurata, così la contesa sul pool e il
+round-trip DB restano visibili nei percentili.
+"""
+import asyncio
+import json
+import re
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from .corpus import SyntheticMessage
+from .fake_services import LatencyModel
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(query: str) -> str:
+    return _WHITESPACE_RE.sub(" ", query).strip().lower()
+
+
+def _as_uuid(value: Any) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _is_archived(row: Dict[str, Any]) -> bool:
+    metadata = row.get("metadata") or {}
+    return str(metadata.get("archived")).lower() == "true"
+
+
+class InMemoryDatabase:
+    """Tabelle chat_messages / documents tenute in dict Python."""
+
+    def __init__(self) -> None:
+        self.chat_messages: Dict[str, List[Dict[str, Any]]] = {}
+        self.idempotency_keys: Set[str] = set()
+        self.documents: Dict[uuid.UUID, Dict[str, Any]] = {}
+        self.documents_by_hash: Dict[str, uuid.UUID] = {}
+        self.queries: Dict[str, int] = {}
+
+    def seed_sessions(self, sessions: Dict[str, Sequence[SyntheticMessage]]) -> None:
+        for session_id, messages in sessions.items():
+            rows = self.chat_messages.setdefault(session_id, [])
+            for message in messages:
+                rows.append({
+                    "id": uuid.UUID(message.id),
+                    "session_id": session_id,
+                    "role": message.role,
+                    "content": message.content,
+                    "source_chunk_ids": [uuid.UUID(cid) for cid in message.source_chunk_ids] or None,
+                    "metadata": {},
+                    "created_at": message.created_at,
+                })
+            rows.sort(key=lambda row: (row["created_at"], row["id"]))
+
+    def count(self, name: str) -> None:
+        self.queries[name] = self.queries.get(name, 0) + 1
+
+    # chat_messages -------------------------------------------------------
+
+    def insert_message(self, args: Sequence[Any]) -> str:
+        message_id, session_id, role, content, chunk_ids, metadata, created_at, key = args
+        if key in self.idempotency_keys:
+            return "INSERT 0 0"
+        self.idempotency_keys.add(key)
+        rows = self.chat_messages.setdefault(session_id, [])
+        row = {
+            "id": _as_uuid(message_id),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "source_chunk_ids": [_as_uuid(cid) for cid in chunk_ids] if chunk_ids else None,
+            "metadata": json.loads(metadata) if isinstance(metadata, str) else (metadata or {}),
+            "created_at": created_at if isinstance(created_at, datetime) else datetime.now(timezone.utc),
+        }
+        rows.append(row)
+        if len(rows) > 1 and (rows[-2]["created_at"], rows[-2]["id"]) > (row["created_at"], row["id"]):
+            rows.sort(key=lambda item: (item["created_at"], item["id"]))
+        return "INSERT 0 1"
+
+    def select_messages(self, query: str, args: Sequence[Any]) -> List[Dict[str, Any]]:
+        session_id = args[0]
+        descending = " desc" in query.split("order by", 1)[1]
+        rows = [row for row in self.chat_messages.get(session_id, []) if not _is_archived(row)]
+        if descending:
+            rows = rows[::-1]
+        if "offset" in query:
+            limit, offset = int(args[1]), int(args[2])
+            return [dict(row) for row in rows[offset:offset + limit]]
+        if "(created_at, id)" in query:
+            position: Tuple[datetime, uuid.UUID] = (args[1], _as_uuid(args[2]))
+            if descending:
+                rows = [row for row in rows if (row["created_at"], row["id"]) < position]
+            else:
+                rows = [row for row in rows if (row["created_at"], row["id"]) > position]
+        limit = int(args[-1])
+        return [dict(row) for row in rows[:limit]]
+
+    def session_stats(self, session_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.chat_messages.get(session_id)
+        if not rows:
+            return None
+        return {"message_count": len(rows), "last_message_id": rows[-1]["id"]}
+
+    def update_summary(self, args: Sequence[Any]) -> str:
+        session_id, summary, covered = args
+        rows = self.chat_messages.get(session_id)
+        if not rows:
+            return "UPDATE 0"
+        rows[-1]["metadata"] = {
+            **(rows[-1].get("metadata") or {}),
+            "rolling_summary": summary,
+            "summary_covered_messages": covered,
+        }
+        return "UPDATE 1"
+
+    def delete_session(self, session_id: str) -> str:
+        removed = self.chat_messages.pop(session_id, [])
+        return f"DELETE {len(removed)}"
+
+    # documents -----------------------------------------------------------
+
+    def upsert_document(self, args: Sequence[Any]) -> uuid.UUID:
+        document_id, file_name, file_path, file_hash, status, strategy, metadata = args
+        existing = self.documents_by_hash.get(file_hash)
+        now = datetime.now(timezone.utc)
+        if existing is not None:
+            self.documents[existing].update(
+                status=status, chunking_strategy=strategy, metadata=metadata, updated_at=now
+            )
+            return existing
+        document_id = _as_uuid(document_id)
+        self.documents[document_id] = {
+            "id": document_id,
+            "file_name": file_name,
+            "file_path": file_path,
+            "file_hash": file_hash,
+            "status": status,
+            "chunking_strategy": strategy,
+            "metadata": metadata,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.documents_by_hash[file_hash] = document_id
+        return document_id
+
+    def update_document_status(self, args: Sequence[Any]) -> str:
+        status, document_id = args[0], _as_uuid(args[-1])
+        document = self.documents.get(document_id)
+        if document is None:
+            return "UPDATE 0"
+        document.update(status=status, updated_at=datetime.now(timezone.utc))
+        return "UPDATE 1"
+
+
+class InMemoryConnection:
+    """Sottoinsieme dell'API ``asyncpg.Connection`` usato dall'app."""
+
+    def __init__(self, database: InMemoryDatabase, latency: LatencyModel) -> None:
+        self._db = database
+        self._latency = latency
+
+    async def _roundtrip(self) -> None:
+        delay_ms = self._latency.sample_ms()
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000.0)
+
+    def _unsupported(self, query: str) -> NotImplementedError:
+        return NotImplementedError(f"query non supportata dal DB in memoria: {query[:120]}")
+
+    async def execute(self, query: str, *args: Any) -> str:
+        await self._roundtrip()
+        sql = _normalize(query)
+        if sql.startswith("insert into chat_messages"):
+            self._db.count("insert_chat_message")
+            return self._db.insert_message(args)
+        if sql.startswith("update chat_messages"):
+            self._db.count("update_session_summary")
+            return self._db.update_summary(args)
+        if sql.startswith("delete from chat_messages"):
+            self._db.count("delete_session")
+            return self._db.delete_session(args[0])
+        if sql.startswith("update documents"):
+            self._db.count("update_document_status")
+            return self._db.update_document_status(args)
+        raise self._unsupported(sql)
+
+    async def executemany(self, query: str, args: Sequence[Sequence[Any]]) -> None:
+        for item in args:
+            await self.execute(query, *item)
+
+    async def fetch(self, query: str, *args: Any) -> List[Dict[str, Any]]:
+        await self._roundtrip()
+        sql = _normalize(query)
+        if sql.startswith("select") and "from chat_messages" in sql:
+            self._db.count("select_chat_messages")
+            return self._db.select_messages(sql, args)
+        raise self._unsupported(sql)
+
+    async def fetchrow(self, query: str, *args: Any) -> Optional[Dict[str, Any]]:
+        sql = _normalize(query)
+        if "from chat_session_stats" in sql:
+            await self._roundtrip()
+            self._db.count("select_session_stats")
+            return self._db.session_stats(args[0])
+        if "from documents" in sql and "file_hash = $1" in sql:
+            await self._roundtrip()
+            self._db.count("select_document_by_hash")
+            document_id = self._db.documents_by_hash.get(args[0])
+            return dict(self._db.documents[document_id]) if document_id else None
+        rows = await self.fetch(query, *args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, query: str, *args: Any) -> Any:
+        sql = _normalize(query)
+        if sql.startswith("insert into documents") and "returning id" in sql:
+            await self._roundtrip()
+            self._db.count("upsert_document")
+            return self._db.upsert_document(args)
+        row = await self.fetchrow(query, *args)
+        return next(iter(row.values())) if row else None
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        yield
+
+
+class InMemoryPool:
+    """Stand-in di ``asyncpg.Pool``: ``acquire`` limitato a ``size`` connessioni."""
+
+    def __init__(
+        self,
+        database: InMemoryDatabase,
+        size: int = 10,
+        latency: Optional[LatencyModel] = None,
+    ) -> None:
+        self.database = database
+        self._size = size
+        self._latency = latency or LatencyModel()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_use = 0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[InMemoryConnection]:
+        if self._semaphore is None:
+            # creato nel loop che esegue i benchmark
+            self._semaphore = asyncio.Semaphore(self._size)
+        async with self._semaphore:
+            self._in_use += 1
+            try:
+                yield InMemoryConnection(self.database, self._latency)
+            finally:
+                self._in_use -= 1
+
+    def get_size(self) -> int:
+        return self._size
+
+    def get_max_size(self) -> int:
+        return self._size
+
+    def get_idle_size(self) -> int:
+        return self._size - self._in_use
+
+    async def close(self) -> None:
+        return None
+
+
+__all__ = ["InMemoryConnection", "InMemoryDatabase", "InMemoryPool"]
@@ -0,0 +1,551 @@
+"""
+Server locale che sostituisce OpenAI e Supabase (PostgREST) nei benchmark.
+
+Un solo processo uvicorn in un thread dedicato, in HTTPS con certificato
+self-signed generato al volo (``SUPABASE_URL`` deve essere ``https://``,
+vedi ``Settings.validate_supabase_url``): il client httpx dell'app lo
+accetta tramite ``SSL_CERT_FILE``. Le chiamate passano quindi per lo stack
+reale (SDK openai, langchain, supabase-py/postgrest, TLS, connection pool).
+
+Route:
+- ``POST /v1/embeddings``: embedding ``corpus.embed_text`` (input stringhe
+  o token id, float o base64)
+- ``POST /v1/chat/completions``: JSON ``AnswerWithCitations`` che cita i
+  ``[chunk_id=...]`` del prompt, o ``EnhancedClassificationOutput`` per il
+  prompt di classificazione (ingestion); ``stream`` supportato
+- ``POST /rest/v1/rpc/match_document_chunks`` (e ``_ids``): top-k coseno
+  sull'indice numpy in memoria, similarity > match_threshold
+- ``POST /rest/v1/document_chunks``: upsert (ingestion), righe restituite
+  con ``id`` come ``Prefer: return=representation``
+- ``GET /__stats``: contatori per route
+
+Latenze: ``LatencyModel`` per famiglia di route (lognormale, fissa o
+nulla), campionate da un RNG con seed; l'attesa è ``asyncio.sleep`` quindi
+il server non serializza le request concorrenti, come un provider reale.
+"""
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from .corpus import EMBEDDING_DIM, SyntheticChunk, embed_text
+
+_CHUNK_ID_RE = re.compile(r"chunk_id=([0-9a-fA-F-]{36})")
+_UUID_RE = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b")
+_CLASSIFICATION_MARKER = "DOMINIO CONTENUTO"
+
+# Inizio di ogni risposta chat fake: distingue una generazione riuscita dal fallback dell'app
+FAKE_ANSWER_PREFIX = "Risposta sintetica del server di benchmark"
+
+
+@dataclass
+class LatencyModel:
+    """
+    Distribuzione di latenza simulata.
+
+    ``lognormal``: mediana ``median_ms``, dispersione ``sigma`` (0.5 ≈ p95 a
+    2.3x la mediana); ``fixed``: sempre ``median_ms``; ``none``: zero.
+    """
+
+    kind: str = "none"
+    median_ms: float = 0.0
+    sigma: float = 0.0
+    seed: int = 0
+    _rng: random.Random = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        if self.kind not in {"none", "fixed", "lognormal"}:
+            raise ValueError(f"distribuzione latenza sconosciuta: {self.kind}")
+        self._rng = random.Random(self.seed)
+
+    def sample_ms(self) -> float:
+        if self.kind == "none" or self.median_ms <= 0:
+            return 0.0
+        if self.kind == "fixed":
+            return self.median_ms
+        with self._lock:
+            return self._rng.lognormvariate(math.log(self.median_ms), self.sigma)
+
+    def describe(self) -> str:
+        if self.kind == "lognormal":
+            return f"lognormal:{self.median_ms:g}:{self.sigma:g}"
+        if self.kind == "fixed":
+            return f"fixed:{self.median_ms:g}"
+        return "none"
+
+
+def parse_latency(spec: str, seed: int = 0) -> LatencyModel:
+    """
+    ``none`` | ``fixed:<ms>`` | ``lognormal:<median_ms>:<sigma>``.
+
+    Raises:
+        ValueError: spec non valida
+    """
+    parts = spec.strip().lower().split(":")
+    try:
+        if parts[0] in {"", "none", "0"}:
+            return LatencyModel(seed=seed)
+        if parts[0] == "fixed" and len(parts) == 2:
+            return LatencyModel("fixed", float(parts[1]), seed=seed)
+        if parts[0] == "lognormal" and len(parts) == 3:
+            return LatencyModel("lognormal", float(parts[1]), float(parts[2]), seed=seed)
+    except ValueError as exc:
+        raise ValueError(f"latenza non valida: {spec!r}") from exc
+    raise ValueError(f"latenza non valida: {spec!r} (none | fixed:<ms> | lognormal:<ms>:<sigma>)")
+
+
+class VectorIndex:
+    """Indice coseno in memoria: stand-in di pgvector per ``match_document_chunks``."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM) -> None:
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._rows: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, rows: Sequence[Dict[str, Any]], embeddings: np.ndarray) -> None:
+        """Upsert per ``id`` (righe: id, document_id, content, metadata)."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+        with self._lock:
+            appended: List[np.ndarray] = []
+            for row, vector in zip(rows, embeddings):
+                position = self._positions.get(row["id"])
+                if position is not None:
+                    self._rows[position] = dict(row)
+                    self._matrix[position] = vector
+                    continue
+                self._positions[row["id"]] = len(self._rows)
+                self._rows.append(dict(row))
+                appended.append(vector)
+            if appended:
+                self._matrix = np.vstack([self._matrix, np.vstack(appended)])
+
+    def add_chunks(self, chunks: Sequence[SyntheticChunk], embeddings: np.ndarray) -> None:
+        self.add(
+            [
+                {"id": chunk.id, "document_id": chunk.document_id,
+                 "content": chunk.content, "metadata": chunk.metadata}
+                for chunk in chunks
+            ],
+            embeddings,
+        )
+
+    def match(self, query_embedding: Sequence[float], threshold: float, count: int) -> List[Dict[str, Any]]:
+        """Top ``count`` per similarity coseno decrescente, similarity > threshold."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        with self._lock:
+            matrix, rows = self._matrix, self._rows
+        if not rows or count <= 0 or norm == 0.0:
+            return []
+        scores = matrix @ (query / norm)
+        if count < len(scores):
+            candidates = np.argpartition(-scores, count - 1)[:count]
+        else:
+            candidates = np.arange(len(scores))
+        ordered = sorted(candidates.tolist(), key=lambda i: (-float(scores[i]), rows[i]["id"]))
+        return [
+            {**rows[i], "similarity": float(scores[i])}
+            for i in ordered
+            if float(scores[i]) > threshold
+        ]
+
+
+@dataclass
+class FakeServiceLatencies:
+    chat: LatencyModel = field(default_factory=LatencyModel)
+    embeddings: LatencyModel = field(default_factory=LatencyModel)
+    rpc: LatencyModel = field(default_factory=LatencyModel)
+
+    def describe(self) -> Dict[str, str]:
+        return {
+            "chat": self.chat.describe(),
+            "embeddings": self.embeddings.describe(),
+            "rpc": self.rpc.describe(),
+        }
+
+
+class FakeServiceState:
+    """Indice vettoriale, latenze e contatori condivisi dalle route."""
+
+    def __init__(self, index: VectorIndex, latencies: FakeServiceLatencies) -> None:
+        self.index = index
+        self.latencies = latencies
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.calls[route] = self.calls.get(route, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self.calls.items()))
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+
+async def _sleep(model: LatencyModel) -> None:
+    delay_ms = model.sample_ms()
+    if delay_ms > 0:
+        await asyncio.sleep(delay_ms / 1000.0)
+
+
+def _decode_tokens(tokens: Sequence[int]) -> str:
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base").decode(list(tokens))
+
+
+def _embedding_inputs(raw: Any) -> List[str]:
+    """``input`` di /v1/embeddings: stringhe o token id (langchain con tiktoken)."""
+    if isinstance(raw, str):
+        return [raw]
+    if raw and all(isinstance(item, int) for item in raw):
+        return [_decode_tokens(raw)]
+    return [_decode_tokens(item) if isinstance(item, list) else str(item) for item in raw or []]
+
+
+def _prompt_text(messages: Sequence[Dict[str, Any]]) -> str:
+    parts: List[str] = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(str(part.get("text", "")) for part in content if isinstance(part, dict))
+    return "\n".join(parts)
+
+
+def _chat_answer(prompt: str) -> Dict[str, Any]:
+    if _CLASSIFICATION_MARKER in prompt:
+        return {
+            "domain": "fisioterapia_clinica",
+            "structure_type": "TESTO_ACCADEMICO_DENSO",
+            "confidence": 0.87,
+            "reasoning": "Classificazione sintetica del server di benchmark.",
+            "detected_features": {"has_tables": False, "has_images": False},
+        }
+    cited = list(dict.fromkeys(_CHUNK_ID_RE.findall(prompt) or _UUID_RE.findall(prompt)))[:3]
+    return {
+        "risposta": (
+            f"{FAKE_ANSWER_PREFIX} basata sul contesto fornito. "
+            "Il trattamento prevede valutazione clinica, esercizio terapeutico progressivo "
+            "e monitoraggio del dolore nelle settimane successive."
+        ),
+        "citazioni": cited,
+    }
+
+
+def build_fake_app(state: FakeServiceState) -> Starlette:
+    """App Starlette delle route fake (vedi docstring modulo)."""
+
+    async def embeddings(request: Request) -> Response:
+        state.count("openai.embeddings")
+        body = await request.json()
+        texts = _embedding_inputs(body.get("input"))
+        await _sleep(state.latencies.embeddings)
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for position, text in enumerate(texts):
+            vector = embed_text(text)
+            if as_base64:
+                encoded: Any = base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+            else:
+                encoded = vector.tolist()
+            data.append({"object": "embedding", "index": position, "embedding": encoded})
+        tokens = sum(len(text.split()) for text in texts)
+        return JSONResponse({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def chat_completions(request: Request) -> Response:
+        state.count("openai.chat_completions")
+        body = await request.json()
+        prompt = _prompt_text(body.get("messages") or [])
+        content = json.dumps(_chat_answer(prompt), ensure_ascii=False)
+        model = body.get("model", "gpt-5-nano")
+        completion_id = f"chatcmpl-bench-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(content.split()),
+            "total_tokens": len(prompt.split()) + len(content.split()),
+        }
+        await _sleep(state.latencies.chat)
+
+        if body.get("stream"):
+            def _chunk(delta: Dict[str, Any], finish: Optional[str]) -> str:
+                payload = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+            async def _events():
+                yield _chunk({"role": "assistant", "content": ""}, None)
+                step = 64
+                for start in range(0, len(content), step):
+                    yield _chunk({"content": content[start:start + step]}, None)
+                yield _chunk({}, "stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(_events(), media_type="text/event-stream")
+
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": usage,
+        })
+
+    async def rpc(request: Request) -> Response:
+        name = request.path_params["name"]
+        state.count(f"postgrest.rpc.{name}")
+        if name not in {"match_document_chunks", "match_document_chunk_ids",
+                        "match_document_chunks_quantized"}:
+            return JSONResponse({"message": f"function {name} not found"}, status_code=404)
+        params = await request.json()
+        embedding = params.get("query_embedding")
+        if isinstance(embedding, str):
+            embedding = json.loads(embedding)
+        await _sleep(state.latencies.rpc)
+        rows = state.index.match(
+            embedding,
+            float(params.get("match_threshold", 0.0)),
+            int(params.get("match_count", 8)),
+        )
+        if name == "match_document_chunk_ids" or params.get("include_content") is False:
+            rows = [{"id": r["id"], "document_id": r["document_id"], "similarity": r["similarity"]}
+                    for r in rows]
+        return JSONResponse(rows)
+
+    async def upsert_chunks(request: Request) -> Response:
+        state.count("postgrest.document_chunks.upsert")
+        payload = await request.json()
+        rows = payload if isinstance(payload, list) else [payload]
+        stored = []
+        vectors = []
+        for row in rows:
+            metadata = row.get("metadata") or {}
+            embedding = row.get("embedding")
+            if isinstance(embedding, str):
+                embedding = json.loads(embedding)
+            stored.append({
+                "id": str(row.get("id") or uuid.uuid4()),
+                "document_id": row.get("document_id") or metadata.get("document_id"),
+                "content": row.get("content"),
+                "metadata": metadata,
+            })
+            vectors.append(embedding or embed_text(row.get("content") or ""))
+        await _sleep(state.latencies.rpc)
+        if stored:
+            state.index.add(stored, np.asarray(vectors, dtype=np.float32))
+        return JSONResponse(stored, status_code=201)
+
+    async def stats(request: Request) -> Response:
+        return JSONResponse({"calls": state.snapshot(), "indexed_chunks": len(state.index)})
+
+    return Starlette(routes=[
+        Route("/v1/embeddings", embeddings, methods=["POST"]),
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/rest/v1/rpc/{name}", rpc, methods=["POST"]),
+        Route("/rest/v1/document_chunks", upsert_chunks, methods=["POST"]),
+        Route("/__stats", stats, methods=["GET"]),
+    ])
+
+
+def create_self_signed_cert(directory: Path) -> Tuple[Path, Path]:
+    """Certificato TLS self-signed per 127.0.0.1/localhost (cert, key)."""
+    import ipaddress
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "fisiorag-benchmark")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([
+                x509.DNSName("localhost"),
+                x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+            ]),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = directory / "fake-services.pem"
+    key_path = directory / "fake-services.key"
+    cert_path.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ))
+    return cert_path, key_path
+
+
+class FakeServicesServer:
+    """uvicorn in un thread daemon su 127.0.0.1, porta libera scelta dal kernel."""
+
+    def __init__(self, state: FakeServiceState) -> None:
+        self.state = state
+        self.port: Optional[int] = None
+        self.cert_path: Optional[Path] = None
+        self._server: Any = None
+        self._thread: Optional[threading.Thread] = None
+        self._tempdir = tempfile.TemporaryDirectory(prefix="fisiorag-bench-")
+
+    @property
+    def base_url(self) -> str:
+        return f"https://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 15.0) -> "FakeServicesServer":
+        import socket
+
+        import uvicorn
+
+        self.cert_path, key_path = create_self_signed_cert(Path(self._tempdir.name))
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        config = uvicorn.Config(
+            build_fake_app(self.state),
+            host="127.0.0.1",
+            port=self.port,
+            ssl_certfile=str(self.cert_path),
+            ssl_keyfile=str(key_path),
+            log_level="warning",
+            access_log=False,
+            lifespan="off",
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-services", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("server fake non avviato")
+            time.sleep(0.02)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self._tempdir.cleanup()
+
+
+# encoding -> blob di tiktoken_ext.openai_public (stessa cache di tiktoken.load)
+_TIKTOKEN_BLOBS = {
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+    "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+}
+
+
+def _tiktoken_cached(blob_url: str) -> bool:
+    import hashlib
+
+    cache_dir = (
+        os.environ.get("TIKTOKEN_CACHE_DIR")
+        or os.environ.get("DATA_GYM_CACHE_DIR")
+        or os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    )
+    return os.path.exists(os.path.join(cache_dir, hashlib.sha1(blob_url.encode()).hexdigest()))
+
+
+def ensure_offline_tokenizer(mode: str = "auto") -> str:
+    """
+    Rende disponibili gli encoding tiktoken senza rete.
+
+    tiktoken scarica i BPE alla prima ``get_encoding`` (embeddings langchain,
+    ConversationManager, context packer). ``auto`` usa i BPE reali se già in
+    cache, altrimenti registra un encoding byte-level con lo stesso nome
+    (conteggi token ~4x più alti: il run lo riporta nel report).
+
+    Returns:
+        ``tiktoken`` | ``byte_fallback`` | ``unavailable``
+    """
+    try:
+        import tiktoken
+        import tiktoken.registry
+    except ImportError:
+        return "unavailable"
+
+    if mode == "tiktoken":
+        return "tiktoken"
+    missing = [
+        name for name, blob in _TIKTOKEN_BLOBS.items()
+        if mode == "offline" or not _tiktoken_cached(blob)
+    ]
+    if not missing:
+        return "tiktoken"
+    for name in missing:
+        tiktoken.registry.ENCODINGS[name] = tiktoken.Encoding(
+            name=name,
+            pat_str=r"""\s*\S+|\s+""",
+            mergeable_ranks={bytes([value]): value for value in range(256)},
+            special_tokens={"<|endoftext|>": 256},
+        )
+    return "byte_fallback"
+
+
+__all__ = [
+    "FAKE_ANSWER_PREFIX",
+    "FakeServiceLatencies",
+    "FakeServiceState",
+    "FakeServicesServer",
+    "LatencyModel",
+    "VectorIndex",
+    "build_fake_app",
+    "ensure_offline_tokenizer",
+    "parse_latency",
+]
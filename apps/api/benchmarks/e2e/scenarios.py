@@ -0,0 +1,343 @@
+"""
+Driver degli scenari end-to-end contro ``api.main.app``.
+
+Le request passano da ``httpx.AsyncClient`` + ``ASGITransport`` (stesso
+processo, nessun socket verso l'app: si misura l'app, non uvicorn) con JWT
+firmati con il secret del benchmark. A valle, l'app parla via HTTPS con il
+server fake (OpenAI + PostgREST) e con il pool DB in memoria.
+
+Scenari:
+- ``search``: ``POST /api/v1/knowledge-base/search`` (embedding + RPC)
+- ``chat``: ``POST /api/v1/chat/sessions/{id}/messages`` (memoria
+  conversazionale + retrieval + LLM + persistenza)
+- ``history``: ``GET /api/v1/chat/sessions/{id}/history/full`` (stats +
+  pagina keyset da DB)
+- ``ingestion``: ``POST /api/v1/admin/knowledge-base/sync-jobs``
+  (classificazione LLM, chunking, embedding, upsert, status documento)
+
+``api`` è importato solo dopo ``configure_environment``: ``Settings`` è un
+singleton letto all'import di ``api.main``. Eseguire il benchmark in un
+processo dedicato (``python -m benchmarks.e2e``).
+"""
+import asyncio
+import itertools
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import jwt
+
+from ..report import ScenarioResult
+from .corpus import SyntheticCorpus, embed_texts, generate_corpus, generate_ingestion_documents
+from .fake_db import InMemoryDatabase, InMemoryPool
+from .fake_services import (
+    FAKE_ANSWER_PREFIX,
+    FakeServiceLatencies,
+    FakeServicesServer,
+    FakeServiceState,
+    VectorIndex,
+    ensure_offline_tokenizer,
+    parse_latency,
+)
+
+SCENARIOS = ("search", "chat", "history", "ingestion")
+
+BENCH_JWT_SECRET = "fisiorag-benchmark-jwt-secret-0123456789"
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+
+@dataclass
+class HarnessConfig:
+    """Parametri del run: entrano nel report e rendono confrontabili due run."""
+
+    scenarios: List[str] = field(default_factory=lambda: list(SCENARIOS))
+    concurrency: List[int] = field(default_factory=lambda: [8])
+    requests: int = 200
+    ingestion_requests: int = 20
+    warmup_requests: int = 5
+    seed: int = 42
+    documents: int = 40
+    chunks_per_document: int = 12
+    sessions: int = 20
+    messages_per_session: int = 60
+    ingestion_words: int = 1500
+    chat_latency: str = "lognormal:400:0.5"
+    embeddings_latency: str = "lognormal:40:0.3"
+    rpc_latency: str = "lognormal:15:0.3"
+    db_latency: str = "fixed:2"
+    db_pool_size: int = 10
+    tokenizer: str = "auto"
+    env: Dict[str, str] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def configure_environment(server: FakeServicesServer, overrides: Dict[str, str]) -> None:
+    """Variabili d'ambiente dell'app puntate al server fake (prima di importare ``api``)."""
+    os.environ.update({
+        "SUPABASE_URL": server.base_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "bench-service-role-key",
+        "SUPABASE_SERVICE_KEY": "bench-service-role-key",
+        "SUPABASE_ANON_KEY": "bench-anon-key",
+        "SUPABASE_JWT_SECRET": BENCH_JWT_SECRET,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{server.base_url}/v1",
+        "OPENAI_API_BASE": f"{server.base_url}/v1",
+        # httpx (openai, postgrest) accetta il certificato self-signed del server fake
+        "SSL_CERT_FILE": str(server.cert_path),
+        "RATE_LIMITING_ENABLED": "false",
+        "CELERY_ENABLED": "false",
+        "CLASSIFICATION_CACHE_ENABLED": "false",
+        "ENABLE_CONVERSATIONAL_MEMORY": "true",
+        "ENABLE_PERSISTENT_MEMORY": "true",
+        "LOG_LEVEL": "WARNING",
+    })
+    os.environ.update(overrides)
+
+
+def make_token(subject: str, admin: bool = False, ttl_seconds: int = 3600) -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {
+            "sub": subject,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "iat": now,
+            "exp": now + ttl_seconds,
+            "app_metadata": {"role": "admin" if admin else "student"},
+        },
+        BENCH_JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    name: str,
+    build_request: Callable[[int], RequestSpec],
+    validate: Callable[[httpx.Response], bool],
+    total: int,
+    concurrency: int,
+    offset: int = 0,
+) -> ScenarioResult:
+    """
+    Esegue ``total`` request con ``concurrency`` worker (closed loop).
+
+    Una request conta come errore se lo status è >= 400, se la risposta non
+    passa ``validate`` (es. risposta di fallback senza LLM) o se solleva.
+    """
+    result = ScenarioResult(name=name, concurrency=concurrency)
+    counter = itertools.count()
+
+    async def _worker() -> None:
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            method, url, kwargs = build_request(offset + index)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+                ok = response.status_code < 400 and validate(response)
+            except Exception as exc:  # noqa: BLE001 - errore conteggiato, il run continua
+                status = type(exc).__name__
+                ok = False
+            result.record((time.perf_counter() - started) * 1000.0, status, ok)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(max(1, concurrency))))
+    result.duration_s = time.perf_counter() - started
+    return result
+
+
+class BenchmarkHarness:
+    """Server fake + corpus + app configurata; ``run`` esegue gli scenari."""
+
+    def __init__(self, config: HarnessConfig) -> None:
+        unknown = set(config.scenarios) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"scenari sconosciuti: {sorted(unknown)}")
+        self.config = config
+        self.corpus: Optional[SyntheticCorpus] = None
+        self.tokenizer: Optional[str] = None
+        self.database: Optional[InMemoryDatabase] = None
+        self.server: Optional[FakeServicesServer] = None
+        self.app: Any = None
+        self.settings: Any = None
+        self._ingestion_texts: List[str] = []
+
+    def start(self) -> "BenchmarkHarness":
+        config = self.config
+        self.tokenizer = ensure_offline_tokenizer(config.tokenizer)
+        self.corpus = generate_corpus(
+            seed=config.seed,
+            documents=config.documents,
+            chunks_per_document=config.chunks_per_document,
+            sessions=config.sessions,
+            messages_per_session=config.messages_per_session,
+        )
+        index = VectorIndex()
+        index.add_chunks(self.corpus.chunks, embed_texts([c.content for c in self.corpus.chunks]))
+        latencies = FakeServiceLatencies(
+            chat=parse_latency(config.chat_latency, seed=config.seed),
+            embeddings=parse_latency(config.embeddings_latency, seed=config.seed + 1),
+            rpc=parse_latency(config.rpc_latency, seed=config.seed + 2),
+        )
+        self.server = FakeServicesServer(FakeServiceState(index, latencies)).start()
+        configure_environment(self.server, config.env)
+
+        from api import database
+        from api.config import get_settings
+        from api.main import app
+
+        self.app = app
+        self.settings = get_settings()
+        self.database = InMemoryDatabase()
+        self.database.seed_sessions(self.corpus.sessions)
+        database.db_pool = InMemoryPool(
+            self.database,
+            size=config.db_pool_size,
+            latency=parse_latency(config.db_latency, seed=config.seed + 3),
+        )
+        per_level = config.ingestion_requests + config.warmup_requests
+        self._ingestion_texts = generate_ingestion_documents(
+            config.seed, per_level * len(config.concurrency), words=config.ingestion_words
+        )
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.stop()
+
+    # -- request builders ----------------------------------------------------
+
+    def _session_ids(self) -> List[str]:
+        return sorted(self.corpus.sessions)
+
+    def _search_request(self, index: int) -> RequestSpec:
+        query = self.corpus.queries[index % len(self.corpus.queries)]
+        token = make_token(f"bench-user-{index % 50}")
+        return "POST", "/api/v1/knowledge-base/search", {
+            "json": {"query": query.text, "match_count": 8},
+            "headers": {"Authorization": f"Bearer {token}"},
+        }
+
+    def _chat_request(self, index: int) -> RequestSpec:
+        sessions = self._session_ids()
+        session_id = sessions[index % len(sessions)]
+        query = self.corpus.queries[index % len(self.corpus.queries)]
+        token = make_token(f"bench-{session_id}")
+        return "POST", f"/api/v1/chat/sessions/{session_id}/messages", {
+            "json": {"message": query.text},
+            "headers": {"Authorization": f"Bearer {token}"},
+        }
+
+    def _history_request(self, index: int) -> RequestSpec:
+        sessions = self._session_ids()
+        session_id = sessions[index % len(sessions)]
+        token = make_token(f"bench-{session_id}")
+        order = "desc" if index % 2 else "asc"
+        return "GET", f"/api/v1/chat/sessions/{session_id}/history/full", {
+            "params": {"limit": 50, "order": order},
+            "headers": {"Authorization": f"Bearer {token}"},
+        }
+
+    def _ingestion_request(self, index: int) -> RequestSpec:
+        token = make_token("bench-admin", admin=True)
+        return "POST", "/api/v1/admin/knowledge-base/sync-jobs", {
+            "json": {
+                "document_text": self._ingestion_texts[index % len(self._ingestion_texts)],
+                "metadata": {"document_name": f"bench_ingestion_{index:05d}.txt"},
+            },
+            "headers": {"Authorization": f"Bearer {token}"},
+            "timeout": 120.0,
+        }
+
+    # -- validators ----------------------------------------------------------
+
+    @staticmethod
+    def _has_results(response: httpx.Response) -> bool:
+        return bool(response.json().get("results"))
+
+    @staticmethod
+    def _llm_answered(response: httpx.Response) -> bool:
+        # Risposta di fallback (LLM non raggiunto) o senza contesto: non è il percorso misurato
+        return str(response.json().get("answer", "")).startswith(FAKE_ANSWER_PREFIX)
+
+    @staticmethod
+    def _has_messages(response: httpx.Response) -> bool:
+        return bool(response.json().get("messages"))
+
+    @staticmethod
+    def _indexed(response: httpx.Response) -> bool:
+        return bool(response.json().get("inserted"))
+
+    def _scenario(self, name: str) -> Tuple[Callable[[int], RequestSpec], Callable[[httpx.Response], bool], int]:
+        requests = self.config.requests
+        return {
+            "search": (self._search_request, self._has_results, requests),
+            "chat": (self._chat_request, self._llm_answered, requests),
+            "history": (self._history_request, self._has_messages, requests),
+            "ingestion": (self._ingestion_request, self._indexed, self.config.ingestion_requests),
+        }[name]
+
+    async def run(self) -> Dict[str, Dict[str, Any]]:
+        """Esegue scenari x livelli di concorrenza; chiave risultato ``<scenario>@c<N>``."""
+        results: Dict[str, Dict[str, Any]] = {}
+        transport = httpx.ASGITransport(app=self.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+            for level_index, concurrency in enumerate(self.config.concurrency):
+                for name in self.config.scenarios:
+                    build, validate, total = self._scenario(name)
+                    # indici disgiunti tra livelli: l'ingestion non ripete documenti già indicizzati
+                    offset = level_index * (total + self.config.warmup_requests)
+                    if self.config.warmup_requests:
+                        await run_load(
+                            client, name, build, validate,
+                            total=self.config.warmup_requests, concurrency=concurrency,
+                            offset=offset,
+                        )
+                    self.server.state.reset_counters()
+                    self.database.queries.clear()
+                    measured = await run_load(
+                        client, name, build, validate,
+                        total=total, concurrency=concurrency,
+                        offset=offset + self.config.warmup_requests,
+                    )
+                    summary = measured.summary()
+                    summary["upstream_calls"] = self.server.state.snapshot()
+                    summary["db_queries"] = dict(sorted(self.database.queries.items()))
+                    results[f"{name}@c{concurrency}"] = summary
+            # lascia completare le persistenze async avviate dalle ultime chat
+            await asyncio.sleep(0.1)
+        return results
+
+    def report_context(self) -> Dict[str, Any]:
+        """Config effettiva: parametri harness + flag dell'app + corpus."""
+        flags = {
+            name: value
+            for name, value in self.settings.model_dump().items()
+            if name.startswith("enable_")
+        }
+        return {
+            **self.config.as_dict(),
+            "tokenizer": self.tokenizer,
+            "corpus": self.corpus.describe(),
+            "feature_flags": dict(sorted(flags.items())),
+        }
+
+
+__all__ = [
+    "BENCH_JWT_SECRET",
+    "SCENARIOS",
+    "BenchmarkHarness",
+    "HarnessConfig",
+    "configure_environment",
+    "make_token",
+    "run_load",
+]
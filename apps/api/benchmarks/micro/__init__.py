@@ -0,0 +1,13 @@
+"""
+Microbenchmark dei percorsi CPU pure-Python.
+
+Componenti:
+- ``fixtures``: input sintetici deterministici (testi da chunkare, history
+  di sessione, chunk rankati, store analytics, key rate limit, file da hashare)
+- ``cases``: registro dei casi ``<gruppo>.<caso>`` (chunking, conversation,
+  retrieval, analytics, rate_limit, logging, ingestion)
+- ``runner``: calibrazione dei loop e statistiche per operazione
+
+Report e confronto con baseline in ``benchmarks.report`` (suite ``micro``).
+Esecuzione: ``python -m benchmarks.micro --help``.
+"""
@@ -0,0 +1,138 @@
+"""
+Microbenchmark dei percorsi CPU: tempo per operazione e confronto con baseline.
+
+Usage:
+    cd apps/api
+    python -m benchmarks.micro
+    python -m benchmarks.micro --list
+    python -m benchmarks.micro --filter 'analytics.*' --filter 'conversation.*' --repeats 11
+
+    # baseline: salva, poi confronta un altro commit con la stessa config
+    python -m benchmarks.micro --baseline benchmarks/baselines/micro.json --save-baseline
+    python -m benchmarks.micro --baseline benchmarks/baselines/micro.json --fail-on-regression
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List
+
+from ..e2e.fake_services import ensure_offline_tokenizer
+from ..report import (
+    DEFAULT_TOLERANCE,
+    build_report,
+    compare_reports,
+    config_differences,
+    format_comparison_table,
+    format_summary_table,
+    load_report,
+    save_report,
+)
+from .cases import select_benchmarks
+from .fixtures import MicroFixtures
+from .runner import DEFAULT_MIN_TIME, DEFAULT_REPEATS, MICRO_METRIC_DIRECTIONS, run_benchmarks
+
+RESULTS_DIR = Path(__file__).resolve().parent.parent / "results"
+
+SUMMARY_METRICS = ("median_us", "min_us", "rsd_pct", "ops_per_sec", "loops")
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Microbenchmark CPU FisioRAG API")
+    parser.add_argument("--filter", action="append", default=[], metavar="GLOB",
+                        help="Casi da eseguire (glob sul nome, es. 'analytics.*'), ripetibile")
+    parser.add_argument("--list", action="store_true", help="Elenca i casi ed esce")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Fattore sulle dimensioni delle fixture")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME,
+                        help="Durata minima di un repeat in secondi (calibra i loop)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--tokenizer", choices=("auto", "tiktoken", "offline"), default="auto",
+                        help="auto: BPE tiktoken se in cache, altrimenti encoding byte-level offline")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Report JSON (default: benchmarks/results/micro-<commit>.json)")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="Report baseline da confrontare (o da scrivere con --save-baseline)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Scrive il report corrente in --baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Variazione relativa tollerata nel confronto (0.15 = 15%%)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit code 1 se il confronto con la baseline trova regressioni")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    if args.save_baseline and args.baseline is None:
+        raise SystemExit("--save-baseline richiede --baseline PATH")
+
+    benchmarks = select_benchmarks(args.filter)
+    if args.list:
+        for case in benchmarks:
+            print(f"{case.name:36} {case.description}")
+        return 0
+    if not benchmarks:
+        raise SystemExit(f"Nessun caso corrisponde a {args.filter}")
+
+    tokenizer = ensure_offline_tokenizer(args.tokenizer)
+    # Solo WARNING+: il costo dei log è misurato a parte (logging.json_format_*)
+    logging.getLogger("api").setLevel(logging.WARNING)
+
+    fixtures = MicroFixtures(seed=args.seed, scale=args.scale)
+    try:
+        results = run_benchmarks(
+            benchmarks,
+            fixtures,
+            min_time=args.min_time,
+            repeats=args.repeats,
+            progress=lambda name, stats: print(
+                f"  {name:36} {stats['median_us']:>12.2f} us/op", file=sys.stderr
+            ),
+        )
+        config = {
+            "seed": args.seed,
+            "scale": args.scale,
+            "min_time": args.min_time,
+            "repeats": args.repeats,
+            "tokenizer": tokenizer,
+            "fixtures": fixtures.describe(),
+        }
+    finally:
+        fixtures.close()
+
+    report = build_report("micro", results, config)
+    print(format_summary_table(results, SUMMARY_METRICS))
+    if tokenizer == "byte_fallback":
+        print("\nNota: BPE tiktoken non in cache, usato encoding byte-level offline.")
+
+    commit = (report["git"].get("commit") or "nogit")[:10]
+    output = args.output or RESULTS_DIR / f"micro-{commit}.json"
+    print(f"\nReport: {save_report(report, output)}")
+
+    exit_code = 0
+    if args.baseline is not None and args.save_baseline:
+        print(f"Baseline aggiornata: {save_report(report, args.baseline)}")
+    elif args.baseline is not None:
+        baseline = load_report(args.baseline)
+        if baseline.get("suite") != "micro":
+            raise SystemExit(f"{args.baseline} non è un report micro (suite {baseline.get('suite')!r})")
+        differences = config_differences(baseline, report)
+        if differences:
+            print("\nAttenzione: config diversa dalla baseline, confronto non omogeneo:")
+            for key, values in differences.items():
+                print(f"  {key}: {values['baseline']!r} -> {values['current']!r}")
+        comparisons = compare_reports(
+            baseline, report, tolerance=args.tolerance, directions=MICRO_METRIC_DIRECTIONS
+        )
+        print(f"\nConfronto con {args.baseline} (commit {str(baseline['git'].get('commit'))[:10]}):")
+        print(format_comparison_table(comparisons))
+        regressions = [item for item in comparisons if item.regression]
+        if regressions and args.fail_on_regression:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,368 @@
+"""
+Registro dei microbenchmark.
+
+Ogni caso è un generatore registrato con ``@benchmark``: prepara lo stato
+con le fixture, fa ``yield`` della callable senza argomenti da misurare
+(una chiamata = una operazione nel report) e ripristina lo stato globale
+toccato dopo lo yield. I moduli ``api`` sono importati dentro i casi:
+``--list`` e la selezione non caricano l'applicazione.
+
+Nome ``<gruppo>.<caso>``: il gruppo è la prima parte (``--filter
+'analytics.*'``).
+"""
+import fnmatch
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Sequence
+
+from .fixtures import MicroFixtures
+
+Operation = Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class MicroBenchmark:
+    """Caso registrato: ``setup(fixtures)`` è un context manager che fornisce l'operazione."""
+
+    name: str
+    description: str
+    setup: Callable[[MicroFixtures], ContextManager[Operation]]
+
+    @property
+    def group(self) -> str:
+        return self.name.split(".", 1)[0]
+
+
+BENCHMARKS: Dict[str, MicroBenchmark] = {}
+
+
+def benchmark(name: str, description: str):
+    """Registra un generatore ``(fixtures) -> Iterator[Operation]`` come caso ``name``."""
+    def decorator(func: Callable[[MicroFixtures], Iterator[Operation]]):
+        if name in BENCHMARKS:
+            raise ValueError(f"microbenchmark duplicato: {name}")
+        BENCHMARKS[name] = MicroBenchmark(name=name, description=description, setup=contextmanager(func))
+        return func
+    return decorator
+
+
+def select_benchmarks(patterns: Sequence[str] = ()) -> List[MicroBenchmark]:
+    """Casi il cui nome corrisponde ad almeno un pattern glob (tutti se nessun pattern)."""
+    if not patterns:
+        return list(BENCHMARKS.values())
+    return [
+        case for name, case in BENCHMARKS.items()
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+    ]
+
+
+# -------------------------------
+# Chunking
+# -------------------------------
+
+
+@benchmark("chunking.recursive_split", "RecursiveCharacterStrategy.split su testo accademico")
+def _recursive_split(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.ingestion.chunking.recursive import RecursiveCharacterStrategy
+
+    strategy, content = RecursiveCharacterStrategy(), fx.academic_text
+    yield lambda: strategy.split(content)
+
+
+@benchmark("chunking.tabular_split", "TabularStructuralStrategy.split su documento tabellare")
+def _tabular_split(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.ingestion.chunking.tabular import TabularStructuralStrategy
+
+    strategy, content = TabularStructuralStrategy(), fx.tabular_text
+    yield lambda: strategy.split(content)
+
+
+@benchmark("chunking.route_mixed", "ChunkRouter.route: accademico, tabellare e fallback (3 route)")
+def _route_mixed(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.ingestion.chunk_router import ChunkRouter
+    from api.ingestion.models import ClassificazioneOutput, DocumentStructureCategory
+
+    router = ChunkRouter()
+    inputs = [
+        (fx.academic_text, ClassificazioneOutput(
+            classificazione=DocumentStructureCategory.TESTO_ACCADEMICO_DENSO,
+            motivazione="benchmark", confidenza=0.92,
+        )),
+        (fx.tabular_text, ClassificazioneOutput(
+            classificazione=DocumentStructureCategory.DOCUMENTO_TABELLARE,
+            motivazione="benchmark", confidenza=0.88,
+        )),
+        (fx.academic_text, ClassificazioneOutput(
+            classificazione=DocumentStructureCategory.PAPER_SCIENTIFICO_MISTO,
+            motivazione="benchmark", confidenza=0.4,
+        )),
+    ]
+
+    def route_all() -> None:
+        for content, classification in inputs:
+            router.route(content, classification)
+
+    yield route_all
+
+
+# -------------------------------
+# Conversation memory
+# -------------------------------
+
+
+@contextmanager
+def _session_in_store(fx: MicroFixtures) -> Iterator[str]:
+    from api import stores
+
+    session_id = "micro-bench-session"
+    # Copie dei dict: il token count memoizzato non resta nelle fixture condivise
+    stores.chat_messages_store[session_id] = [dict(message) for message in fx.session_messages]
+    try:
+        yield session_id
+    finally:
+        stores.chat_messages_store.pop(session_id, None)
+
+
+@benchmark(
+    "conversation.context_window_cold",
+    "ConversationManager.get_context_window senza window in cache (ricostruzione dallo store)",
+)
+def _context_window_cold(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.services.conversation_service import ConversationManager
+
+    manager = ConversationManager()
+    with _session_in_store(fx) as session_id:
+        def cold() -> None:
+            manager._windows.clear()
+            manager.get_context_window(session_id)
+
+        yield cold
+
+
+@benchmark(
+    "conversation.context_window_warm",
+    "ConversationManager.get_context_window con window incrementale già allineato",
+)
+def _context_window_warm(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.services.conversation_service import ConversationManager
+
+    manager = ConversationManager()
+    with _session_in_store(fx) as session_id:
+        manager.get_context_window(session_id)
+        yield lambda: manager.get_context_window(session_id)
+
+
+@benchmark(
+    "conversation.truncate_to_budget",
+    "ConversationManager._truncate_to_budget sull'intera history (token contati a ogni chiamata)",
+)
+def _truncate_to_budget(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.services.conversation_service import ConversationManager
+
+    manager = ConversationManager()
+    messages = [
+        entry[0] for entry in (
+            manager._parse_stored_message("micro", dict(message)) for message in fx.session_messages
+        ) if entry is not None
+    ]
+    yield lambda: manager._truncate_to_budget(messages)
+
+
+@benchmark("conversation.format_for_prompt", "ConversationManager.format_for_prompt del context window")
+def _format_for_prompt(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.services.conversation_service import ConversationManager
+
+    manager = ConversationManager()
+    with _session_in_store(fx) as session_id:
+        window = manager.get_context_window(session_id)
+    yield lambda: manager.format_for_prompt(window)
+
+
+# -------------------------------
+# Retrieval
+# -------------------------------
+
+
+@benchmark("retrieval.diversify_chunks", "diversify_chunks (max_per_doc=2, preserve_top_n=3)")
+def _diversify(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.knowledge_base.diversification import diversify_chunks
+
+    chunks = fx.ranked_chunks
+    yield lambda: diversify_chunks(chunks, max_per_doc=2, preserve_top_n=3)
+
+
+@benchmark(
+    "retrieval.dynamic_match_count",
+    "DynamicRetrievalStrategy.get_optimal_match_count sull'elenco di query miste (una op = tutte)",
+)
+def _dynamic_match_count(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.config import Settings
+    from api.knowledge_base.dynamic_retrieval import DynamicRetrievalStrategy
+
+    # Default dei campi senza leggere env/.env: risultato indipendente dalla macchina
+    strategy = DynamicRetrievalStrategy(Settings.model_construct())
+    queries = fx.queries
+
+    def match_counts() -> None:
+        for query in queries:
+            strategy.get_optimal_match_count(query)
+
+    yield match_counts
+
+
+# -------------------------------
+# Analytics
+# -------------------------------
+
+
+@benchmark("analytics.aggregate_analytics", "aggregate_analytics su store sintetico")
+def _aggregate_analytics(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.analytics.analytics import aggregate_analytics
+
+    store, feedback, samples = fx.analytics_store, fx.feedback_store, fx.latency_samples_ms
+    yield lambda: aggregate_analytics(store, feedback, samples)
+
+
+@benchmark("analytics.temporal_distribution", "aggregate_temporal_distribution (filtro month)")
+def _temporal_distribution(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.analytics.analytics import aggregate_temporal_distribution
+
+    store = fx.analytics_store
+    yield lambda: aggregate_temporal_distribution(store, time_filter="month")
+
+
+@benchmark("analytics.quality_metrics", "aggregate_quality_metrics su store sintetico")
+def _quality_metrics(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.analytics.analytics import aggregate_quality_metrics
+
+    store = fx.analytics_store
+    yield lambda: aggregate_quality_metrics(store)
+
+
+@benchmark("analytics.problematic_queries", "aggregate_problematic_queries (limit=5)")
+def _problematic_queries(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.analytics.analytics import aggregate_problematic_queries
+
+    store, feedback = fx.analytics_store, fx.feedback_store
+    yield lambda: aggregate_problematic_queries(store, feedback, limit=5)
+
+
+@benchmark("analytics.engagement_stats", "aggregate_engagement_stats su store sintetico")
+def _engagement_stats(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.analytics.analytics import aggregate_engagement_stats
+
+    store, feedback = fx.analytics_store, fx.feedback_store
+    yield lambda: aggregate_engagement_stats(store, feedback)
+
+
+@benchmark("analytics.top_chunks", "aggregate_top_chunks (limit=10)")
+def _top_chunks(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.analytics.analytics import aggregate_top_chunks
+
+    store = fx.analytics_store
+    yield lambda: aggregate_top_chunks(store, limit=10)
+
+
+# -------------------------------
+# Rate limiting
+# -------------------------------
+
+
+@contextmanager
+def _rate_limiting_enabled() -> Iterator[None]:
+    # enforce_rate_limit è un no-op con TESTING=true o RATE_LIMITING_ENABLED=false
+    saved = {name: os.environ.pop(name, None) for name in ("TESTING", "RATE_LIMITING_ENABLED")}
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is not None:
+                os.environ[name] = value
+
+
+@benchmark(
+    "rate_limit.enforce_many_keys",
+    "RateLimitService.enforce_rate_limit, store locale con tutte le key vive (round robin)",
+)
+def _enforce_many_keys(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.services.rate_limit_service import RateLimitService
+
+    service = RateLimitService(store={})
+    keys = fx.rate_limit_keys
+    # Intervallo GCRA 0.1s: ogni key resta viva tra due passaggi del round robin
+    # (nessuna espulsione) e il burst di 1h non si esaurisce durante la misura
+    limits = {"scope": "micro_bench", "window_seconds": 3600, "max_requests": 36000}
+    position = 0
+
+    def enforce() -> None:
+        nonlocal position
+        service.enforce_rate_limit(keys[position], **limits)
+        position = (position + 1) % len(keys)
+
+    with _rate_limiting_enabled():
+        for key in keys:
+            service.enforce_rate_limit(key, **limits)
+        yield enforce
+
+
+# -------------------------------
+# Logging
+# -------------------------------
+
+
+def _log_record(msg: Any, exc_info: Any = None) -> logging.LogRecord:
+    return logging.LogRecord(
+        name="api", level=logging.INFO, pathname=__file__, lineno=1,
+        msg=msg, args=None, exc_info=exc_info,
+    )
+
+
+@benchmark("logging.json_format_event", "JSONFormatter.format di un evento dict tipico")
+def _json_format_event(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.utils.logging import JSONFormatter
+
+    formatter = JSONFormatter()
+    record = _log_record({
+        "event": "chat_query_completed",
+        "session_id": "micro-bench-session",
+        "request_id": "0b5c6a7e-4d0e-4f43-9f1e-2f7a3c1d9e10",
+        "latency_ms": 412.7,
+        "chunks_count": 8,
+        "cached": False,
+        "chunk_ids": [chunk["id"] for chunk in fx.ranked_chunks[:5]],
+        "model": "gpt-4o-mini",
+    })
+    yield lambda: formatter.format(record)
+
+
+@benchmark("logging.json_format_exception", "JSONFormatter.format di un record con traceback")
+def _json_format_exception(fx: MicroFixtures) -> Iterator[Operation]:
+    import sys
+
+    from api.utils.logging import JSONFormatter
+
+    formatter = JSONFormatter()
+    try:
+        raise RuntimeError("errore sintetico benchmark")
+    except RuntimeError:
+        record = _log_record("chat_query_failed %s", exc_info=sys.exc_info())
+    record.args = ("micro-bench-session",)
+    yield lambda: formatter.format(record)
+
+
+# -------------------------------
+# Ingestion
+# -------------------------------
+
+
+@benchmark("ingestion.compute_file_hash", "compute_file_hash (SHA-256) di un file da ~8 MiB in page cache")
+def _compute_file_hash(fx: MicroFixtures) -> Iterator[Operation]:
+    from api.ingestion.watcher import compute_file_hash
+
+    path = fx.hash_file
+    yield lambda: compute_file_hash(path)
+
+
+__all__ = ["BENCHMARKS", "MicroBenchmark", "benchmark", "select_benchmarks"]
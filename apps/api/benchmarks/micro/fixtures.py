@@ -0,0 +1,240 @@
+"""
+Fixture deterministiche per i microbenchmark.
+
+Stesso ``seed`` e ``scale`` → stessi input byte per byte, quindi due run su
+commit diversi misurano lo stesso lavoro. Il testo riusa il generatore del
+corpus end-to-end (``benchmarks.e2e.corpus``). ``scale`` riduce le
+dimensioni (es. 0.05 nei test di smoke), le proporzioni restano le stesse.
+"""
+import random
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..e2e.corpus import TOPICS, generate_text
+
+_STARTED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+_SIMPLE_QUERIES = (
+    "cos'è la lombalgia",
+    "definizione di sciatica",
+    "che cosa significa propriocezione",
+)
+_COMPLEX_QUERIES = (
+    "confronta trattamento conservativo e chirurgico della lesione del crociato anteriore "
+    "e spiega le differenze nel protocollo di riabilitazione",
+    "quali sono le differenze tra tendinopatia della cuffia dei rotatori e capsulite adesiva "
+    "nella valutazione clinica e nella progressione degli esercizi",
+)
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class MicroFixtures:
+    """
+    Input sintetici dei microbenchmark, generati alla prima richiesta.
+
+    Args:
+        seed: Seed del generatore
+        scale: Fattore sulle dimensioni (1.0 = default documentato nel README)
+    """
+
+    def __init__(self, seed: int = 42, scale: float = 1.0):
+        self.seed = seed
+        self.scale = scale
+        self._tmpdir: Optional[Path] = None
+
+    def _n(self, value: int, minimum: int = 1) -> int:
+        return max(minimum, int(value * self.scale))
+
+    def _rng(self, name: str) -> random.Random:
+        # Un generatore per fixture: aggiungerne una non sposta le altre
+        return random.Random(f"{self.seed}:{name}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "academic_chars": len(self.academic_text),
+            "tabular_chars": len(self.tabular_text),
+            "session_messages": len(self.session_messages),
+            "ranked_chunks": len(self.ranked_chunks),
+            "queries": len(self.queries),
+            "analytics_sessions": len(self.analytics_store),
+            "analytics_feedback": len(self.feedback_store),
+            "rate_limit_keys": len(self.rate_limit_keys),
+            "hash_file_bytes": self.hash_file_bytes,
+        }
+
+    @cached_property
+    def academic_text(self) -> str:
+        """Testo accademico a paragrafi (~60k caratteri)."""
+        rng = self._rng("academic")
+        topics = sorted(TOPICS)
+        return "\n\n".join(
+            generate_text(rng, topics[index % len(topics)], 160)
+            for index in range(self._n(48))
+        )
+
+    @cached_property
+    def tabular_text(self) -> str:
+        """Documento tabellare: sezioni con intestazione e righe ``|``-separate."""
+        rng = self._rng("tabular")
+        topics = sorted(TOPICS)
+        sections: List[str] = []
+        for index in range(self._n(80)):
+            topic = topics[index % len(topics)]
+            rows = [f"Tabella {index + 1} - {topic}", "| parametro | valore | note |"]
+            for _ in range(rng.randint(2, 8)):
+                rows.append(
+                    f"| {rng.choice(TOPICS[topic])} | {rng.randint(1, 180)} "
+                    f"| {generate_text(rng, topic, 6)} |"
+                )
+            sections.append("\n".join(rows))
+        return "\n\n".join(sections)
+
+    @cached_property
+    def session_messages(self) -> List[Dict[str, Any]]:
+        """History di una sessione nel formato di ``chat_messages_store``."""
+        rng = self._rng("session")
+        topics = sorted(TOPICS)
+        messages: List[Dict[str, Any]] = []
+        for index in range(self._n(40, minimum=8)):
+            role = "user" if index % 2 == 0 else "assistant"
+            message: Dict[str, Any] = {
+                "id": _uuid(rng),
+                "session_id": "micro-session",
+                "role": role,
+                "content": generate_text(rng, rng.choice(topics), 30 if role == "user" else 220),
+                "created_at": (_STARTED + timedelta(seconds=index * 9)).isoformat(),
+            }
+            if role == "assistant":
+                message["citations"] = [{"chunk_id": _uuid(rng)} for _ in range(rng.randint(1, 4))]
+            messages.append(message)
+        return messages
+
+    @cached_property
+    def ranked_chunks(self) -> List[Dict[str, Any]]:
+        """Chunk ordinati per score, con documenti ripetuti (input di ``diversify_chunks``)."""
+        rng = self._rng("ranked")
+        documents = [_uuid(rng) for _ in range(self._n(12))]
+        chunks = [
+            {
+                "id": _uuid(rng),
+                "document_id": rng.choice(documents),
+                "content": generate_text(rng, "spalla", 20),
+                "similarity_score": rng.random(),
+            }
+            for _ in range(self._n(60, minimum=4))
+        ]
+        chunks.sort(key=lambda chunk: chunk["similarity_score"], reverse=True)
+        return chunks
+
+    @cached_property
+    def queries(self) -> List[str]:
+        """Query miste (semplici, complesse, generiche) per il match count dinamico."""
+        rng = self._rng("queries")
+        topics = sorted(TOPICS)
+        queries: List[str] = []
+        for index in range(self._n(60, minimum=3)):
+            kind = index % 3
+            if kind == 0:
+                queries.append(rng.choice(_SIMPLE_QUERIES))
+            elif kind == 1:
+                queries.append(rng.choice(_COMPLEX_QUERIES))
+            else:
+                queries.append(generate_text(rng, rng.choice(topics), rng.randint(6, 14)).rstrip("."))
+        return queries
+
+    @cached_property
+    def analytics_store(self) -> Dict[str, List[Dict[str, Any]]]:
+        """``chat_messages_store`` con messaggi completi dei campi letti dagli aggregati analytics."""
+        rng = self._rng("analytics")
+        topics = sorted(TOPICS)
+        documents = [f"{topic}_{index:02d}.pdf" for topic in topics for index in range(4)]
+        chunk_ids = [_uuid(rng) for _ in range(self._n(300, minimum=10))]
+        question_pool = [generate_text(rng, topic, 10) for topic in topics for _ in range(15)]
+        # Ancorate al mezzogiorno di oggi (fasce orarie stabili), entro 21 giorni:
+        # il filtro "month" include sempre tutti i messaggi
+        now =datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+        store: Dict[str, List[Dict[str, Any]]] = {}
+        for session_index in range(self._n(400)):
+            session_id = f"micro-analytics-{session_index:05d}"
+            started = now - timedelta(days=rng.randint(0, 20), minutes=rng.randint(0, 600))
+            messages: List[Dict[str, Any]] = []
+            for turn in range(rng.randint(1, 10)):
+                created = started + timedelta(seconds=turn * 40)
+                messages.append({
+                    "id": _uuid(rng),
+                    "role": "user",
+                    "content": rng.choice(question_pool),
+                    "created_at": created.isoformat(),
+                })
+                cited = rng.sample(chunk_ids, k=rng.randint(1, 5))
+                messages.append({
+                    "id": _uuid(rng),
+                    "role": "assistant",
+                    "content": generate_text(rng, rng.choice(topics), 80),
+                    "created_at": (created + timedelta(seconds=5)).isoformat(),
+                    "chunk_ids": cited,
+                    "chunk_scores": [round(rng.uniform(0.5, 0.95), 4) for _ in cited],
+                    "chunk_documents": [rng.choice(documents) for _ in cited],
+                })
+            store[session_id] = messages
+        return store
+
+    @cached_property
+    def feedback_store(self) -> Dict[str, Dict[str, Any]]:
+        """Feedback su ~30% delle risposte, chiave ``session_id:message_id``."""
+        rng = self._rng("feedback")
+        feedback: Dict[str, Dict[str, Any]] = {}
+        for session_id, messages in self.analytics_store.items():
+            for message in messages:
+                if message["role"] == "assistant" and rng.random() < 0.3:
+                    feedback[f"{session_id}:{message['id']}"] = {
+                        "vote": "up" if rng.random() < 0.75 else "down",
+                        "created_at": message["created_at"],
+                    }
+        return feedback
+
+    @cached_property
+    def latency_samples_ms(self) -> List[int]:
+        rng = self._rng("latency")
+        return [int(rng.lognormvariate(6.5, 0.5)) for _ in range(self._n(5000))]
+
+    @cached_property
+    def rate_limit_keys(self) -> List[str]:
+        """IP sintetici distinti (uno store con molte chiavi vive)."""
+        rng = self._rng("rate_limit")
+        return [
+            f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{index % 256}"
+            for index in range(self._n(20000, minimum=10))
+        ]
+
+    @property
+    def hash_file_bytes(self) -> int:
+        return self._n(8 * 1024 * 1024, minimum=64 * 1024)
+
+    @cached_property
+    def hash_file(self) -> Path:
+        """File binario deterministico per ``compute_file_hash`` (~8 MiB)."""
+        if self._tmpdir is None:
+            self._tmpdir = Path(tempfile.mkdtemp(prefix="micro-bench-"))
+        path = self._tmpdir / "document.bin"
+        rng = self._rng("hash_file")
+        path.write_bytes(rng.randbytes(self.hash_file_bytes))
+        return path
+
+    def close(self) -> None:
+        """Rimuove i file temporanei creati dalle fixture."""
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+            self.__dict__.pop("hash_file", None)
+
+
+__all__ = ["MicroFixtures"]
@@ -0,0 +1,103 @@
+"""
+Misura dei microbenchmark.
+
+Per ogni caso: una chiamata di warmup, calibrazione del numero di loop
+finché un repeat dura almeno ``min_time``, poi ``repeats`` ripetizioni.
+Il tempo per operazione di ogni repeat è ``tempo / loop``; nel report
+mediana (metrica di confronto, robusta ai picchi), minimo, media e
+deviazione standard. Il GC resta attivo durante la misura (``timeit`` lo
+disattiva di default): i casi che allocano molto pagano le collezioni come
+in produzione.
+"""
+import math
+import statistics
+import timeit
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from .cases import MicroBenchmark, Operation
+from .fixtures import MicroFixtures
+
+# metrica -> True se valori più alti sono migliori (``compare_reports``)
+MICRO_METRIC_DIRECTIONS: Dict[str, bool] = {
+    "median_us": False,
+    "min_us": False,
+}
+
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_REPEATS = 7
+
+
+def _calibrate(timer: timeit.Timer, min_time: float) -> int:
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            return loops
+        if elapsed <= 0:
+            loops *= 10
+            continue
+        loops = max(loops * 2, math.ceil(loops * min_time / elapsed))
+
+
+def measure(
+    operation: Operation,
+    min_time: float = DEFAULT_MIN_TIME,
+    repeats: int = DEFAULT_REPEATS,
+) -> Dict[str, Any]:
+    """
+    Tempo per operazione di ``operation`` (microsecondi).
+
+    Args:
+        operation: Callable senza argomenti
+        min_time: Durata minima di un repeat (secondi)
+        repeats: Ripetizioni misurate
+
+    Returns:
+        Statistiche per operazione e parametri di misura
+    """
+    operation()
+    timer = timeit.Timer(operation, setup="gc.enable()")
+    loops = _calibrate(timer, min_time)
+    per_op_us = sorted(
+        elapsed / loops * 1e6 for elapsed in timer.repeat(repeat=max(1, repeats), number=loops)
+    )
+    median = statistics.median(per_op_us)
+    mean = statistics.fmean(per_op_us)
+    stdev = statistics.stdev(per_op_us) if len(per_op_us) > 1 else 0.0
+    return {
+        "median_us": round(median, 3),
+        "min_us": round(per_op_us[0], 3),
+        "mean_us": round(mean, 3),
+        "stdev_us": round(stdev, 3),
+        "rsd_pct": round(stdev / mean * 100.0, 2) if mean > 0 else 0.0,
+        "ops_per_sec": round(1e6 / median, 1) if median > 0 else math.inf,
+        "loops": loops,
+        "repeats": len(per_op_us),
+    }
+
+
+def run_benchmarks(
+    benchmarks: Sequence[MicroBenchmark],
+    fixtures: MicroFixtures,
+    min_time: float = DEFAULT_MIN_TIME,
+    repeats: int = DEFAULT_REPEATS,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Esegue i casi in ordine; risultati per nome caso (formato ``build_report``)."""
+    results: Dict[str, Dict[str, Any]] = {}
+    for case in benchmarks:
+        with case.setup(fixtures) as operation:
+            stats = measure(operation, min_time=min_time, repeats=repeats)
+        results[case.name] = {"group": case.group, **stats}
+        if progress is not None:
+            progress(case.name, results[case.name])
+    return results
+
+
+__all__ = [
+    "DEFAULT_MIN_TIME",
+    "DEFAULT_REPEATS",
+    "MICRO_METRIC_DIRECTIONS",
+    "measure",
+    "run_benchmarks",
+]
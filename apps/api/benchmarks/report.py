@@ -0,0 +1,297 @@
+"""
+Report dei benchmark: statistiche, salvataggio JSON, confronto con baseline.
+
+Formato report (``schema_version`` 1)::
+
+    {
+      "schema_version": 1,
+      "suite": "e2e",
+      "created_at": "...",
+      "git": {"commit": "...", "branch": "...", "dirty": false},
+      "environment": {"python": "...", "platform": "..."},
+      "config": {...},
+      "results": {"<nome>": {"p50_ms": ..., "p95_ms": ..., ...}}
+    }
+
+``compare_reports`` confronta le metriche note (``METRIC_DIRECTIONS``)
+presenti in entrambi i report: una variazione peggiorativa oltre la
+tolleranza relativa è una regressione. Le metriche sono confrontabili solo
+tra run con la stessa ``config`` (seed, concorrenza, latenze simulate): il
+confronto segnala le differenze di config invece di ignorarle.
+"""
+import json
+import math
+import platform
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+SCHEMA_VERSION = 1
+
+# metrica -> True se valori più alti sono migliori
+METRIC_DIRECTIONS: Dict[str, bool] = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "mean_ms": False,
+}
+
+DEFAULT_TOLERANCE = 0.15
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Percentile ``q`` (0-100) con interpolazione lineare (come numpy default)."""
+    if not sorted_values:
+        return math.nan
+    if len(sorted_values) == 1:
+        return float(sorted_values[0])
+    rank = (len(sorted_values) - 1) * q / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    fraction = rank - low
+    return float(sorted_values[low] + (sorted_values[high] - sorted_values[low]) * fraction)
+
+
+def latency_summary(latencies_ms: Iterable[float]) -> Dict[str, float]:
+    """p50/p95/p99, media e massimo di una serie di latenze (ms)."""
+    values = sorted(latencies_ms)
+    if not values:
+        return {"p50_ms": math.nan, "p95_ms": math.nan, "p99_ms": math.nan,
+                "mean_ms": math.nan, "max_ms": math.nan}
+    return {
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+@dataclass
+class ScenarioResult:
+    """Misure grezze di uno scenario (una request = una latenza)."""
+
+    name: str
+    concurrency: int
+    duration_s: float = 0.0
+    latencies_ms: List[float] = field(default_factory=list)
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, latency_ms: float, status: str, ok: bool) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        requests = len(self.latencies_ms)
+        return {
+            "requests": requests,
+            "concurrency": self.concurrency,
+            "duration_s": round(self.duration_s, 3),
+            "throughput_rps": round(requests / self.duration_s, 3) if self.duration_s > 0 else 0.0,
+            **latency_summary(self.latencies_ms),
+            "errors": self.errors,
+            "error_rate": round(self.errors / requests, 4) if requests else 0.0,
+            "status_counts": dict(sorted(self.status_counts.items())),
+        }
+
+
+def git_metadata(cwd: Optional[Path] = None) -> Dict[str, Any]:
+    """Commit, branch e stato del working tree (None fuori da un repo git)."""
+    def _git(*args: str) -> Optional[str]:
+        try:
+            completed = subprocess.run(
+                ["git", *args], cwd=cwd, capture_output=True, text=True, timeout=10, check=True
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return completed.stdout.strip()
+
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+    }
+
+
+def build_report(
+    suite: str,
+    results: Mapping[str, Mapping[str, Any]],
+    config: Mapping[str, Any],
+    extra: Optional[Mapping[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Report serializzabile con metadati git e ambiente."""
+    report: Dict[str, Any] = {
+        "schema_version": SCHEMA_VERSION,
+        "suite": suite,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_metadata(Path(__file__).parent),
+        "environment": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "config": dict(config),
+        "results": {name: dict(values) for name, values in results.items()},
+    }
+    if extra:
+        report.update(extra)
+    return report
+
+
+def save_report(report: Mapping[str, Any], path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False, default=str) + "\n", encoding="utf-8")
+    return path
+
+
+def load_report(path: Path) -> Dict[str, Any]:
+    report = json.loads(Path(path).read_text(encoding="utf-8"))
+    if report.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(
+            f"schema_version {report.get('schema_version')!r} non supportata ({path})"
+        )
+    return report
+
+
+@dataclass(frozen=True)
+class MetricComparison:
+    """Confronto di una metrica tra baseline e run corrente."""
+
+    result: str
+    metric: str
+    baseline: float
+    current: float
+    change_pct: float
+    regression: bool
+    improvement: bool
+
+
+def compare_reports(
+    baseline: Mapping[str, Any],
+    current: Mapping[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    directions: Optional[Mapping[str, bool]] = None,
+) -> List[MetricComparison]:
+    """
+    Confronta i risultati comuni ai due report.
+
+    Args:
+        baseline: Report di riferimento (``load_report``)
+        current: Report del run corrente
+        tolerance: Variazione relativa tollerata (0.15 = 15%)
+        directions: Metriche da confrontare (default ``METRIC_DIRECTIONS``)
+
+    Returns:
+        Un confronto per (risultato, metrica) presente in entrambi
+    """
+    directions = METRIC_DIRECTIONS if directions is None else directions
+    comparisons: List[MetricComparison] = []
+    baseline_results = baseline.get("results", {})
+    for name, values in current.get("results", {}).items():
+        reference = baseline_results.get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in directions.items():
+            old, new = reference.get(metric), values.get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            if math.isnan(old) or math.isnan(new) or old <= 0:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            comparisons.append(MetricComparison(
+                result=name,
+                metric=metric,
+                baseline=float(old),
+                current=float(new),
+                change_pct=round(change * 100.0, 2),
+                regression=worse > tolerance,
+                improvement=worse < -tolerance,
+            ))
+    return comparisons
+
+
+def _flatten(values: Mapping[str, Any], prefix: str = "") -> Dict[str, Any]:
+    flat: Dict[str, Any] = {}
+    for key, value in values.items():
+        if isinstance(value, Mapping) and value:
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def config_differences(baseline: Mapping[str, Any], current: Mapping[str, Any]) -> Dict[str, Any]:
+    """Chiavi di config (annidate: ``a.b``) diverse tra i due report: confronto non omogeneo."""
+    old = _flatten(baseline.get("config", {}))
+    new = _flatten(current.get("config", {}))
+    return {
+        key: {"baseline": old.get(key), "current": new.get(key)}
+        for key in sorted(set(old) | set(new))
+        if old.get(key) != new.get(key)
+    }
+
+
+def format_summary_table(results: Mapping[str, Mapping[str, Any]], metrics: Sequence[str]) -> str:
+    """Tabella testuale dei risultati (una riga per risultato)."""
+    header = ["name", *metrics]
+    rows = [[name, *(_format_value(values.get(metric)) for metric in metrics)]
+            for name, values in results.items()]
+    return _format_table(header, rows)
+
+
+def format_comparison_table(comparisons: Sequence[MetricComparison]) -> str:
+    header = ["name", "metric", "baseline", "current", "change", ""]
+    rows = [
+        [
+            item.result,
+            item.metric,
+            _format_value(item.baseline),
+            _format_value(item.current),
+            f"{item.change_pct:+.1f}%",
+            "REGRESSION" if item.regression else ("improved" if item.improvement else ""),
+        ]
+        for item in comparisons
+    ]
+    return _format_table(header, rows)
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return "-" if value is None else str(value)
+
+
+def _format_table(header: Sequence[str], rows: Sequence[Sequence[str]]) -> str:
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    lines = ["  ".join(str(cell).ljust(width) for cell, width in zip(line, widths)).rstrip()
+             for line in [header, *rows]]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+__all__ = [
+    "DEFAULT_TOLERANCE",
+    "METRIC_DIRECTIONS",
+    "MetricComparison",
+    "ScenarioResult",
+    "build_report",
+    "compare_reports",
+    "config_differences",
+    "format_comparison_table",
+    "format_summary_table",
+    "latency_summary",
+    "load_report",
+    "percentile",
+    "save_report",
+]
@@ -0,0 +1,268 @@
+"""
+Benchmark serializzazione response JSON per endpoint (payload grandi).
+
+Confronta, per ogni endpoint con payload sintetico di dimensione massima:
+
+- ``legacy``: percorso FastAPI precedente (ri-validazione response_model,
+  ``to_python(mode="json")`` / ``jsonable_encoder``, ``json.dumps`` stdlib)
+- ``default_class``: stesso percorso FastAPI con ``FastJSONResponse`` come
+  ``default_response_class`` (orjson sul dict già JSON-compatibile)
+- ``direct``: l'endpoint restituisce ``FastJSONResponse(model)``
+  (``model_dump_json``, nessuna ri-validazione)
+
+Metriche: CPU di serializzazione per response (``time.process_time``, mediana)
+e latenza end-to-end in-process (ASGI, p50/p95) su un'app minima con le tre
+varianti. Nessun servizio esterno richiesto.
+
+Usage:
+    python scripts/benchmark_response_serialization.py
+    python scripts/benchmark_response_serialization.py --iterations 500 --output reports/response-serialization.md
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from statistics import median
+from typing import Any, Callable, Dict, List, Optional
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+from api.analytics.analytics import (
+    AdvancedAnalyticsResponse,
+    aggregate_analytics,
+    aggregate_engagement_stats,
+    aggregate_problematic_queries,
+    aggregate_quality_metrics,
+    aggregate_temporal_distribution,
+    aggregate_top_chunks,
+)
+from api.schemas.chat import ChatQueryChunk, ChatQueryResponse, ConversationMessage, SessionHistoryResponse
+from api.schemas.knowledge_base import ChunkDetail, DocumentChunksResponse, SearchResponse
+from api.utils.responses import FastJSONResponse
+
+_CONTENT = (
+    "La lombalgia meccanica è caratterizzata da dolore modulato dal carico e "
+    "dalla postura; l'esercizio terapeutico graduale riduce disabilità e recidive. "
+)
+_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _document_chunks() -> BaseModel:
+    """100 chunk con contenuto completo (~1.5 KB ciascuno)."""
+    return DocumentChunksResponse(
+        document_id="doc-1",
+        document_name="linee_guida_lombalgia.pdf",
+        chunks=[
+            ChunkDetail(
+                chunk_id=f"chunk-{i}",
+                content=_CONTENT * 10,
+                chunk_size=len(_CONTENT) * 10,
+                chunk_index=i,
+                chunking_strategy="recursive",
+                page_number=i // 4,
+                embedding_status="indexed",
+                created_at=(_EPOCH + timedelta(seconds=i)).isoformat(),
+            )
+            for i in range(100)
+        ],
+        total_chunks=100,
+    )
+
+
+def _history_full() -> BaseModel:
+    """500 messaggi con citazioni."""
+    return SessionHistoryResponse(
+        messages=[
+            ConversationMessage(
+                id=f"msg-{i}",
+                role="assistant" if i % 2 else "user",
+                content=_CONTENT * (4 if i % 2 else 1),
+                source_chunk_ids=[f"chunk-{i}-{j}" for j in range(3)] if i % 2 else None,
+                metadata={"citations": [{"chunk_id": f"chunk-{i}-{j}"} for j in range(3)]} if i % 2 else {},
+                created_at=(_EPOCH + timedelta(minutes=i)).isoformat(),
+            )
+            for i in range(500)
+        ],
+        total_count=2000,
+        has_more=True,
+        next_cursor="eyJjIjoiMjAyNi0wMS0wMSJ9",
+    )
+
+
+def _analytics() -> BaseModel:
+    """Analytics avanzate su uno store sintetico (200 sessioni)."""
+    store: Dict[str, List[Dict[str, Any]]] = {}
+    feedback: Dict[str, Dict[str, Any]] = {}
+    for s in range(200):
+        messages = []
+        for m in range(10):
+            created_at = (_EPOCH + timedelta(hours=s, minutes=m)).isoformat()
+            messages.append({"id": f"u-{s}-{m}", "role": "user", "content": f"domanda {m % 25}", "created_at": created_at})
+            messages.append({
+                "id": f"a-{s}-{m}",
+                "role": "assistant",
+                "content": _CONTENT,
+                "created_at": created_at,
+                "chunk_ids": [f"chunk-{(s + m + j) % 300}" for j in range(5)],
+                "chunk_scores": [0.9 - j * 0.05 for j in range(5)],
+                "chunk_documents": [f"doc-{j}" for j in range(5)],
+            })
+            if m % 3 == 0:
+                feedback[f"{s}:a-{s}-{m}"] = {"session_id": str(s), "message_id": f"a-{s}-{m}", "vote": "down" if m % 2 else "up"}
+        store[str(s)] = messages
+
+    base = aggregate_analytics(store, feedback, [100 + i for i in range(1000)])
+    return AdvancedAnalyticsResponse(
+        overview=base.overview,
+        top_queries=base.top_queries,
+        feedback_summary=base.feedback_summary,
+        performance_metrics=base.performance_metrics,
+        temporal_distribution=aggregate_temporal_distribution(store, "all"),
+        quality_metrics=aggregate_quality_metrics(store),
+        problematic_queries=aggregate_problematic_queries(store, feedback),
+        engagement_stats=aggregate_engagement_stats(store, feedback),
+        top_chunks=aggregate_top_chunks(store),
+    )
+
+
+def _search() -> BaseModel:
+    """Risultati knowledge-base/search (list[dict], 50 risultati)."""
+    return SearchResponse(results=[
+        {
+            "content": _CONTENT * 6,
+            "metadata": {"id": f"chunk-{i}", "document_id": f"doc-{i % 7}", "page_number": i},
+            "similarity_score": 0.95 - i * 0.01,
+        }
+        for i in range(50)
+    ])
+
+
+def _chat_query() -> BaseModel:
+    """Chunk /chat/query (20 risultati)."""
+    return ChatQueryResponse(chunks=[
+        ChatQueryChunk(id=f"chunk-{i}", document_id=f"doc-{i % 5}", content=_CONTENT * 8, similarity=0.9 - i * 0.01)
+        for i in range(20)
+    ])
+
+
+# endpoint -> (factory payload, response_model dichiarato o None)
+ENDPOINTS: Dict[str, tuple] = {
+    "GET /admin/documents/{id}/chunks": (_document_chunks, DocumentChunksResponse),
+    "GET /chat/sessions/{id}/history/full": (_history_full, SessionHistoryResponse),
+    "GET /admin/analytics?include_advanced": (_analytics, None),
+    "POST /knowledge-base/search": (_search, SearchResponse),
+    "POST /chat/query": (_chat_query, ChatQueryResponse),
+}
+
+
+def _legacy_encoder(response_model: Optional[type], response_class: type) -> Callable[[BaseModel], bytes]:
+    """Percorso di FastAPI ``serialize_response`` + ``response_class.render``."""
+    if response_model is None:
+        return lambda model: response_class(jsonable_encoder(model)).body
+    adapter = TypeAdapter(response_model)
+
+    def encode(model: BaseModel) -> bytes:
+        validated = adapter.validate_python(model, from_attributes=True)
+        return response_class(adapter.dump_python(validated, mode="json", by_alias=True)).body
+
+    return encode
+
+
+def _variants(response_model: Optional[type]) -> Dict[str, Callable[[BaseModel], bytes]]:
+    return {
+        "legacy": _legacy_encoder(response_model, JSONResponse),
+        "default_class": _legacy_encoder(response_model, FastJSONResponse),
+        "direct": lambda model: FastJSONResponse(model).body,
+    }
+
+
+def measure_cpu(encode: Callable[[BaseModel], bytes], model: BaseModel, iterations: int) -> Dict[str, float]:
+    encode(model)  # warmup
+    samples = []
+    for _ in range(iterations):
+        started = time.process_time()
+        body = encode(model)
+        samples.append((time.process_time() - started) * 1_000_000)
+    return {"cpu_us_p50": median(samples), "bytes": len(body)}
+
+
+def _build_app(payloads: Dict[str, BaseModel]) -> FastAPI:
+    app = FastAPI()
+    for index, (name, (_, response_model)) in enumerate(ENDPOINTS.items()):
+        model = payloads[name]
+        app.add_api_route(f"/{index}/legacy", lambda m=model: m, response_model=response_model, response_class=JSONResponse)
+        app.add_api_route(f"/{index}/default_class", lambda m=model: m, response_model=response_model, response_class=FastJSONResponse)
+        app.add_api_route(f"/{index}/direct", lambda m=model: FastJSONResponse(m), response_model=response_model)
+    return app
+
+
+async def measure_latency(app: FastAPI, path: str, iterations: int) -> Dict[str, float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # warmup
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = await client.get(path)
+            samples.append((time.perf_counter() - started) * 1000.0)
+            response.raise_for_status()
+    samples.sort()
+    return {"latency_ms_p50": median(samples), "latency_ms_p95": samples[int(len(samples) * 0.95) - 1]}
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+    payloads = {name: factory() for name, (factory, _) in ENDPOINTS.items()}
+    app = _build_app(payloads)
+    rows = []
+    for index, (name, (_, response_model)) in enumerate(ENDPOINTS.items()):
+        for variant, encode in _variants(response_model).items():
+            row = {"endpoint": name, "variant": variant}
+            row.update(measure_cpu(encode, payloads[name], iterations))
+            row.update(asyncio.run(measure_latency(app, f"/{index}/{variant}", iterations)))
+            rows.append(row)
+    return rows
+
+
+def format_report(rows: List[Dict[str, Any]], iterations: int) -> str:
+    lines = [
+        "# Response serialization benchmark",
+        "",
+        f"Iterazioni per variante: {iterations}",
+        "",
+        "| Endpoint | Variante | Bytes | CPU p50 (µs) | Latenza p50 (ms) | Latenza p95 (ms) | Speedup CPU |",
+        "|---|---|---:|---:|---:|---:|---:|",
+    ]
+    legacy_cpu = {row["endpoint"]: row["cpu_us_p50"] for row in rows if row["variant"] == "legacy"}
+    for row in rows:
+        speedup = legacy_cpu[row["endpoint"]] / row["cpu_us_p50"] if row["cpu_us_p50"] else 0.0
+        lines.append(
+            f"| {row['endpoint']} | {row['variant']} | {row['bytes']} | {row['cpu_us_p50']:.0f} | "
+            f"{row['latency_ms_p50']:.2f} | {row['latency_ms_p95']:.2f} | {speedup:.1f}x |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark serializzazione response JSON per endpoint")
+    parser.add_argument("--iterations", type=int, default=200, help="Ripetizioni per variante (default: 200)")
+    parser.add_argument("--output", type=str, default=None, help="File Markdown del report (default: stdout)")
+    args = parser.parse_args()
+
+    report = format_report(run(args.iterations), args.iterations)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(report, encoding="utf-8")
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,13 @@ Metrics:
 - Diversity Score
 - Latency (p50, p95)
 
+Con --compare-quantized confronta invece l'RPC full (vector 1536) con
+match_document_chunks_quantized (halfvec 512 + rescoring esatto):
+Recall@k del quantizzato rispetto al full e latenza RPC.
+
 Usage:
     python scripts/benchmark_retrieval.py --output reports/retrieval-benchmark-7.2.md
+    python scripts/benchmark_retrieval.py --compare-quantized --output reports/retrieval-quantized-recall.md
 """
 import argparse
 import json
@@ -27,7 +32,12 @@ import numpy as np
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from api.knowledge_base.search import perform_semantic_search
+from api.knowledge_base.search import (
+    QUANTIZED_MAX_CANDIDATES,
+    _get_embeddings_model,
+    _get_supabase_client,
+    perform_semantic_search,
+)
 from api.knowledge_base.enhanced_retrieval import get_enhanced_retriever
 from api.knowledge_base.diversification import calculate_diversity_score
 from api.config import get_settings
@@ -135,6 +145,122 @@ def calculate_mrr(retrieved_ids: List[str], relevant_ids: List[str]) -> float:
     return 0.0
 
 
+def calculate_recall_at_k(candidate_ids: List[str], reference_ids: List[str], k: int) -> float:
+    """
+    Calculate Recall@k of candidate ranking against a reference ranking.
+    
+    Args:
+        candidate_ids: Chunk IDs from the approximate (quantized) search
+        reference_ids: Chunk IDs from the full-precision search
+        k: Cut-off position
+        
+    Returns:
+        Fraction of reference top-k found in candidate top-k (0.0-1.0)
+    """
+    reference = set(reference_ids[:k])
+    if not reference:
+        return 0.0
+    return len(reference & set(candidate_ids[:k])) / len(reference)
+
+
+def run_match_rpc(
+    rpc_name: str,
+    query_embedding: List[float],
+    match_count: int,
+    extra_params: Optional[Dict[str, Any]] = None,
+) -> tuple[List[str], float]:
+    """
+    Run a match RPC directly (no client-side fallback) and time it.
+    
+    Returns:
+        (chunk_ids, latency_ms)
+    """
+    params = {
+        "query_embedding": query_embedding,
+        "match_threshold": 0.0,
+        "match_count": match_count,
+        **(extra_params or {}),
+    }
+    supabase = _get_supabase_client()
+    start_time = time.time()
+    rows = supabase.rpc(rpc_name, params).execute().data or []
+    latency_ms = (time.time() - start_time) * 1000
+    return [str(row["id"]) for row in rows if row.get("id")], latency_ms
+
+
+def compare_quantized_recall(
+    ground_truth: List[Dict[str, Any]],
+    match_count: int = 10,
+    output_path: Optional[str] = None,
+):
+    """
+    Compare full-precision vs quantized ANN search on the same embeddings.
+    
+    Args:
+        ground_truth: Ground truth dataset (only queries are used)
+        match_count: Top-k for recall computation
+        output_path: Output file path for report
+    """
+    settings = get_settings()
+    candidate_count = min(
+        match_count * settings.quantized_ann_candidate_factor,
+        QUANTIZED_MAX_CANDIDATES,
+    )
+    embeddings = _get_embeddings_model()
+    
+    recalls: List[float] = []
+    full_latencies: List[float] = []
+    quantized_latencies: List[float] = []
+    
+    for item in ground_truth:
+        query_id = item["query_id"]
+        try:
+            query_embedding = embeddings.embed_query(item["query"])
+            full_ids, full_latency = run_match_rpc(
+                "match_document_chunks", query_embedding, match_count
+            )
+            quantized_ids, quantized_latency = run_match_rpc(
+                "match_document_chunks_quantized",
+                query_embedding,
+                match_count,
+                {"candidate_count": candidate_count},
+            )
+        except Exception as e:
+            logger.error(f"Quantized comparison failed for {query_id}: {e}")
+            continue
+        
+        recalls.append(calculate_recall_at_k(quantized_ids, full_ids, match_count))
+        full_latencies.append(full_latency)
+        quantized_latencies.append(quantized_latency)
+    
+    def p95(values: List[float]) -> float:
+        return float(np.percentile(values, 95)) if values else 0.0
+    
+    report = f"""# Quantized ANN Recall Report
+
+**Date:** {time.strftime("%Y-%m-%d %H:%M:%S")}  
+**Queries:** {len(recalls)}/{len(ground_truth)}  
+**Top-k:** {match_count} — **Candidates (halfvec 512):** {candidate_count}
+
+| Metric | Full (vector 1536) | Quantized (halfvec 512 + rescoring) |
+|--------|--------------------|-------------------------------------|
+| Recall@{match_count} vs full | 1.000 | {mean(recalls) if recalls else 0.0:.3f} (min {min(recalls) if recalls else 0.0:.3f}) |
+| Latency p50 (ms) | {median(full_latencies) if full_latencies else 0.0:.0f} | {median(quantized_latencies) if quantized_latencies else 0.0:.0f} |
+| Latency p95 (ms) | {p95(full_latencies):.0f} | {p95(quantized_latencies):.0f} |
+
+Target: Recall@{match_count} >= 0.98 prima di attivare ENABLE_QUANTIZED_ANN_SEARCH.
+"""
+    
+    if output_path:
+        output_file = Path(output_path)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(report)
+        logger.info(f"Report saved to {output_path}")
+    else:
+        print(report)
+
+
 def run_baseline_retrieval(query: str, match_count: int = 10) -> tuple[List[Dict], float]:
     """
     Run baseline semantic search.
@@ -388,8 +514,14 @@ def main():
     )
     parser.add_argument(
         "--output",
-        default="reports/retrieval-benchmark-7.2.md",
-        help="Output file path for report",
+        default=None,
+        help="Output file path for report (default per mode in reports/)",
+    )
+    
+    parser.add_argument(
+        "--compare-quantized",
+        action="store_true",
+        help="Compare recall/latency of full vs quantized ANN RPC",
     )
     
     args = parser.parse_args()
@@ -398,7 +530,16 @@ def main():
     ground_truth = load_ground_truth(args.ground_truth)
     
     # Run benchmark
-    benchmark_retrieval(ground_truth, output_path=args.output)
+    if args.compare_quantized:
+        compare_quantized_recall(
+            ground_truth,
+            output_path=args.output or "reports/retrieval-quantized-recall.md",
+        )
+    else:
+        benchmark_retrieval(
+            ground_truth,
+            output_path=args.output or "reports/retrieval-benchmark-7.2.md",
+        )
     
     logger.info("Benchmark completed successfully!")
 
@@ -0,0 +1,128 @@
+"""
+Unit tests per ChunkContentCache e risoluzione content via RPC ids+scores.
+"""
+import types
+
+import pytest
+
+from api.knowledge_base import chunk_cache, search
+from api.knowledge_base.chunk_cache import ChunkContentCache
+from api.knowledge_base.search import perform_semantic_search
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table_name = table
+        self.ids = []
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, values):
+        self.ids = list(values)
+        return self
+
+    def execute(self):
+        self.client.table_calls.append(self.ids)
+        rows = [self.client.chunks[i] for i in self.ids if i in self.client.chunks]
+        return types.SimpleNamespace(data=rows)
+
+
+class FakeSupabase:
+    """Fake Supabase: RPC ids+scores e tabella document_chunks."""
+
+    def __init__(self, rpc_rows, chunks):
+        self.rpc_rows = rpc_rows
+        self.chunks = chunks
+        self.rpc_calls = []
+        self.table_calls = []
+
+    def rpc(self, name, params):
+        self.rpc_calls.append(name)
+        return types.SimpleNamespace(
+            execute=lambda: types.SimpleNamespace(data=self.rpc_rows)
+        )
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+def test_lru_eviction_skips_pinned_chunks():
+    cache = ChunkContentCache(max_entries=2)
+    cache.put("hot", "d1", "hot content", pinned=True)
+    cache.put("a", "d1", "a")
+    cache.put("b", "d2", "b")
+
+    found, missing = cache.get_many(["hot", "a", "b"])
+
+    assert set(found) == {"hot", "b"}
+    assert missing == ["a"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_put_rejected_when_full_of_pinned():
+    cache = ChunkContentCache(max_entries=1)
+    assert cache.put("hot", "d1", "x", pinned=True)
+    assert not cache.put("other", "d1", "y")
+    assert len(cache) == 1
+
+
+def test_invalidate_document_removes_pinned_entries():
+    cache = ChunkContentCache(max_entries=10)
+    cache.put("c1", "d1", "uno", pinned=True)
+    cache.put("c2", "d1", "due")
+    cache.put("c3", "d2", "tre")
+
+    removed = cache.invalidate_document("d1")
+
+    assert removed == 2
+    _, missing = cache.get_many(["c1", "c2", "c3"])
+    assert missing == ["c1", "c2"]
+    assert cache.stats()["pinned"] == 0
+
+
+@pytest.fixture
+def cached_search(monkeypatch):
+    supabase = FakeSupabase(
+        rpc_rows=[
+            {"id": "c1", "document_id": "d1", "similarity": 0.9},
+            {"id": "c2", "document_id": "d1", "similarity": 0.8},
+            {"id": "gone", "document_id": "d2", "similarity": 0.7},
+        ],
+        chunks={
+            "c1": {"id": "c1", "document_id": "d1", "content": "uno", "metadata": {"page": 1}},
+            "c2": {"id": "c2", "document_id": "d1", "content": "due", "metadata": {}},
+        },
+    )
+    settings = types.SimpleNamespace(
+        enable_chunk_content_cache=True,
+        enable_quantized_ann_search=False,
+    )
+    cache = ChunkContentCache(max_entries=10)
+    monkeypatch.setattr(search, "get_settings", lambda: settings)
+    monkeypatch.setattr(search, "_get_supabase_client", lambda: supabase)
+    monkeypatch.setattr(chunk_cache, "_chunk_cache", cache)
+    return supabase, cache
+
+
+def test_search_uses_ids_rpc_and_resolves_from_cache(cached_search):
+    supabase, cache = cached_search
+    cache.put("c1", "d1", "uno", {"page": 1})
+
+    results = perform_semantic_search(
+        "dolore lombare", match_count=3, match_threshold=0.5, query_embedding=[0.1]
+    )
+
+    assert supabase.rpc_calls == ["match_document_chunk_ids"]
+    assert supabase.table_calls == [["c2", "gone"]]
+    assert [r["id"] for r in results] == ["c1", "c2"]
+    assert results[0]["content"] == "uno"
+    assert results[0]["metadata"]["page"] == 1
+    assert results[0]["metadata"]["chunk_id"] == "c1"
+
+    perform_semantic_search(
+        "dolore lombare", match_count=3, match_threshold=0.5, query_embedding=[0.1]
+    )
+    # Secondo giro: solo il chunk mancante viene riletto
+    assert supabase.table_calls[-1] == ["gone"]
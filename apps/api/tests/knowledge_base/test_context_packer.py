@@ -0,0 +1,118 @@
+"""
+Unit tests per il context packer dei chunk (dedup overlap, merge, budget).
+"""
+from api.knowledge_base.context_packer import find_overlap, pack_context
+from api.schemas.chat import ChatQueryChunk
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def _words(start: int, end: int) -> str:
+    return " ".join(f"w{i}" for i in range(start, end))
+
+
+def test_find_overlap_detects_suffix_prefix():
+    previous = _words(0, 40)
+    following = _words(28, 60)
+
+    overlap = find_overlap(previous, following)
+
+    assert previous[-overlap:] == following[:overlap]
+    assert following[overlap:].split()[0] == "w40"
+    assert find_overlap(previous, _words(100, 140)) == 0
+
+
+def test_adjacent_chunks_same_document_are_deduped():
+    chunks = [
+        ChatQueryChunk(id="c1", document_id="d1", content=_words(0, 40), similarity=0.9),
+        ChatQueryChunk(id="c2", document_id="d1", content=_words(28, 60), similarity=0.8),
+    ]
+
+    packed = pack_context(chunks, token_budget=1000, count_tokens=count_words)
+
+    assert packed.chunk_ids == ["c1", "c2"]
+    assert packed.merged_chunks == 1
+    assert packed.text.count("w30") == 1
+    assert "[chunk_id=c1]" in packed.text and "[chunk_id=c2]" in packed.text
+    assert packed.tokens_saved == 12
+
+
+def test_chunk_preceding_top_chunk_is_merged_before_it():
+    chunks = [
+        ChatQueryChunk(id="c2", document_id="d1", content=_words(28, 60), similarity=0.9),
+        ChatQueryChunk(id="c1", document_id="d1", content=_words(0, 40), similarity=0.8),
+    ]
+
+    packed = pack_context(chunks, token_budget=1000, count_tokens=count_words)
+
+    assert packed.text.index("[chunk_id=c1]") < packed.text.index("[chunk_id=c2]")
+    assert packed.text.count("w30") == 1
+
+
+def test_low_score_tail_is_trimmed_but_top_chunks_preserved():
+    chunks = [
+        ChatQueryChunk(id="a", document_id="d1", content="alpha", similarity=0.9),
+        ChatQueryChunk(id="b", document_id="d2", content="beta", similarity=0.8),
+        ChatQueryChunk(id="c", document_id="d3", content="gamma", similarity=0.8),
+    ]
+
+    packed = pack_context(
+        chunks, token_budget=1000, count_tokens=count_words,
+        min_relative_score=0.5, min_chunks=2, rerank_scores=[0.9, 0.3, 0.2],
+    )
+
+    assert packed.chunk_ids == ["a", "b"]
+    assert packed.dropped_chunk_ids == ["c"]
+
+
+def test_tail_trim_follows_rerank_order_not_similarity():
+    chunks = [
+        ChatQueryChunk(id="a", document_id="d1", content="alpha", similarity=0.55),
+        ChatQueryChunk(id="b", document_id="d2", content="beta", similarity=0.90),
+        ChatQueryChunk(id="c", document_id="d3", content="gamma", similarity=0.85),
+        ChatQueryChunk(id="d", document_id="d4", content="delta", similarity=0.88),
+    ]
+
+    packed = pack_context(
+        chunks, token_budget=1000, count_tokens=count_words,
+        min_relative_score=0.5, min_chunks=1, rerank_scores=[0.95, 0.80, 0.30, 0.60],
+    )
+
+    # Taglio dal primo chunk sotto soglia: anche "d", che la supera, è coda
+    assert packed.chunk_ids == ["a", "b"]
+    assert packed.dropped_chunk_ids == ["c", "d"]
+
+
+def test_no_score_trim_without_rerank_scores():
+    chunks = [
+        ChatQueryChunk(id="a", document_id="d1", content="alpha", similarity=0.9),
+        ChatQueryChunk(id="b", document_id="d2", content="beta", similarity=0.3),
+    ]
+
+    packed = pack_context(
+        chunks, token_budget=1000, count_tokens=count_words,
+        min_relative_score=0.5, min_chunks=1,
+    )
+
+    assert packed.chunk_ids == ["a", "b"]
+    assert packed.dropped_chunk_ids == []
+
+
+def test_budget_keeps_top_chunk_and_drops_overflow():
+    chunks = [
+        ChatQueryChunk(id="a", document_id="d1", content=_words(0, 50), similarity=0.9),
+        ChatQueryChunk(id="b", document_id="d2", content=_words(100, 150), similarity=0.85),
+        ChatQueryChunk(id="c", document_id="d3", content="breve", similarity=0.8),
+    ]
+
+    packed = pack_context(chunks, token_budget=10, count_tokens=count_words)
+
+    assert packed.chunk_ids == ["a"]
+    assert packed.dropped_chunk_ids == ["b", "c"]
+    assert packed.packed_tokens < packed.original_tokens
+
+    packed = pack_context(chunks, token_budget=60, count_tokens=count_words)
+
+    assert packed.chunk_ids == ["a", "c"]
@@ -25,6 +25,10 @@ def mock_settings():
     settings.enable_chunk_diversification = False
     settings.diversification_max_per_document = 2
     settings.diversification_preserve_top_n = 3
+    settings.cross_encoder_skip_margin = 0.15
+    settings.cross_encoder_batch_size = 8
+    settings.cross_encoder_max_chunk_tokens = 256
+    settings.cross_encoder_latency_budget_ms = 1500
     return settings
 
 
@@ -262,6 +266,125 @@ class TestEnhancedChunkRetriever:
             assert call_args["max_per_doc"] == 2
             assert call_args["preserve_top_n"] == 3
 
+    @patch("api.knowledge_base.search.perform_semantic_search")
+    @patch("api.knowledge_base.enhanced_retrieval._get_cross_encoder_model")
+    def test_retrieve_and_rerank_skips_on_clear_margin(
+        self, mock_get_model, mock_search, mock_settings, mock_baseline_results
+    ):
+        """Test skip re-ranking se gap bi-encoder tra k e k+1 >= margin."""
+        results_with_gap = mock_baseline_results.copy()
+        results_with_gap[2] = {**results_with_gap[2], "similarity_score": 0.90}
+        results_with_gap[3] = {**results_with_gap[3], "similarity_score": 0.50}
+        mock_search.return_value = results_with_gap
+        mock_model = MagicMock()
+        mock_get_model.return_value = mock_model
+        
+        retriever = EnhancedChunkRetriever(settings=mock_settings)
+        results = retriever.retrieve_and_rerank(query="test query", match_count=3)
+        
+        mock_model.predict.assert_not_called()
+        assert [r["id"] for r in results] == ["chunk1", "chunk2", "chunk3"]
+    
+    @patch("api.knowledge_base.search.perform_semantic_search")
+    @patch("api.knowledge_base.enhanced_retrieval._get_cross_encoder_model")
+    def test_retrieve_and_rerank_early_exit_on_stable_top_k(
+        self, mock_get_model, mock_search, mock_settings, mock_baseline_results
+    ):
+        """Test early-exit: stop mini-batch quando top-k non cambia."""
+        mock_settings.cross_encoder_batch_size = 2
+        mock_search.return_value = mock_baseline_results.copy()
+        
+        mock_model = MagicMock()
+        mock_model.predict.side_effect = lambda pairs, batch_size: np.array(
+            [0.9, 0.8][:len(pairs)] if mock_model.predict.call_count == 1 else [0.1, 0.05][:len(pairs)]
+        )
+        mock_get_model.return_value = mock_model
+        
+        retriever = EnhancedChunkRetriever(settings=mock_settings)
+        results = retriever.retrieve_and_rerank(
+            query="test query",
+            match_count=2,
+            match_threshold=0.6,
+            diversify=False,
+        )
+        
+        # Batch 1 fissa top-2, batch 2 non lo cambia → batch 3 mai valutato
+        assert mock_model.predict.call_count == 2
+        assert [r["id"] for r in results] == ["chunk1", "chunk2"]
+        assert "rerank_score" not in mock_baseline_results[4]
+
+    @patch("api.knowledge_base.search.perform_semantic_search")
+    @patch("api.knowledge_base.enhanced_retrieval._get_cross_encoder_model")
+    def test_retrieve_and_rerank_unscored_tail_not_backfilled(
+        self, mock_get_model, mock_search, mock_settings, mock_baseline_results
+    ):
+        """Test: chunk non valutati non sostituiscono chunk scartati dal threshold."""
+        mock_settings.cross_encoder_batch_size = 2
+        mock_search.return_value = mock_baseline_results.copy()
+
+        mock_model = MagicMock()
+        mock_model.predict.side_effect = lambda pairs, batch_size: np.array(
+            [0.9, 0.3][:len(pairs)] if mock_model.predict.call_count == 1 else [0.2, 0.1][:len(pairs)]
+        )
+        mock_get_model.return_value = mock_model
+
+        retriever = EnhancedChunkRetriever(settings=mock_settings)
+        results = retriever.retrieve_and_rerank(
+            query="test query",
+            match_count=2,
+            match_threshold=0.6,
+            diversify=False,
+        )
+
+        # Early-exit su top-2 stabile: chunk5 mai valutato, chunk2 sotto threshold
+        assert mock_model.predict.call_count == 2
+        assert "rerank_score" not in mock_baseline_results[4]
+        assert [r["id"] for r in results] == ["chunk1"]
+
+    @patch("api.knowledge_base.search.perform_semantic_search")
+    @patch("api.knowledge_base.enhanced_retrieval._get_cross_encoder_model")
+    def test_retrieve_and_rerank_budget_exhausted_returns_baseline_order(
+        self, mock_get_model, mock_search, mock_settings, mock_baseline_results
+    ):
+        """Test latency budget misurato da request_started_at."""
+        import time
+        mock_search.return_value = mock_baseline_results.copy()
+        mock_model = MagicMock()
+        mock_get_model.return_value = mock_model
+        
+        retriever = EnhancedChunkRetriever(settings=mock_settings)
+        results = retriever.retrieve_and_rerank(
+            query="test query",
+            match_count=3,
+            diversify=False,
+            request_started_at=time.time() - 5.0,  # Budget 1.5s già esaurito
+        )
+        
+        mock_model.predict.assert_not_called()
+        assert [r["id"] for r in results] == ["chunk1", "chunk2", "chunk3"]
+    
+    @patch("api.knowledge_base.search.perform_semantic_search")
+    @patch("api.knowledge_base.enhanced_retrieval._get_cross_encoder_model")
+    def test_retrieve_and_rerank_truncates_chunk_to_token_budget(
+        self, mock_get_model, mock_search, mock_settings
+    ):
+        """Test troncamento contenuto chunk prima dello scoring."""
+        mock_settings.cross_encoder_max_chunk_tokens = 32
+        long_content = " ".join(f"parola{i}" for i in range(100))
+        mock_search.return_value = [
+            {"id": "c1", "document_id": "d1", "content": long_content, "similarity_score": 0.8},
+        ]
+        mock_model = MagicMock()
+        mock_model.predict.return_value = np.array([0.9])
+        mock_get_model.return_value = mock_model
+        
+        retriever = EnhancedChunkRetriever(settings=mock_settings)
+        results = retriever.retrieve_and_rerank(query="q", match_count=1, diversify=False)
+        
+        pairs = mock_model.predict.call_args[0][0]
+        assert len(pairs[0][1].split()) == 32
+        assert results[0]["content"] == long_content
+
 
 def test_get_enhanced_retriever():
     """Test factory function."""
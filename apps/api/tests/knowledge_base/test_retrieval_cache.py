@@ -0,0 +1,112 @@
+"""
+Unit tests per RetrievalResultCache e invalidazione tramite corpus version.
+"""
+import types
+
+import pytest
+
+from api import stores
+from api.knowledge_base import retrieval_cache
+from api.knowledge_base.retrieval_cache import (
+    RetrievalResultCache,
+    bump_corpus_version,
+    make_cache_key,
+)
+from api.shared_state import SharedMap, SQLiteStateBackend
+
+
+@pytest.fixture
+def settings():
+    return types.SimpleNamespace(
+        enable_cross_encoder_reranking=True,
+        enable_chunk_diversification=False,
+    )
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    instance = RetrievalResultCache(max_entries=2, ttl_seconds=60)
+    monkeypatch.setattr(retrieval_cache, "_retrieval_cache", instance)
+    return instance
+
+
+def test_key_normalizes_query_and_includes_flags(settings):
+    key = make_cache_key("  Dolore   LOMBARE ", 8, 0.6, settings)
+
+    assert key == make_cache_key("dolore lombare", 8, 0.6, settings)
+    assert key != make_cache_key("dolore lombare", 5, 0.6, settings)
+
+    settings.enable_chunk_diversification = True
+    assert key != make_cache_key("dolore lombare", 8, 0.6, settings)
+
+
+def test_cached_results_are_copies(cache, settings):
+    key = make_cache_key("q", 8, None, settings)
+    results = [{"id": "c1", "metadata": {"page": 1}}]
+    cache.put(key, "enhanced", results)
+    results[0]["metadata"]["page"] = 99
+
+    tier, cached = cache.get(key)
+    cached[0]["metadata"]["page"] = 42
+
+    assert tier == "enhanced"
+    assert cache.get(key)[1][0]["metadata"]["page"] == 1
+
+
+def test_bump_corpus_version_invalidates(cache, settings):
+    key = make_cache_key("q", 8, None, settings)
+    cache.put(key, "baseline", [{"id": "c1"}])
+
+    bump_corpus_version("test")
+
+    assert cache.get(key) is None
+    assert make_cache_key("q", 8, None, settings) != key
+
+
+def test_version_bumped_by_other_process_invalidates(cache, settings, tmp_path):
+    stores.use_state_backend(SQLiteStateBackend(tmp_path / "state.sqlite3"))
+    try:
+        key = make_cache_key("q", 8, None, settings)
+        cache.put(key, "enhanced", [{"id": "c1"}])
+        assert cache.get(key) is not None
+
+        # Bump da un altro processo (es. worker Celery) sullo stesso stato
+        other_process = SharedMap("corpus_state")
+        other_process.use_backend(SQLiteStateBackend(tmp_path / "state.sqlite3"))
+        other_process.update_item("version", lambda record: {"version": (record or {}).get("version", 0) + 1})
+
+        assert make_cache_key("q", 8, None, settings) != key
+        assert cache.get(key) is None
+    finally:
+        stores.use_state_backend(None)
+
+
+def test_celery_indexing_bumps_corpus_version(cache, settings, monkeypatch):
+    from api.celery_app import kb_indexing_task
+
+    monkeypatch.setattr(
+        "api.knowledge_base.indexer.index_chunks", lambda chunks, metadata_list: len(chunks)
+    )
+    key = make_cache_key("q", 8, None, settings)
+    cache.put(key, "baseline", [{"id": "c1"}])
+
+    result = kb_indexing_task.run({"chunks": ["a", "b"], "document_id": "doc-1"})
+
+    assert result == {"inserted": 2, "document_id": "doc-1"}
+    assert cache.get(key) is None
+    assert make_cache_key("q", 8, None, settings) != key
+
+
+def test_lru_and_ttl(cache, settings, monkeypatch):
+    keys = [make_cache_key(f"q{i}", 8, None, settings) for i in range(3)]
+    for key in keys:
+        cache.put(key, "baseline", [{"id": key[1]}])
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is not None
+
+    now = retrieval_cache.time.monotonic()
+    monkeypatch.setattr(
+        retrieval_cache, "time", types.SimpleNamespace(monotonic=lambda: now + 120)
+    )
+    assert cache.get(keys[2]) is None
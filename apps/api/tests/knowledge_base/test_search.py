@@ -0,0 +1,128 @@
+"""
+Unit tests for baseline semantic search.
+
+Verifica RPC singola con filtro threshold lato client e popolamento
+RetrievalResult per riuso nei tier di fallback.
+"""
+import types
+
+import pytest
+
+from api.knowledge_base import search
+from api.knowledge_base.search import (
+    RetrievalResult,
+    perform_semantic_search,
+    results_from_candidates,
+)
+
+
+class FakeSupabase:
+    """Fake client Supabase che registra le chiamate RPC."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.rpc_calls = []
+
+    def rpc(self, name, params):
+        self.rpc_calls.append((name, params))
+        return self
+
+    def execute(self):
+        return types.SimpleNamespace(data=self.rows)
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, query):
+        self.calls += 1
+        return [0.1, 0.2, 0.3]
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    rows = [
+        {"id": "c1", "document_id": "d1", "content": "uno", "similarity": 0.82},
+        {"id": "c2", "document_id": "d1", "content": "due", "similarity": 0.55},
+        {"id": "c3", "document_id": "d2", "content": "tre", "similarity": 0.41},
+    ]
+    supabase = FakeSupabase(rows)
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(search, "_get_supabase_client", lambda: supabase)
+    monkeypatch.setattr(search, "_get_embeddings_model", lambda: embeddings)
+    return supabase, embeddings
+
+
+def test_threshold_applied_client_side_with_single_rpc(fake_backend):
+    supabase, _ = fake_backend
+
+    results = perform_semantic_search("dolore lombare", match_count=3, match_threshold=0.5)
+
+    assert [r["id"] for r in results] == ["c1", "c2"]
+    assert len(supabase.rpc_calls) == 1
+    assert supabase.rpc_calls[0][1]["match_threshold"] == 0.0
+
+
+def test_threshold_fallback_without_second_rpc(fake_backend):
+    supabase, _ = fake_backend
+
+    results = perform_semantic_search("dolore lombare", match_count=3, match_threshold=0.9)
+
+    assert [r["id"] for r in results] == ["c1", "c2", "c3"]
+    assert len(supabase.rpc_calls) == 1
+
+
+def test_result_populated_and_embedding_reused(fake_backend):
+    supabase, embeddings = fake_backend
+    result = RetrievalResult(query="dolore lombare")
+
+    perform_semantic_search("dolore lombare", match_count=3, match_threshold=0.4, result=result)
+    perform_semantic_search(
+        "dolore lombare",
+        match_count=3,
+        query_embedding=result.query_embedding,
+    )
+
+    assert embeddings.calls == 1
+    assert result.query_embedding == [0.1, 0.2, 0.3]
+    assert [c["id"] for c in result.candidates] == ["c1", "c2", "c3"]
+    assert result.candidates_match_count == 3
+    assert "embedding_ms" in result.timings_ms
+    assert "rpc_ms" in result.timings_ms
+    assert len(supabase.rpc_calls) == 2
+
+
+def test_results_from_candidates_applies_threshold_and_count():
+    result = RetrievalResult(
+        query="q",
+        candidates=[
+            {"id": "c1", "similarity_score": 0.9, "rerank_score": 3.2},
+            {"id": "c2", "similarity_score": 0.7},
+            {"id": "c3", "similarity_score": 0.5},
+        ],
+        candidates_match_count=9,
+    )
+
+    results = results_from_candidates(result, match_count=3, match_threshold=0.6)
+
+    assert [r["id"] for r in results] == ["c1", "c2"]
+    assert results[0] is not result.candidates[0]
+
+
+def test_quantized_rpc_used_with_candidate_count(fake_backend, monkeypatch):
+    supabase, _ = fake_backend
+    settings = types.SimpleNamespace(
+        enable_chunk_content_cache=False,
+        enable_quantized_ann_search=True,
+        quantized_ann_candidate_factor=4,
+    )
+    monkeypatch.setattr(search, "get_settings", lambda: settings)
+
+    results = perform_semantic_search("dolore lombare", match_count=30, match_threshold=0.5)
+
+    name, params = supabase.rpc_calls[0]
+    assert name == "match_document_chunks_quantized"
+    assert params["candidate_count"] == search.QUANTIZED_MAX_CANDIDATES
+    assert params["include_content"] is True
+    assert [r["id"] for r in results] == ["c1", "c2"]
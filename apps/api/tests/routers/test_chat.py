@@ -694,3 +694,292 @@ def external_stubs(monkeypatch):
 
     splitters_module.RecursiveCharacterTextSplitter = RecursiveCharacterTextSplitter
     monkeypatch.setitem(sys.modules, "langchain_text_splitters", splitters_module)
+
+
+# =============================================================================
+# Test Retrieval Fallback Tiers
+# =============================================================================
+
+def test_fallback_tier_reuses_candidates_without_search(monkeypatch):
+    """Test: candidati del tier enhanced riusati, nessuna nuova ricerca."""
+    from api.knowledge_base.search import RetrievalResult
+    from api.routers.chat import _retrieve_fallback_tier
+
+    def fail_search(*_args, **_kwargs):
+        raise AssertionError("perform_semantic_search non deve essere chiamata")
+
+    monkeypatch.setattr("api.routers.chat.perform_semantic_search", fail_search)
+    result = RetrievalResult(
+        query="dolore lombare",
+        query_embedding=[0.1],
+        candidates=[
+            {"id": "c1", "similarity_score": 0.9},
+            {"id": "c2", "similarity_score": 0.3},
+        ],
+        candidates_match_count=24,
+        tier="enhanced",
+    )
+
+    hits = _retrieve_fallback_tier(result, match_count=8, match_threshold=0.6, session_id="s1")
+
+    assert [h["id"] for h in hits] == ["c1"]
+    assert result.tier == "fallback_candidates"
+    assert "tier_fallback_candidates_ms" in result.timings_ms
+
+
+def test_fallback_tier_reuses_query_embedding(monkeypatch):
+    """Test: embedding già calcolato passato alla ricerca baseline."""
+    from api.knowledge_base.search import RetrievalResult
+    from api.routers.chat import _retrieve_fallback_tier
+
+    captured = {}
+
+    def fake_search(**kwargs):
+        captured.update(kwargs)
+        return [{"id": "c1"}]
+
+    monkeypatch.setattr("api.routers.chat.perform_semantic_search", fake_search)
+    result = RetrievalResult(query="dolore lombare", query_embedding=[0.1, 0.2], tier="enhanced")
+
+    hits = _retrieve_fallback_tier(result, match_count=5, match_threshold=None, session_id="s1")
+
+    assert hits == [{"id": "c1"}]
+    assert captured["query_embedding"] == [0.1, 0.2]
+    assert result.tier == "fallback_embedding"
+
+
+def test_fallback_tier_does_not_repeat_failed_baseline(monkeypatch):
+    """Test: baseline fallita senza lavoro riusabile non viene ripetuta."""
+    from api.knowledge_base.search import RetrievalResult
+    from api.routers.chat import _retrieve_fallback_tier
+
+    def fail_search(*_args, **_kwargs):
+        raise AssertionError("baseline non deve essere ripetuta")
+
+    monkeypatch.setattr("api.routers.chat.perform_semantic_search", fail_search)
+    result = RetrievalResult(query="dolore lombare", tier="baseline")
+
+    assert _retrieve_fallback_tier(result, match_count=5, match_threshold=None, session_id="s1") == []
+    assert result.tier == "fallback_none"
+
+
+# =============================================================================
+# Test Chat Chain Registry
+# =============================================================================
+
+
+@pytest.fixture(autouse=True)
+def reset_chain_registry():
+    """Chain compilate non devono sopravvivere tra test (monkeypatch factory)."""
+    from api.routers.chat import reset_chat_chain_registry
+
+    reset_chat_chain_registry()
+    yield
+    reset_chat_chain_registry()
+
+
+def _patch_chain_factories(monkeypatch, built):
+    class FakeParser:
+        def __init__(self, pydantic_object):
+            built["parsers"] += 1
+            self.model = pydantic_object
+
+        def get_format_instructions(self):
+            built["format_instructions"] += 1
+            return "{schema}"
+
+    class FakePrompt:
+        def __init__(self, messages):
+            self.messages = messages
+
+        def partial(self, **kwargs):
+            self.partials = kwargs
+            return self
+
+        def __or__(self, other):
+            return FakeChain([self, other])
+
+    class FakeChain:
+        def __init__(self, steps):
+            self.steps = steps
+
+        def __or__(self, other):
+            return FakeChain(self.steps + [other])
+
+    class FakePromptFactory:
+        @staticmethod
+        def from_messages(messages):
+            return FakePrompt(messages)
+
+    class FakeLLM:
+        def bind(self, **kwargs):
+            self.bound = kwargs
+            return self
+
+    def fake_get_llm(_settings):
+        built["llms"] += 1
+        return FakeLLM()
+
+    monkeypatch.setattr("api.routers.chat.PydanticOutputParser", FakeParser)
+    monkeypatch.setattr("api.routers.chat.ChatPromptTemplate", FakePromptFactory)
+    monkeypatch.setattr("api.routers.chat.get_llm", fake_get_llm)
+
+
+def test_chat_chain_compiled_once_per_flag_combination(monkeypatch):
+    from api.routers.chat import _get_chat_chain
+
+    built = {"parsers": 0, "format_instructions": 0, "llms": 0}
+    _patch_chain_factories(monkeypatch, built)
+    settings = types.SimpleNamespace(
+        enable_academic_prompt=True,
+        enable_enhanced_response_model=False,
+        llm_config_refactor_enabled=True,
+        openai_model="gpt-5-nano",
+        openai_temperature_chat=None,
+        enable_native_structured_output=False,
+        structured_output_strict=True,
+        enable_llm_gateway=False,
+    )
+
+    first = _get_chat_chain(settings)
+    second = _get_chat_chain(settings)
+
+    assert first is second
+    assert built == {"parsers": 1, "format_instructions": 1, "llms": 1}
+
+    settings.enable_academic_prompt = False
+    third = _get_chat_chain(settings)
+
+    assert third is not first
+    assert built["llms"] == 2
+
+
+def test_academic_chain_binds_only_format_instructions(monkeypatch):
+    from api.routers.chat import _get_chat_chain
+
+    built = {"parsers": 0, "format_instructions": 0, "llms": 0}
+    _patch_chain_factories(monkeypatch, built)
+    settings = types.SimpleNamespace(
+        enable_academic_prompt=True,
+        enable_enhanced_response_model=True,
+        llm_config_refactor_enabled=True,
+        openai_model="gpt-5-nano",
+        openai_temperature_chat=None,
+        enable_native_structured_output=False,
+        structured_output_strict=True,
+        enable_llm_gateway=False,
+    )
+
+    chain = _get_chat_chain(settings)
+    prompt = chain.steps[0]
+
+    # context / conversation_history sono variabili per request, non partial
+    assert prompt.partials == {"format_instructions": "{schema}"}
+
+
+def test_coalescing_key_normalizes_question_and_tracks_prompt_flags():
+    from api.routers.chat import _chat_coalescing_key
+    from api.schemas.chat import ChatMessageCreateRequest
+
+    settings = types.SimpleNamespace(
+        enable_academic_prompt=True,
+        enable_enhanced_response_model=False,
+        openai_model="gpt-5-nano",
+    )
+    body = ChatMessageCreateRequest(message="Cos'è la  Lombalgia?", sessionId="s1")
+    other_session = ChatMessageCreateRequest(message="cos'è la lombalgia?", sessionId="s2")
+
+    key = _chat_coalescing_key(body.message, body, settings)
+
+    assert key == _chat_coalescing_key(other_session.message, other_session, settings)
+
+    settings.enable_enhanced_response_model = True
+    assert key != _chat_coalescing_key(body.message, body, settings)
+
+
+def test_summary_only_window_bypasses_coalescing(monkeypatch):
+    """Riassunto ripristinato senza messaggi in L1: il turno non è condiviso."""
+    from api.config import get_settings
+    from api.routers import chat as chat_router
+    from api.services.conversation_service import ConversationManager
+    from api.services.conversation_summarizer import ConversationSummarizer
+    from api.stores import chat_messages_store, conversation_summaries_store
+
+    manager = ConversationManager(max_turns=3)
+    manager.summarizer = ConversationSummarizer(summarize_fn=lambda *_: "")
+    monkeypatch.setattr(chat_router, "get_conversation_manager", lambda **_: manager)
+    chat_messages_store.pop("s-summary", None)
+    conversation_summaries_store["s-summary"] = {
+        "summary": "lo studente ha chiesto della lombalgia",
+        "covered_messages": 4,
+        "store_offset": 4,
+    }
+
+    async def fail_coalesced(*_args, **_kwargs):
+        raise AssertionError("turno con riassunto coalescato")
+
+    monkeypatch.setattr(chat_router._chat_single_flight, "do", fail_coalesced)
+    captured = {}
+
+    def fake_pipeline(user_message, body, settings, session_id, history, window, started_at):
+        captured["history"] = history
+        return chat_router._GenerationOutcome(
+            resolved_chunks=[],
+            answer="risposta",
+            citations=[],
+            retrieval_time_ms=0,
+            generation_time_ms=0,
+        )
+
+    monkeypatch.setattr(chat_router, "_run_generation_pipeline", fake_pipeline)
+
+    settings = get_settings().model_copy(update={
+        "enable_request_coalescing": True,
+        "enable_conversational_memory": True,
+        "enable_persistent_memory": False,
+        "enable_conversation_summary": True,
+    })
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    app.dependency_overrides[chat_router.get_settings] = lambda: settings
+    app.dependency_overrides[chat_router._auth_bridge] = lambda: {
+        "role": "authenticated", "sub": "student-1",
+    }
+    try:
+        with TestClient(app) as client:
+            response = client.post(
+                "/api/v1/chat/sessions/s-summary/messages",
+                json={"message": "E le cause?", "sessionId": "s-summary"},
+            )
+    finally:
+        chat_messages_store.pop("s-summary", None)
+        conversation_summaries_store.pop("s-summary", None)
+
+    assert response.status_code == 200
+    assert "lo studente ha chiesto della lombalgia" in captured["history"]
+
+
+def test_native_structured_output_chain_skips_parser_and_format_instructions(monkeypatch):
+    from api.routers.chat import _get_chat_chain
+
+    built = {"parsers": 0, "format_instructions": 0, "llms": 0}
+    _patch_chain_factories(monkeypatch, built)
+    settings = types.SimpleNamespace(
+        enable_academic_prompt=True,
+        enable_enhanced_response_model=True,
+        llm_config_refactor_enabled=True,
+        openai_model="gpt-5-nano",
+        openai_temperature_chat=None,
+        enable_native_structured_output=True,
+        structured_output_strict=True,
+        enable_llm_gateway=False,
+    )
+
+    chain = _get_chat_chain(settings)
+    prompt, llm = chain.steps
+
+    assert built["parsers"] == 0
+    assert prompt.partials == {"format_instructions": ""}
+    response_format = llm.bound["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["name"] == "EnhancedAcademicResponse"
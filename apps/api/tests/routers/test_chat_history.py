@@ -191,3 +191,31 @@ def test_get_session_history_rate_limit_exceeded(client_student):
         assert response.headers["Retry-After"] == "60"
         data = response.json()
         assert "Rate limit exceeded" in data["detail"]
+
+
+def test_history_etag_changes_with_session_state():
+    """ETag dipende da ultimo messaggio, conteggio e parametri pagina."""
+    from api.routers.chat import _etag_matches, _history_etag
+    from api.services.persistence_service import SessionHistoryStats
+    
+    stats = SessionHistoryStats(message_count=10, last_message_id="m-10")
+    etag = _history_etag(stats, "asc", 100, None, 0)
+    
+    assert etag.startswith('W/"')
+    assert etag == _history_etag(stats, "asc", 100, None, 0)
+    assert etag != _history_etag(
+        SessionHistoryStats(message_count=11, last_message_id="m-11"), "asc", 100, None, 0
+    )
+    # Archiviazione: stesso ultimo id ma conteggio diverso
+    assert etag != _history_etag(
+        SessionHistoryStats(message_count=9, last_message_id="m-10"), "asc", 100, None, 0
+    )
+    assert etag != _history_etag(stats, "desc", 100, None, 0)
+    assert etag != _history_etag(stats, "asc", 100, "cursor-x", 0)
+    
+    assert _etag_matches(etag, etag)
+    assert _etag_matches(f'"altro", {etag}', etag)
+    assert _etag_matches(etag[2:], etag)
+    assert _etag_matches("*", etag)
+    assert not _etag_matches(None, etag)
+    assert not _etag_matches('W/"altro"', etag)
@@ -9,54 +9,58 @@ Coverage:
 """
 from unittest.mock import patch, MagicMock
 
+import pytest
+
 
 def test_track_ag_latency_stores_samples():
-    """Test: track_ag_latency memorizza samples."""
-    from api.services.chat_service import track_ag_latency, ag_latency_samples_ms
+    """Test: track_ag_latency registra samples nello sketch."""
+    from api.services.chat_service import track_ag_latency, ag_latency_sketch
     
     # Pulisci samples
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
     
     # Track latency
     track_ag_latency(150)
     track_ag_latency(200)
     track_ag_latency(180)
     
-    assert len(ag_latency_samples_ms) == 3
-    assert 150 in ag_latency_samples_ms
-    assert 200 in ag_latency_samples_ms
-    assert 180 in ag_latency_samples_ms
+    assert ag_latency_sketch.count == 3
+    assert ag_latency_sketch.bounds() == (150, 200)
+    assert ag_latency_sketch.quantile(0.5) == 180
     
     # Cleanup
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
 
 
-def test_track_ag_latency_max_samples():
-    """Test: track_ag_latency limita a max 10000 samples."""
-    from api.services.chat_service import track_ag_latency, ag_latency_samples_ms
+def test_track_ag_latency_memory_is_bounded():
+    """Test: memoria sketch limitata dai bucket, non dal numero di samples."""
+    from api.services.chat_service import track_ag_latency, ag_latency_sketch
     
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
     
-    # Track 10001 samples
-    for i in range(10001):
+    # Track 20000 samples
+    for i in range(20000):
         track_ag_latency(100 + i)
     
-    # Verifica limite
-    assert len(ag_latency_samples_ms) == 10000
+    snapshot = ag_latency_sketch.snapshot()
+    assert snapshot.count == 20000
+    # Bucket logaritmici: poche centinaia per 100ms-20s
+    assert len(snapshot._counts) < 1200
+    assert ag_latency_sketch.quantile(0.5) == pytest.approx(10100, rel=0.01)
     
     # Cleanup
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
 
 
 def test_get_latency_p95_calculation():
     """Test: get_latency_p95 calcola percentile corretto."""
-    from api.services.chat_service import get_latency_p95, ag_latency_samples_ms
+    from api.services.chat_service import get_latency_p95, track_ag_latency, ag_latency_sketch
     
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
     
     # Setup samples: 1-100 ms
     for i in range(1, 101):
-        ag_latency_samples_ms.append(i)
+        track_ag_latency(i)
     
     p95 = get_latency_p95()
     
@@ -64,18 +68,18 @@ def test_get_latency_p95_calculation():
     assert 94 <= p95 <= 96
     
     # Cleanup
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
 
 
 def test_get_latency_p99_calculation():
     """Test: get_latency_p99 calcola percentile corretto."""
-    from api.services.chat_service import get_latency_p99, ag_latency_samples_ms
+    from api.services.chat_service import get_latency_p99, track_ag_latency, ag_latency_sketch
     
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
     
     # Setup samples: 1-100 ms
     for i in range(1, 101):
-        ag_latency_samples_ms.append(i)
+        track_ag_latency(i)
     
     p99 = get_latency_p99()
     
@@ -83,14 +87,14 @@ def test_get_latency_p99_calculation():
     assert 98 <= p99 <= 100
     
     # Cleanup
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
 
 
 def test_get_latency_zero_samples():
     """Test: latency 0 quando nessun sample."""
-    from api.services.chat_service import get_latency_p95, get_latency_p99, ag_latency_samples_ms
+    from api.services.chat_service import get_latency_p95, get_latency_p99, ag_latency_sketch
     
-    ag_latency_samples_ms.clear()
+    ag_latency_sketch.clear()
     
     assert get_latency_p95() == 0
     assert get_latency_p99() == 0
@@ -227,6 +227,78 @@ class TestConversationManager:
         truncated_count = manager._count_tokens(truncated)
         assert truncated_count < original_count  # Reduced tokens
 
+    def test_add_turn_stores_token_count(self):
+        """Test token count computed once and stored alongside each message."""
+        session_id = "session_tokens"
+        manager = ConversationManager()
+        
+        manager.add_turn(session_id, "Domanda breve", "Risposta un po' più lunga")
+        
+        stored = chat_messages_store[session_id]
+        assert stored[0]["token_count"] == manager._count_text_tokens("Domanda breve")
+        assert stored[1]["token_count"] == manager._count_text_tokens("Risposta un po' più lunga")
+    
+    def test_context_window_incremental_matches_rebuild(self, monkeypatch):
+        """Test incremental window parses only new messages and matches full rebuild."""
+        session_id = "session_incremental"
+        manager = ConversationManager(max_turns=3, max_tokens=2000)
+        manager.add_turn(session_id, "Domanda 0", "Risposta 0")
+        manager.get_context_window(session_id)
+        
+        counted = []
+        original = manager._count_text_tokens
+        monkeypatch.setattr(
+            manager, "_count_text_tokens", lambda text: counted.append(text) or original(text)
+        )
+        parsed = []
+        original_parse = manager._parse_stored_message
+        monkeypatch.setattr(
+            manager,
+            "_parse_stored_message",
+            lambda sid, msg: parsed.append(msg["content"]) or original_parse(sid, msg),
+        )
+        
+        for i in range(1, 6):
+            manager.add_turn(session_id, f"Domanda {i}", f"Risposta {i}")
+            window = manager.get_context_window(session_id)
+        
+        # Ogni messaggio contato una volta (add_turn) e parsato una volta
+        assert len(counted) == 10
+        assert len(parsed) == 10
+        
+        rebuilt = ConversationManager(max_turns=3, max_tokens=2000).get_context_window(session_id)
+        assert [m.content for m in window.messages] == [m.content for m in rebuilt.messages]
+        assert window.messages[0].content == "Domanda 3"
+        assert window.total_tokens == rebuilt.total_tokens
+    
+    def test_context_window_rebuilt_when_store_replaced(self):
+        """Test cached window invalidated when session list is replaced."""
+        session_id = "session_replaced"
+        manager = ConversationManager()
+        manager.add_turn(session_id, "Vecchia domanda", "Vecchia risposta")
+        manager.get_context_window(session_id)
+        
+        chat_messages_store[session_id] = [
+            {"role": "user", "content": "Nuova domanda"},
+        ]
+        window = manager.get_context_window(session_id)
+        
+        assert [m.content for m in window.messages] == ["Nuova domanda"]
+    
+    def test_context_window_truncation_uses_cached_counts(self):
+        """Test truncation drops oldest messages in a single pass over cached counts."""
+        session_id = "session_budget"
+        chat_messages_store[session_id] = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"msg {i}", "token_count": 300}
+            for i in range(6)
+        ]
+        manager = ConversationManager(max_tokens=700)
+        
+        window = manager.get_context_window(session_id)
+        
+        assert [m.content for m in window.messages] == ["msg 4", "msg 5"]
+        assert window.total_tokens == 600
+
 
 class TestConversationManagerSingleton:
     """Test singleton pattern for ConversationManager."""
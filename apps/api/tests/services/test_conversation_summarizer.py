@@ -0,0 +1,236 @@
+"""
+Test suite per il riassunto rolling delle conversazioni (background summarizer).
+"""
+from unittest.mock import AsyncMock
+
+import pytest
+
+from api.services.conversation_service import ConversationManager
+from api.services.conversation_summarizer import ConversationSummarizer
+from api.stores import chat_messages_store, conversation_summaries_store
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def reset_stores():
+    chat_messages_store.clear()
+    conversation_summaries_store.clear()
+    yield
+    chat_messages_store.clear()
+    conversation_summaries_store.clear()
+
+
+def make_manager(calls, persistence=None):
+    def fake_summarize(previous, messages, max_words):
+        calls.append((previous, [m["content"] for m in messages], max_words))
+        return f"riassunto di {len(messages)} messaggi (prec: {previous or '-'})"
+
+    manager = ConversationManager(max_turns=3)
+    manager.summarizer = ConversationSummarizer(
+        summarize_fn=fake_summarize,
+        min_new_messages=2,
+        max_words=80,
+        persistence=persistence,
+    )
+    return manager
+
+
+def add_turns(manager, session_id, count, start=0):
+    for index in range(start, start + count):
+        manager.add_turn(session_id, f"domanda {index}", f"risposta {index}")
+
+
+async def test_summary_runs_in_background_after_add_turn():
+    calls = []
+    manager = make_manager(calls)
+
+    add_turns(manager, "s1", 1)
+    assert manager.summarizer.uncovered_count("s1") == 0
+    assert not manager.summarizer._inflight
+
+    add_turns(manager, "s1", 1, start=1)
+    # Schedulato, non eseguito nel request path
+    assert calls == []
+    await manager.summarizer.drain()
+
+    assert calls == [(None, ["domanda 0", "risposta 0"], 80)]
+    entry = conversation_summaries_store["s1"]
+    assert entry["covered_messages"] == 2
+
+
+async def test_summary_is_rolling_and_replaces_covered_messages():
+    calls = []
+    manager = make_manager(calls)
+
+    add_turns(manager, "s1", 2)
+    await manager.summarizer.drain()
+    add_turns(manager, "s1", 2, start=2)
+    await manager.summarizer.drain()
+
+    # Secondo aggiornamento: riassunto precedente + soli messaggi nuovi
+    assert calls[-1][0] == "riassunto di 2 messaggi (prec: -)"
+    assert calls[-1][1] == ["domanda 1", "risposta 1", "domanda 2", "risposta 2"]
+
+    window = manager.get_context_window("s1")
+    assert [m.content for m in window.messages] == ["domanda 3", "risposta 3"]
+    assert window.summary.startswith("riassunto di 4 messaggi")
+
+    prompt = manager.format_for_prompt(window)
+    assert prompt.index("RIASSUNTO CONVERSAZIONE PRECEDENTE") < prompt.index("STUDENTE: domanda 3")
+    assert "domanda 1" not in prompt
+
+
+async def test_lagging_summary_keeps_uncovered_messages():
+    calls = []
+    manager = make_manager(calls)
+    add_turns(manager, "s1", 2)
+    await manager.summarizer.drain()
+
+    # Nuovo turno sotto soglia: il window mostra anche i messaggi non coperti
+    add_turns(manager, "s1", 1, start=2)
+    window = manager.get_context_window("s1")
+
+    assert [m.content for m in window.messages] == [
+        "domanda 1", "risposta 1", "domanda 2", "risposta 2",
+    ]
+    assert window.summary is not None
+
+
+async def test_summary_failure_leaves_window_unchanged():
+    manager = ConversationManager(max_turns=3)
+
+    def failing(*_args):
+        raise RuntimeError("llm down")
+
+    manager.summarizer = ConversationSummarizer(summarize_fn=failing, min_new_messages=2)
+    add_turns(manager, "s1", 2)
+    await manager.summarizer.drain()
+
+    window = manager.get_context_window("s1")
+    assert window.summary is None
+    assert len(window.messages) == 4
+
+
+async def test_summary_persisted_in_message_metadata():
+    persistence = AsyncMock()
+    manager = make_manager([], persistence=persistence)
+
+    add_turns(manager, "s1", 2)
+    await manager.summarizer.drain()
+
+    persistence.save_session_summary.assert_awaited_once_with(
+        "s1", "riassunto di 2 messaggi (prec: -)", 2
+    )
+
+
+def test_add_turn_without_event_loop_does_not_schedule():
+    manager = make_manager([])
+
+    add_turns(manager, "s1", 3)
+
+    assert manager.summarizer.uncovered_count("s1") == 4
+    assert not manager.summarizer._inflight
+
+
+def make_persistence(summary=None, covered=0, message_count=0, history=()):
+    from api.models.conversation import ConversationMessage
+    from api.services.persistence_service import SessionHistoryStats, SessionSummaryRecord
+
+    persistence = AsyncMock()
+    persistence.load_session_summary.return_value = (
+        SessionSummaryRecord(summary=summary, covered_messages=covered) if summary else None
+    )
+    persistence.get_session_stats.return_value = SessionHistoryStats(
+        message_count=message_count, last_message_id=None
+    )
+    persistence.load_session_history.return_value = [
+        ConversationMessage(role=role, content=content) for role, content in history
+    ]
+    return persistence
+
+
+async def test_summary_restored_from_persisted_metadata_on_store_miss():
+    persistence = make_persistence("riassunto salvato", covered=8, message_count=10)
+    manager = make_manager([], persistence=persistence)
+
+    assert await manager.summarizer.restore_summary("s1") is True
+    # Un solo tentativo per sessione
+    assert await manager.summarizer.restore_summary("s1") is False
+    persistence.load_session_summary.assert_awaited_once_with("s1")
+
+    window = manager.get_context_window("s1")
+    assert window.messages == []
+    assert window.summary == "riassunto salvato"
+    assert "RIASSUNTO CONVERSAZIONE PRECEDENTE" in manager.format_for_prompt(window)
+
+    # Dopo il riavvio lo store L1 riparte dal messaggio 10 della sessione
+    add_turns(manager, "s1", 1)
+    window = manager.get_context_window("s1")
+    assert [m.content for m in window.messages] == ["domanda 0", "risposta 0"]
+    assert window.summary == "riassunto salvato"
+
+
+async def test_restored_summary_rejected_when_beyond_db_count():
+    persistence = make_persistence("riassunto orfano", covered=12, message_count=4)
+    manager = make_manager([], persistence=persistence)
+
+    assert await manager.summarizer.restore_summary("s1") is False
+    assert "s1" not in conversation_summaries_store
+
+
+async def test_restored_summary_integrates_messages_only_in_db():
+    persistence = make_persistence(
+        "riassunto salvato",
+        covered=2,
+        message_count=4,
+        history=[("user", "domanda db"), ("assistant", "risposta db")],
+    )
+    calls = []
+    manager = make_manager(calls, persistence=persistence)
+    await manager.summarizer.restore_summary("s1")
+
+    add_turns(manager, "s1", 1)
+    await manager.summarizer.drain()
+
+    # Messaggi 2-3 solo nel DB + turno 4 in L1 (l'ultimo turno resta integrale)
+    persistence.load_session_history.assert_awaited_once_with(
+        "s1", limit=2, offset=2, order_desc=False
+    )
+    assert calls == [("riassunto salvato", ["domanda db", "risposta db"], 80)]
+    assert conversation_summaries_store["s1"]["covered_messages"] == 4
+
+
+async def test_covered_messages_validated_against_db_count():
+    calls = []
+    manager = make_manager(calls, persistence=make_persistence(message_count=12))
+    # covered oltre la lunghezza L1 ma entro il conteggio DB: non si azzera
+    conversation_summaries_store["s1"] = {"summary": "riassunto", "covered_messages": 8}
+    add_turns(manager, "s1", 3)
+    await manager.summarizer.drain()
+
+    assert calls == []
+    assert conversation_summaries_store["s1"]["covered_messages"] == 8
+
+
+async def test_summary_token_count_computed_on_write(monkeypatch):
+    manager = make_manager([])
+    manager.summarizer.count_tokens = lambda text: 7
+    add_turns(manager, "s1", 2)
+    await manager.summarizer.drain()
+
+    assert conversation_summaries_store["s1"]["token_count"] == 7
+
+    # In lettura si usa il conteggio salvato, senza ritokenizzare
+    def no_tokenize(_text):
+        raise AssertionError("summary ritokenizzato")
+
+    monkeypatch.setattr(manager, "_count_text_tokens", no_tokenize)
+    assert manager._summary_for_window("s1", chat_messages_store["s1"]) == (
+        "riassunto di 2 messaggi (prec: -)", 7
+    )
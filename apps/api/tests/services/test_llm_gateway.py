@@ -0,0 +1,197 @@
+"""
+Unit tests per LLMGateway: deadline, hedging, pool pesato, latency tracking.
+
+I test di trasporto usano un server OpenAI fake locale (http.server).
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api.services.llm_gateway import (
+    LLMDeadlineExceeded,
+    LLMEndpoint,
+    LLMGateway,
+    llm_call_deadline,
+    openai_transport,
+)
+
+MESSAGES = [{"role": "user", "content": "Cos'è la lombalgia?"}]
+
+
+def delayed_transport(delays, failures=()):
+    """Trasporto fake: latenza per modello, errori per i modelli in failures."""
+    calls = []
+
+    def _send(endpoint, messages, timeout_s, params):
+        calls.append((endpoint.model, round(timeout_s, 1), params))
+        delay = delays[endpoint.model]
+        if delay > timeout_s:
+            time.sleep(timeout_s)
+            raise TimeoutError(endpoint.model)
+        time.sleep(delay)
+        if endpoint.model in failures:
+            raise RuntimeError(f"{endpoint.model} down")
+        return f"risposta da {endpoint.model}"
+
+    return _send, calls
+
+
+def test_complete_returns_primary_and_records_latency():
+    transport, calls = delayed_transport({"a": 0.01})
+    endpoint = LLMEndpoint(model="a")
+    gateway = LLMGateway([endpoint], transport)
+
+    assert gateway.complete(MESSAGES, response_format={"type": "json_object"}) == "risposta da a"
+    assert calls[0][2] == {"response_format": {"type": "json_object"}}
+    assert len(endpoint.latency) == 1
+    assert gateway.stats()["endpoints"][0]["samples"] == 1
+
+
+def test_deadline_bounds_slow_call():
+    transport, _ = delayed_transport({"slow": 5.0})
+    gateway = LLMGateway([LLMEndpoint(model="slow")], transport)
+
+    started = time.monotonic()
+    with llm_call_deadline(time.monotonic() + 0.2):
+        with pytest.raises((LLMDeadlineExceeded, TimeoutError)):
+            gateway.complete(MESSAGES)
+
+    assert time.monotonic() - started < 1.0
+
+
+def test_hedge_to_second_endpoint_wins_over_slow_primary():
+    transport, calls = delayed_transport({"slow": 2.0, "fast": 0.01})
+    slow, fast = LLMEndpoint(model="slow", weight=1000), LLMEndpoint(model="fast", weight=0.001)
+    gateway = LLMGateway(
+        [slow, fast], transport, hedging=True, hedge_min_delay_ms=50,
+        rng=random.Random(1),
+    )
+
+    started = time.monotonic()
+    text = gateway.complete(MESSAGES, deadline=time.monotonic() + 3)
+
+    assert text == "risposta da fast"
+    assert time.monotonic() - started < 1.0
+    assert [model for model, _, _ in calls] == ["slow", "fast"]
+    assert gateway.stats()["hedges_won"] == 1
+
+
+def test_primary_error_triggers_hedge_immediately():
+    transport, _ = delayed_transport({"bad": 0.0, "good": 0.01}, failures={"bad"})
+    bad, good = LLMEndpoint(model="bad", weight=1000), LLMEndpoint(model="good", weight=0.001)
+    gateway = LLMGateway(
+        [bad, good], transport, hedging=True, hedge_min_delay_ms=5000,
+        rng=random.Random(1),
+    )
+
+    started = time.monotonic()
+    assert gateway.complete(MESSAGES) == "risposta da good"
+    assert time.monotonic() - started < 1.0
+    assert bad.errors == 1
+
+
+def test_without_hedging_error_is_raised():
+    transport, _ = delayed_transport({"bad": 0.0}, failures={"bad"})
+    gateway = LLMGateway([LLMEndpoint(model="bad")], transport)
+
+    with pytest.raises(RuntimeError, match="bad down"):
+        gateway.complete(MESSAGES)
+
+
+def test_hedge_delay_uses_observed_p95():
+    gateway = LLMGateway([LLMEndpoint(model="a")], lambda *_: "", hedge_min_delay_ms=100)
+    endpoint = gateway.endpoints[0]
+
+    assert gateway.hedge_delay_s(endpoint) == pytest.approx(0.1)
+    for value in range(1, 101):
+        endpoint.latency.record(value * 10)
+
+    assert gateway.hedge_delay_s(endpoint) == pytest.approx(0.95, abs=0.02)
+
+
+def test_weighted_pool_selection():
+    transport, calls = delayed_transport({"heavy": 0.0, "light": 0.0})
+    gateway = LLMGateway(
+        [LLMEndpoint(model="heavy", weight=9), LLMEndpoint(model="light", weight=1)],
+        transport,
+        rng=random.Random(7),
+    )
+
+    for _ in range(200):
+        gateway.complete(MESSAGES)
+
+    heavy_share = sum(1 for model, _, _ in calls if model == "heavy") / len(calls)
+    assert 0.8 < heavy_share < 0.97
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    delay_s = 0.0
+
+    def do_POST(self):  # noqa: N802 - API http.server
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+        time.sleep(self.delay_s)
+        body = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": f"echo {request['messages'][-1]['content']}"},
+                "finish_reason": "stop",
+            }],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def fake_openai_server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    servers = []
+
+    def _start(delay_s=0.0):
+        handler = type("Handler", (FakeOpenAIHandler,), {"delay_s": delay_s})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_openai_transport_against_fake_server(fake_openai_server):
+    pytest.importorskip("openai")
+    slow_url = fake_openai_server(delay_s=2.0)
+    fast_url = fake_openai_server(delay_s=0.0)
+    gateway = LLMGateway(
+        [
+            LLMEndpoint(model="gpt-slow", base_url=slow_url, weight=1000),
+            LLMEndpoint(model="gpt-fast", base_url=fast_url, weight=0.001),
+        ],
+        openai_transport("sk-test"),
+        hedging=True,
+        hedge_min_delay_ms=100,
+        rng=random.Random(3),
+    )
+
+    started = time.monotonic()
+    text = gateway.complete(MESSAGES, deadline=time.monotonic() + 5)
+
+    assert text == "echo Cos'è la lombalgia?"
+    assert time.monotonic() - started < 1.5
+    assert gateway.stats()["hedges_sent"] == 1
@@ -16,7 +16,28 @@ from unittest.mock import AsyncMock, MagicMock
 from uuid import UUID
 
 from api.models.conversation import ConversationMessage
-from api.services.persistence_service import ConversationPersistenceService
+from api.services.persistence_service import (
+    ConversationPersistenceService,
+    InvalidHistoryCursor,
+    SessionSummaryRecord,
+    decode_history_cursor,
+    encode_history_cursor,
+)
+
+
+def make_rows(count, start_minute=0):
+    return [
+        {
+            "id": UUID(int=index + 1),
+            "session_id": "session_abc123",
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": f"messaggio {index}",
+            "source_chunk_ids": None,
+            "metadata": {},
+            "created_at": datetime(2025, 1, 15, 10, start_minute + index, tzinfo=timezone.utc),
+        }
+        for index in range(count)
+    ]
 
 
 @pytest.fixture
@@ -244,6 +265,131 @@ class TestConversationPersistenceService:
         # Should return empty list, non-raise
         assert messages == []
     
+    @pytest.mark.anyio
+    async def test_save_session_summary_updates_latest_message_metadata(self, mock_db_pool):
+        """Test riassunto rolling salvato nel metadata dell'ultimo messaggio."""
+        pool, mock_conn = mock_db_pool
+        mock_conn.execute = AsyncMock(return_value="UPDATE 1")
+        
+        service = ConversationPersistenceService(db_pool=pool)
+        
+        result = await service.save_session_summary("session_abc123", "Riassunto", 4)
+        
+        assert result is True
+        query, *args = mock_conn.execute.call_args[0]
+        assert "rolling_summary" in query
+        assert "ORDER BY created_at DESC" in query
+        assert args == ["session_abc123", "Riassunto", 4]
+    
+    @pytest.mark.anyio
+    async def test_load_session_summary_reads_latest_metadata(self, mock_db_pool):
+        """Test riassunto rolling riletto dal metadata più recente."""
+        pool, mock_conn = mock_db_pool
+        mock_conn.fetchrow = AsyncMock(
+            return_value={"summary": "Riassunto", "covered_messages": 4}
+        )
+        
+        service = ConversationPersistenceService(db_pool=pool)
+        
+        record = await service.load_session_summary("session_abc123")
+        
+        assert record == SessionSummaryRecord(summary="Riassunto", covered_messages=4)
+        query, *args = mock_conn.fetchrow.call_args[0]
+        assert "metadata ? 'rolling_summary'" in query
+        assert "ORDER BY created_at DESC" in query
+        assert args == ["session_abc123"]
+    
+    @pytest.mark.anyio
+    async def test_load_session_summary_missing_returns_none(self, mock_db_pool):
+        """Test sessione senza riassunto persistito."""
+        pool, mock_conn = mock_db_pool
+        mock_conn.fetchrow = AsyncMock(return_value=None)
+        
+        service = ConversationPersistenceService(db_pool=pool)
+        
+        assert await service.load_session_summary("session_abc123") is None
+    
+    @pytest.mark.anyio
+    async def test_load_session_history_page_first_page(self, mock_db_pool):
+        """Test keyset: prima pagina senza cursor, id DB e next_cursor."""
+        pool, mock_conn = mock_db_pool
+        rows = make_rows(3)
+        mock_conn.fetch = AsyncMock(return_value=rows)
+        
+        service = ConversationPersistenceService(db_pool=pool)
+        messages, next_cursor = await service.load_session_history_page(
+            session_id="session_abc123", limit=2,
+        )
+        
+        assert [m.content for m in messages] == ["messaggio 0", "messaggio 1"]
+        assert messages[0].id == str(UUID(int=1))
+        assert decode_history_cursor(next_cursor) == (rows[1]["created_at"], rows[1]["id"])
+        
+        query, *args = mock_conn.fetch.call_args[0]
+        assert "(created_at, id)" not in query
+        assert "IS DISTINCT FROM 'true'" in query
+        assert "ORDER BY created_at ASC, id ASC" in query
+        assert args == ["session_abc123", 3]
+    
+    @pytest.mark.anyio
+    async def test_load_session_history_page_with_cursor_desc(self, mock_db_pool):
+        """Test keyset: pagina successiva newest first parte dal cursor."""
+        pool, mock_conn = mock_db_pool
+        mock_conn.fetch = AsyncMock(return_value=make_rows(1))
+        position = datetime(2025, 1, 15, 11, 0, tzinfo=timezone.utc)
+        cursor = encode_history_cursor(position, str(UUID(int=42)))
+        
+        service = ConversationPersistenceService(db_pool=pool)
+        messages, next_cursor = await service.load_session_history_page(
+            session_id="session_abc123", limit=5, cursor=cursor, order_desc=True,
+        )
+        
+        assert len(messages) == 1
+        assert next_cursor is None
+        query, *args = mock_conn.fetch.call_args[0]
+        assert "AND (created_at, id) < ($2, $3)" in query
+        assert "ORDER BY created_at DESC, id DESC" in query
+        assert "LIMIT $4" in query
+        assert args == ["session_abc123", position, UUID(int=42), 6]
+    
+    @pytest.mark.anyio
+    async def test_load_session_history_page_invalid_cursor(self, mock_db_pool):
+        """Test cursor malformato: errore client, nessuna query."""
+        pool, mock_conn = mock_db_pool
+        service = ConversationPersistenceService(db_pool=pool)
+        
+        with pytest.raises(InvalidHistoryCursor):
+            await service.load_session_history_page("session_abc123", cursor="non-un-cursor")
+        mock_conn.fetch.assert_not_called()
+    
+    @pytest.mark.anyio
+    async def test_get_session_stats(self, mock_db_pool):
+        """Test conteggio esatto da chat_session_stats."""
+        pool, mock_conn = mock_db_pool
+        mock_conn.fetchrow = AsyncMock(
+            return_value={"message_count": 250, "last_message_id": UUID(int=7)}
+        )
+        service = ConversationPersistenceService(db_pool=pool)
+        
+        stats = await service.get_session_stats("session_abc123")
+        
+        assert stats.message_count == 250
+        assert stats.last_message_id == str(UUID(int=7))
+        
+        mock_conn.fetchrow = AsyncMock(return_value=None)
+        empty = await service.get_session_stats("session_nuova")
+        assert empty.message_count == 0
+        assert empty.last_message_id is None
+    
+    @pytest.mark.anyio
+    async def test_get_session_stats_missing_table_returns_none(self, mock_db_pool):
+        """Test migration non applicata: None, l'endpoint usa il fallback."""
+        pool, mock_conn = mock_db_pool
+        mock_conn.fetchrow = AsyncMock(side_effect=Exception("relation does not exist"))
+        service = ConversationPersistenceService(db_pool=pool)
+        
+        assert await service.get_session_stats("session_abc123") is None
+    
     def test_generate_idempotency_key_deterministic(self, mock_db_pool):
         """Test idempotency key generation è deterministico."""
         pool, _ = mock_db_pool
@@ -163,3 +163,126 @@ def test_rate_limit_service_multiple_keys_isolated():
     except Exception as e:
         pytest.fail(f"User 2 first request should be allowed but raised: {e}")
 
+
+
+@pytest.fixture
+def rate_limiting_on(monkeypatch):
+    monkeypatch.setenv("TESTING", "false")
+    monkeypatch.setenv("RATE_LIMITING_ENABLED", "true")
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr("api.services.rate_limit_service.time.time", lambda: clock["now"])
+    return clock
+
+
+def test_gcra_state_is_single_float_per_key(rate_limiting_on, fake_clock):
+    """Test: stato costante per key, indipendente da max_requests."""
+    from api.services.rate_limit_service import RateLimitService
+
+    store = {}
+    service = RateLimitService(store=store)
+    for _ in range(50):
+        fake_clock["now"] += 1.0
+        service.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=100)
+
+    assert isinstance(store["chat"]["user_1"], float)
+    assert len(store["chat"]) == 1
+
+
+def test_gcra_retry_after_header(rate_limiting_on, fake_clock):
+    """Test: 429 con Retry-After fino alla prossima richiesta ammessa."""
+    from api.services.rate_limit_service import RateLimitService
+    from fastapi import HTTPException
+
+    service = RateLimitService(store={})
+    for _ in range(2):
+        service.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+
+    with pytest.raises(HTTPException) as exc_info:
+        service.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+    assert exc_info.value.headers == {"Retry-After": "30"}
+
+    fake_clock["now"] += 30
+    service.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+
+
+def test_idle_keys_are_evicted(rate_limiting_on, fake_clock):
+    """Test: key inattive rimosse senza crescita illimitata dello store."""
+    from api.services.rate_limit_service import RateLimitService
+
+    store = {}
+    service = RateLimitService(store=store)
+    for index in range(1000):
+        fake_clock["now"] += 1.0
+        service.enforce_rate_limit(f"ip_{index}", "exchange_code", window_seconds=10, max_requests=5)
+
+    # Solo le key con TAT ancora nel futuro (ultimi ~2s)
+    assert len(store["exchange_code"]) <= 3
+
+
+class FakeRedisScript:
+    """Script GCRA con la stessa semantica del Lua, stato condiviso come su Redis."""
+
+    def __init__(self, clock, fail=False):
+        self.clock = clock
+        self.fail = fail
+        self.state = {}
+        self.calls = []
+
+    def __call__(self, keys, args):
+        from api.services.rate_limit_service import RedisError, gcra_update
+
+        self.calls.append((keys, args))
+        if self.fail:
+            raise RedisError("connection refused")
+        allowed, tat, retry_after = gcra_update(
+            self.state.get(keys[0]), self.clock["now"], float(args[0]), float(args[1])
+        )
+        if allowed:
+            self.state[keys[0]] = tat
+        return [int(allowed), int(retry_after * 1000)]
+
+
+class FakeRedis:
+    def __init__(self, script):
+        self.script = script
+
+    def register_script(self, source):
+        assert "redis.call('TIME')" in source
+        return self.script
+
+
+def test_redis_backend_limit_shared_across_workers(rate_limiting_on, fake_clock):
+    """Test: con Redis il limite vale per tutti i worker, non N volte."""
+    from api.services.rate_limit_service import RateLimitService
+    from fastapi import HTTPException
+
+    shared = FakeRedis(FakeRedisScript(fake_clock))
+    worker_a = RateLimitService(store={}, redis_client=shared)
+    worker_b = RateLimitService(store={}, redis_client=shared)
+
+    worker_a.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+    worker_b.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+    with pytest.raises(HTTPException) as exc_info:
+        worker_a.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+
+    assert exc_info.value.status_code == 429
+    assert shared.script.calls[0] == (["ratelimit:v1:chat:user_1"], ["30.0", "60.0"])
+
+
+def test_redis_error_falls_back_to_local_limiter(rate_limiting_on, fake_clock):
+    """Test: Redis non disponibile, si applica il limite per processo."""
+    from api.services.rate_limit_service import RateLimitService
+    from fastapi import HTTPException
+
+    store = {}
+    service = RateLimitService(store=store, redis_client=FakeRedis(FakeRedisScript(fake_clock, fail=True)))
+    assert service.backend == "redis"
+
+    service.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=1)
+    with pytest.raises(HTTPException):
+        service.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=1)
+    assert "user_1" in store["chat"]
@@ -0,0 +1,121 @@
+"""
+Unit tests per SingleFlight (coalescing richieste identiche in corso).
+"""
+import asyncio
+
+import pytest
+
+from api.services.single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    # SingleFlight usa future asyncio
+    return "asyncio"
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = {"count": 0}
+    release = asyncio.Event()
+
+    async def compute():
+        calls["count"] += 1
+        await release.wait()
+        return {"answer": "ok"}
+
+    tasks = [asyncio.create_task(flight.do("q", compute)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls["count"] == 1
+    assert [shared for _, shared in results].count(False) == 1
+    assert all(value == {"answer": "ok"} for value, _ in results)
+    assert flight.stats() == {"inflight": 0, "leaders": 1, "coalesced": 4}
+
+
+async def test_different_keys_and_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    calls = {"count": 0}
+
+    async def compute():
+        calls["count"] += 1
+        return calls["count"]
+
+    first, _ = await flight.do("a", compute)
+    second, shared = await flight.do("a", compute)
+    third, _ = await flight.do("b", compute)
+
+    assert (first, second, third) == (1, 2, 3)
+    assert shared is False
+
+
+async def test_error_propagates_to_followers_and_clears_entry():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("llm down")
+
+    tasks = [asyncio.create_task(flight.do("q", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert all(isinstance(item, RuntimeError) for item in results)
+    assert len(flight) == 0
+
+    async def succeeding():
+        return "recovered"
+
+    assert await flight.do("q", succeeding) == ("recovered", False)
+
+
+async def test_follower_cancellation_does_not_cancel_leader():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def compute():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("q", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("q", compute))
+    await asyncio.sleep(0)
+    follower.cancel()
+    release.set()
+
+    assert await leader == ("done", False)
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+
+
+async def test_leader_cancellation_does_not_cancel_followers():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = {"count": 0}
+
+    async def compute():
+        calls["count"] += 1
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("q", compute))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do("q", compute)) for _ in range(2)]
+    await asyncio.sleep(0)
+    # Client del leader disconnesso: la computazione prosegue per i follower
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*followers) == [("done", True), ("done", True)]
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert calls["count"] == 1
+    assert len(flight) == 0
@@ -0,0 +1,89 @@
+"""
+Unit tests per structured output nativo e parser JSON incrementale.
+"""
+import json
+
+import pytest
+
+from api.models.answer_with_citations import AnswerWithCitations
+from api.models.enhanced_response import EnhancedAcademicResponse
+from api.services.structured_output import (
+    IncrementalJSONParser,
+    StructuredOutputError,
+    build_response_format,
+    generate_structured,
+)
+
+
+def test_parser_emits_fields_as_they_complete():
+    payload = json.dumps({
+        "risposta": 'Il "core" {stabile}, sempre',
+        "citazioni": ["c1", "c2"],
+        "extra": {"nested": [1, {"a": "}"}]},
+    })
+    parser = IncrementalJSONParser()
+    emitted = []
+
+    for char in "```json\n" + payload:
+        emitted.extend(parser.feed(char))
+
+    assert [name for name, _ in emitted] == ["risposta", "citazioni", "extra"]
+    assert parser.complete
+    assert parser.fields == json.loads(payload)
+
+
+def test_parser_waits_for_field_end_before_emitting():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"risposta": "parz') == []
+    assert parser.feed('iale", "citaz') == [("risposta", "parziale")]
+    assert not parser.complete
+    assert parser.feed('ioni": []}') == [("citazioni", [])]
+    assert parser.complete
+
+
+def test_strict_response_format_requires_all_fields():
+    response_format = build_response_format(EnhancedAcademicResponse, strict=True)
+    schema = response_format["json_schema"]["schema"]
+
+    assert response_format["json_schema"]["strict"] is True
+    assert set(schema["required"]) == set(schema["properties"])
+    assert schema["additionalProperties"] is False
+    citation = schema["$defs"]["CitationMetadata"]
+    assert set(citation["required"]) == set(citation["properties"])
+    assert "maxLength" not in json.dumps(schema)
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeStreamingChain:
+    def __init__(self, text, size=7):
+        self.text = text
+        self.size = size
+
+    def stream(self, _inputs):
+        for start in range(0, len(self.text), self.size):
+            yield FakeChunk(self.text[start:start + self.size])
+
+
+def test_generate_structured_validates_model_and_reports_fields():
+    chain = FakeStreamingChain('{"risposta": "ok", "citazioni": ["chunk-1"]}')
+    seen = []
+
+    result = generate_structured(
+        chain, {"question": "q"}, AnswerWithCitations,
+        on_field=lambda name, _value: seen.append(name),
+    )
+
+    assert result == AnswerWithCitations(risposta="ok", citazioni=["chunk-1"])
+    assert seen == ["risposta", "citazioni"]
+
+
+def test_generate_structured_rejects_truncated_output():
+    chain = FakeStreamingChain('{"risposta": "tronc')
+
+    with pytest.raises(StructuredOutputError):
+        generate_structured(chain, {}, AnswerWithCitations)
@@ -0,0 +1,140 @@
+"""
+Test harness benchmark offline (benchmarks/): corpus, stand-in, report.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from api.models.conversation import ConversationMessage
+from api.services.persistence_service import ConversationPersistenceService
+from benchmarks.e2e.corpus import embed_text, embed_texts, generate_corpus
+from benchmarks.e2e.fake_db import InMemoryDatabase, InMemoryPool
+from benchmarks.e2e.fake_services import VectorIndex, _chat_answer, parse_latency
+from benchmarks.report import (
+    ScenarioResult,
+    compare_reports,
+    config_differences,
+    percentile,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _small_corpus(seed=7):
+    return generate_corpus(
+        seed=seed, documents=6, chunks_per_document=4, queries=20, sessions=2, messages_per_session=9
+    )
+
+
+def test_corpus_is_deterministic_and_queries_hit_source_chunk():
+    first, second = _small_corpus(), _small_corpus()
+
+    assert [c.id for c in first.chunks] == [c.id for c in second.chunks]
+    assert [q.text for q in first.queries] == [q.text for q in second.queries]
+    assert [c.id for c in _small_corpus(seed=8).chunks] != [c.id for c in first.chunks]
+    assert np.array_equal(embed_text(first.chunks[0].content), embed_text(second.chunks[0].content))
+
+    index = VectorIndex()
+    index.add_chunks(first.chunks, embed_texts([c.content for c in first.chunks]))
+    hits = sum(
+        query.source_chunk_id in {row["id"] for row in index.match(embed_text(query.text), 0.0, 5)}
+        for query in first.queries
+    )
+    # Le query sono costruite dalle parole del chunk sorgente
+    assert hits >= len(first.queries) * 0.8
+
+
+def test_vector_index_threshold_order_and_upsert():
+    index = VectorIndex(dim=3)
+    rows = [{"id": name, "document_id": "d", "content": name, "metadata": {}} for name in "abc"]
+    index.add(rows, np.array([[1, 0, 0], [0.8, 0.6, 0], [0, 0, 1]], dtype=np.float32))
+
+    matches = index.match([1, 0, 0], threshold=0.5, count=5)
+    assert [(m["id"], round(m["similarity"], 2)) for m in matches] == [("a", 1.0), ("b", 0.8)]
+
+    index.add([{**rows[2], "content": "c2"}], np.array([[1, 0, 0]], dtype=np.float32))
+    assert len(index) == 3
+    assert [m["id"] for m in index.match([1, 0, 0], threshold=0.5, count=2)] == ["a", "c"]
+
+
+def test_fake_chat_cites_prompt_chunks_and_classifies():
+    chunk_id = "0b5c6a7e-4d0e-4f43-9f1e-2f7a3c1d9e10"
+    answer = _chat_answer(f"Contesto:\n[chunk_id={chunk_id}] testo")
+    assert answer["citazioni"] == [chunk_id]
+
+    classification = _chat_answer("1. DOMINIO CONTENUTO (scegli uno): ...")
+    assert classification["structure_type"] == "TESTO_ACCADEMICO_DENSO"
+
+
+def test_parse_latency():
+    assert parse_latency("none").sample_ms() == 0.0
+    assert parse_latency("fixed:12").sample_ms() == 12.0
+    model = parse_latency("lognormal:100:0.5", seed=3)
+    samples = sorted(model.sample_ms() for _ in range(2000))
+    assert 80 < percentile(samples, 50) < 120
+    replay = parse_latency("lognormal:100:0.5", seed=3)
+    assert samples == sorted(replay.sample_ms() for _ in range(2000))
+    with pytest.raises(ValueError):
+        parse_latency("gaussian:10")
+
+
+async def test_in_memory_pool_serves_persistence_service():
+    corpus = _small_corpus()
+    database = InMemoryDatabase()
+    database.seed_sessions(corpus.sessions)
+    service = ConversationPersistenceService(InMemoryPool(database, size=2))
+    session_id = sorted(corpus.sessions)[0]
+
+    stats = await service.get_session_stats(session_id)
+    assert stats.message_count == 9
+
+    first, cursor = await service.load_session_history_page(session_id, limit=5)
+    rest, end = await service.load_session_history_page(session_id, limit=5, cursor=cursor)
+    assert end is None
+    expected = [m.id for m in corpus.sessions[session_id]]
+    assert [m.id for m in first + rest] == expected
+
+    newest, _ = await service.load_session_history_page(session_id, limit=3, order_desc=True)
+    assert [m.id for m in newest] == expected[::-1][:3]
+
+    timestamp = datetime(2026, 2, 1, tzinfo=timezone.utc)
+    messages = [
+        ConversationMessage(role="user", content="nuova domanda", timestamp=timestamp),
+        ConversationMessage(role="assistant", content="risposta", timestamp=timestamp + timedelta(seconds=1)),
+    ]
+    assert await service.save_messages(session_id, messages)
+    assert await service.save_messages(session_id, messages)  # idempotente
+    assert (await service.get_session_stats(session_id)).message_count == 11
+
+    with pytest.raises(NotImplementedError):
+        async with InMemoryPool(database).acquire() as conn:
+            await conn.fetch("SELECT * FROM tabella_sconosciuta")
+
+
+def test_compare_reports_flags_regressions_and_config_changes():
+    result = ScenarioResult(name="chat@c8", concurrency=8, duration_s=2.0)
+    for latency in (100.0, 110.0, 120.0, 400.0):
+        result.record(latency, "200", ok=True)
+    result.record(90.0, "500", ok=False)
+    summary = result.summary()
+    assert summary["requests"] == 5
+    assert summary["throughput_rps"] == 2.5
+    assert summary["error_rate"] == 0.2
+    assert summary["status_counts"] == {"200": 4, "500": 1}
+
+    baseline = {"config": {"seed": 42, "flags": {"a": True}},
+                "results": {"chat@c8": {"p95_ms": 100.0, "throughput_rps": 10.0}}}
+    current = {"config": {"seed": 42, "flags": {"a": False}},
+               "results": {"chat@c8": {"p95_ms": 130.0, "throughput_rps": 10.5},
+                           "search@c8": {"p95_ms": 10.0}}}
+
+    comparisons = {c.metric: c for c in compare_reports(baseline, current, tolerance=0.15)}
+    assert comparisons["p95_ms"].regression and comparisons["p95_ms"].change_pct == 30.0
+    assert not comparisons["throughput_rps"].regression
+    assert config_differences(baseline, current) == {"flags.a": {"baseline": True, "current": False}}
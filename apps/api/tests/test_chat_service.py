@@ -2,7 +2,7 @@ from api.services import chat_service
 
 
 def test_record_ag_latency_ms_returns_percentiles():
-    chat_service.ag_latency_samples_ms.clear()
+    chat_service.ag_latency_sketch.clear()
 
     values = [120, 180, 250, 320, 480]
     summary = {}
@@ -15,7 +15,7 @@ def test_record_ag_latency_ms_returns_percentiles():
 
 
 def test_percentiles_handle_empty_samples():
-    chat_service.ag_latency_samples_ms.clear()
+    chat_service.ag_latency_sketch.clear()
     assert chat_service.get_latency_p50() == 0
     assert chat_service.get_latency_p95() == 0
     assert chat_service.get_latency_p99() == 0
@@ -0,0 +1,80 @@
+"""
+Test FastJSONResponse (api/utils/responses.py).
+"""
+import json
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, Field
+
+from api.schemas.chat import ChatQueryChunk, ChatQueryResponse
+from api.utils.responses import FastJSONResponse, dumps_json
+
+
+class _Item(BaseModel):
+    item_id: str = Field(alias="itemId")
+    created_at: datetime
+    score: Optional[float] = None
+
+
+def test_render_model_matches_fastapi_shape():
+    item = _Item(itemId="c1", created_at=datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc), score=0.5)
+
+    body = json.loads(FastJSONResponse(item).body)
+
+    # Alias come response_model_by_alias=True, datetime in ISO 8601
+    assert body == {"itemId": "c1", "created_at": "2026-01-02T03:04:05Z", "score": 0.5}
+
+
+def test_render_plain_content_matches_json_response():
+    content = {"results": [{"content": "àèìòù", "similarity_score": 0.91}], "total": 1}
+
+    assert json.loads(FastJSONResponse(content).body) == json.loads(JSONResponse(content).body)
+
+
+def test_dumps_json_handles_non_native_types():
+    uid = UUID("12345678-1234-5678-1234-567812345678")
+    payload = {
+        "id": uid,
+        "chunk": ChatQueryChunk(id="c1", similarity=0.8),
+        "tags": {"a"},
+        1: "chiave intera",
+        "big": 2**70,
+    }
+
+    decoded = json.loads(dumps_json(payload))
+
+    assert decoded["id"] == str(uid)
+    assert decoded["chunk"] == {"id": "c1", "document_id": None, "content": None, "similarity": 0.8}
+    assert decoded["tags"] == ["a"]
+    assert decoded["1"] == "chiave intera"
+    assert decoded["big"] == 2**70
+
+
+def test_direct_model_response_keeps_headers_and_skips_revalidation():
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/query", response_model=ChatQueryResponse)
+    def query(response: Response):
+        response.headers["ETag"] = 'W/"abc"'
+        chunks = [ChatQueryChunk.model_construct(id="c1", document_id=None, content="testo", similarity=0.7)]
+        return FastJSONResponse(ChatQueryResponse.model_construct(chunks=chunks), headers=response.headers)
+
+    @app.get("/plain")
+    def plain():
+        return {"ok": True}
+
+    client = TestClient(app)
+    response = client.get("/query")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == 'W/"abc"'
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {
+        "chunks": [{"id": "c1", "document_id": None, "content": "testo", "similarity": 0.7}]
+    }
+    assert client.get("/plain").json() == {"ok": True}
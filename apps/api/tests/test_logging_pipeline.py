@@ -0,0 +1,99 @@
+"""
+Test pipeline di logging non bloccante (api/utils/logging.py).
+"""
+import io
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from api.utils.logging import (
+    AsyncQueueHandler,
+    BatchingLogWriter,
+    EventLogFilter,
+    JSONFormatter,
+)
+
+
+def _record(msg, level=logging.INFO, created=None):
+    record = logging.LogRecord("api", level, __file__, 1, msg, None, None)
+    if created is not None:
+        record.created = created
+    return record
+
+
+def test_json_formatter_dict_and_fallback_types():
+    created = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc).timestamp()
+    line = JSONFormatter().format(
+        _record({"event": "x", "score": Decimal("0.5"), "città": "Bologna"}, created=created)
+    )
+    data = json.loads(line)
+
+    assert data["event"] == "x"
+    assert data["score"] == "0.5"
+    assert data["città"] == "Bologna"
+    # Timestamp del record, non della scrittura (il writer formatta in ritardo)
+    assert data["time"] == "2025-01-02T03:04:05+00:00"
+    assert data["level"] == "INFO"
+
+    assert json.loads(JSONFormatter().format(_record("plain %s")))["message"] == "plain %s"
+
+
+def test_event_filter_levels_and_sampling():
+    event_filter = EventLogFilter(
+        event_levels={"noisy": "DEBUG", "important": "WARNING"},
+        sample_rates={"sampled": 0.0, "kept": 1.0},
+        min_level=logging.INFO,
+    )
+
+    assert event_filter.filter(_record({"event": "noisy"})) is False
+    promoted = _record({"event": "important"})
+    assert event_filter.filter(promoted) is True
+    assert promoted.levelname == "WARNING"
+    assert event_filter.filter(_record({"event": "sampled"})) is False
+    assert event_filter.filter(_record({"event": "kept"})) is True
+    assert event_filter.filter(_record("not a dict")) is True
+
+
+def test_event_filter_marks_sampled_records(monkeypatch):
+    monkeypatch.setattr("api.utils.logging.random.random", lambda: 0.01)
+    record = _record({"event": "context_packed"})
+
+    assert EventLogFilter(sample_rates={"context_packed": 0.1}).filter(record) is True
+    assert record.msg == {"event": "context_packed", "sample_rate": 0.1}
+
+
+def test_async_pipeline_writes_batches_in_order():
+    log_queue = queue.Queue(maxsize=5000)
+    stream = io.StringIO()
+    handler = AsyncQueueHandler(log_queue)
+    writer = BatchingLogWriter(log_queue, stream, JSONFormatter(), batch_size=100)
+
+    logger = logging.getLogger("api.test_async_pipeline")
+    logger.propagate = False
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        payload = {"event": "tick"}
+        for index in range(1000):
+            payload["index"] = index
+            logger.info(payload)
+        writer.start()
+    finally:
+        writer.stop()
+        logger.removeHandler(handler)
+
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line)["index"] for line in lines] == list(range(1000))
+    # 1000 record già in coda -> al più 10 write da 100
+    assert writer.batches_written <= 10
+
+
+def test_full_queue_drops_without_blocking():
+    handler = AsyncQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(_record({"event": "burst"}))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
@@ -0,0 +1,78 @@
+"""
+Test microbenchmark (benchmarks/micro/): fixture, casi registrati, misura.
+"""
+import os
+
+import pytest
+
+from api import stores
+from benchmarks.micro.cases import BENCHMARKS, select_benchmarks
+from benchmarks.micro.fixtures import MicroFixtures
+from benchmarks.micro.runner import MICRO_METRIC_DIRECTIONS, measure, run_benchmarks
+from benchmarks.report import compare_reports
+
+
+@pytest.fixture
+def fixtures():
+    micro = MicroFixtures(seed=3, scale=0.02)
+    yield micro
+    micro.close()
+
+
+def test_fixtures_are_deterministic():
+    first, second = MicroFixtures(seed=3, scale=0.05), MicroFixtures(seed=3, scale=0.05)
+    try:
+        assert first.academic_text == second.academic_text
+        assert first.ranked_chunks == second.ranked_chunks
+        assert first.feedback_store == second.feedback_store
+        assert first.hash_file.read_bytes() == second.hash_file.read_bytes()
+        assert MicroFixtures(seed=4, scale=0.05).queries != first.queries
+        hash_file = first.hash_file
+    finally:
+        first.close()
+        second.close()
+    assert not hash_file.exists()
+
+
+def test_every_case_runs_and_restores_global_state(fixtures):
+    sessions_before = dict(stores.chat_messages_store)
+    testing_before = os.environ.get("TESTING")
+
+    for case in select_benchmarks():
+        with case.setup(fixtures) as operation:
+            operation()
+            if case.name == "rate_limit.enforce_many_keys":
+                # Il caso misura il limiter vero, non il bypass dei test
+                assert os.environ.get("TESTING") is None
+
+    assert stores.chat_messages_store == sessions_before
+    assert os.environ.get("TESTING") == testing_before
+
+
+def test_select_benchmarks_by_glob():
+    names = [case.name for case in select_benchmarks(["analytics.*", "logging.json_format_event"])]
+    assert names and all(
+        name.startswith("analytics.") or name == "logging.json_format_event" for name in names
+    )
+    assert "logging.json_format_event" in names
+    assert len(select_benchmarks()) == len(BENCHMARKS)
+
+
+def test_measure_and_compare_with_baseline(fixtures):
+    stats = measure(lambda: sum(range(50)), min_time=0.001, repeats=3)
+    assert stats["repeats"] == 3 and stats["loops"] >= 1
+    assert 0 < stats["min_us"] <= stats["median_us"]
+
+    results = run_benchmarks(select_benchmarks(["retrieval.diversify_chunks"]), fixtures,
+                             min_time=0.001, repeats=2)
+    assert results["retrieval.diversify_chunks"]["group"] == "retrieval"
+
+    baseline = {"results": {"case": {"median_us": 10.0, "min_us": 9.0, "ops_per_sec": 100000.0}}}
+    current = {"results": {"case": {"median_us": 12.5, "min_us": 9.1, "ops_per_sec": 80000.0}}}
+    comparisons = {
+        c.metric: c
+        for c in compare_reports(baseline, current, tolerance=0.15, directions=MICRO_METRIC_DIRECTIONS)
+    }
+    assert set(comparisons) == {"median_us", "min_us"}
+    assert comparisons["median_us"].regression
+    assert not comparisons["min_us"].regression
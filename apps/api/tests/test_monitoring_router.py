@@ -53,3 +53,17 @@ def test_watcher_metrics_endpoint_prometheus(client, monkeypatch):
     response = client.get("/metrics/watcher", params={"format": "prometheus"})
     assert response.status_code == 200
     assert "watcher_documents_processed_total" in response.text
+
+
+def test_prometheus_endpoint_exposes_unified_registry(client):
+    from api.utils.prometheus_exporter import observe_chat_stage, record_cache_lookup
+
+    observe_chat_stage("retrieval", 42)
+    record_cache_lookup("retrieval", hits=1)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'rag_chat_stage_duration_seconds_count{stage="retrieval"}' in response.text
+    assert 'rag_cache_requests_total{cache="retrieval",result="hit"}' in response.text
+    assert 'rag_db_pool_connections{state="in_use"}' in response.text
@@ -0,0 +1,95 @@
+"""
+Test exporter Prometheus unificato (api/utils/prometheus_exporter.py).
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from api.utils import prometheus_exporter  # noqa: E402
+from api.utils.metrics import MetricsCollector  # noqa: E402
+
+API_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _sample(name, labels=None):
+    return prometheus_client.REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+def test_cache_lookups_and_chat_stages_are_counted():
+    hits_before = _sample("rag_cache_requests_total", {"cache": "chunk", "result": "hit"})
+    misses_before = _sample("rag_cache_requests_total", {"cache": "chunk", "result": "miss"})
+    stage_before = _sample("rag_chat_stage_duration_seconds_count", {"stage": "generation"})
+
+    prometheus_exporter.record_cache_lookup("chunk", hits=3, misses=1)
+    prometheus_exporter.observe_chat_stage("generation", 1500)
+
+    assert _sample("rag_cache_requests_total", {"cache": "chunk", "result": "hit"}) == hits_before + 3
+    assert _sample("rag_cache_requests_total", {"cache": "chunk", "result": "miss"}) == misses_before + 1
+    assert _sample("rag_chat_stage_duration_seconds_count", {"stage": "generation"}) == stage_before + 1
+
+
+def test_metrics_collector_is_bridged():
+    collector = MetricsCollector()
+    before = _sample("rag_outbox_retry_success_total")
+
+    collector.increment("outbox_retry_success", 2)
+    collector.gauge("circuit_breaker_open", 1)
+    collector.histogram("db_write_latency_ms", 250)
+
+    assert _sample("rag_outbox_retry_success_total") == before + 2
+    assert _sample("rag_circuit_breaker_open") == 1
+    # Histogram *_ms esportati in secondi
+    assert _sample("rag_db_write_latency_seconds_bucket", {"le": "0.25"}) >= 1
+
+    collector.gauge("circuit_breaker_open", 0)
+
+
+def test_db_pool_sampling():
+    class FakePool:
+        def get_size(self):
+            return 8
+
+        def get_idle_size(self):
+            return 3
+
+        def get_max_size(self):
+            return 20
+
+    prometheus_exporter.sample_db_pool(FakePool())
+    assert _sample("rag_db_pool_connections", {"state": "in_use"}) == 5
+    assert _sample("rag_db_pool_connections", {"state": "max"}) == 20
+
+    prometheus_exporter.sample_db_pool(None)
+    assert _sample("rag_db_pool_connections", {"state": "size"}) == 0
+
+
+_WORKER_SCRIPT = """
+from api.utils import prometheus_exporter
+prometheus_exporter.record_cache_lookup("classification", hits=2, misses=1)
+prometheus_exporter.observe_chat_stage("total", 800)
+"""
+
+
+def test_multiprocess_render_aggregates_workers(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+    for _ in range(2):
+        subprocess.run(
+            [sys.executable, "-c", _WORKER_SCRIPT],
+            cwd=API_ROOT,
+            env=env,
+            check=True,
+            timeout=60,
+        )
+
+    payload, content_type = prometheus_exporter.render_metrics(str(tmp_path))
+    text = payload.decode()
+
+    assert content_type.startswith("text/plain")
+    assert 'rag_cache_requests_total{cache="classification",result="hit"} 4.0' in text
+    assert 'rag_cache_requests_total{cache="classification",result="miss"} 2.0' in text
+    assert 'rag_chat_stage_duration_seconds_count{stage="total"} 2.0' in text
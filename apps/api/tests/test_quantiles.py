@@ -0,0 +1,97 @@
+"""
+Test suite per gli sketch di quantili (api/utils/quantiles.py).
+"""
+import random
+
+import pytest
+
+from api.utils.quantiles import (
+    QuantileSketch,
+    WindowedQuantileSketch,
+    as_sketch,
+    sketch_from_values,
+)
+
+
+def test_empty_sketch_returns_none():
+    sketch = QuantileSketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.quantiles((0.5, 0.95)) == [None, None]
+    assert sketch.mean is None
+
+
+def test_sparse_values_are_exact():
+    """Un valore distinto per bucket: la media del bucket è il valore stesso."""
+    sketch = sketch_from_values([120, 180, 250, 320, 480])
+
+    assert sketch.quantiles((0.0, 0.5, 0.95, 1.0)) == [120, 250, 480, 480]
+    assert sketch.quantiles((0.5, 0.95, 0.99), interpolate=True) == pytest.approx(
+        [250.0, 448.0, 473.6]
+    )
+
+
+def test_relative_error_is_bounded_on_skewed_distribution():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(6, 1.2) for _ in range(50_000)]
+    sketch = sketch_from_values(values, relative_accuracy=0.005)
+    ordered = sorted(values)
+
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = ordered[round(q * (len(ordered) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.011)
+    # Memoria limitata dal range dei valori, non dai campioni
+    assert len(sketch._counts) < 2000
+    assert sketch.mean == pytest.approx(sum(values) / len(values))
+
+
+def test_merge_and_subtract_roundtrip():
+    first = sketch_from_values(range(1, 51))
+    second = sketch_from_values(range(51, 101))
+
+    merged = QuantileSketch()
+    merged.merge(first)
+    merged.merge(second)
+    assert merged.count == 100
+    assert merged.quantile(0.5) == 51
+
+    merged.subtract(first)
+    assert merged.count == 50
+    assert merged.quantile(0.5, interpolate=True) == pytest.approx(75.5, rel=0.01)
+
+
+def test_zero_and_tiny_values_go_to_zero_bucket():
+    sketch = sketch_from_values([0, 0, 0.0001, 5])
+    assert sketch.quantile(0.5) == pytest.approx(0.0, abs=1e-3)
+    assert sketch.quantile(1.0) == 5
+
+
+def test_windowed_sketch_expires_old_slices():
+    clock = {"now": 0.0}
+    window = WindowedQuantileSketch(window_seconds=60, slices=6, clock=lambda: clock["now"])
+
+    for value in range(100):
+        window.record(value)
+        clock["now"] += 1.0
+
+    # Restano le slice degli ultimi ~60s (valori 50..99)
+    assert window.count == 50
+    assert window.bounds() == (50, 99)
+    assert window.quantile(0.0) == 50
+
+    clock["now"] += 120
+    assert window.count == 0
+    assert window.bounds() == (None, None)
+    assert window.quantile(0.5) is None
+
+
+def test_as_sketch_accepts_lists_and_sketches():
+    window = WindowedQuantileSketch()
+    window.record(10)
+    window.record(30)
+
+    assert as_sketch([10, 30]).quantile(0.5, interpolate=True) == 20
+    assert as_sketch(window).count == 2
+    snapshot = as_sketch(window)
+    snapshot.record(50)
+    # Lo snapshot è una copia: la finestra non cambia
+    assert window.count == 2
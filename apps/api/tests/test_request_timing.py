@@ -0,0 +1,162 @@
+"""
+Test timing per-request (api/utils/request_timing.py, middleware Server-Timing).
+"""
+import logging
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from api.middleware import RequestContextMiddleware
+from api.routers.admin import get_slow_requests
+from api.utils.request_timing import (
+    SlowRequestLog,
+    begin_request,
+    current_timing,
+    end_request,
+    record_stage,
+    slow_request_log,
+    span,
+)
+
+
+@pytest.fixture
+def clean_slow_log():
+    original = slow_request_log.stats()
+    slow_request_log.clear()
+    yield slow_request_log
+    slow_request_log.clear()
+    slow_request_log.configure(
+        threshold_ms=original["threshold_ms"],
+        sample_rate=original["sample_rate"],
+    )
+
+
+def test_span_is_noop_outside_request():
+    assert current_timing() is None
+    with span("embedding"):
+        pass
+    record_stage("parsing", 3.0)
+    assert current_timing() is None
+
+
+def test_spans_accumulate_and_render_server_timing():
+    timing, token = begin_request("POST", "/api/v1/chat/sessions/s1/messages")
+    try:
+        with span("ann_rpc"):
+            time.sleep(0.002)
+        with span("ann_rpc"):
+            pass
+        record_stage("generation", 120.0)
+    finally:
+        end_request(token)
+
+    assert timing.counts["ann_rpc"] == 2
+    assert timing.stages["ann_rpc"] >= 2.0
+    header = timing.server_timing(150.0)
+    assert header.startswith("ann_rpc;dur=")
+    assert "generation;dur=120.0" in header
+    assert header.endswith("total;dur=150.0")
+
+    summary = timing.summary(150.0, 200, "req-1")
+    assert list(summary["stages"])[0] == "generation"
+    assert summary["unaccounted_ms"] == pytest.approx(150.0 - sum(timing.stages.values()), abs=0.01)
+
+
+def test_slow_request_log_threshold_capacity_and_order():
+    log = SlowRequestLog(capacity=3, threshold_ms=100)
+    assert log.offer({"path": "/fast", "duration_ms": 50}) is False
+    for duration in (150, 400, 200, 300):
+        assert log.offer({"path": "/api/v1/chat", "duration_ms": duration})
+
+    # Capacità 3: la più vecchia (150) è uscita; lettura dalla più lenta
+    assert [e["duration_ms"] for e in log.entries()] == [400, 300, 200]
+    assert [e["duration_ms"] for e in log.entries(limit=1)] == [400]
+    assert log.entries(path_prefix="/other") == []
+
+    log.configure(sample_rate=0.0)
+    assert log.offer({"path": "/api/v1/chat", "duration_ms": 999}) is False
+    assert log.stats()["slow_requests_seen"] == 5
+    assert log.stats()["slow_requests_recorded"] == 4
+
+
+def test_middleware_sets_server_timing_and_records_slow_requests(clean_slow_log):
+    clean_slow_log.configure(threshold_ms=0)
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/work")
+    def work():
+        # Route sync: il contesto arriva anche nel threadpool
+        with span("rerank"):
+            time.sleep(0.001)
+        return {"ok": True}
+
+    response = TestClient(app).get("/work")
+
+    assert response.status_code == 200
+    assert "rerank;dur=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]
+    [entry] = clean_slow_log.entries()
+    assert entry["path"] == "/work"
+    assert entry["request_id"] == response.headers["X-Request-ID"]
+    assert entry["status"] == 200
+    assert entry["stages"]["rerank"]["count"] == 1
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_request_context_middleware_streams_and_exposes_request_id():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware, server_timing=False)
+
+    @app.get("/stream")
+    async def stream(request: Request):
+        async def chunks():
+            yield request.state.request_id.encode()
+            yield b"|done"
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    handler = _ListHandler()
+    logger = logging.getLogger("api")
+    previous_level = logger.level
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        response = TestClient(app).get("/stream")
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(previous_level)
+
+    request_id = response.headers["X-Request-ID"]
+    assert response.text == f"{request_id}|done"
+    assert "Server-Timing" not in response.headers
+    [access_log] = [
+        record.msg for record in handler.records
+        if isinstance(record.msg, dict) and record.msg.get("event") == "http_request"
+    ]
+    assert access_log["status"] == 200
+    assert access_log["request_id"] == request_id
+
+
+def test_admin_slow_requests_endpoint(clean_slow_log):
+    clean_slow_log.configure(threshold_ms=0)
+    clean_slow_log.offer({"path": "/api/v1/chat", "duration_ms": 1200.0})
+
+    with pytest.raises(HTTPException) as exc:
+        get_slow_requests(payload={"app_metadata": {"role": "student"}}, limit=10, path_prefix=None)
+    assert exc.value.status_code == 403
+
+    body = get_slow_requests(payload={"app_metadata": {"role": "admin"}}, limit=10, path_prefix=None)
+    assert body["log"]["size"] == 1
+    assert body["requests"][0]["duration_ms"] == 1200.0
@@ -0,0 +1,109 @@
+"""
+Test profiler a campionamento (api/utils/sampling_profiler.py, endpoint admin).
+"""
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from api.config import get_settings
+from api.routers.admin import profile_worker
+from api.utils import sampling_profiler
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(200))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=_busy_loop, args=(stop,), name="busy-worker")
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_profile_captures_busy_thread(busy_thread):
+    result = sampling_profiler.profile(0.2, interval_seconds=0.005)
+
+    assert result.sample_count > 5
+    collapsed = result.to_collapsed()
+    busy_lines = [line for line in collapsed.splitlines() if line.startswith("busy-worker;")]
+    assert busy_lines
+    assert any("_busy_loop (test_sampling_profiler.py:" in line for line in busy_lines)
+    # Formato collapsed: "stack count"
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in busy_lines)
+
+
+def test_speedscope_profile_is_consistent(busy_thread):
+    profile = sampling_profiler.profile(0.1, interval_seconds=0.005).to_speedscope()
+
+    json.dumps(profile)
+    frames = profile["shared"]["frames"]
+    [busy] = [p for p in profile["profiles"] if p["name"].endswith("busy-worker")]
+    assert busy["type"] == "sampled"
+    assert len(busy["samples"]) == len(busy["weights"])
+    assert all(0 <= index < len(frames) for stack in busy["samples"] for index in stack)
+    assert busy["endValue"] == pytest.approx(sum(busy["weights"]))
+
+
+def test_only_one_profile_at_a_time():
+    started = threading.Event()
+
+    def _run():
+        started.set()
+        sampling_profiler.profile(0.3, interval_seconds=0.01)
+
+    thread = threading.Thread(target=_run)
+    thread.start()
+    started.wait()
+    time.sleep(0.05)
+    try:
+        assert sampling_profiler.is_profiling()
+        with pytest.raises(sampling_profiler.ProfilerBusyError):
+            sampling_profiler.profile(0.01)
+    finally:
+        thread.join()
+    assert not sampling_profiler.is_profiling()
+
+
+async def test_profile_endpoint_formats_and_guards():
+    test_settings = get_settings()
+    admin = {"sub": "admin-1", "app_metadata": {"role": "admin"}}
+    request = SimpleNamespace()
+
+    with pytest.raises(HTTPException) as exc:
+        await profile_worker(
+            request, {"app_metadata": {"role": "student"}}, test_settings,
+            duration_seconds=0.05, interval_ms=5.0, format="collapsed", include_idle=False,
+        )
+    assert exc.value.status_code == 403
+
+    with pytest.raises(HTTPException) as exc:
+        await profile_worker(
+            request, admin, test_settings,
+            duration_seconds=test_settings.profiler_max_duration_seconds + 1,
+            interval_ms=5.0, format="collapsed", include_idle=False,
+        )
+    assert exc.value.status_code == 422
+
+    response = await profile_worker(
+        request, admin, test_settings,
+        duration_seconds=0.05, interval_ms=5.0, format="speedscope", include_idle=True,
+    )
+    assert response.media_type == "application/json"
+    assert "speedscope.json" in response.headers["content-disposition"]
+    assert int(response.headers["x-profile-samples"]) > 0
@@ -0,0 +1,389 @@
+"""
+Test stato condiviso tra worker (api/shared_state.py).
+
+Coverage:
+- Backend shm (SQLite) e redis (client fake in memoria) con la stessa semantica
+- SharedSessionLog: read-through incrementale, sostituzione, cancellazione
+- SharedMap: update atomici, patch, TTL
+- Access code mono-uso, context window e rate limit tra worker diversi
+- configure_shared_state e fallback su stato per processo
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api import stores
+from api.main import app
+from api.shared_state import (
+    RedisStateBackend,
+    SharedMap,
+    SharedSessionLog,
+    SQLiteStateBackend,
+    WatchError,
+    configure_shared_state,
+    create_state_backend,
+    decode_value,
+    encode_value,
+    get_state_backend,
+)
+
+
+class FakeRedis:
+    """Sottoinsieme dei comandi Redis usati da RedisStateBackend (TTL, WATCH inclusi)."""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.versions = {}
+
+    def _alive(self, key):
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.get(key)
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def get(self, key):
+        return self._alive(key)
+
+    def set(self, key, value, px=None, keepttl=False):
+        self.data[key] = value
+        if px:
+            self.expiry[key] = time.time() + px / 1000
+        elif not keepttl:
+            self.expiry.pop(key, None)
+        self._touch(key)
+        return True
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key) is not None:
+                removed += 1
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+            self._touch(key)
+        return removed
+
+    def mget(self, keys):
+        return [self._alive(key) for key in keys]
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+        self._touch(key)
+
+    def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(members)
+        self._touch(key)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    def scard(self, key):
+        return len(self.data.get(key, set()))
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+        self._touch(key)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return list(items[start:] if end == -1 else items[start:end + 1])
+
+    def hget(self, key, field):
+        value = self.data.get(key, {}).get(field)
+        return None if value is None else str(value)
+
+    def hincrby(self, key, field, amount=1):
+        bucket = self.data.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+        self._touch(key)
+        return bucket[field]
+
+    def ping(self):
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Pipeline con WATCH/MULTI: comandi immediati dopo watch, in coda dopo multi."""
+
+    def __init__(self, client):
+        self.client = client
+        self.reset()
+
+    def reset(self):
+        self.watched = {}
+        self.immediate = False
+        self.queued = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def watch(self, *keys):
+        self.watched = {key: self.client.versions.get(key, 0) for key in keys}
+        self.immediate = True
+
+    def multi(self):
+        self.immediate = False
+
+    def execute(self):
+        queued, watched = self.queued, self.watched
+        self.reset()
+        if any(self.client.versions.get(key, 0) != version for key, version in watched.items()):
+            raise WatchError("watched key changed")
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in queued]
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        if self.immediate:
+            return command
+
+        def _queue(*args, **kwargs):
+            self.queued.append((name, args, kwargs))
+            return self
+
+        return _queue
+
+
+@pytest.fixture(params=["shm", "redis"])
+def workers(request, tmp_path):
+    """Due backend distinti sullo stesso stato, come due worker."""
+    if request.param == "shm":
+        backends = [SQLiteStateBackend(tmp_path / "state.sqlite3") for _ in range(2)]
+    else:
+        client = FakeRedis()
+        backends = [RedisStateBackend(client) for _ in range(2)]
+    yield backends
+    for backend in backends:
+        backend.close()
+
+
+@pytest.fixture
+def shared_stores(tmp_path):
+    """Store di api/stores.py su backend shm, ripristinati per processo a fine test.
+
+    ``api.main`` è importato a livello di modulo: all'import configura lo stato
+    dai settings e sovrascriverebbe il backend del test.
+    """
+    settings = SimpleNamespace(shared_state_cache_ttl_seconds=0.0)
+    backend = SQLiteStateBackend(tmp_path / "state.sqlite3")
+    configure_shared_state(settings, backend=backend)
+    yield backend
+    configure_shared_state(settings, backend=None)
+
+
+def _message(role, content):
+    return {"role": role, "content": content, "timestamp": "2026-01-01T10:00:00+00:00"}
+
+
+def test_codec_round_trips_datetimes():
+    now = datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc)
+    value = {"expires_at": now, "nested": [{"at": now}], "count": 2, "text": "è"}
+
+    assert decode_value(encode_value(value)) == value
+    assert decode_value(None) is None
+
+
+def test_session_log_read_through_across_workers(workers):
+    worker_a, worker_b = SharedSessionLog("chat_messages"), SharedSessionLog("chat_messages")
+    worker_a.use_backend(workers[0])
+    worker_b.use_backend(workers[1])
+
+    assert worker_a.append("s1", [_message("user", "ciao"), _message("assistant", "salve")]) == 2
+    seen = worker_b["s1"]
+    assert [item["content"] for item in seen] == ["ciao", "salve"]
+
+    # Solo append: stessa lista estesa in place (window incrementale valido)
+    assert worker_a.append("s1", [_message("user", "e poi?")]) == 3
+    assert worker_b.get("s1") is seen
+    assert seen[-1]["content"] == "e poi?"
+    assert list(worker_b) == ["s1"] and len(worker_b) == 1
+
+    # Sostituzione: nuova generazione, lista nuova anche sull'altro worker
+    before = worker_a["s1"]
+    worker_b["s1"] = [_message("user", "reset")]
+    after = worker_a["s1"]
+    assert after is not before
+    assert [item["content"] for item in after] == ["reset"]
+
+    del worker_a["s1"]
+    assert "s1" not in worker_b
+    assert len(worker_b) == 0
+    assert worker_b.append("s1", [_message("user", "di nuovo")]) == 1
+    assert [item["content"] for item in worker_a["s1"]] == ["di nuovo"]
+
+
+def test_shared_map_updates_and_ttl(workers):
+    worker_a, worker_b = SharedMap("sync_jobs"), SharedMap("sync_jobs")
+    worker_a.use_backend(workers[0])
+    worker_b.use_backend(workers[1])
+    started = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+    worker_a["job-1"] = {"status": "running", "started_at": started}
+    assert worker_b["job-1"] == {"status": "running", "started_at": started}
+
+    assert worker_b.patch("job-1", status="completed", inserted=12)["inserted"] == 12
+    assert worker_a["job-1"]["status"] == "completed"
+    assert worker_a.patch("missing", status="failed") is None
+    assert "missing" not in worker_b
+
+    previous, current = worker_a.update_item("job-1", lambda record: None)
+    assert previous["status"] == "completed" and current is None
+    assert "job-1" not in worker_b and len(worker_b) == 0
+
+    # patch senza TTL mantiene la scadenza del record
+    worker_a.put("short", {"status": "running"}, ttl=0.2)
+    worker_b.patch("short", status="completed")
+    worker_a.put("long", {"status": "running"})
+    assert sorted(worker_b) == ["long", "short"]
+    time.sleep(0.3)
+    assert "short" not in worker_b
+    assert list(worker_a) == ["long"]
+
+
+def test_redis_update_retries_on_concurrent_write():
+    client = FakeRedis()
+    worker_a, worker_b = RedisStateBackend(client), RedisStateBackend(client)
+    worker_a.set("access_codes", "CODE", {"usage_count": 0})
+    calls = []
+
+    def _redeem(record):
+        calls.append(record)
+        if len(calls) == 1:
+            # Un altro worker riscatta il codice tra WATCH ed EXEC
+            worker_b.set("access_codes", "CODE", {"usage_count": 1})
+        return {**record, "usage_count": record["usage_count"] + 1}
+
+    previous, current = worker_a.update("access_codes", "CODE", _redeem)
+
+    assert len(calls) == 2
+    assert previous == {"usage_count": 1} and current == {"usage_count": 2}
+
+
+def test_access_code_redeemed_once_under_concurrency(tmp_path):
+    path = tmp_path / "state.sqlite3"
+    setup = SharedMap("access_codes", cacheable=False)
+    setup.use_backend(SQLiteStateBackend(path))
+    setup["CODE"] = {"is_active": True, "usage_count": 0}
+    winners = []
+
+    def _worker():
+        codes = SharedMap("access_codes", cacheable=False)
+        codes.use_backend(SQLiteStateBackend(path))
+        previous, _ = codes.update_item(
+            "CODE",
+            lambda record: {**record, "usage_count": record["usage_count"] + 1, "is_active": False}
+            if record["is_active"] else record,
+        )
+        if previous["is_active"]:
+            winners.append(previous)
+
+    threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(winners) == 1
+    assert setup["CODE"] == {"is_active": False, "usage_count": 1}
+
+
+def test_exchange_code_single_use_across_workers(shared_stores, tmp_path):
+    stores.access_codes_store["SHAREDCODE"] = {
+        "id": "code-1",
+        "code": "SHAREDCODE",
+        "is_active": True,
+        "expires_at": None,
+        "usage_count": 0,
+        "last_used_at": None,
+        "created_by_id": "admin-1",
+        "created_at": None,
+        "updated_at": None,
+    }
+    client = TestClient(app)
+
+    assert client.post("/api/v1/auth/exchange-code", json={"access_code": "SHAREDCODE"}).status_code == 200
+
+    other_worker = SharedMap("access_codes", cacheable=False)
+    other_worker.use_backend(SQLiteStateBackend(tmp_path / "state.sqlite3"))
+    assert other_worker["SHAREDCODE"]["usage_count"] == 1
+    assert isinstance(other_worker["SHAREDCODE"]["last_used_at"], datetime)
+    assert client.post("/api/v1/auth/exchange-code", json={"access_code": "SHAREDCODE"}).status_code == 409
+
+
+def test_context_window_follows_turns_from_other_worker(shared_stores, tmp_path):
+    from api.services.conversation_service import ConversationManager
+
+    manager = ConversationManager()
+    manager.add_turn("session-1", "Cos'è la spondilolistesi?", "Scivolamento di una vertebra.")
+    first = manager.get_context_window("session-1")
+    assert len(first.messages) == 2
+
+    # Turno servito da un altro worker: il window lo vede senza sticky session
+    other_worker = SharedSessionLog("chat_messages")
+    other_worker.use_backend(SQLiteStateBackend(tmp_path / "state.sqlite3"))
+    assert other_worker.append(
+        "session-1", [_message("user", "E la terapia?"), _message("assistant", "Esercizio graduale.")]
+    ) == 4
+
+    second = manager.get_context_window("session-1")
+    assert [message.content for message in second.messages][-2:] == ["E la terapia?", "Esercizio graduale."]
+    assert second.total_tokens > first.total_tokens
+    assert manager._windows["session-1"].source is stores.chat_messages_store["session-1"]
+
+
+def test_rate_limit_shared_across_workers_on_shm(monkeypatch, tmp_path):
+    from api.services.rate_limit_service import RateLimitService
+
+    monkeypatch.setenv("TESTING", "false")
+    monkeypatch.setenv("RATE_LIMITING_ENABLED", "true")
+    worker_a, worker_b = RateLimitService(store={}), RateLimitService(store={})
+    worker_a.use_state_backend(SQLiteStateBackend(tmp_path / "state.sqlite3"))
+    worker_b.use_state_backend(SQLiteStateBackend(tmp_path / "state.sqlite3"))
+    assert worker_a.backend == "shm"
+
+    worker_a.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+    worker_b.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+    with pytest.raises(HTTPException) as exc_info:
+        worker_a.enforce_rate_limit("user_1", "chat", window_seconds=60, max_requests=2)
+
+    assert exc_info.value.status_code == 429
+    worker_b.enforce_rate_limit("user_2", "chat", window_seconds=60, max_requests=2)
+
+
+def test_configure_shared_state_and_fallback(tmp_path):
+    settings = SimpleNamespace(
+        shared_state_backend="shm",
+        shared_state_shm_path=str(tmp_path / "nested" / "state.sqlite3"),
+        shared_state_redis_url="redis://127.0.0.1:1/0",
+        celery_broker_url=None,
+        shared_state_cache_ttl_seconds=0.5,
+    )
+    try:
+        assert configure_shared_state(settings) == "shm"
+        assert get_state_backend() is stores.sync_jobs_store.backend
+        assert stores.chat_messages_store.backend is get_state_backend()
+        assert stores.sync_jobs_store.cache_ttl == 0.5
+        # Access code sempre dal backend, mai da cache locale
+        assert stores.access_codes_store.cache_ttl == 0.0
+    finally:
+        assert configure_shared_state(settings, backend=None) == "memory"
+    assert stores.sync_jobs_store.backend is None
+
+    # Redis non raggiungibile: warning e stato per processo
+    settings.shared_state_backend = "redis"
+    assert create_state_backend(settings) is None
@@ -0,0 +1,112 @@
+"""
+Test avvio worker: warmup in lifespan, profilo di avvio, import differiti.
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from api import startup
+from api.routers.admin import get_startup_profile
+from api.utils.lazy_import import LazyAttribute, lazy_import
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def clean_profile():
+    startup.startup_profile.reset()
+    yield startup.startup_profile
+    startup.startup_profile.reset()
+
+
+def _settings(**overrides):
+    values = {
+        "startup_warmup_enabled": True,
+        "startup_warmup_components": ["tiktoken", "llm_clients", "reranker"],
+        "startup_warmup_timeout_seconds": 5.0,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+async def test_run_warmup_records_each_component(monkeypatch, clean_profile):
+    calls = []
+
+    def ok(settings):
+        calls.append("tiktoken")
+
+    def fails(settings):
+        raise RuntimeError("OPENAI_API_KEY mancante")
+
+    monkeypatch.setattr(startup, "WARMUP_COMPONENTS", {
+        "tiktoken": ok,
+        "llm_clients": fails,
+        "reranker": lambda settings: "skipped",
+    })
+
+    result = await startup.run_warmup(_settings())
+
+    assert calls == ["tiktoken"]
+    assert result["tiktoken"]["status"] == "ok"
+    assert result["llm_clients"]["status"] == "error"
+    assert "OPENAI_API_KEY" in result["llm_clients"]["error"]
+    assert result["reranker"]["status"] == "skipped"
+    assert "warmup" in clean_profile.as_dict()["phases_ms"]
+
+
+async def test_run_warmup_timeout_does_not_block_startup(monkeypatch, clean_profile):
+    release = threading.Event()
+    monkeypatch.setattr(startup, "WARMUP_COMPONENTS", {
+        "reranker": lambda settings: release.wait(5),
+    })
+
+    try:
+        result = await startup.run_warmup(
+            _settings(startup_warmup_components=["reranker"], startup_warmup_timeout_seconds=0.05)
+        )
+    finally:
+        release.set()
+
+    assert result["reranker"]["status"] == "timeout"
+
+
+async def test_run_warmup_disabled(monkeypatch, clean_profile):
+    monkeypatch.setattr(startup, "WARMUP_COMPONENTS", {"tiktoken": pytest.fail})
+
+    assert await startup.run_warmup(_settings(startup_warmup_enabled=False)) == {}
+    assert clean_profile.as_dict()["warmup"] == {}
+
+
+def test_startup_phase_and_admin_endpoint(clean_profile):
+    with startup.startup_phase("db_pool"):
+        pass
+    clean_profile.mark_ready()
+
+    with pytest.raises(HTTPException) as exc:
+        get_startup_profile(payload={"app_metadata": {"role": "student"}})
+    assert exc.value.status_code == 403
+
+    body = get_startup_profile(payload={"app_metadata": {"role": "admin"}})
+    assert body["ready"] is True
+    assert body["phases_ms"]["db_pool"] >= 0
+
+
+def test_lazy_import_defers_module_load():
+    missing = lazy_import("api.module_che_non_esiste", "Factory")
+
+    # Nessun import alla definizione: l'errore arriva solo all'uso
+    assert isinstance(missing, LazyAttribute)
+    with pytest.raises(ModuleNotFoundError):
+        missing()
+
+    quantile_sketch = lazy_import("..quantiles", "WindowedQuantileSketch", "api.utils.lazy_import")
+    sketch = quantile_sketch(window_seconds=60, slices=2)
+    assert type(sketch).__name__ == "WindowedQuantileSketch"
+    assert quantile_sketch.__name__ == "WindowedQuantileSketch"
@@ -40,6 +40,9 @@ class _DummyCache:
     def get_stats(self) -> Dict[str, int]:
         return {"hits": self.hits, "misses": self.misses}
 
+    def counters(self) -> tuple[int, int]:
+        return self.hits, self.misses
+
     def record_latency(self, latency_ms: float, cached: bool) -> None:
         if cached:
             self.hits += 1
@@ -133,12 +136,11 @@ def test_classify_with_timeout_identifies_cache_source(
     class CacheWithHitGrowth(_DummyCache):
         def __init__(self) -> None:
             super().__init__()
-            self._call = 0
+            self.stats_calls = 0
 
         def get_stats(self) -> Dict[str, int]:
-            self._call += 1
-            if self._call == 1:
-                return {"hits": 0, "misses": 0}
+            # Contatori letti prima con counters(): hit registrato durante la classificazione
+            self.stats_calls += 1
             return {"hits": 1, "misses": 0}
 
     cache = CacheWithHitGrowth()
@@ -153,6 +155,7 @@ def test_classify_with_timeout_identifies_cache_source(
     _, meta = watcher._classify_with_timeout("text", {}, 5, cache)
     assert meta["source"] == "cache"
     assert meta["cache"]["hits"] >= 1
+    assert cache.stats_calls == 1
 
 
 def test_classify_with_timeout_timeout_error(monkeypatch: pytest.MonkeyPatch) -> None:
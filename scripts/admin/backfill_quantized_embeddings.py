@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Backfill embedding_short (halfvec 512) e build indice HNSW ridotto.
+
+Prerequisito: migration 20251121000000_quantized_embedding_index.sql
+(colonna embedding_short + trigger per i nuovi chunk). Lo script:
+1. Popola embedding_short sui chunk esistenti in batch (UPDATE brevi,
+   nessun lock lungo sulla tabella)
+2. Crea l'indice HNSW CONCURRENTLY (non ammesso dentro una migration)
+3. Riporta dimensione indice full vs ridotto
+
+Dopo il backfill: confrontare recall con
+    python scripts/benchmark_retrieval.py --compare-quantized
+e attivare ENABLE_QUANTIZED_ANN_SEARCH=true.
+
+Usage:
+    poetry --directory apps/api run python scripts/admin/backfill_quantized_embeddings.py [--batch-size 500] [--skip-index]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import asyncpg
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "document_chunks_embedding_short_hnsw_idx"
+
+
+async def backfill_embedding_short(conn: asyncpg.Connection, batch_size: int) -> int:
+    """Popola embedding_short a batch finché restano chunk da convertire."""
+    total_updated = 0
+    start_time = time.time()
+
+    while True:
+        # Il trigger calcola embedding_short: basta riscrivere embedding
+        status = await conn.execute("""
+            UPDATE document_chunks
+            SET embedding = embedding
+            WHERE id IN (
+                SELECT id FROM document_chunks
+                WHERE embedding IS NOT NULL AND embedding_short IS NULL
+                LIMIT $1
+            )
+        """, batch_size)
+        updated = int(status.split()[-1])
+        total_updated += updated
+
+        logger.info({
+            "event": "quantized_backfill_batch",
+            "updated": updated,
+            "total_updated": total_updated,
+        })
+
+        if updated < batch_size:
+            break
+
+    logger.info({
+        "event": "quantized_backfill_complete",
+        "total_updated": total_updated,
+        "duration_s": round(time.time() - start_time, 2),
+    })
+    return total_updated
+
+
+async def build_reduced_index(conn: asyncpg.Connection) -> None:
+    """Crea indice HNSW halfvec su embedding_short (CONCURRENTLY)."""
+    start_time = time.time()
+    await conn.execute(f"""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME}
+        ON document_chunks
+        USING hnsw (embedding_short halfvec_cosine_ops)
+        WITH (m = 16, ef_construction = 64)
+    """)
+    logger.info({
+        "event": "quantized_index_built",
+        "index": INDEX_NAME,
+        "duration_s": round(time.time() - start_time, 2),
+    })
+
+
+async def report_index_sizes(conn: asyncpg.Connection) -> None:
+    """Confronta dimensione indici HNSW full vs ridotto."""
+    rows = await conn.fetch("""
+        SELECT indexrelname AS index_name,
+               pg_size_pretty(pg_relation_size(indexrelid)) AS size
+        FROM pg_stat_user_indexes
+        WHERE relname = 'document_chunks'
+          AND indexrelname LIKE '%hnsw%'
+        ORDER BY pg_relation_size(indexrelid) DESC
+    """)
+    coverage = await conn.fetchrow("""
+        SELECT COUNT(embedding) AS with_embeddings,
+               COUNT(embedding_short) AS with_embedding_short
+        FROM document_chunks
+    """)
+
+    print("\n📊 Indici HNSW document_chunks:")
+    for row in rows:
+        print(f"  • {row['index_name']}: {row['size']}")
+    print(
+        f"  • Coverage embedding_short: {coverage['with_embedding_short']}"
+        f"/{coverage['with_embeddings']}\n"
+    )
+
+
+async def main():
+    """Entry point con error handling."""
+    parser = argparse.ArgumentParser(description="Backfill embedding_short + indice HNSW ridotto")
+    parser.add_argument("--batch-size", type=int, default=500, help="Chunk per UPDATE")
+    parser.add_argument("--skip-index", action="store_true", help="Solo backfill, senza CREATE INDEX")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL non impostata in .env")
+
+    conn: asyncpg.Connection = await asyncpg.connect(database_url, statement_cache_size=0)
+    try:
+        await backfill_embedding_short(conn, args.batch_size)
+        if not args.skip_index:
+            await build_reduced_index(conn)
+        await report_index_sizes(conn)
+        sys.exit(0)
+
+    except KeyboardInterrupt:
+        logger.warning("Script interrotto da utente")
+        sys.exit(130)
+
+    except Exception as exc:
+        logger.error({
+            "event": "quantized_backfill_fatal_error",
+            "error": str(exc),
+            "error_type": type(exc).__name__
+        })
+        print(f"\n❌ Errore fatale: {exc}\n", file=sys.stderr)
+        sys.exit(1)
+
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
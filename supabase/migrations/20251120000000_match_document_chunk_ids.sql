@@ -0,0 +1,38 @@
+-- ==================================================
+-- Migration: match_document_chunk_ids (RPC solo id + score)
+-- ==================================================
+-- Purpose: ridurre payload ed egress della ricerca semantica.
+-- La variante restituisce solo id, document_id e similarity; il content
+-- viene risolto lato API dalla cache chunk locale
+-- (ENABLE_CHUNK_CONTENT_CACHE=true, api/knowledge_base/chunk_cache.py).
+-- Stessa semantica di ordinamento/threshold di match_document_chunks.
+-- ==================================================
+
+CREATE OR REPLACE FUNCTION public.match_document_chunk_ids (
+  query_embedding vector(1536),
+  match_threshold float DEFAULT 0.75,
+  match_count int DEFAULT 8
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  similarity float
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_catalog
+AS $$
+  SELECT
+    dc.id,
+    dc.document_id,
+    1 - (dc.embedding <=> query_embedding) AS similarity
+  FROM public.document_chunks dc
+  WHERE 1 - (dc.embedding <=> query_embedding) > match_threshold
+  ORDER BY (dc.embedding <=> query_embedding) ASC
+  LIMIT match_count;
+$$;
+
+ALTER FUNCTION public.match_document_chunk_ids(vector, float, int)
+  OWNER TO service_role;
+REVOKE EXECUTE ON FUNCTION public.match_document_chunk_ids(vector, float, int) FROM PUBLIC;
@@ -0,0 +1,101 @@
+-- ==================================================
+-- Migration: indice ANN ridotto (halfvec 512) + rescoring esatto
+-- ==================================================
+-- Purpose: ridurre memoria indice HNSW e latenza query.
+-- text-embedding-3-small supporta dimensioni native ridotte (Matryoshka):
+-- i primi 512 componenti dell'embedding 1536 in half precision
+-- (halfvec, pgvector >= 0.7) bastano per la candidate generation.
+-- Il top-k finale è ricalcolato con distanza esatta sul vector(1536).
+--
+-- Changes:
+-- 1. ADD COLUMN embedding_short halfvec(512)
+-- 2. Trigger che mantiene embedding_short allineato a embedding
+-- 3. RPC match_document_chunks_quantized (candidati ANN + rescoring esatto)
+--
+-- L'indice HNSW su embedding_short NON è creato qui (CREATE INDEX
+-- CONCURRENTLY non ammesso in transazione): backfill e build indice con
+--   python scripts/admin/backfill_quantized_embeddings.py
+-- Attivazione lato API: ENABLE_QUANTIZED_ANN_SEARCH=true
+-- ==================================================
+
+-- =====================
+-- 1. Colonna embedding ridotto
+-- =====================
+ALTER TABLE public.document_chunks
+  ADD COLUMN IF NOT EXISTS embedding_short halfvec(512);
+
+-- =====================
+-- 2. Trigger sync embedding -> embedding_short
+-- =====================
+-- Copre INSERT (SupabaseVectorStore.add_texts) e UPDATE embeddings
+-- (watcher / generate_missing_embeddings.py)
+CREATE OR REPLACE FUNCTION public.sync_document_chunk_embedding_short()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SET search_path = public, pg_catalog
+AS $$
+BEGIN
+  IF NEW.embedding IS NULL THEN
+    NEW.embedding_short := NULL;
+  ELSE
+    NEW.embedding_short := subvector(NEW.embedding, 1, 512)::halfvec(512);
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+ALTER FUNCTION public.sync_document_chunk_embedding_short()
+  OWNER TO service_role;
+REVOKE EXECUTE ON FUNCTION public.sync_document_chunk_embedding_short() FROM PUBLIC;
+
+DROP TRIGGER IF EXISTS trigger_sync_embedding_short ON public.document_chunks;
+CREATE TRIGGER trigger_sync_embedding_short
+  BEFORE INSERT OR UPDATE OF embedding ON public.document_chunks
+  FOR EACH ROW
+  EXECUTE FUNCTION public.sync_document_chunk_embedding_short();
+
+-- =====================
+-- 3. RPC quantizzata con rescoring esatto
+-- =====================
+-- candidate_count: candidati dall'indice ridotto (over-retrieval, es. 4x match_count)
+-- include_content: false con cache chunk locale (ENABLE_CHUNK_CONTENT_CACHE)
+CREATE OR REPLACE FUNCTION public.match_document_chunks_quantized (
+  query_embedding vector(1536),
+  match_threshold float DEFAULT 0.75,
+  match_count int DEFAULT 8,
+  candidate_count int DEFAULT 32,
+  include_content boolean DEFAULT true
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  similarity float
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public, pg_catalog
+SET hnsw.ef_search = 100
+AS $$
+  WITH candidates AS (
+    SELECT dc.id, dc.document_id, dc.content, dc.embedding
+    FROM public.document_chunks dc
+    WHERE dc.embedding_short IS NOT NULL
+    ORDER BY dc.embedding_short <=> subvector(query_embedding, 1, 512)::halfvec(512) ASC
+    LIMIT greatest(candidate_count, match_count)
+  )
+  SELECT
+    c.id,
+    c.document_id,
+    CASE WHEN include_content THEN c.content END,
+    1 - (c.embedding <=> query_embedding) AS similarity
+  FROM candidates c
+  WHERE 1 - (c.embedding <=> query_embedding) > match_threshold
+  ORDER BY (c.embedding <=> query_embedding) ASC
+  LIMIT match_count;
+$$;
+
+ALTER FUNCTION public.match_document_chunks_quantized(vector, float, int, int, boolean)
+  OWNER TO service_role;
+REVOKE EXECUTE ON FUNCTION public.match_document_chunks_quantized(vector, float, int, int, boolean) FROM PUBLIC;
@@ -0,0 +1,135 @@
+-- ==================================================
+-- Session history: keyset pagination + exact per-session count
+-- ==================================================
+-- Created: 2025-11-22
+-- Purpose: GET /sessions/{sessionId}/history/full con costo costante per pagina
+--
+-- Changes:
+-- 1. CREATE PARTIAL INDEX (session_id, created_at, id) sui soli messaggi non archived
+-- 2. CREATE TABLE chat_session_stats (conteggio esatto + ultimo messaggio per sessione)
+-- 3. CREATE TRIGGER su chat_messages che mantiene chat_session_stats
+-- 4. Backfill chat_session_stats dai messaggi esistenti
+-- ==================================================
+
+-- =====================
+-- 1. Keyset Index (partial, non archived)
+-- =====================
+-- Query pattern (prima pagina / pagina successiva):
+--   WHERE session_id = $1
+--     AND (metadata->>'archived') IS DISTINCT FROM 'true'
+--     AND (created_at, id) > ($2, $3)
+--   ORDER BY created_at, id LIMIT $4
+-- Lo stesso indice serve anche ORDER BY ... DESC (scansione backward).
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_keyset
+    ON public.chat_messages(session_id, created_at, id)
+    WHERE (metadata->>'archived') IS DISTINCT FROM 'true';
+
+-- =====================
+-- 2. Per-session counters
+-- =====================
+CREATE TABLE IF NOT EXISTS public.chat_session_stats (
+    session_id TEXT PRIMARY KEY,
+    message_count BIGINT NOT NULL DEFAULT 0,
+    last_message_id UUID,
+    last_created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL
+);
+
+ALTER TABLE public.chat_session_stats OWNER TO postgres;
+
+-- =====================
+-- 3. Trigger: INSERT / DELETE / UPDATE metadata (archiviazione)
+-- =====================
+-- Conta solo i messaggi visibili (non archived), come la query history.
+-- last_message_id segue il messaggio più recente inserito; archiviazioni e
+-- delete cambiano comunque message_count, quindi l'ETag dell'endpoint
+-- (last_message_id + message_count) cambia a ogni modifica visibile.
+CREATE OR REPLACE FUNCTION public.chat_session_stats_apply()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    old_visible BOOLEAN := FALSE;
+    new_visible BOOLEAN := FALSE;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        old_visible := (OLD.metadata->>'archived') IS DISTINCT FROM 'true';
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_visible := (NEW.metadata->>'archived') IS DISTINCT FROM 'true';
+    END IF;
+
+    IF new_visible AND NOT old_visible THEN
+        INSERT INTO public.chat_session_stats AS s
+            (session_id, message_count, last_message_id, last_created_at)
+        VALUES (NEW.session_id, 1, NEW.id, NEW.created_at)
+        ON CONFLICT (session_id) DO UPDATE SET
+            message_count = s.message_count + 1,
+            last_message_id = CASE
+                WHEN s.last_created_at IS NULL
+                  OR (EXCLUDED.last_created_at, EXCLUDED.last_message_id)
+                     >= (s.last_created_at, s.last_message_id)
+                THEN EXCLUDED.last_message_id
+                ELSE s.last_message_id
+            END,
+            last_created_at = GREATEST(s.last_created_at, EXCLUDED.last_created_at),
+            updated_at = NOW();
+    ELSIF old_visible AND NOT new_visible THEN
+        UPDATE public.chat_session_stats
+        SET message_count = GREATEST(message_count - 1, 0),
+            updated_at = NOW()
+        WHERE session_id = OLD.session_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_chat_session_stats ON public.chat_messages;
+CREATE TRIGGER trg_chat_session_stats
+    AFTER INSERT OR DELETE OR UPDATE OF metadata ON public.chat_messages
+    FOR EACH ROW EXECUTE FUNCTION public.chat_session_stats_apply();
+
+-- =====================
+-- 4. Backfill
+-- =====================
+INSERT INTO public.chat_session_stats (session_id, message_count, last_message_id, last_created_at)
+SELECT DISTINCT ON (session_id)
+    session_id,
+    COUNT(*) OVER (PARTITION BY session_id),
+    id,
+    created_at
+FROM public.chat_messages
+WHERE (metadata->>'archived') IS DISTINCT FROM 'true'
+ORDER BY session_id, created_at DESC, id DESC
+ON CONFLICT (session_id) DO UPDATE SET
+    message_count = EXCLUDED.message_count,
+    last_message_id = EXCLUDED.last_message_id,
+    last_created_at = EXCLUDED.last_created_at,
+    updated_at = NOW();
+
+-- =====================
+-- Grants
+-- =====================
+GRANT ALL ON public.chat_session_stats TO service_role;
+GRANT ALL ON public.chat_session_stats TO postgres;
+
+-- =====================
+-- Verification Queries
+-- =====================
+-- EXPLAIN ANALYZE
+-- SELECT id FROM public.chat_messages
+-- WHERE session_id = 'test_session'
+--   AND (metadata->>'archived') IS DISTINCT FROM 'true'
+--   AND (created_at, id) > ('2025-01-01T00:00:00Z', '00000000-0000-0000-0000-000000000000')
+-- ORDER BY created_at, id
+-- LIMIT 101;
+-- -- Should use idx_chat_messages_session_keyset (Index Scan, no Sort)
+--
+-- SELECT s.session_id, s.message_count, COUNT(m.id)
+-- FROM public.chat_session_stats s
+-- LEFT JOIN public.chat_messages m
+--   ON m.session_id = s.session_id AND (m.metadata->>'archived') IS DISTINCT FROM 'true'
+-- GROUP BY s.session_id, s.message_count
+-- HAVING s.message_count <> COUNT(m.id);
+-- -- Should return 0 rows